@@ -0,0 +1,193 @@
+# Acquisition.py
+
+import time
+import serial
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from Transport import (
+    READ_TIMEOUT,
+    LoopStats,
+    SampleBatcher,
+    SampleDecoder,
+    read_chunk,
+    request_transport_mode,
+)
+from SimulatedDevice import open_serial_port
+from DecodePool import DecodePool
+from Instrumentation import instrumentation
+
+
+class AcquisitionService(QThread):
+    """
+    Owns the serial port for the whole session and fans sample chunks out to subscribers.
+
+    LogicDisplay creates one service and hands it to every mode, so switching between
+    Signal, I2C, SPI and UART only changes the subscribers and never reopens the port.
+    Subscribers are callables taking (samples, start_idx); they run in this thread, so
+    protocol decoding stays off the GUI thread. start_idx counts samples since the port
+    was opened.
+
+    With port None the service runs offline, for looking at capture files: the serial
+    object is never opened, so device commands fail the way they do for a lost port.
+    Ports named sim:<waveform> open an in-process SimulatedSerial instead of hardware.
+    """
+
+    def __init__(self, port, baudrate):
+        super().__init__()
+        self.is_running = True
+        self.subscribers = ()  # Replaced, never mutated, so run() can iterate without a lock
+        self.sample_idx = 0
+        self.decoder = SampleDecoder()  # ASCII lines or binary frames, auto-detected
+        self.batcher = SampleBatcher()  # Coalesces samples into ~10 ms chunks
+        self.loop_stats = LoopStats()  # Wake-ups and CPU time of run()
+        self.serial = None
+        if port is None:
+            self.serial = serial.Serial()  # Unopened
+            self.is_running = False
+            return
+        try:
+            self.serial = open_serial_port(port, baudrate, READ_TIMEOUT)
+            request_transport_mode(self.serial)
+        except serial.SerialException as e:
+            print(f"Failed to open serial port: {str(e)}")
+            self.is_running = False
+
+    def subscribe(self, callback):
+        if callback not in self.subscribers:
+            self.subscribers = self.subscribers + (callback,)
+
+    def unsubscribe(self, callback):
+        self.subscribers = tuple(s for s in self.subscribers if s != callback)
+
+    def set_baudrate(self, baudrate):
+        # Applied to the open port, USB CDC devices do not re-enumerate
+        if self.serial is not None and self.serial.baudrate != baudrate:
+            self.serial.baudrate = baudrate
+
+    def run(self):
+        self.loop_stats.reset()
+        while self.is_running:
+            start = time.perf_counter()
+            raw_data = read_chunk(self.serial)  # Blocks for at most READ_TIMEOUT
+            self.loop_stats.wakeup(len(raw_data))
+            if raw_data:
+                instrumentation.record('read', start, len(raw_data))  # Idle timeouts would swamp the latencies
+            start = time.perf_counter()
+            samples = self.decoder.feed(raw_data)
+            if raw_data:
+                instrumentation.record('parse', start, len(samples))
+            self.batcher.add(samples)
+            if self.batcher.is_due():
+                samples = self.batcher.take()
+                start = time.perf_counter()
+                for callback in self.subscribers:
+                    callback(samples, self.sample_idx)
+                instrumentation.record('emit', start, len(samples))
+                instrumentation.set_counter('dropped_frames', self.decoder.dropped_frames)
+                instrumentation.set_counter('checksum_errors', self.decoder.checksum_errors)
+                self.sample_idx += len(samples)
+
+    def stop_worker(self):
+        self.is_running = False
+        # run() notices within one read timeout, close the port only after it has left read()
+        self.wait()
+        if self.serial is not None and self.serial.is_open:
+            self.serial.close()
+
+
+class AcquisitionSubscriber(QObject):
+    """
+    Base class for the per-mode workers. Subscribes to an AcquisitionService and
+    re-emits chunks as data_ready(samples, start_idx) for the display.
+
+    Subclasses override process_samples to gate or decode chunks. It is called from the
+    acquisition thread once start() has subscribed the worker, signals emitted there are
+    queued to the GUI thread.
+    """
+    data_ready = pyqtSignal(object, int)  # For sample chunks and the index of their first sample
+
+    def __init__(self, acquisition):
+        super().__init__()
+        self.acquisition = acquisition
+        self.is_running = False
+
+    @property
+    def serial(self):
+        # Displays send device commands through the shared port
+        return self.acquisition.serial
+
+    def process_samples(self, samples, start_idx):
+        self.data_ready.emit(samples, start_idx)
+
+    def start(self):
+        self.is_running = True
+        self.acquisition.subscribe(self.process_samples)
+
+    def stop_worker(self):
+        self.is_running = False
+        self.acquisition.unsubscribe(self.process_samples)
+
+
+class DecodingSubscriber(AcquisitionSubscriber):
+    """
+    Base class for the protocol workers. Every chunk goes to the display first, then to
+    the worker's decoder, inline in the acquisition thread or in a DecodePool, and the
+    events come out as decoded_message_ready. Subclasses supply the decoder and give
+    its configs the name their display uses.
+
+    Events are numbered by sample_idx, the samples handed to the display since the last
+    reset. reset_decoding_states() is called from the GUI thread; while subscribed, the
+    reset is applied by the acquisition thread before its next chunk.
+    """
+    decoded_message_ready = pyqtSignal(dict)  # For decoded messages
+
+    def __init__(self, acquisition, decoder, channels=8):
+        super().__init__(acquisition)
+        self.channels = channels
+        self.trigger_modes = ['No Trigger'] * self.channels
+        self.decoder = decoder  # Decoding state of every group lives in the decoder
+        self.sample_idx = 0
+        self.decode_pool = None  # Set by use_decode_pool()
+        self.reset_requested = False  # Set by the GUI thread, taken up by process_samples()
+
+    def set_trigger_mode(self, channel_idx, mode):
+        self.trigger_modes[channel_idx] = mode
+
+    def process_samples(self, samples, start_idx):
+        if self.reset_requested:
+            self.apply_reset()  # Between chunks, so no chunk is decoded half before it
+        # Hand the chunk to the GUI before decoding it, so cursors never point past the plotted data
+        instrumentation.chunk_emitted()
+        self.data_ready.emit(samples, self.sample_idx)
+        start = time.perf_counter()
+        if self.decode_pool is not None:
+            # Only copied to the worker processes here; a file being replayed may wait for them, the device may not
+            self.decode_pool.submit(samples, self.sample_idx, wait=not self.is_running)
+        else:
+            for decoded_data in self.decoder.decode(samples, self.sample_idx):
+                self.decoded_message_ready.emit(decoded_data)
+        instrumentation.record('decode', start, len(samples))
+        self.sample_idx += len(samples)
+
+    def emit_decoded(self, annotations):
+        # Called by the pool's collector thread, the signals are queued to the GUI thread as before
+        for decoded_data in annotations:
+            self.decoded_message_ready.emit(decoded_data)
+
+    def use_decode_pool(self, enabled):
+        # Decoding in worker processes, or back in the acquisition thread; the decoders start over
+        pool = self.decode_pool
+        self.decode_pool = DecodePool([self.decoder], self.emit_decoded) if enabled else None
+        if pool is not None:
+            pool.close()
+
+    def reset_decoding_states(self):
+        self.reset_requested = True
+        if not self.is_running:
+            self.apply_reset()
+
+    def apply_reset(self):
+        self.reset_requested = False
+        self.decoder.reset()
+        if self.decode_pool is not None:
+            self.decode_pool.reset()
+        self.sample_idx = 0
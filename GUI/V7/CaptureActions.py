@@ -0,0 +1,234 @@
+# CaptureActions.py
+
+import pyqtgraph as pg
+from PyQt6.QtWidgets import QFileDialog
+from PyQt6.QtCore import Qt
+from SampleBuffer import SampleRingBuffer
+from Transitions import TransitionStore
+from LevelOfDetail import MAPPED_MIN_BLOCK_SIZE, MinMaxPyramid
+from CaptureFile import CAPTURE_FILTER, capture_chunks, load_capture, make_header, save_capture
+from Interchange import OPEN_FILTER, SAVE_FILTER, export_capture, is_interchange_path, open_import, with_extension
+from Recorder import CaptureRecorder
+from Instrumentation import instrumentation
+
+
+class CaptureActions:
+    """
+    Capture file handling shared by the Signal, I2C, SPI and UART displays: saving the
+    buffer, opening a file in place of live data, going back to live acquisition,
+    recording everything acquired to disk and exporting or importing VCD and sigrok
+    files (the formats themselves are in Interchange.py).
+
+    The display provides the widgets and state these methods use (data_buffer, lod,
+    plot, channel_buttons, record_button, sample_rate, capture, recorder, ...) and the
+    hooks below:
+    capture_mode names the display in the file header, capture_decoder_configs() and
+    apply_capture_configs() save and restore the decoder settings, capture_decoder()
+    decodes an opened file and prepare_import() readies the display for imported samples.
+    """
+
+    capture_mode = None
+
+    def save_capture_file(self):
+        path, selected_filter = QFileDialog.getSaveFileName(self, "Save Capture", "", SAVE_FILTER)
+        if path:
+            path = with_extension(path, selected_filter)
+            if is_interchange_path(path):
+                self.export_capture_file(path)
+            else:
+                self.write_capture_file(path)
+
+    def open_capture_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Capture", "", OPEN_FILTER)
+        if path:
+            if is_interchange_path(path):
+                self.import_capture_file(path)
+            else:
+                self.read_capture_file(path)
+
+    def read_capture_file(self, path):
+        try:
+            capture = load_capture(path)
+        except (OSError, ValueError) as e:
+            print(f"Failed to open capture: {e}")
+            return
+        self.show_capture(capture)
+
+    def capture_trigger_position(self):
+        if self.capture is not None:
+            return self.capture.trigger_position
+        # A triggered capture starts at the trigger, which stays at sample 0 until the buffer wraps
+        triggered = any(mode != 'No Trigger' for mode in self.current_trigger_modes)
+        if triggered and self.data_buffer.first_sample == 0 and len(self.data_buffer):
+            return 0
+        return None
+
+    def capture_decoder_configs(self):
+        return None  # Plain logic capture
+
+    def apply_capture_configs(self, decoder_configs):
+        pass
+
+    def capture_decoder(self):
+        return None
+
+    def set_capture_sample_rate(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.sample_rate_input.setText(str(int(self.sample_rate)))
+
+    def clear_decoded_text(self):
+        pass
+
+    def prepare_import(self):
+        pass
+
+    def export_capture_file(self, path):
+        try:
+            export_capture(
+                path, self.data_buffer.contiguous(), self.sample_rate,
+                [button.text() for button in self.channel_buttons],
+            )
+            print(f"Capture exported to {path}")
+        except OSError as e:
+            print(f"Failed to export capture: {e}")
+
+    def import_capture_file(self, path):
+        try:
+            imported = open_import(path)
+        except (OSError, ValueError) as e:
+            print(f"Failed to import capture: {e}")
+            return
+        # Imported samples take the live path like a single capture: worker, triggers,
+        # decoders and sample buffer all see them as if the device had sent them
+        if self.capture is not None:
+            self.close_capture()
+        if self.is_reading:
+            self.stop_reading()
+        self.clear_data_buffers()
+        self.prepare_import()
+        self.set_capture_sample_rate(imported.sample_rate)
+        for button, name in zip(self.channel_buttons, imported.channel_names):
+            button.setText(name)
+        self.plot.setLimits(xMin=0, xMax=self.bufferSize / self.sample_rate)
+        self.worker.stop_worker()  # Chunks from the device must not interleave with the file
+        self.is_single_capture = True
+        self.is_reading = True
+        try:
+            for start_idx, samples in imported.chunks():
+                if not self.is_reading:
+                    break  # The buffer is full
+                self.worker.process_samples(samples, start_idx)
+        except (OSError, ValueError) as e:
+            print(f"Failed to import capture: {e}")
+        self.is_single_capture = False
+        self.is_reading = False
+        self.worker.start()
+        self.update_plot()
+
+    def show_trigger_marker(self, trigger_position):
+        if self.trigger_line is not None:
+            self.plot.removeItem(self.trigger_line)
+            self.trigger_line = None
+        if trigger_position is not None:
+            self.trigger_line = pg.InfiniteLine(
+                pos=trigger_position / self.sample_rate, angle=90,
+                pen=pg.mkPen(color='r', width=1, style=Qt.PenStyle.DashLine),
+            )
+            self.plot.addItem(self.trigger_line)
+
+    def close_capture(self):
+        # Back to a live ring buffer before acquiring again
+        self.capture = None
+        self.data_buffer = SampleRingBuffer(self.bufferSize, transitions=True)
+        self.lod = MinMaxPyramid(self.data_buffer)
+        self.show_trigger_marker(None)
+        self.plot.setLimits(xMin=0, xMax=self.bufferSize / self.sample_rate)
+        self.clear_data_buffers()
+
+    def write_capture_file(self, path):
+        try:
+            save_capture(
+                path, self.data_buffer.contiguous(), self.sample_rate,
+                [button.text() for button in self.channel_buttons],
+                self.capture_trigger_position(), self.capture_mode, self.capture_decoder_configs(),
+            )
+            print(f"Capture saved to {path}")
+        except OSError as e:
+            print(f"Failed to save capture: {e}")
+
+    def toggle_recording(self, checked):
+        if not checked:
+            self.stop_recording()
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Record To", "", CAPTURE_FILTER)
+        if path:
+            self.start_recording(path)
+        else:
+            self.record_button.setChecked(False)
+
+    def start_recording(self, path):
+        # Every acquired sample goes to disk, the display only keeps a sliding window
+        if self.capture is not None:
+            self.close_capture()
+        header = make_header(
+            self.sample_rate, [button.text() for button in self.channel_buttons], None, self.capture_mode,
+            self.capture_decoder_configs(),
+        )
+        self.recorder = CaptureRecorder(path, header)
+        self.recorder.start()
+        self.acquisition.subscribe(self.recorder.record)
+        self.record_button.setChecked(True)
+        self.record_button.setStyleSheet("background-color: #FF5555; color: black;")
+
+    def stop_recording(self):
+        if self.recorder is None:
+            return
+        self.acquisition.unsubscribe(self.recorder.record)
+        self.recorder.stop()  # Writes out what is still queued
+        self.update_record_label()
+        print(f"Recorded {self.recorder.written_samples} samples to {len(self.recorder.segment_paths)} file(s), "
+              f"{self.recorder.dropped_samples} dropped")
+        self.recorder = None
+        self.record_button.setChecked(False)
+        self.record_button.setStyleSheet("")
+
+    def update_record_label(self):
+        if self.recorder is not None:
+            self.record_label.setText(
+                f"Rec {self.recorder.written_samples}, dropped {self.recorder.dropped_samples}"
+            )
+            instrumentation.set_counter('recording_dropped_samples', self.recorder.dropped_samples)
+
+    def show_capture(self, capture):
+        # Shows a capture file instead of live data, no device needed
+        self.stop_recording()
+        if self.is_reading:
+            self.stop_reading()
+        self.clear_data_buffers()
+        self.clear_decoded_text()
+        self.capture = capture
+        # One pass over the file gives the runs both the plot and the decoders read, unless
+        # the capture changes so often that its samples take less memory
+        transitions = TransitionStore.from_samples(capture.samples, max_bytes=len(capture))
+        self.data_buffer = SampleRingBuffer.wrap(capture.samples, transitions)
+        self.lod = MinMaxPyramid(self.data_buffer, min_block_size=MAPPED_MIN_BLOCK_SIZE)
+        self.total_samples = len(capture)
+        self.set_capture_sample_rate(capture.sample_rate)
+        for button, name in zip(self.channel_buttons, capture.channel_names):
+            button.setText(name)
+        self.apply_capture_configs(capture.decoder_configs)
+        self.show_trigger_marker(capture.trigger_position)
+        duration = max(len(capture), 1) / self.sample_rate
+        self.plot.setLimits(xMin=0, xMax=duration)
+        self.plot.setXRange(0, duration, padding=0)
+        # A separate decoder, the worker's one keeps following the live stream
+        decoder = self.capture_decoder()
+        if decoder is not None:
+            if transitions is not None:
+                decoded = (decoder.decode_runs(*runs) for runs in transitions.chunks())
+            else:
+                decoded = (decoder.decode(chunk, start_idx) for start_idx, chunk in capture_chunks(capture.samples))
+            for events in decoded:
+                for decoded_data in events:
+                    self.display_decoded_message(decoded_data)
+        self.update_plot()
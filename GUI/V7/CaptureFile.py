@@ -0,0 +1,132 @@
+# CaptureFile.py
+
+import json
+import os
+import struct
+import numpy as np
+
+CAPTURE_MAGIC = b'LACAP\x00'
+CAPTURE_VERSION = 1
+CAPTURE_EXTENSION = '.lacap'
+CAPTURE_FILTER = "Captures (*.lacap)"
+PAYLOAD_ALIGNMENT = 4096  # Samples start on a page boundary so the memory map is aligned
+PREFIX_FORMAT = '<6sHI'  # Magic, version, header length
+DECODE_CHUNK = 1 << 20  # Samples per step when a capture is decoded after opening
+
+
+class CaptureFile:
+    """
+    A capture opened from disk.
+
+    Layout: magic, format version and JSON header length, the JSON header, zero padding
+    up to PAYLOAD_ALIGNMENT, then one packed uint8 per sample (bit i is channel i) up to
+    the end of the file. The sample count follows from the file size, so a recorder can
+    keep appending samples without rewriting the header.
+
+    `samples` is a read-only np.memmap: opening is instant whatever the size, and the
+    pages of a slice are only read from disk when the slice is used.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            prefix = file.read(struct.calcsize(PREFIX_FORMAT))
+            if len(prefix) < struct.calcsize(PREFIX_FORMAT):
+                raise ValueError(f"{path} is too short to be a capture file")
+            magic, version, header_length = struct.unpack(PREFIX_FORMAT, prefix)
+            if magic != CAPTURE_MAGIC:
+                raise ValueError(f"{path} is not a capture file")
+            if version > CAPTURE_VERSION:
+                raise ValueError(f"{path} has capture format version {version}, newer than {CAPTURE_VERSION}")
+            self.header = json.loads(file.read(header_length).decode('utf-8'))
+        self.payload_offset = payload_offset(header_length)
+        num_samples = max(os.path.getsize(path) - self.payload_offset, 0)
+        if num_samples:
+            self.samples = np.memmap(path, dtype=np.uint8, mode='r', offset=self.payload_offset, shape=(num_samples,))
+        else:
+            self.samples = np.empty(0, dtype=np.uint8)  # np.memmap refuses empty files
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def sample_rate(self):
+        return self.header['sample_rate']
+
+    @property
+    def channel_names(self):
+        return self.header.get('channel_names', [])
+
+    @property
+    def trigger_position(self):
+        # Sample index of the trigger, None when the capture was not triggered
+        return self.header.get('trigger_position')
+
+    @property
+    def mode(self):
+        # Display the capture was taken with: Signal, I2C, SPI or UART
+        return self.header.get('mode', 'Signal')
+
+    @property
+    def decoder_configs(self):
+        return self.header.get('decoder_configs', [])
+
+    @property
+    def segment(self):
+        # Position in a segmented recording, 0 for a single file
+        return self.header.get('segment', 0)
+
+    @property
+    def first_sample(self):
+        # Number of the first sample counted from the start of the recording
+        return self.header.get('first_sample', 0)
+
+
+def payload_offset(header_length):
+    header_end = struct.calcsize(PREFIX_FORMAT) + header_length
+    return -(-header_end // PAYLOAD_ALIGNMENT) * PAYLOAD_ALIGNMENT
+
+
+def make_header(sample_rate, channel_names, trigger_position=None, mode='Signal', decoder_configs=None):
+    return {
+        'sample_rate': sample_rate,
+        'channel_names': list(channel_names),
+        'trigger_position': trigger_position,
+        'mode': mode,
+        'decoder_configs': decoder_configs if decoder_configs else [],
+    }
+
+
+def write_header(file, header):
+    """
+    Writes the prefix, the JSON header and the padding, leaving the file at the payload.
+    """
+    encoded = json.dumps(header).encode('utf-8')
+    prefix = struct.pack(PREFIX_FORMAT, CAPTURE_MAGIC, CAPTURE_VERSION, len(encoded))
+    file.write(prefix + encoded)
+    file.write(b'\x00' * (payload_offset(len(encoded)) - len(prefix) - len(encoded)))
+
+
+def save_capture(path, samples, sample_rate, channel_names, trigger_position=None, mode='Signal',
+                 decoder_configs=None, chunk_size=1 << 22):
+    """
+    Writes samples (packed uint8, or anything that converts to it) with their header.
+    """
+    header = make_header(sample_rate, channel_names, trigger_position, mode, decoder_configs)
+    with open(path, 'wb') as file:
+        write_header(file, header)
+        for i in range(0, len(samples), chunk_size):
+            np.asarray(samples[i:i + chunk_size]).astype(np.uint8, copy=False).tofile(file)
+
+
+def load_capture(path):
+    return CaptureFile(path)
+
+
+def capture_chunks(samples, chunk_size=DECODE_CHUNK):
+    """
+    Yields (start_idx, chunk) over a capture, so decoders see it the way they see the
+    live stream and only one chunk of a memory-mapped file is paged in at a time.
+    """
+    for start in range(0, len(samples), chunk_size):
+        yield start, samples[start:start + chunk_size]
@@ -0,0 +1,344 @@
+# DecodePool.py
+
+import multiprocessing
+import operator
+import os
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+import numpy as np
+from Decoders import create_decoder
+from Instrumentation import instrumentation
+
+RING_SIZE = 16 << 20  # Bytes of samples in flight, about 16 s at 1 MS/s
+POLL_INTERVAL = 0.5  # Seconds the collector waits for results before checking the workers are alive
+
+
+def default_processes(num_lanes):
+    # One core stays with the acquisition thread and the GUI
+    return max(min(num_lanes, (os.cpu_count() or 2) - 1), 1)
+
+
+def decode_worker(worker_idx, shm_name, tasks, results):
+    """
+    Worker process: decodes the chunks in shared memory for the lanes it was given and
+    sends back (seq, worker_idx, [(lane_idx, events)], seconds) per chunk.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    lanes = {}  # Lane index -> (decoder, group index, event key of the group)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            kind = task[0]
+            if kind == 'lanes':
+                lanes = {}
+                for lane_idx, name, group_idx, config, sample_rate in task[1]:
+                    try:
+                        decoder = create_decoder(name, [config], sample_rate)
+                    except ValueError as e:
+                        print(e)
+                        continue
+                    lanes[lane_idx] = (decoder, group_idx, decoder.group_key)
+                continue
+            if kind == 'configs':
+                # Edited settings apply from the next chunk on, like the display's edits do inline
+                for lane_idx, config in task[1]:
+                    if lane_idx in lanes:
+                        lanes[lane_idx][0].configs[0] = config
+                continue
+
+            start = time.perf_counter()
+            if kind == 'chunk':
+                _, seq, offset, length, start_idx, reset = task
+                samples = np.frombuffer(shm.buf, dtype=np.uint8, count=length, offset=offset).copy()
+            else:
+                _, seq = task  # 'flush' at the end of a capture
+            lane_events = []
+            for lane_idx, (decoder, group_idx, group_key) in lanes.items():
+                try:
+                    if kind == 'chunk':
+                        if reset:
+                            decoder.reset()
+                        events = decoder.decode(samples, start_idx)
+                    else:
+                        events = decoder.flush()
+                except Exception as e:
+                    print(f"Decoder {decoder.name} failed on group {group_idx + 1}: {e}")
+                    events = []
+                if group_idx:
+                    for event in events:
+                        event[group_key] = group_idx
+                lane_events.append((lane_idx, events))
+            results.put((seq, worker_idx, lane_events, time.perf_counter() - start))
+    finally:
+        results.put((None, worker_idx, None, 0.0))
+        shm.close()
+
+
+class RingSpace:
+    """
+    Space for chunks in a ring of size bytes: each chunk is one contiguous region, handed
+    out after the newest one and freed oldest first.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.regions = deque()  # (offset, length) of the chunks in use, oldest first
+        self.write_pos = 0  # End of the newest region
+
+    def allocate(self, length):
+        """
+        Returns the offset of length free bytes, None when the regions in use leave no room.
+        """
+        if not self.regions:
+            offset = 0
+        else:
+            oldest = self.regions[0][0]
+            # With regions in use, write_pos == oldest means the ring is full, not empty
+            if self.write_pos > oldest:
+                if self.write_pos + length <= self.size:
+                    offset = self.write_pos
+                elif length <= oldest:
+                    offset = 0  # Wrapped to the start
+                else:
+                    return None
+            elif self.write_pos + length <= oldest:
+                offset = self.write_pos
+            else:
+                return None
+        self.regions.append((offset, length))
+        self.write_pos = offset + length
+        return offset
+
+    def release(self):
+        self.regions.popleft()
+
+
+class DecodePool:
+    """
+    Decodes sample chunks in worker processes, so protocol decoding neither holds the GIL
+    of the acquisition thread nor makes it miss serial data.
+
+    Every group of every decoder is a lane with a decoder of its own in one of the
+    processes; lanes are dealt to the processes in turn. submit() copies a chunk into a
+    shared memory ring and queues its position to every process, which takes no longer
+    than the copy. A collector thread waits for the results of each chunk from all
+    processes, merges them by sample index as DecoderSet does, and hands them to
+    callback(annotations) in submission order. Groups of one decoder that end on the same
+    sample come back in group order, like the decoder returns them inline.
+
+    The decoders passed in are only read, for their name, sample rate and configs; configs
+    edited in place are picked up at the next submit() and sent to the processes.
+
+    When the ring is full the chunk is dropped rather than waiting, unless wait is set,
+    and the next chunk resets the decoders, since their state ended before the gap.
+    Drops and chunks in flight are the decode_dropped and decode_backlog counters, the
+    time the processes took the pool stage.
+    """
+
+    def __init__(self, decoders, callback, processes=None, ring_size=RING_SIZE):
+        self.decoders = list(decoders)
+        self.callback = callback
+        self.ring_size = ring_size
+        self.lanes = self.make_lanes()
+        self.num_processes = processes or default_processes(len(self.lanes))
+        self.shm = shared_memory.SharedMemory(create=True, size=ring_size)
+        self.ring = np.frombuffer(self.shm.buf, dtype=np.uint8, count=ring_size)
+
+        # Ring state, shared with the collector under the condition's lock
+        self.space = threading.Condition()
+        self.ring_space = RingSpace(ring_size)
+        self.in_flight = deque()  # (seq, length) still being decoded, a flush has length None
+        self.next_seq = 0
+        self.failed = False
+        self.closed = False
+        self.needs_reset = False
+        self.first_seq = 0  # Results of earlier chunks are dropped, they predate reset()
+        self.delivery = threading.Lock()  # Held while results are handed out
+        self.dropped = 0
+
+        # Spawned, a forked copy of a process running Qt threads can deadlock
+        context = multiprocessing.get_context('spawn')
+        self.results = context.Queue()
+        self.tasks = [context.Queue() for _ in range(self.num_processes)]
+        self.processes = [
+            context.Process(target=decode_worker, args=(worker_idx, self.shm.name, tasks, self.results), daemon=True)
+            for worker_idx, tasks in enumerate(self.tasks)
+        ]
+        for process in self.processes:
+            process.start()
+        self.send_lanes()
+        self.collector = threading.Thread(target=self.collect, daemon=True)
+        self.collector.start()
+
+    def make_lanes(self):
+        # (decoder index, group index, config) per lane, the configs copied as sent
+        return [
+            (decoder_idx, group_idx, decoder.group_config(group_idx))
+            for decoder_idx, decoder in enumerate(self.decoders)
+            for group_idx in range(len(decoder.configs))
+        ]
+
+    def worker_lanes(self, worker_idx):
+        return range(worker_idx, len(self.lanes), self.num_processes)
+
+    def send_lanes(self):
+        for worker_idx, tasks in enumerate(self.tasks):
+            tasks.put(('lanes', [
+                (lane_idx, self.decoders[decoder_idx].name, group_idx, config, self.decoders[decoder_idx].sample_rate)
+                for lane_idx in self.worker_lanes(worker_idx)
+                for decoder_idx, group_idx, config in [self.lanes[lane_idx]]
+            ]))
+
+    def send_configs(self):
+        lanes = self.make_lanes()
+        if len(lanes) != len(self.lanes):
+            # Groups were added or removed, every lane starts over
+            self.lanes = lanes
+            self.send_lanes()
+            return
+        changed = {lane_idx for lane_idx, (lane, sent) in enumerate(zip(lanes, self.lanes)) if lane != sent}
+        if not changed:
+            return
+        self.lanes = lanes
+        for worker_idx, tasks in enumerate(self.tasks):
+            updates = [(lane_idx, lanes[lane_idx][2]) for lane_idx in self.worker_lanes(worker_idx) if lane_idx in changed]
+            if updates:
+                tasks.put(('configs', updates))
+
+    def submit(self, samples, start_idx, wait=False):
+        """
+        Queues a chunk of packed samples for decoding. Returns False when it was dropped,
+        because the ring is full and wait is not set, or the pool has failed.
+        """
+        if len(samples) == 0:
+            return True
+        if len(samples) > self.ring_size // 2:
+            # The decoders carry their state across chunks, so a long one can be split
+            half = self.ring_size // 2
+            return all([self.submit(samples[i:i + half], start_idx + i, wait) for i in range(0, len(samples), half)])
+        with self.space:
+            while True:
+                offset = None if self.failed or self.closed else self.ring_space.allocate(len(samples))
+                if offset is not None or not wait or self.failed or self.closed:
+                    break
+                self.space.wait()
+            if offset is None:
+                self.dropped += 1
+                self.needs_reset = True
+                instrumentation.set_counter('decode_dropped', self.dropped)
+                return False
+            # Under the lock, so close() cannot shut the queues in between
+            self.send_configs()
+            seq = self.next_seq
+            self.next_seq += 1
+            self.in_flight.append((seq, len(samples)))
+            reset, self.needs_reset = self.needs_reset, False
+            self.ring[offset:offset + len(samples)] = samples
+            for tasks in self.tasks:
+                tasks.put(('chunk', seq, offset, len(samples), start_idx, reset))
+        instrumentation.set_counter('decode_backlog', len(self.in_flight))
+        return True
+
+    def reset(self):
+        """
+        Starts the decoders over at the next chunk, as a new acquisition does. Results of
+        the chunks submitted before are no longer handed out once this returns.
+        """
+        with self.delivery:  # Waits for a delivery in progress
+            with self.space:
+                self.needs_reset = True
+                self.first_seq = self.next_seq
+
+    def flush(self):
+        # Events the decoders hold back until the end of a capture, delivered after the last chunk
+        with self.space:
+            if self.closed:
+                return
+            seq = self.next_seq
+            self.next_seq += 1
+            self.in_flight.append((seq, None))  # Takes no ring space
+            for tasks in self.tasks:
+                tasks.put(('flush', seq))
+
+    def collect(self):
+        """
+        Collector thread: puts the results of each chunk together and hands them out in order.
+        """
+        pending = {}  # seq -> [(lane_idx, events)] of the workers that answered so far
+        answered = {}  # seq -> number of workers that answered
+        slowest = {}  # seq -> seconds of the slowest worker
+        finished = 0
+        while finished < self.num_processes:
+            try:
+                seq, worker_idx, lane_events, seconds = self.results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if not self.failed and not all(process.is_alive() for process in self.processes):
+                    print("A decode worker process exited, decoding stopped")
+                    self.fail()
+                if self.failed and not any(process.is_alive() for process in self.processes):
+                    break
+                continue
+            if seq is None:
+                finished += 1
+                continue
+            pending.setdefault(seq, []).extend(lane_events)
+            answered[seq] = answered.get(seq, 0) + 1
+            slowest[seq] = max(slowest.get(seq, 0.0), seconds)
+            while self.in_flight and answered.get(self.in_flight[0][0]) == self.num_processes:
+                self.deliver(pending, answered, slowest)
+
+    def deliver(self, pending, answered, slowest):
+        seq, length = self.in_flight[0]
+        lane_events = pending.pop(seq)
+        del answered[seq]
+        instrumentation.record('pool', time.perf_counter() - slowest.pop(seq), length or 0)
+        lane_events.sort(key=operator.itemgetter(0))
+        annotations = [event for _, events in lane_events for event in events]
+        # Each lane's events are sorted already, a stable sort merges them
+        annotations.sort(key=operator.itemgetter('sample_idx'))
+        with self.space:
+            self.in_flight.popleft()
+            if length is not None:
+                self.ring_space.release()  # Its samples have been read, the space is free again
+            self.space.notify_all()
+        instrumentation.set_counter('decode_backlog', len(self.in_flight))
+        with self.delivery:
+            if annotations and seq >= self.first_seq:
+                try:
+                    self.callback(annotations)
+                except Exception as e:
+                    print(f"Failed to handle decoded events: {e}")
+
+    def fail(self):
+        with self.space:
+            self.failed = True
+            self.space.notify_all()
+
+    def close(self):
+        """
+        Stops the processes once they have decoded what was submitted, and waits until the
+        collector has handed out the results.
+        """
+        with self.space:
+            if self.closed:
+                return
+            self.closed = True  # A submit() racing with this one drops its chunk
+            self.space.notify_all()
+            for tasks in self.tasks:
+                tasks.put(None)
+        self.collector.join()
+        for process in self.processes:
+            process.join(timeout=POLL_INTERVAL)
+            if process.is_alive():
+                process.terminate()
+        for tasks in self.tasks:
+            tasks.close()
+        self.results.close()
+        del self.ring  # The view into the segment must go before it can be closed
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,368 @@
+# Decoders.py
+
+import abc
+import ast
+import importlib
+import importlib.util
+import operator
+import os
+from Transitions import expand_runs
+
+DECODER_SUFFIX = 'Decoder.py'  # <Name>Decoder.py modules next to this one are found by discover_decoders()
+DECODERS = {}  # Name -> 'Module:Class' until first used, then the plugin class
+PAYLOAD_LIMIT = 256  # Bytes per annotation of a stacked decoder, longer transfers are split
+
+
+def parse_number(text):
+    # Settings values in decimal or 0x hex
+    return int(text, 0)
+
+
+class DecoderPlugin(abc.ABC):
+    """
+    Base class of the protocol decoders.
+
+    A plugin declares its channels (the config keys holding a 1-based channel number),
+    its settings (option name -> (config key, type)) and the config defaults, and decodes
+    chunks of packed samples incrementally: decode() is called with consecutive chunks and
+    carries its state across them until reset(). Each decoder holds a list of configs, one
+    per group of channels, which the displays edit in place.
+
+    Annotations are the event dicts the displays and headless.py already read, 'event'
+    (UART frames have none and are DATA), 'sample_idx' and the decoded fields, tagged with
+    'decoder', the plugin name, so the events of several decoders can be told apart.
+
+    decode_runs() decodes the same chunks given as runs of the packed word, the form a
+    TransitionStore keeps; the edge-driven decoders read the runs directly and the others
+    get the samples back.
+
+    A plugin with a display names the LogicDisplay mode and the 'Module:Class' of the view
+    that shows its events; the view is only imported when the mode is opened.
+    """
+
+    name = None  # Registry key, also the headless.py option
+    label = None
+    mode = None  # LogicDisplay mode, None for decoders that only headless.py shows
+    display = None  # 'Module:Class' of the view
+    channels = ()
+    settings = {}
+    defaults = {}
+    group_key = 'group_idx'  # Event key holding the index of the config that decoded it
+
+    def __init__(self, configs=None, sample_rate=None):
+        self.configs = configs if configs is not None else [self.make_config()]
+        self.sample_rate = sample_rate
+        self.reset()
+
+    @classmethod
+    def make_config(cls, text='', **overrides):
+        """
+        Returns a config from the defaults, "data=1,clock=2" style settings and overrides.
+        """
+        settings = cls.all_settings()
+        config = cls.all_defaults()
+        for item in filter(None, text.split(',')):
+            key, _, value = item.partition('=')
+            if key not in settings:
+                raise ValueError(f"unknown {cls.name} setting {key!r}, expected one of {', '.join(settings)}")
+            name, kind = settings[key]
+            try:
+                config[name] = kind(value)
+            except ValueError:
+                raise ValueError(f"invalid {cls.name} setting {item!r}") from None
+        config.update(overrides)
+        return config
+
+    @classmethod
+    def all_settings(cls):
+        return dict(cls.settings)
+
+    @classmethod
+    def all_defaults(cls):
+        return dict(cls.defaults)
+
+    def group_config(self, group_idx):
+        """
+        Returns the config that decodes group group_idx alone, as the only group of a
+        decoder of its own; DecodePool runs the groups in separate processes this way.
+        """
+        return dict(self.configs[group_idx])
+
+    def reset(self):
+        pass
+
+    @abc.abstractmethod
+    def decode_events(self, samples, start_idx):
+        """
+        Returns the event dicts completed in this chunk, ordered by sample index.
+        """
+
+    def decode(self, samples, start_idx):
+        """
+        Decodes one chunk of packed samples whose first sample has index start_idx.
+        """
+        events = self.decode_events(samples, start_idx)
+        # Tagged in place, a copy per event would cost more than some decoders take
+        for event in events:
+            event['decoder'] = self.name
+        return events
+
+    def decode_run_events(self, indices, values, stop_idx):
+        """
+        Returns the event dicts completed in a chunk of runs, (sample index, packed value) at
+        every change, covering the samples up to stop_idx.
+        """
+        return self.decode_events(expand_runs(indices, values, stop_idx), int(indices[0]))
+
+    def decode_runs(self, indices, values, stop_idx):
+        """
+        Decodes one chunk given as runs; the events are the ones decode() returns for the
+        same samples.
+        """
+        if len(indices) == 0:
+            return []
+        events = self.decode_run_events(indices, values, stop_idx)
+        for event in events:
+            event['decoder'] = self.name
+        return events
+
+    def flush_events(self):
+        """
+        Returns the events still held back when the capture ends.
+        """
+        return []
+
+    def flush(self):
+        events = self.flush_events()
+        for event in events:
+            event['decoder'] = self.name
+        return events
+
+
+class StackedDecoderPlugin(DecoderPlugin):
+    """
+    Base class of the decoders that read the annotations of another one instead of the
+    samples, like EEPROM accesses over I2C.
+
+    The lower decoder is created from the same configs, which carry the settings of both
+    layers; the layer's defaults win over the lower ones, so it can ask for what it needs.
+    decode() runs the whole stack over a chunk and hands the lower annotations to
+    decode_annotations(), together with the index of the sample after the chunk for
+    layers that end a transfer on silence. A layer keeps only the transfer in progress and
+    splits long ones into PAYLOAD_LIMIT byte annotations, so a long recording decodes in
+    linear time and bounded memory.
+    """
+
+    lower = None  # Name of the decoder this one reads
+
+    def __init__(self, configs=None, sample_rate=None):
+        configs = configs if configs is not None else [self.make_config()]
+        self.lower_decoder = create_decoder(self.lower, configs, sample_rate)
+        super().__init__(configs, sample_rate)
+
+    @classmethod
+    def all_settings(cls):
+        return dict(load_decoder(cls.lower).all_settings(), **cls.settings)
+
+    @classmethod
+    def all_defaults(cls):
+        return dict(load_decoder(cls.lower).all_defaults(), **cls.defaults)
+
+    def group_config(self, group_idx):
+        return self.lower_decoder.group_config(group_idx)
+
+    def reset(self):
+        self.lower_decoder.reset()
+
+    def decode_events(self, samples, start_idx):
+        annotations = self.lower_decoder.decode(samples, start_idx)
+        return self.decode_layer(annotations, start_idx + len(samples))
+
+    def decode_run_events(self, indices, values, stop_idx):
+        annotations = self.lower_decoder.decode_runs(indices, values, stop_idx)
+        return self.decode_layer(annotations, stop_idx)
+
+    def decode_layer(self, annotations, end_idx):
+        events = self.decode_annotations(annotations, end_idx)
+        # A transfer is reported when it ends, at the sample it started; groups interleave
+        events.sort(key=operator.itemgetter('sample_idx'))
+        return events
+
+    @abc.abstractmethod
+    def decode_annotations(self, annotations, end_idx):
+        """
+        Returns the event dicts of the transfers that ended in these lower annotations,
+        or by end_idx.
+        """
+
+
+class DecoderSet:
+    """
+    Several decoders over the same samples in one pass: every chunk goes to each of them
+    and the annotations completed in it come back merged by sample index, in decoder order
+    on ties. An event finished in this chunk can point back into the previous one, like an
+    I2C ADDRESS at the sample its first bit was read, so the order holds per chunk.
+    """
+
+    def __init__(self, decoders=()):
+        self.decoders = list(decoders)
+
+    def __len__(self):
+        return len(self.decoders)
+
+    def add(self, decoder):
+        self.decoders.append(decoder)
+
+    def reset(self):
+        for decoder in self.decoders:
+            decoder.reset()
+
+    def decode(self, samples, start_idx):
+        if len(self.decoders) == 1:
+            return self.decoders[0].decode(samples, start_idx)
+        annotations = []
+        for decoder in self.decoders:
+            annotations.extend(decoder.decode(samples, start_idx))
+        # Each decoder's events are sorted already, a stable sort merges the runs
+        annotations.sort(key=operator.itemgetter('sample_idx'))
+        return annotations
+
+    def decode_runs(self, indices, values, stop_idx):
+        if len(self.decoders) == 1:
+            return self.decoders[0].decode_runs(indices, values, stop_idx)
+        annotations = []
+        for decoder in self.decoders:
+            annotations.extend(decoder.decode_runs(indices, values, stop_idx))
+        annotations.sort(key=operator.itemgetter('sample_idx'))
+        return annotations
+
+    def flush(self):
+        annotations = []
+        for decoder in self.decoders:
+            annotations.extend(decoder.flush())
+        annotations.sort(key=operator.itemgetter('sample_idx'))
+        return annotations
+
+
+def register_decoder(name, target):
+    """
+    Registers a plugin class, or a 'Module:Class' string imported on first use.
+    """
+    DECODERS[name] = target
+
+
+def discover_decoders(directory=None):
+    """
+    Registers every <Name>Decoder.py module of the directory (this one by default) as
+    decoder '<name>' with plugin class <Name>Plugin, without importing anything.
+    Returns the names of all registered decoders.
+    """
+    directory = directory or os.path.dirname(os.path.abspath(__file__))
+    for file_name in sorted(os.listdir(directory)):
+        stem = file_name[:-len('.py')]
+        if file_name.endswith(DECODER_SUFFIX) and len(file_name) > len(DECODER_SUFFIX):
+            name = stem[:-len('Decoder')]
+            DECODERS.setdefault(name.lower(), f"{stem}:{name}Plugin")
+    return list(DECODERS)
+
+
+def load_decoder(name):
+    """
+    Returns the plugin class of a registered decoder, importing its module the first time.
+    """
+    if not DECODERS:
+        discover_decoders()
+    if name not in DECODERS:
+        raise ValueError(f"unknown decoder {name!r}, expected one of {', '.join(DECODERS)}")
+    target = DECODERS[name]
+    if isinstance(target, str):
+        module_name, _, class_name = target.partition(':')
+        try:
+            target = getattr(importlib.import_module(module_name), class_name)
+        except Exception as e:
+            # A broken plugin must not stop the others from loading
+            raise ValueError(f"decoder {name!r} could not be loaded: {e}") from None
+        DECODERS[name] = target
+    return target
+
+
+def create_decoder(name, configs=None, sample_rate=None):
+    return load_decoder(name)(configs, sample_rate)
+
+
+class DecoderInfo:
+    """
+    What LogicDisplay needs of a plugin to offer its mode: name, label, mode and display.
+    """
+
+    FIELDS = ('name', 'label', 'mode', 'display')
+
+    def __init__(self, name, label=None, mode=None, display=None):
+        self.name = name
+        self.label = label
+        self.mode = mode
+        self.display = display
+
+
+def read_plugin_info(name, target):
+    """
+    Reads the DecoderInfo fields of a 'Module:Class' target from the class body in its
+    source, without importing the module. Returns None when there is no source to read.
+    """
+    module_name, _, class_name = target.partition(':')
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or not spec.origin or not spec.origin.endswith('.py'):
+        return None
+    with open(spec.origin, encoding='utf-8') as file:
+        tree = ast.parse(file.read(), spec.origin)
+    fields = {}
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == class_name:
+            for statement in node.body:
+                if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+                    key = getattr(statement.targets[0], 'id', None)
+                    if key in DecoderInfo.FIELDS[1:]:
+                        fields[key] = ast.literal_eval(statement.value)
+            return DecoderInfo(name, **fields)
+    return None
+
+
+def decoder_info(name):
+    """
+    Returns the DecoderInfo of a registered decoder, read from its source until the
+    plugin has been imported for decoding.
+    """
+    target = DECODERS[name]
+    if isinstance(target, str):
+        try:
+            info = read_plugin_info(name, target)
+        except (OSError, SyntaxError, ValueError) as e:
+            raise ValueError(f"decoder {name!r} could not be read: {e}") from None
+        if info is not None:
+            return info
+        target = load_decoder(name)
+    return DecoderInfo(name, target.label, target.mode, target.display)
+
+
+def decoder_modes():
+    """
+    Returns the DecoderInfo of the decoders that have a LogicDisplay mode, in registry
+    order. Modules are only read, not imported, so the decoders load when first used.
+    """
+    if not DECODERS:
+        discover_decoders()
+    infos = []
+    for name in list(DECODERS):
+        try:
+            info = decoder_info(name)
+        except ValueError as e:
+            print(e)
+            continue
+        if info.mode is not None:
+            infos.append(info)
+    return infos
+
+
+def load_display(plugin):
+    module_name, _, class_name = plugin.display.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)
@@ -0,0 +1,68 @@
+# EEPROMDecoder.py
+
+from Decoders import StackedDecoderPlugin, parse_number
+from I2CDecoder import I2CTransfers
+
+
+class EEPROMPlugin(StackedDecoderPlugin):
+    """
+    24Cxx I2C EEPROM accesses, stacked on the I2C decoder.
+
+    A write transfer starts with the memory address, address_bytes bytes MSB first, and
+    the data follows; a write of the address alone sets the address pointer for the read
+    after the repeated START. Reads without an address continue from the pointer, which
+    moves on with every byte read or written. On the small parts (24C04 to 24C16) the low
+    block_bits bits of the device address are the top bits of the memory address.
+
+    Events are READ and WRITE with the 'device' address, the memory 'address' and the
+    'data' bytes, at the sample of the START. Transfers the device did not acknowledge,
+    as when it is busy writing a page, are skipped.
+    """
+
+    name = 'eeprom'
+    label = '24Cxx EEPROM'
+    lower = 'i2c'
+    settings = {
+        'device': ('device', parse_number), 'address_bytes': ('address_bytes', int), 'block_bits': ('block_bits', int),
+    }
+    defaults = {
+        'address_width': 7, 'repeated_start': 1, 'stop_message': False, 'device': 0x50, 'address_bytes': 2,
+        'block_bits': 0,
+    }
+
+    def reset(self):
+        super().reset()
+        self.transfers = I2CTransfers()
+        self.pointers = {}  # (group, device) -> next memory address
+
+    def decode_annotations(self, annotations, end_idx):
+        events = []
+        for transfer in self.transfers.feed(annotations):
+            config = self.configs[transfer['group_idx']]
+            address_bytes = config.get('address_bytes', 2)
+            block_mask = (1 << config.get('block_bits', 0)) - 1
+            device = transfer['address']
+            if device & ~block_mask != config.get('device', 0x50) or transfer['nack']:
+                continue
+            key = (transfer['group_idx'], device & ~block_mask)
+            pointer = self.pointers.get(key, 0)
+            write = transfer['write']
+            if write and not transfer['continued']:
+                if len(write) < address_bytes:
+                    continue  # Stopped inside the memory address
+                block = device & block_mask
+                pointer = (block << (8 * address_bytes)) | int.from_bytes(bytes(write[:address_bytes]), 'big')
+                write = write[address_bytes:]
+            for event, data in (('WRITE', write), ('READ', transfer['read'])):
+                if data:
+                    events.append({
+                        'group_idx': transfer['group_idx'],
+                        'event': event,
+                        'device': device,
+                        'address': pointer,
+                        'data': data,
+                        'sample_idx': transfer['sample_idx'],
+                    })
+                    pointer += len(data)
+            self.pointers[key] = pointer
+        return events
@@ -25,262 +25,35 @@ from PyQt6.QtWidgets import (
     QGroupBox,
 )
 from PyQt6.QtGui import QIcon, QIntValidator, QTextCursor, QFont
-from PyQt6.QtCore import QTimer, QThread, pyqtSignal, Qt
+from PyQt6.QtCore import pyqtSignal, Qt
 from collections import deque
 from InterfaceCommands import (
     get_trigger_edge_command,
     get_trigger_pins_command,
 )
 from aesthetic import get_icon
+from SampleBuffer import SampleRingBuffer
+from Acquisition import AcquisitionService, DecodingSubscriber
+from Decoders import create_decoder
+from LevelOfDetail import MinMaxPyramid, visible_window
+from CaptureActions import CaptureActions
+from Instrumentation import instrumentation
+from RenderScheduler import RenderScheduler
 
-class SerialWorker(QThread):
-    data_ready = pyqtSignal(int, int)  # For raw data values and sample indices
-    decoded_message_ready = pyqtSignal(dict)  # For decoded messages
+class SerialWorker(DecodingSubscriber):
+    def __init__(self, acquisition, channels=8, group_configs=None):
+        decoder = create_decoder('i2c', group_configs if group_configs else [{} for _ in range(4)])
+        super().__init__(acquisition, decoder, channels)
 
-    def __init__(self, port, baudrate, channels=8, group_configs=None):
-        super().__init__()
-        self.is_running = True
-        self.channels = channels
-        self.group_configs = group_configs if group_configs else [{} for _ in range(4)]
-        self.trigger_modes = ['No Trigger'] * self.channels
-        # Initialize I2C decoding variables for each group
-        self.states = ['IDLE'] * len(self.group_configs)
-        self.bit_buffers = [[] for _ in range(len(self.group_configs))]
-        self.current_bytes = [0] * len(self.group_configs)
-        self.bit_counts = [0] * len(self.group_configs)
-        self.decoded_messages = [[] for _ in range(len(self.group_configs))]
-        self.scl_last_values = [1] * len(self.group_configs)
-        self.sda_last_values = [1] * len(self.group_configs)
-        self.messages = [[] for _ in range(len(self.group_configs))]
-        self.error_flags = [False] * len(self.group_configs)
-        self.sample_idx = 0  # Initialize sample index
+    @property
+    def group_configs(self):
+        # The display edits and replaces the configs, the decoder reads them on every chunk
+        return self.decoder.configs
+
+    @group_configs.setter
+    def group_configs(self, configs):
+        self.decoder.configs = configs
 
-        try:
-            self.serial = serial.Serial(port, baudrate)
-        except serial.SerialException as e:
-            print(f"Failed to open serial port: {str(e)}")
-            self.is_running = False
-            
-        # Initialize sample index variables for each group
-        self.addr_sample_idxs = [None] * len(self.group_configs)
-        self.ack_sample_idxs = [None] * len(self.group_configs)
-        self.data_sample_idxs = [None] * len(self.group_configs)
-        self.stop_sample_idxs = [None] * len(self.group_configs)
-
-
-    def set_trigger_mode(self, channel_idx, mode):
-        self.trigger_modes[channel_idx] = mode
-
-    def run(self):
-        data_buffer = deque(maxlen=1000)
-
-        while self.is_running:
-            if self.serial.in_waiting:
-                raw_data = self.serial.read(self.serial.in_waiting).splitlines()
-                for line in raw_data:
-                    try:
-                        data_value = int(line.strip())
-                        data_buffer.append(data_value)
-                        self.data_ready.emit(data_value, self.sample_idx)  # Emit data_value and sample_idx
-                        self.decode_i2c(data_value, self.sample_idx)
-                        self.sample_idx += 1  # Increment sample index
-                    except ValueError:
-                        continue
-
-    def decode_i2c(self, data_value, sample_idx):
-        for group_idx, group_config in enumerate(self.group_configs):
-            scl_channel = group_config['clock_channel'] - 1
-            sda_channel = group_config['data_channel'] - 1
-            address_width = group_config.get('address_width', 8)
-            data_format = group_config.get('data_format', 'Hexadecimal')
-
-            # Extract SCL and SDA values
-            scl = (data_value >> scl_channel) & 1
-            sda = (data_value >> sda_channel) & 1
-
-            # Detect edges on SCL and SDA
-            scl_last = self.scl_last_values[group_idx]
-            sda_last = self.sda_last_values[group_idx]
-            scl_edge = scl != scl_last
-            sda_edge = sda != sda_last
-
-            # State machine for I2C decoding
-            state = self.states[group_idx]
-            current_byte = self.current_bytes[group_idx]
-            bit_count = self.bit_counts[group_idx]
-            message = self.messages[group_idx]
-            error_flag = self.error_flags[group_idx]
-
-            # Retrieve stored sample indices
-            addr_sample_idx = self.addr_sample_idxs[group_idx]
-            ack_sample_idx = self.ack_sample_idxs[group_idx]
-            data_sample_idx = self.data_sample_idxs[group_idx]
-            stop_sample_idx = self.stop_sample_idxs[group_idx]
-
-            # Determine the expected number of bits for the address
-            if address_width == 7:
-                expected_bits = address_width + 1  # Include R/W bit
-            else:
-                expected_bits = address_width  # 8 bits, no extra bit
-
-            if state == 'IDLE':
-                if sda_edge and sda == 0 and scl == 1:
-                    # Start condition detected
-                    state = 'START'
-                    current_byte = 0
-                    bit_count = 0
-                    message = []
-                    error_flag = False
-                    # Record the sample index for START
-                    start_sample_idx = sample_idx
-                    # Emit start condition immediately
-                    self.decoded_message_ready.emit({
-                        'group_idx': group_idx,
-                        'event': 'START',
-                        'sample_idx': start_sample_idx,
-                    })
-            elif state == 'START':
-                if scl_edge and scl == 1:
-                    if bit_count == 0:
-                        # Record sample index at the start of address transmission
-                        addr_sample_idx = sample_idx
-                        self.addr_sample_idxs[group_idx] = addr_sample_idx
-                    # Rising edge of SCL, sample SDA
-                    current_byte = (current_byte << 1) | sda
-                    bit_count += 1
-                    if bit_count == expected_bits:
-                        # Address byte received
-                        if address_width == 7:
-                            address = current_byte >> 1
-                            rw_bit = current_byte & 1
-                            message.append({'type': 'Address', 'data': address, 'rw': rw_bit})
-                        else:
-                            address = current_byte
-                            rw_bit = None
-                            message.append({'type': 'Address', 'data': address})
-                        # Emit signal for address
-                        self.decoded_message_ready.emit({
-                            'group_idx': group_idx,
-                            'event': 'ADDRESS',
-                            'data': address,
-                            'rw_bit': rw_bit,
-                            'sample_idx': addr_sample_idx,  # Use recorded sample index
-                        })
-                        bit_count = 0
-                        current_byte = 0
-                        state = 'ACK'
-                        # Reset address sample index
-                        self.addr_sample_idxs[group_idx] = None
-            elif state == 'ACK':
-                if scl_edge and scl == 1:
-                    # Record sample index at the start of ACK bit
-                    ack_sample_idx = sample_idx
-                    self.ack_sample_idxs[group_idx] = ack_sample_idx
-                    # Sample ACK bit
-                    ack = sda
-                    message.append({'type': 'ACK', 'data': ack})
-                    # Emit signal for ACK
-                    self.decoded_message_ready.emit({
-                        'group_idx': group_idx,
-                        'event': 'ACK',
-                        'data': ack,
-                        'sample_idx': ack_sample_idx,
-                    })
-                    state = 'DATA'
-                    # Reset ACK sample index
-                    self.ack_sample_idxs[group_idx] = None
-            elif state == 'DATA':
-                if scl_edge and scl == 1:
-                    if bit_count == 0:
-                        # Record sample index at the start of data byte
-                        data_sample_idx = sample_idx
-                        self.data_sample_idxs[group_idx] = data_sample_idx
-                    # Rising edge of SCL, sample SDA
-                    current_byte = (current_byte << 1) | sda
-                    bit_count += 1
-                    if bit_count == 8:
-                        # Data byte received
-                        message.append({'type': 'Data', 'data': current_byte})
-                        # Emit signal for DATA
-                        self.decoded_message_ready.emit({
-                            'group_idx': group_idx,
-                            'event': 'DATA',
-                            'data': current_byte,
-                            'sample_idx': data_sample_idx,  # Use recorded sample index
-                        })
-                        bit_count = 0
-                        current_byte = 0
-                        state = 'ACK2'
-                        # Reset data sample index
-                        self.data_sample_idxs[group_idx] = None
-            elif state == 'ACK2':
-                if scl_edge and scl == 1:
-                    # Record sample index at the start of ACK bit
-                    ack_sample_idx = sample_idx
-                    self.ack_sample_idxs[group_idx] = ack_sample_idx
-                    # Sample ACK bit
-                    ack = sda
-                    message.append({'type': 'ACK', 'data': ack})
-                    # Emit signal for ACK
-                    self.decoded_message_ready.emit({
-                        'group_idx': group_idx,
-                        'event': 'ACK',
-                        'data': ack,
-                        'sample_idx': ack_sample_idx,
-                    })
-                    state = 'DATA'
-                    # Reset ACK sample index
-                    self.ack_sample_idxs[group_idx] = None
-            if sda_edge and sda == 1 and scl == 1:
-                # Stop condition detected
-                stop_sample_idx = sample_idx  # Record sample index for STOP
-                # Emit the decoded message
-                self.decoded_message_ready.emit({
-                    'group_idx': group_idx,
-                    'event': 'STOP',
-                    'message': message.copy(),
-                    'sample_idx': stop_sample_idx,
-                })
-                # Reset state
-                state = 'IDLE'
-                current_byte = 0
-                bit_count = 0
-                message = []
-                error_flag = False
-                # Reset sample indices
-                self.addr_sample_idxs[group_idx] = None
-                self.ack_sample_idxs[group_idx] = None
-                self.data_sample_idxs[group_idx] = None
-                self.stop_sample_idxs[group_idx] = None
-
-            # Update the stored states
-            self.states[group_idx] = state
-            self.current_bytes[group_idx] = current_byte
-            self.bit_counts[group_idx] = bit_count
-            self.messages[group_idx] = message
-            self.error_flags[group_idx] = error_flag
-
-            # Update last values
-            self.scl_last_values[group_idx] = scl
-            self.sda_last_values[group_idx] = sda
-            
-    def reset_decoding_states(self):
-        # Reset I2C decoding variables for each group
-        self.states = ['IDLE'] * len(self.group_configs)
-        self.bit_buffers = [[] for _ in range(len(self.group_configs))]
-        self.current_bytes = [0] * len(self.group_configs)
-        self.bit_counts = [0] * len(self.group_configs)
-        self.decoded_messages = [[] for _ in range(len(self.group_configs))]
-        self.scl_last_values = [1] * len(self.group_configs)
-        self.sda_last_values = [1] * len(self.group_configs)
-        self.messages = [[] for _ in range(len(self.group_configs))]
-        self.error_flags = [False] * len(self.group_configs)
-        self.sample_idx = 0  # Reset sample index
-
-    def stop_worker(self):
-        self.is_running = False
-        if self.serial.is_open:
-            self.serial.close()
 
 class FixedYViewBox(pg.ViewBox):
     def __init__(self, *args, **kwargs):
@@ -438,8 +211,10 @@ class I2CConfigDialog(QDialog):
             'data_format': self.format_combo.currentText(),
         }
 
-class I2CDisplay(QWidget):
-    def __init__(self, port, baudrate, bufferSize, channels=8):
+class I2CDisplay(CaptureActions, QWidget):
+    capture_mode = 'I2C'
+
+    def __init__(self, port, baudrate, bufferSize, channels=8, acquisition=None):
         super().__init__()
         self.period = 65454
         self.num_samples = 0
@@ -448,11 +223,16 @@ class I2CDisplay(QWidget):
         self.channels = channels
         self.bufferSize = bufferSize
 
-        self.data_buffer = [deque(maxlen=self.bufferSize) for _ in range(self.channels)]  # 8 channels
+        self.data_buffer = SampleRingBuffer(self.bufferSize, transitions=True)  # 8 channels packed per sample
+        self.lod = MinMaxPyramid(self.data_buffer)  # Min/max summaries for zoomed out views
         self.sample_indices = deque(maxlen=self.bufferSize)
         self.total_samples = 0
+        self.awaiting_restart = False  # Cleared buffers wait for the worker's index to restart
         
         self.is_single_capture = False
+        self.capture = None  # CaptureFile shown instead of live data
+        self.trigger_line = None
+        self.recorder = None  # CaptureRecorder streaming every acquired sample to disk
 
         self.current_trigger_modes = ['No Trigger'] * self.channels
         self.trigger_mode_options = ['No Trigger', 'Rising Edge', 'Falling Edge']
@@ -478,21 +258,27 @@ class I2CDisplay(QWidget):
         self.i2c_group_enabled = [False] * 4  # Track which I2C groups are enabled
 
         # Initialize decoded messages per group
-        self.decoded_messages_per_group = {i: [] for i in range(4)}
+        self.decoded_messages_per_group = {i: deque(maxlen=self.bufferSize) for i in range(4)}
 
         self.group_cursors = [[] for _ in range(4)]  # To store cursors per group
 
         self.setup_ui()
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_plot)
+        self.render_scheduler = RenderScheduler(self, self.update_plot)  # Redraws when new samples arrive
+        # Redraw on zoom and pan, the level of detail depends on the visible range
+        self.plot.sigXRangeChanged.connect(lambda *args: self.update_plot())
 
         self.is_reading = False
         self.decoded_texts = []
         
-        self.worker = SerialWorker(self.port, self.baudrate, channels=self.channels, group_configs=self.group_configs)
-        self.worker.data_ready.connect(self.handle_data_value)
-        self.worker.decoded_message_ready.connect(self.display_decoded_message)
+        # Share the caller's acquisition service, or run a private one when used standalone
+        self.owns_acquisition = acquisition is None
+        self.acquisition = acquisition if acquisition else AcquisitionService(self.port, self.baudrate)
+        self.worker = SerialWorker(self.acquisition, channels=self.channels, group_configs=self.group_configs)
+        self.worker.data_ready.connect(self.handle_data_chunk)
+        self.worker.decoded_message_ready.connect(self.handle_decoded_message)
         self.worker.start()
+        if self.owns_acquisition:
+            self.acquisition.start()
         
         self.group_curves = []
         for group_idx in range(4):  # Assuming 4 groups
@@ -631,6 +417,26 @@ class I2CDisplay(QWidget):
         self.single_button.clicked.connect(self.start_single_capture)
         control_buttons_layout.addWidget(self.single_button)
 
+        self.open_button = QPushButton("Open")
+        self.open_button.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Preferred)
+        self.open_button.setFixedWidth(80)
+        self.open_button.clicked.connect(self.open_capture_file)
+        control_buttons_layout.addWidget(self.open_button)
+
+        self.save_button = QPushButton("Save")
+        self.save_button.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Preferred)
+        self.save_button.setFixedWidth(80)
+        self.save_button.clicked.connect(self.save_capture_file)
+        control_buttons_layout.addWidget(self.save_button)
+
+        self.record_button = QPushButton("Record")
+        self.record_button.setCheckable(True)
+        self.record_button.clicked.connect(self.toggle_recording)
+        control_buttons_layout.addWidget(self.record_button)
+
+        self.record_label = QLabel("")  # Recorded and dropped samples
+        control_buttons_layout.addWidget(self.record_label)
+
         # Add control buttons layout to the button_layout
         button_layout.addLayout(control_buttons_layout, next_row + 2, 0, 1, 2)
 
@@ -881,13 +687,15 @@ class I2CDisplay(QWidget):
 
     def start_reading(self):
         if not self.is_reading:
+            if self.capture is not None:
+                self.close_capture()
             self.is_reading = True
-            self.timer.start(1)
+            self.render_scheduler.start()
 
     def stop_reading(self):
         if self.is_reading:
             self.is_reading = False
-            self.timer.stop()
+            self.render_scheduler.stop()
 
     def start_single_capture(self):
         if not self.is_reading:
@@ -909,7 +717,7 @@ class I2CDisplay(QWidget):
         self.single_button.setStyleSheet("")
 
     def clear_data_buffers(self):
-        self.data_buffer = [deque(maxlen=self.bufferSize) for _ in range(self.channels)]
+        self.data_buffer.clear()
         self.total_samples = 0  # Reset total samples
 
         # Remove all cursors
@@ -919,28 +727,62 @@ class I2CDisplay(QWidget):
                 self.plot.removeItem(cursor_info['label'])
             self.group_cursors[group_idx] = []
 
-        # Reset worker's decoding states
+        # Reset worker's decoding states; chunks and messages already on their way predate it
+        self.awaiting_restart = True
         self.worker.reset_decoding_states()
 
-
-    def handle_data_value(self, data_value):
+    def capture_decoder_configs(self):
+        # Group settings go with their enabled state, so the file reopens decoded the same way
+        return [dict(config, enabled=enabled) for config, enabled in zip(self.group_configs, self.i2c_group_enabled)]
+
+    def apply_capture_configs(self, decoder_configs):
+        for group_idx, config in enumerate(decoder_configs[:len(self.group_configs)]):
+            config = dict(config)
+            is_enabled = config.pop('enabled', False)
+            self.group_configs[group_idx] = config
+            self.channel_buttons[group_idx].setChecked(is_enabled)
+
+    def capture_decoder(self):
+        return create_decoder('i2c', self.group_configs)
+
+    @instrumentation.timed('handle')
+    def handle_data_chunk(self, samples, start_idx):
+        instrumentation.chunk_handled()
+        if self.awaiting_restart:
+            if start_idx != 0:
+                return  # Sent before the worker restarted its sample index for the cleared buffers
+            self.awaiting_restart = False
         if self.is_reading:
-            # Store raw data for plotting
-            for i in range(self.channels):
-                bit = (data_value >> i) & 1
-                self.data_buffer[i].append(bit)
-            self.total_samples += 1  # Increment total samples
-
-            # Check if buffers are full
-            if all(len(buf) >= self.bufferSize for buf in self.data_buffer):
-                if self.is_single_capture:
-                    # In single capture mode, stop acquisition
-                    self.stop_single_capture()
-                else:
-                    # In continuous mode, reset buffers and cursors
-                    self.clear_data_buffers()
-                    self.clear_decoded_text()
+            self.render_scheduler.mark_dirty()
+        if self.is_reading and self.recorder is not None and not self.is_single_capture:
+            # The recording keeps everything, so the display slides instead of starting over
+            self.data_buffer.append(samples)
+            self.total_samples += len(samples)
+            return
+        if not self.is_reading:
+            return
+        # Store raw data for plotting, only up to capacity so a full buffer is handled at the same sample as before
+        space = self.data_buffer.capacity - len(self.data_buffer)
+        self.data_buffer.append(samples[:space])
+        self.total_samples += min(space, len(samples))  # Increment total samples
+
+        # Check if buffers are full
+        if self.data_buffer.is_full():
+            if self.is_single_capture:
+                # In single capture mode, stop acquisition
+                self.stop_single_capture()
+            else:
+                # In continuous mode, reset buffers and cursors. The rest of the chunk is dropped,
+                # the worker numbers its samples from 0 again with the next chunk
+                self.clear_data_buffers()
+                self.clear_decoded_text()
 
+    def handle_decoded_message(self, decoded_data):
+        # Messages from the worker; capture files are decoded here and shown directly
+        if not self.awaiting_restart:
+            self.display_decoded_message(decoded_data)
+
+    @instrumentation.timed('messages')
     def display_decoded_message(self, decoded_data):
         group_idx = decoded_data['group_idx']
         if not self.i2c_group_enabled[group_idx]:
@@ -1042,6 +884,8 @@ class I2CDisplay(QWidget):
             self.decoded_messages_per_group[group_idx].append(message_str)
 
     def create_cursor(self, group_idx, sample_idx, label_text):
+        if sample_idx < self.total_samples - len(self.data_buffer):
+            return  # Already slid out of the display window while recording
         # Get base level for this group
         base_level = (4 - group_idx - 1) * 4  # Adjust as needed
         # Cursor color (keeping your tweaks)
@@ -1072,10 +916,15 @@ class I2CDisplay(QWidget):
     def clear_decoded_text(self):
         # Clear all decoded text boxes and messages per group
         for idx, text_edit in enumerate(self.decoded_texts):
-            self.decoded_messages_per_group[idx] = []
+            self.decoded_messages_per_group[idx] = deque(maxlen=self.bufferSize)
         # Cursors are already cleared in clear_data_buffers
 
+    @instrumentation.timed('frame')
     def update_plot(self):
+        self.update_record_label()
+        # Only the visible X range, at the resolution the plot width can show
+        x_range, pixel_width = visible_window(self.plot)
+        num_samples = len(self.data_buffer)
         for group_idx, is_enabled in enumerate(self.i2c_group_enabled):
             if is_enabled:
                 group_config = self.group_configs[group_idx]
@@ -1086,41 +935,19 @@ class I2CDisplay(QWidget):
                 sda_curve = self.group_curves[group_idx]['sda_curve']
                 scl_curve = self.group_curves[group_idx]['scl_curve']
 
-                # Prepare data for plotting
-                sda_data = list(self.data_buffer[sda_channel])
-                scl_data = list(self.data_buffer[scl_channel])
-
-                num_samples = len(sda_data)
                 if num_samples > 1:
-                    t = np.arange(num_samples) / self.sample_rate
+                    sample_period = 1 / self.sample_rate  # Cursor positions only need the period, not a time axis
 
                     # Offset per group to separate the signals vertically
                     base_level = (4 - group_idx - 1) * 4  # Adjust as needed
 
                     # --- Plot SDA Signal ---
-                    sda_square_wave_time = []
-                    sda_square_wave_data = []
-                    for j in range(1, num_samples):
-                        sda_square_wave_time.extend([t[j - 1], t[j]])
-                        level = sda_data[j - 1] + base_level
-                        sda_square_wave_data.extend([level, level])
-                        if sda_data[j] != sda_data[j - 1]:
-                            sda_square_wave_time.append(t[j])
-                            level = sda_data[j] + base_level
-                            sda_square_wave_data.append(level)
+                    sda_square_wave_time, sda_square_wave_data = self.lod.square_wave(sda_channel, self.sample_rate, base_level, x_range, pixel_width)
                     sda_curve.setData(sda_square_wave_time, sda_square_wave_data)
 
                     # --- Plot SCL Signal ---
-                    scl_square_wave_time = []
-                    scl_square_wave_data = []
-                    for j in range(1, num_samples):
-                        scl_square_wave_time.extend([t[j - 1], t[j]])
-                        level = scl_data[j - 1] + base_level + 2  # Offset by 2 to separate from SDA
-                        scl_square_wave_data.extend([level, level])
-                        if scl_data[j] != scl_data[j - 1]:
-                            scl_square_wave_time.append(t[j])
-                            level = scl_data[j] + base_level + 2
-                            scl_square_wave_data.append(level)
+                    # Offset by 2 to separate from SDA
+                    scl_square_wave_time, scl_square_wave_data = self.lod.square_wave(scl_channel, self.sample_rate, base_level + 2, x_range, pixel_width)
                     scl_curve.setData(scl_square_wave_time, scl_square_wave_data)
 
                     # --- Update Cursors ---
@@ -1129,14 +956,14 @@ class I2CDisplay(QWidget):
                         sample_idx = cursor_info['sample_idx']
                         idx_in_buffer = sample_idx - (self.total_samples - num_samples)
                         if 0 <= idx_in_buffer < num_samples:
-                            cursor_time = t[int(idx_in_buffer)]
+                            cursor_time = int(idx_in_buffer) * sample_period
                             # Update the line position
                             x = cursor_time
                             y1 = cursor_info['y1']
                             y2 = cursor_info['y2']
                             cursor_info['line'].setData([x, x], [y1, y2])
                             # Update the label position
-                            label_offset = (t[1] - t[0]) * 5  # Adjust label offset as needed
+                            label_offset = sample_period * 5  # Adjust label offset as needed
                             cursor_info['label'].setPos(x + label_offset, (y1 + y2) / 2)
                             cursor_info['x_pos'] = x + label_offset  # Store x position for overlap checking
                         else:
@@ -1161,7 +988,7 @@ class I2CDisplay(QWidget):
                     labels_with_positions.sort(key=lambda item: item[0])
 
                     # Hide labels that overlap
-                    min_label_spacing = (t[1] - t[0]) * 10  # Adjust as needed
+                    min_label_spacing = sample_period * 10  # Adjust as needed
                     last_label_x = None
                     for x_pos, label in labels_with_positions:
                         if last_label_x is None:
@@ -1185,9 +1012,11 @@ class I2CDisplay(QWidget):
 
 
     def closeEvent(self, event):
+        self.stop_recording()
         self.worker.stop_worker()
-        self.worker.quit()
-        self.worker.wait()
+        self.worker.use_decode_pool(False)  # Ends its processes
+        if self.owns_acquisition:
+            self.acquisition.stop_worker()
         event.accept()
 
     def open_configuration_dialog(self, group_idx):
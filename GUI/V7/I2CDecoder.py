@@ -0,0 +1,324 @@
+# I2CDecoder.py
+
+import numpy as np
+from Decoders import PAYLOAD_LIMIT, DecoderPlugin
+
+
+class I2CDecoder:
+    """
+    Edge-driven I2C decoder for up to 4 groups of SCL/SDA channels.
+
+    Instead of running the state machine on every sample, decode() finds the SCL rising
+    edges and the START/STOP conditions of a chunk with NumPy and walks only those events.
+    The events match the per-sample decoder the I2C view used before: START, ADDRESS, ACK,
+    DATA and STOP dicts with the same keys, in the same order, with state carried across
+    chunks. A START is only recognised while idle, and a STOP ends the transfer in any state.
+    With 'repeated_start' set in a group config, a START inside a transfer is reported too
+    and the next byte is read as an address, as register reads over I2C need. With
+    'stop_message' off, STOP carries an empty message instead of the whole transfer, so a
+    long transfer takes no memory.
+
+    decode_runs() takes the same chunk as runs of the packed word: every event sits on a
+    sample where SCL or SDA changes, which is the start of a run, so the masks are built over
+    the runs and the walk is the same.
+    """
+
+    def __init__(self, num_groups=4):
+        self.num_groups = num_groups
+        self.reset()
+
+    def reset(self):
+        self.states = ['IDLE'] * self.num_groups
+        self.current_bytes = [0] * self.num_groups
+        self.bit_counts = [0] * self.num_groups
+        self.messages = [[] for _ in range(self.num_groups)]
+        self.scl_last_values = [1] * self.num_groups
+        self.sda_last_values = [1] * self.num_groups
+        self.addr_sample_idxs = [None] * self.num_groups
+        self.data_sample_idxs = [None] * self.num_groups
+
+    def decode(self, samples, start_idx, group_configs):
+        """
+        Decodes one chunk of packed samples whose first sample has index start_idx.
+
+        Returns the decoded event dicts ordered by the sample that completed them, then by
+        group, like the per-sample decoder emitted them.
+        """
+        samples = np.asarray(samples)
+        if len(samples) == 0:
+            return []
+        return self._decode_groups(samples, start_idx, group_configs)
+
+    def decode_runs(self, indices, values, stop_idx, group_configs):
+        """
+        Decodes one chunk given as runs, (sample index, packed value) at every change as
+        TransitionStore keeps them, covering the samples up to stop_idx. Returns the events
+        decode() returns for the same samples.
+        """
+        if len(indices) == 0:
+            return []
+        start_idx = int(indices[0])
+        return self._decode_groups(np.asarray(values), start_idx, group_configs, np.asarray(indices) - start_idx)
+
+    def _decode_groups(self, samples, start_idx, group_configs, run_offsets=None):
+        keyed_events = []
+        for group_idx, group_config in enumerate(group_configs[:self.num_groups]):
+            keyed_events.extend(self._decode_group(samples, start_idx, group_idx, group_config, run_offsets))
+        # Stable sort keeps the order of events completed by the same sample in one group
+        keyed_events.sort(key=lambda item: (item[0], item[1]))
+        return [event for _, _, event in keyed_events]
+
+    def _decode_group(self, samples, start_idx, group_idx, group_config, run_offsets=None):
+        # With run_offsets, samples holds the value of each run and run_offsets its first sample
+        scl_channel = group_config['clock_channel'] - 1
+        sda_channel = group_config['data_channel'] - 1
+        address_width = group_config.get('address_width', 8)
+        # 7-bit addresses are followed by the R/W bit
+        expected_bits = address_width + 1 if address_width == 7 else address_width
+        repeated_start = group_config.get('repeated_start', False)
+        keep_message = group_config.get('stop_message', True)
+
+        scl = (samples >> scl_channel) & 1
+        sda = (samples >> sda_channel) & 1
+        scl_prev = np.empty_like(scl)
+        sda_prev = np.empty_like(sda)
+        scl_prev[0] = self.scl_last_values[group_idx]
+        sda_prev[0] = self.sda_last_values[group_idx]
+        scl_prev[1:] = scl[:-1]
+        sda_prev[1:] = sda[:-1]
+        self.scl_last_values[group_idx] = int(scl[-1])
+        self.sda_last_values[group_idx] = int(sda[-1])
+
+        scl_rise = (scl == 1) & (scl_prev == 0)
+        start_cond = (sda == 0) & (sda_prev == 1) & (scl == 1)
+        stop_cond = (sda == 1) & (sda_prev == 0) & (scl == 1)
+        event_positions = np.flatnonzero(scl_rise | start_cond | stop_cond)
+        if len(event_positions) == 0:
+            return []
+        # While idle only START and STOP matter, so the walk can jump between them
+        condition_positions = np.flatnonzero(start_cond[event_positions] | stop_cond[event_positions])
+
+        positions = (event_positions if run_offsets is None else run_offsets[event_positions]).tolist()
+        rises = scl_rise[event_positions].tolist()
+        starts = start_cond[event_positions].tolist()
+        stops = stop_cond[event_positions].tolist()
+        sda_bits = sda[event_positions].tolist()
+        next_condition = condition_positions.tolist()
+
+        state = self.states[group_idx]
+        current_byte = self.current_bytes[group_idx]
+        bit_count = self.bit_counts[group_idx]
+        message = self.messages[group_idx]
+        addr_sample_idx = self.addr_sample_idxs[group_idx]
+        data_sample_idx = self.data_sample_idxs[group_idx]
+
+        events = []
+        num_events = len(positions)
+        condition_ptr = 0
+        i = 0
+        while i < num_events:
+            if state == 'IDLE':
+                # Skip SCL edges until the next START or STOP
+                while condition_ptr < len(next_condition) and next_condition[condition_ptr] < i:
+                    condition_ptr += 1
+                if condition_ptr == len(next_condition):
+                    break
+                i = next_condition[condition_ptr]
+            sample_idx = start_idx + positions[i]
+
+            if state == 'IDLE':
+                if starts[i]:
+                    state = 'START'
+                    current_byte = 0
+                    bit_count = 0
+                    message = []
+                    events.append((sample_idx, group_idx, {
+                        'group_idx': group_idx,
+                        'event': 'START',
+                        'sample_idx': sample_idx,
+                    }))
+            elif repeated_start and starts[i] and not rises[i]:
+                state = 'START'
+                current_byte = 0
+                bit_count = 0
+                events.append((sample_idx, group_idx, {
+                    'group_idx': group_idx,
+                    'event': 'START',
+                    'sample_idx': sample_idx,
+                }))
+            elif rises[i]:
+                sda_bit = sda_bits[i]
+                if state == 'START':
+                    if bit_count == 0:
+                        addr_sample_idx = sample_idx
+                    current_byte = (current_byte << 1) | sda_bit
+                    bit_count += 1
+                    if bit_count == expected_bits:
+                        if address_width == 7:
+                            address = current_byte >> 1
+                            rw_bit = current_byte & 1
+                            if keep_message:
+                                message.append({'type': 'Address', 'data': address, 'rw': rw_bit})
+                        else:
+                            address = current_byte
+                            rw_bit = None
+                            if keep_message:
+                                message.append({'type': 'Address', 'data': address})
+                        events.append((sample_idx, group_idx, {
+                            'group_idx': group_idx,
+                            'event': 'ADDRESS',
+                            'data': address,
+                            'rw_bit': rw_bit,
+                            'sample_idx': addr_sample_idx,
+                        }))
+                        bit_count = 0
+                        current_byte = 0
+                        state = 'ACK'
+                        addr_sample_idx = None
+                elif state == 'DATA':
+                    if bit_count == 0:
+                        data_sample_idx = sample_idx
+                    current_byte = (current_byte << 1) | sda_bit
+                    bit_count += 1
+                    if bit_count == 8:
+                        if keep_message:
+                            message.append({'type': 'Data', 'data': current_byte})
+                        events.append((sample_idx, group_idx, {
+                            'group_idx': group_idx,
+                            'event': 'DATA',
+                            'data': current_byte,
+                            'sample_idx': data_sample_idx,
+                        }))
+                        bit_count = 0
+                        current_byte = 0
+                        state = 'ACK2'
+                        data_sample_idx = None
+                else:
+                    # ACK after the address or after a data byte
+                    if keep_message:
+                        message.append({'type': 'ACK', 'data': sda_bit})
+                    events.append((sample_idx, group_idx, {
+                        'group_idx': group_idx,
+                        'event': 'ACK',
+                        'data': sda_bit,
+                        'sample_idx': sample_idx,
+                    }))
+                    state = 'DATA'
+
+            if stops[i]:
+                events.append((sample_idx, group_idx, {
+                    'group_idx': group_idx,
+                    'event': 'STOP',
+                    'message': message.copy(),
+                    'sample_idx': sample_idx,
+                }))
+                state = 'IDLE'
+                current_byte = 0
+                bit_count = 0
+                message = []
+                addr_sample_idx = None
+                data_sample_idx = None
+            i += 1
+
+        self.states[group_idx] = state
+        self.current_bytes[group_idx] = current_byte
+        self.bit_counts[group_idx] = bit_count
+        self.messages[group_idx] = message
+        self.addr_sample_idxs[group_idx] = addr_sample_idx
+        self.data_sample_idxs[group_idx] = data_sample_idx
+        return events
+
+
+class I2CPlugin(DecoderPlugin):
+    name = 'i2c'
+    label = 'I2C'
+    mode = 'I2C'
+    display = 'I2C:I2CDisplay'
+    channels = ('data_channel', 'clock_channel')
+    settings = {
+        'data': ('data_channel', int), 'clock': ('clock_channel', int), 'address_width': ('address_width', int),
+        'repeated_start': ('repeated_start', int),
+    }
+    defaults = {'data_channel': 1, 'clock_channel': 2, 'address_width': 8, 'data_format': 'Hexadecimal'}
+
+    def reset(self):
+        self.decoder = I2CDecoder(len(self.configs))
+
+    def decode_events(self, samples, start_idx):
+        return self.decoder.decode(samples, start_idx, self.configs)
+
+    def decode_run_events(self, indices, values, stop_idx):
+        return self.decoder.decode_runs(indices, values, stop_idx, self.configs)
+
+
+class I2CTransfers:
+    """
+    Groups the annotations of an I2C decoder into transfers for the stacked decoders:
+    START, address and written bytes, then after a repeated START the address again and
+    the bytes read, up to the STOP. A register read is one transfer with both parts.
+
+    Transfers are dicts with 'group_idx', 'address', 'write' and 'read' byte lists,
+    'sample_idx' of the START, 'nack' when the address was not acknowledged and
+    'continued' for the pieces after the first when a transfer is split every
+    PAYLOAD_LIMIT bytes. Only the transfer in progress of each group is kept.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.transfers = {}  # Group -> transfer in progress
+        self.last_events = {}  # Group -> previous event, an ACK after ADDRESS acknowledges the address
+
+    def feed(self, annotations):
+        # Returns the transfers ended, or split, by these annotations
+        finished = []
+        for annotation in annotations:
+            group_idx = annotation['group_idx']
+            event = annotation['event']
+            transfer = self.transfers.get(group_idx)
+            if event == 'START':
+                if transfer is None:
+                    self.transfers[group_idx] = self.new_transfer(group_idx, annotation['sample_idx'])
+            elif event == 'ADDRESS' and transfer is not None:
+                address, rw_bit = annotation['data'], annotation['rw_bit']
+                if rw_bit is None:
+                    # 8-bit addresses carry the R/W bit
+                    address, rw_bit = address >> 1, address & 1
+                if transfer['address'] is None:
+                    transfer['address'] = address
+                    transfer['reading'] = rw_bit == 1
+                elif rw_bit == 1 and not transfer['reading'] and not transfer['read']:
+                    transfer['reading'] = True
+                else:
+                    # A new transfer after a repeated START
+                    if transfer['sample_idx'] is not None:
+                        finished.append(transfer)
+                    transfer = self.transfers[group_idx] = self.new_transfer(group_idx, annotation['sample_idx'])
+                    transfer['address'] = address
+                    transfer['reading'] = rw_bit == 1
+            elif event == 'ACK' and transfer is not None:
+                if self.last_events.get(group_idx) == 'ADDRESS' and annotation['data']:
+                    transfer['nack'] = True
+            elif event == 'DATA' and transfer is not None:
+                data = transfer['read'] if transfer['reading'] else transfer['write']
+                data.append(annotation['data'])
+                if transfer['sample_idx'] is None:
+                    transfer['sample_idx'] = annotation['sample_idx']
+                if len(data) >= PAYLOAD_LIMIT:
+                    finished.append(transfer)
+                    # The next piece starts at its first byte
+                    piece = self.transfers[group_idx] = self.new_transfer(group_idx, None)
+                    piece.update(address=transfer['address'], reading=transfer['reading'], continued=True)
+            elif event == 'STOP' and transfer is not None:
+                if transfer['sample_idx'] is not None:
+                    finished.append(transfer)
+                del self.transfers[group_idx]
+            self.last_events[group_idx] = event
+        return finished
+
+    def new_transfer(self, group_idx, sample_idx):
+        return {
+            'group_idx': group_idx, 'address': None, 'reading': False, 'write': [], 'read': [],
+            'sample_idx': sample_idx, 'nack': False, 'continued': False,
+        }
@@ -0,0 +1,174 @@
+# Instrumentation.py
+
+import functools
+import json
+import platform
+import time
+from collections import deque
+import numpy as np
+
+HISTORY_LENGTH = 1024  # Latest calls kept per stage for the rolling statistics
+LATENCY_BINS = np.logspace(-6, 0, 13)  # Histogram edges from 1 us to 1 s, two per decade
+# Stage -> label, in the order samples pass through them
+STAGES = {
+    'read': 'serial read',
+    'parse': 'parse',
+    'emit': 'emit',
+    'decode': 'decode',
+    'pool': 'decode workers',
+    'handle': 'handle',
+    'messages': 'show decoded',
+    'frame': 'plot + setData',
+}
+
+
+class StageStats:
+    """
+    Rolling statistics of one stage: the duration, end time and item count (bytes or
+    samples) of its last HISTORY_LENGTH calls, plus running totals.
+    """
+
+    def __init__(self, length=HISTORY_LENGTH):
+        self.durations = deque(maxlen=length)
+        self.end_times = deque(maxlen=length)
+        self.items = deque(maxlen=length)
+        self.calls = 0
+        self.total_items = 0
+
+    def add(self, duration, items, end_time):
+        self.durations.append(duration)
+        self.end_times.append(end_time)
+        self.items.append(items)
+        self.calls += 1
+        self.total_items += items
+
+    def summary(self):
+        # list() copies a deque in one step under the GIL, the owning thread may append meanwhile
+        durations = np.array(list(self.durations), dtype=np.float64)
+        end_times = np.array(list(self.end_times), dtype=np.float64)
+        items = np.array(list(self.items), dtype=np.float64)
+        count = min(len(durations), len(end_times), len(items))
+        durations, end_times, items = durations[:count], end_times[:count], items[:count]
+        if count == 0:
+            return {'calls': self.calls, 'total_items': self.total_items}
+        span = end_times[-1] - end_times[0] if count > 1 else 0.0
+        return {
+            'calls': self.calls,
+            'total_items': self.total_items,
+            'calls_per_second': (count - 1) / span if span > 0 else 0.0,
+            'items_per_second': items[1:].sum() / span if span > 0 else 0.0,
+            'mean_ms': durations.mean() * 1e3,
+            'p50_ms': np.percentile(durations, 50) * 1e3,
+            'p95_ms': np.percentile(durations, 95) * 1e3,
+            'max_ms': durations.max() * 1e3,
+            'histogram': np.histogram(np.clip(durations, LATENCY_BINS[0], LATENCY_BINS[-1]), LATENCY_BINS)[0].tolist(),
+        }
+
+
+class Instrumentation:
+    """
+    Per-stage latency counters for the path from the serial port to the screen.
+
+    Stages are timed with record(stage, start, items) or the timed() decorator and cost
+    one attribute check while disabled. Each stage is written by one thread only (read,
+    parse, emit and decode by the acquisition thread, the others by the GUI thread),
+    so no lock is needed; readers copy the rolling deques before summarising them.
+
+    Chunks queued from the acquisition thread to the GUI thread are counted all the time,
+    by two counters with one writer each, so the queue depth is right whenever it is read.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = {stage: StageStats() for stage in STAGES}
+        self.chunks_emitted = 0  # Written by the acquisition thread only
+        self.chunks_handled = 0  # Written by the GUI thread only
+        self.counters = {}  # Latest values of cumulative counters such as dropped frames
+        self.start_time = time.perf_counter()
+
+    def reset(self):
+        self.stages = {stage: StageStats() for stage in STAGES}
+        self.counters = {}
+        self.start_time = time.perf_counter()
+
+    def record(self, stage, start, items=0):
+        if self.enabled:
+            end = time.perf_counter()
+            self.stages[stage].add(end - start, items, end)
+
+    def timed(self, stage):
+        """
+        Decorates a method to record its duration as `stage`. The items are the samples
+        when the first argument is a sample chunk, one per call otherwise.
+        """
+        def decorator(method):
+            @functools.wraps(method)
+            def wrapper(owner, *args):
+                if not self.enabled:
+                    return method(owner, *args)
+                start = time.perf_counter()
+                try:
+                    return method(owner, *args)
+                finally:
+                    self.record(stage, start, len(args[0]) if args and isinstance(args[0], np.ndarray) else 1)
+            return wrapper
+        return decorator
+
+    def chunk_emitted(self):
+        self.chunks_emitted += 1
+
+    def chunk_handled(self):
+        self.chunks_handled += 1
+
+    @property
+    def queue_depth(self):
+        # Chunks emitted to the GUI thread and not handled yet
+        return max(self.chunks_emitted - self.chunks_handled, 0)
+
+    def set_counter(self, name, value):
+        self.counters[name] = value
+
+    def snapshot(self):
+        return {
+            'enabled': self.enabled,
+            'uptime_s': time.perf_counter() - self.start_time,
+            'queue_depth': self.queue_depth,
+            'chunks_emitted': self.chunks_emitted,
+            'chunks_handled': self.chunks_handled,
+            'counters': dict(self.counters),
+            'stages': {stage: stats.summary() for stage, stats in list(self.stages.items())},
+        }
+
+    def overlay_text(self):
+        """
+        A few lines for the status overlay: samples/s, queue depth, frame time, drops and
+        the p95 latency of every stage.
+        """
+        snapshot = self.snapshot()
+        stages = snapshot['stages']
+        frame = stages['frame']
+        lines = [
+            f"{stages['parse'].get('items_per_second', 0.0) / 1e3:8.1f} kS/s parsed  "
+            f"{stages['handle'].get('items_per_second', 0.0) / 1e3:8.1f} kS/s shown",
+            f"queue {snapshot['queue_depth']} chunks  frame {frame.get('mean_ms', 0.0):.2f} ms "
+            f"(p95 {frame.get('p95_ms', 0.0):.2f})  {frame.get('calls_per_second', 0.0):.0f} fps",
+            "  ".join(f"{name.replace('_', ' ')} {value}" for name, value in snapshot['counters'].items())
+            or "no drops counted",
+        ]
+        for stage, label in STAGES.items():
+            summary = stages[stage]
+            if 'p95_ms' in summary:
+                lines.append(f"{label:>15} p50 {summary['p50_ms']:7.3f} ms  p95 {summary['p95_ms']:7.3f} ms")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """
+        Writes the snapshot as JSON, with the histogram bin edges in seconds.
+        """
+        report = dict(self.snapshot(), histogram_edges_s=LATENCY_BINS.tolist(),
+                      time=time.strftime('%Y-%m-%dT%H:%M:%S'), host=platform.node())
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=1)
+
+
+instrumentation = Instrumentation()  # Shared by the acquisition service, the workers and the displays
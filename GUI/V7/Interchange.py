@@ -0,0 +1,290 @@
+# Interchange.py
+
+import configparser
+import io
+import re
+import zipfile
+import numpy as np
+from CaptureFile import CAPTURE_EXTENSION, CAPTURE_FILTER, write_header, make_header
+from Transitions import iter_transitions
+
+VCD_EXTENSION = '.vcd'
+SIGROK_EXTENSION = '.sr'
+VCD_FILTER = "Value Change Dump (*.vcd)"
+SIGROK_FILTER = "sigrok session (*.sr)"
+SAVE_FILTER = ";;".join((CAPTURE_FILTER, VCD_FILTER, SIGROK_FILTER))
+OPEN_FILTER = ";;".join(("All captures (*.lacap *.vcd *.sr)", CAPTURE_FILTER, VCD_FILTER, SIGROK_FILTER))
+FILTER_EXTENSIONS = {CAPTURE_FILTER: CAPTURE_EXTENSION, VCD_FILTER: VCD_EXTENSION, SIGROK_FILTER: SIGROK_EXTENSION}
+IMPORT_CHUNK = 1 << 16  # Samples per chunk handed to the live path, about what the acquisition delivers
+EXPORT_CHUNK = 1 << 20
+
+VCD_UNITS = (('s', 1), ('ms', 1e3), ('us', 1e6), ('ns', 1e9), ('ps', 1e12), ('fs', 1e15))
+RATE_UNITS = (('GHz', 1e9), ('MHz', 1e6), ('kHz', 1e3), ('Hz', 1))
+
+
+def with_extension(path, selected_filter):
+    # Save dialogs return the name as typed, the selected filter says which format was meant
+    if not path.endswith((CAPTURE_EXTENSION, VCD_EXTENSION, SIGROK_EXTENSION)):
+        path += FILTER_EXTENSIONS.get(selected_filter, CAPTURE_EXTENSION)
+    return path
+
+
+def is_interchange_path(path):
+    return path.endswith((VCD_EXTENSION, SIGROK_EXTENSION))
+
+
+def format_rate(sample_rate):
+    # Sample rate the way sigrok writes it: "1 MHz", "250 kHz", "9600 Hz"
+    for unit, scale in RATE_UNITS:
+        if sample_rate >= scale and sample_rate % scale == 0:
+            return f"{int(sample_rate // scale)} {unit}"
+    return f"{sample_rate:g} Hz"
+
+
+def parse_rate(text):
+    match = re.match(r'\s*([\d.]+)\s*([kMG]?Hz)?', text)
+    if not match:
+        raise ValueError(f"Unreadable sample rate: {text!r}")
+    scale = dict(RATE_UNITS).get(match.group(2) or 'Hz')
+    return float(match.group(1)) * scale
+
+
+def vcd_timescale(sample_rate):
+    """
+    Returns (timescale, ticks_per_sample): the coarsest unit in which a sample period is a
+    whole number of ticks, so that at 1 MHz the dump counts in microseconds like sigrok's.
+    """
+    for unit, per_second in VCD_UNITS:
+        ticks = per_second / sample_rate
+        if ticks >= 1 and abs(ticks - round(ticks)) < 1e-9 * ticks:
+            return f"1 {unit}", int(round(ticks))
+    return "1 fs", 1e15 / sample_rate  # Rounded per change
+
+
+def vcd_identifier(channel):
+    return chr(ord('!') + channel)
+
+
+def export_vcd(path, samples, sample_rate, channel_names, chunk_size=EXPORT_CHUNK):
+    """
+    Writes a Value Change Dump. Only the changes are visited, one chunk at a time, so the
+    time taken follows the number of transitions and memory stays constant.
+    """
+    timescale, ticks_per_sample = vcd_timescale(sample_rate)
+    ids = [vcd_identifier(ch) for ch in range(8)]
+    names = [name.replace(' ', '_').replace('\n', '_') for name in channel_names][:8]
+    names += [f"D{ch}" for ch in range(len(names), 8)]
+    change_text = {}  # (changed bits, new value) -> lines, the same few combinations repeat
+    with open(path, 'w', newline='\n') as file:
+        file.write(f"$comment\n  Acquisition with 8/8 channels at {format_rate(sample_rate)}\n$end\n")
+        file.write(f"$timescale {timescale} $end\n$scope module logic $end\n")
+        for ch in range(8):
+            file.write(f"$var wire 1 {ids[ch]} {names[ch]} $end\n")
+        file.write("$upscope $end\n$enddefinitions $end\n")
+        previous = None
+        for indices, values in iter_transitions(samples, chunk_size):
+            if previous is None:
+                first = int(values[0])
+                file.write("#0\n$dumpvars\n")
+                file.write("".join(f"{(first >> ch) & 1}{ids[ch]}\n" for ch in range(8)))
+                file.write("$end\n")
+                previous, indices, values = first, indices[1:], values[1:]
+            changed = np.bitwise_xor(values, np.append(previous, values[:-1]).astype(np.uint8))
+            times = np.round(indices * ticks_per_sample).astype(np.int64)
+            lines = []
+            for time, value, bits in zip(times.tolist(), values.tolist(), changed.tolist()):
+                text = change_text.get((bits, value))
+                if text is None:
+                    text = "".join(f"{(value >> ch) & 1}{ids[ch]}\n" for ch in range(8) if bits >> ch & 1)
+                    change_text[(bits, value)] = text
+                lines.append(f"#{time}\n{text}")
+            file.write("".join(lines))
+            if len(values):
+                previous = int(values[-1])
+        # The closing timestamp marks the end of the last sample
+        file.write(f"#{int(round(len(samples) * ticks_per_sample))}\n")
+
+
+def export_sigrok(path, samples, sample_rate, channel_names, chunk_size=EXPORT_CHUNK):
+    """
+    Writes a sigrok session file (format version 2): the packed samples are already
+    sigrok's unitsize 1 logic data, so they go into logic-1-N members chunk by chunk.
+    """
+    metadata = configparser.ConfigParser()
+    metadata.optionxform = str  # Keys are case sensitive
+    metadata['global'] = {'sigrok version': '0.5.2'}
+    device = {
+        'capturefile': 'logic-1',
+        'total probes': '8',
+        'samplerate': format_rate(sample_rate),
+        'total analog': '0',
+    }
+    names = list(channel_names)[:8] + [f"D{ch}" for ch in range(len(channel_names), 8)]
+    for ch in range(8):
+        device[f"probe{ch + 1}"] = names[ch].replace('\n', ' ')
+    device['unitsize'] = '1'
+    metadata['device 1'] = device
+    text = io.StringIO()
+    metadata.write(text)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('version', '2')
+        archive.writestr('metadata', text.getvalue())
+        for number, start in enumerate(range(0, len(samples), chunk_size), 1):
+            chunk = np.asarray(samples[start:start + chunk_size]).astype(np.uint8, copy=False)
+            archive.writestr(f"logic-1-{number}", chunk.tobytes())
+
+
+def export_capture(path, samples, sample_rate, channel_names):
+    if path.endswith(VCD_EXTENSION):
+        export_vcd(path, samples, sample_rate, channel_names)
+    elif path.endswith(SIGROK_EXTENSION):
+        export_sigrok(path, samples, sample_rate, channel_names)
+    else:
+        raise ValueError(f"Unknown export format: {path}")
+
+
+class SigrokImport:
+    """
+    Reads a sigrok session file. chunks() yields (start_idx, samples) of packed uint8
+    samples, only the first 8 logic probes are kept.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not zipfile.is_zipfile(path):
+            raise ValueError(f"{path} is not a sigrok session file")
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+            if 'metadata' not in names:
+                raise ValueError(f"{path} is not a sigrok session file")
+            metadata = configparser.ConfigParser()
+            metadata.optionxform = str
+            metadata.read_string(archive.read('metadata').decode('utf-8'))
+        device = next((metadata[s] for s in metadata.sections() if s.startswith('device')), None)
+        if device is None or 'capturefile' not in device:
+            raise ValueError(f"{path} has no logic data")
+        self.sample_rate = parse_rate(device.get('samplerate', '1 Hz'))
+        self.unitsize = int(device.get('unitsize', '1'))
+        self.channel_names = [device.get(f"probe{ch + 1}", f"D{ch}") for ch in range(8)]
+        prefix = device['capturefile']
+        numbered = [name for name in names if re.fullmatch(re.escape(prefix) + r'-\d+', name)]
+        self.members = sorted(numbered, key=lambda name: int(name.rsplit('-', 1)[1]))
+        if not self.members and prefix in names:
+            self.members = [prefix]  # Format version 1, one member
+
+    def chunks(self, chunk_size=IMPORT_CHUNK):
+        start_idx = 0
+        with zipfile.ZipFile(self.path) as archive:
+            for member in self.members:
+                with archive.open(member) as data:
+                    while True:
+                        raw = data.read(chunk_size * self.unitsize)
+                        if not raw:
+                            break
+                        raw = raw[:len(raw) - len(raw) % self.unitsize]
+                        samples = np.frombuffer(raw, dtype=np.uint8)[::self.unitsize]  # Low byte = probes 1-8
+                        yield start_idx, samples
+                        start_idx += len(samples)
+
+
+class VCDImport:
+    """
+    Reads a Value Change Dump of 1-bit wires into packed uint8 samples; the first 8 wires
+    become channels 0-7. chunks() yields (start_idx, samples) while parsing the file line
+    by line, so memory stays bounded whatever the dump length.
+
+    The sample rate comes from sigrok's "at <rate>" comment when there is one, otherwise
+    one timescale tick is one sample unless sample_rate is given.
+    """
+
+    def __init__(self, path, sample_rate=None):
+        self.path = path
+        self.ids = {}  # Identifier -> channel
+        self.channel_names = []
+        self.ticks_per_sample = 1
+        timescale = None
+        comment_rate = None
+        with open(path, 'r') as file:
+            header = []
+            for line in file:
+                header.append(line)
+                if '$enddefinitions' in line:
+                    break
+            else:
+                raise ValueError(f"{path} is not a VCD file")
+        text = " ".join(header)
+        match = re.search(r'\$timescale\s+(\d+)\s*(s|ms|us|ns|ps|fs)\s+\$end', text)
+        if match:
+            timescale = int(match.group(1)) / dict(VCD_UNITS)[match.group(2)]
+        match = re.search(r'at\s+([\d.]+\s*[kMG]?Hz)', text)
+        if match:
+            comment_rate = parse_rate(match.group(1))
+        for width, identifier, name in re.findall(r'\$var\s+\w+\s+(\d+)\s+(\S+)\s+(\S+)', text):
+            if width == '1' and identifier not in self.ids and len(self.ids) < 8:
+                self.ids[identifier] = len(self.ids)
+                self.channel_names.append(name)
+        if not self.ids:
+            raise ValueError(f"{path} has no 1-bit wires")
+        self.channel_names += [f"D{ch}" for ch in range(len(self.channel_names), 8)]
+        timescale = timescale if timescale else 1e-9
+        self.sample_rate = sample_rate if sample_rate else (comment_rate if comment_rate else 1 / timescale)
+        self.ticks_per_sample = 1 / (self.sample_rate * timescale)
+
+    def chunks(self, chunk_size=IMPORT_CHUNK):
+        ids = self.ids
+        value = 0
+        run_start = 0  # Sample where `value` took effect
+        start_idx = 0  # First sample of the chunk being filled
+        chunk = np.empty(chunk_size, dtype=np.uint8)
+        changed = False  # Changes after the last timestamp
+        in_header = True
+        with open(self.path, 'r') as file:
+            for line in file:
+                if in_header:
+                    in_header = '$enddefinitions' not in line
+                    continue
+                for token in line.split():
+                    if token[0] == '#':
+                        changed = False
+                        sample = int(round(int(token[1:]) / self.ticks_per_sample))
+                        # Flush the run of the current value up to this change
+                        while sample > run_start:
+                            stop = min(sample, start_idx + chunk_size)
+                            chunk[run_start - start_idx:stop - start_idx] = value
+                            run_start = stop
+                            if stop == start_idx + chunk_size:
+                                yield start_idx, chunk.copy()
+                                start_idx += chunk_size
+                    elif token[0] in '01xXzZ' and token[1:] in ids:
+                        bit = 1 << ids[token[1:]]
+                        value = value | bit if token[0] == '1' else value & ~bit
+                        changed = True
+        # The last timestamp closes the dump, unless values changed at it: they last one sample
+        if changed:
+            if run_start == start_idx + chunk_size:
+                yield start_idx, chunk.copy()
+                start_idx += chunk_size
+            chunk[run_start - start_idx] = value
+            run_start += 1
+        if run_start > start_idx:
+            yield start_idx, chunk[:run_start - start_idx].copy()
+
+
+def open_import(path, sample_rate=None):
+    if path.endswith(SIGROK_EXTENSION):
+        return SigrokImport(path)
+    if path.endswith(VCD_EXTENSION):
+        return VCDImport(path, sample_rate)
+    raise ValueError(f"Unknown import format: {path}")
+
+
+def convert_to_capture(source_path, capture_path, mode='Signal'):
+    """
+    Converts a VCD or sigrok file into a capture file without holding it in memory.
+    """
+    imported = open_import(source_path)
+    with open(capture_path, 'wb') as file:
+        write_header(file, make_header(imported.sample_rate, imported.channel_names, None, mode))
+        for _, samples in imported.chunks(EXPORT_CHUNK):
+            samples.tofile(file)
+    return imported
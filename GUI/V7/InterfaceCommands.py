@@ -1,5 +1,7 @@
 # InterfaceCommands.py:
 
+import time
+
 def get_trigger_edge_command(trigger_modes):
     """
     Determines the edge of buttons selected and returns the corresponding command integer.
@@ -32,3 +34,68 @@ def get_trigger_pins_command(trigger_modes):
         if mode in ('Rising Edge', 'Falling Edge'):
             command_value |= 1 << idx  # Set bit idx if trigger is enabled
     return command_value
+
+
+TIMER_CLOCK = 72e6  # MCU timer clock in Hz
+COMMAND_DELAY = 0.001  # Seconds between the parts of a command, as the displays send them
+
+
+def get_sample_period(sample_rate):
+    """
+    Returns the sample timer period in TIMER_CLOCK ticks for a sample rate in Hz, at least 1.
+    """
+    return max(int(TIMER_CLOCK / sample_rate), 1)
+
+
+def get_trigger_timer(period, num_samples):
+    """
+    Returns (period16, prescaler) of the 16-bit timer that counts num_samples samples of the
+    given sample period, the same values Signal.updateTriggerTimer sends.
+    """
+    trigger_freq = (TIMER_CLOCK / period) / num_samples
+    period16 = int(TIMER_CLOCK / trigger_freq)
+    prescaler = 1
+    if period16 > 2**16:
+        prescaler = -(-period16 // 2**16)
+        period16 = int((TIMER_CLOCK / prescaler) / trigger_freq)
+    return period16, prescaler
+
+
+def send_command(serial_port, command, first, second, delay=COMMAND_DELAY):
+    """
+    Writes one 3-part command: the command digit, then two values as decimal text.
+    """
+    serial_port.write(str(command).encode('utf-8'))
+    time.sleep(delay)
+    serial_port.write(str(first).encode('utf-8'))
+    time.sleep(delay)
+    serial_port.write(str(second).encode('utf-8'))
+    time.sleep(delay)
+
+
+def send_sample_rate(serial_port, sample_rate):
+    # Commands 5 and 6 carry the high and low halves of the 32-bit period
+    period = get_sample_period(sample_rate)
+    send_command(serial_port, 5, (period >> 24) & 0xFF, (period >> 16) & 0xFF)
+    send_command(serial_port, 6, (period >> 8) & 0xFF, period & 0xFF)
+    return period
+
+
+def send_num_samples(serial_port, period, num_samples):
+    # Command 4 is the trigger timer period, command 7 its prescaler
+    period16, prescaler = get_trigger_timer(period, num_samples)
+    send_command(serial_port, 4, (period16 >> 8) & 0xFF, period16 & 0xFF)
+    send_command(serial_port, 7, (prescaler >> 8) & 0xFF, prescaler & 0xFF)
+
+
+def send_triggers(serial_port, trigger_modes):
+    send_command(serial_port, 2, 0, get_trigger_edge_command(trigger_modes))
+    send_command(serial_port, 3, 0, get_trigger_pins_command(trigger_modes))
+
+
+def send_start(serial_port):
+    send_command(serial_port, 0, 0, 0)
+
+
+def send_stop(serial_port):
+    send_command(serial_port, 1, 1, 1)
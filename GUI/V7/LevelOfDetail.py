@@ -0,0 +1,275 @@
+# LevelOfDetail.py
+
+import numpy as np
+from SquareWave import build_square_wave, build_square_wave_from_edges
+
+BLOCK_FACTOR = 8  # Samples per block on level 1, blocks per block on the levels above
+MAPPED_MIN_BLOCK_SIZE = 64  # Finest level for captures opened from disk, keeps the pyramid at ~4% of the file
+UPDATE_CHUNK = 1 << 22  # Samples folded in per step, bounds the scratch memory of update()
+
+
+class Trace:
+    """
+    Step-trace vertices of one channel as drawn last frame, positions in sample numbers.
+
+    The vertices live in positions/levels[begin:end] with room to grow at the end, so
+    appending the vertices of new samples and dropping old ones from the front cost in
+    proportion to what changed. first_block is the first pyramid block of a min/max
+    trace, level -1 is a trace of raw samples.
+    """
+
+    def __init__(self, level, start, stop, total_samples, positions, levels, first_block=0):
+        self.level = level
+        self.start = start
+        self.stop = stop
+        self.total_samples = total_samples
+        self.positions = positions
+        self.levels = levels
+        self.begin = 0
+        self.end = len(positions)
+        self.first_block = first_block
+
+    def __len__(self):
+        return self.end - self.begin
+
+    def vertices(self):
+        return self.positions[self.begin:self.end], self.levels[self.begin:self.end]
+
+    def append(self, positions, levels):
+        if self.end + len(positions) > len(self.positions):
+            # Move to the front of storage twice the size needed
+            count = len(self) + len(positions)
+            grown_positions = np.empty(max(2 * count, 1024))
+            grown_levels = np.empty(len(grown_positions))
+            grown_positions[:len(self)] = self.positions[self.begin:self.end]
+            grown_levels[:len(self)] = self.levels[self.begin:self.end]
+            self.positions, self.levels = grown_positions, grown_levels
+            self.begin, self.end = 0, len(self)
+        self.positions[self.end:self.end + len(positions)] = positions
+        self.levels[self.end:self.end + len(positions)] = levels
+        self.end += len(positions)
+
+
+class MinMaxPyramid:
+    """
+    Multi-resolution summary of a SampleRingBuffer for drawing long captures.
+
+    Level k has one entry per block of BLOCK_FACTOR**k samples. Each entry stores the
+    AND and the OR of the packed samples in the block, so for every channel the AND bit
+    is the block's minimum and the OR bit its maximum: equal bits mean the channel was
+    constant, different bits mean it toggled somewhere inside the block.
+
+    Block j of a level summarises samples j * block_size .. (j + 1) * block_size - 1,
+    numbered like the ring buffer, and lives at index j % len(level), so the pyramid
+    wraps together with the buffer. update() only recomputes the blocks touched by
+    samples appended since the previous call.
+
+    The traces drawn by square_wave() are kept per channel, so a frame only builds the
+    vertices of the samples that came into view since the last one and trims those that
+    scrolled out or were overwritten, instead of building the whole visible range again.
+    Raw traces come from the buffer's TransitionStore when it keeps one, so drawing them
+    costs in proportion to the edges in view rather than the samples.
+    """
+
+    def __init__(self, ring_buffer, factor=BLOCK_FACTOR, min_block_size=None):
+        self.ring_buffer = ring_buffer
+        self.factor = factor
+        # Captures opened from disk skip the finest levels, raw reads of a few pixels are cheap
+        self.min_block_size = min_block_size if min_block_size else factor
+        self.reset()
+
+    def reset(self):
+        capacity = self.ring_buffer.capacity
+        self.generation = self.ring_buffer.generation
+        self.capacity = capacity
+        self.updated_to = 0  # Samples already folded into the pyramid
+        self.traces = {}  # Channel -> Trace of the last frame
+        self.block_sizes = []
+        self.and_levels = []
+        self.or_levels = []
+        block_size = self.factor
+        while block_size < self.min_block_size:
+            block_size *= self.factor
+        while block_size < capacity:
+            # One extra block because a partly overwritten block stays around
+            num_blocks = -(-capacity // block_size) + 1
+            self.block_sizes.append(block_size)
+            self.and_levels.append(np.zeros(num_blocks, dtype=np.uint8))
+            self.or_levels.append(np.zeros(num_blocks, dtype=np.uint8))
+            block_size *= self.factor
+
+    def update(self):
+        ring_buffer = self.ring_buffer
+        if ring_buffer.generation != self.generation or ring_buffer.capacity != self.capacity:
+            self.reset()
+        start = max(self.updated_to, ring_buffer.first_sample)
+        stop = ring_buffer.total_samples
+        # Long backlogs, e.g. a capture file drawn for the first time, go in bounded steps
+        while start < stop:
+            step_stop = min(start + UPDATE_CHUNK, stop)
+            self._update_range(start, step_stop)
+            start = step_stop
+        self.updated_to = max(self.updated_to, stop)
+
+    def _update_range(self, start, stop):
+        ring_buffer = self.ring_buffer
+        lower_and = lower_or = None
+        lower_size = 1
+        for level, block_size in enumerate(self.block_sizes):
+            ratio = block_size // lower_size  # Items of the level below per block
+            first_block = start // block_size
+            last_block = (stop - 1) // block_size
+            # Items of the level below that make up the touched blocks, clipped to stored data
+            item_start = first_block * ratio
+            item_stop = (last_block + 1) * ratio
+            valid_start = max(item_start, ring_buffer.first_sample // lower_size)
+            valid_stop = min(item_stop, -(-stop // lower_size))
+
+            # Pad with the neutral element of each reduction so partial blocks stay correct
+            and_items = np.full(item_stop - item_start, 0xFF, dtype=np.uint8)
+            or_items = np.zeros(item_stop - item_start, dtype=np.uint8)
+            offset = valid_start - item_start
+            if lower_size == 1:
+                samples = ring_buffer.read(valid_start, valid_stop)
+                and_items[offset:offset + len(samples)] = samples
+                or_items[offset:offset + len(samples)] = samples
+            else:
+                positions = np.arange(valid_start, valid_stop) % len(lower_and)
+                and_items[offset:offset + len(positions)] = lower_and[positions]
+                or_items[offset:offset + len(positions)] = lower_or[positions]
+
+            and_blocks = np.bitwise_and.reduce(and_items.reshape(-1, ratio), axis=1)
+            or_blocks = np.bitwise_or.reduce(or_items.reshape(-1, ratio), axis=1)
+            positions = np.arange(first_block, last_block + 1) % len(self.and_levels[level])
+            self.and_levels[level][positions] = and_blocks
+            self.or_levels[level][positions] = or_blocks
+
+            lower_and = self.and_levels[level]
+            lower_or = self.or_levels[level]
+            lower_size = block_size
+
+    def square_wave(self, channel, sample_rate, level_offset, x_range, pixel_width):
+        """
+        Builds step-trace vertices for one channel, covering only the visible X range.
+
+        x_range is in seconds from the oldest stored sample, as plotted by the displays.
+        Raw samples are used while a pixel spans fewer than BLOCK_FACTOR samples, above that
+        the coarsest level whose blocks are still narrower than a pixel is drawn as min/max
+        pairs, so the vertex count follows the pixel width instead of the sample count.
+        """
+        self.update()
+        ring_buffer = self.ring_buffer
+        num_samples = len(ring_buffer)
+        if num_samples < 2:
+            return np.empty(0), np.empty(0)
+        first_sample = ring_buffer.first_sample
+
+        # One sample of margin on each side so the trace reaches the edges of the view
+        start = min(max(int(np.floor(x_range[0] * sample_rate)) - 1, 0), num_samples - 1)
+        stop = min(max(int(np.ceil(x_range[1] * sample_rate)) + 2, start + 2), num_samples)
+        samples_per_pixel = (stop - start) / max(pixel_width, 1)
+
+        level = -1
+        for idx, block_size in enumerate(self.block_sizes):
+            if block_size <= samples_per_pixel:
+                level = idx
+        positions, levels = self.trace(channel, level, first_sample + start, first_sample + stop).vertices()
+        return (positions - first_sample) / sample_rate, levels + level_offset
+
+    def trace(self, channel, level, start, stop):
+        """
+        The Trace of one channel from sample number start to stop - 1, built from the
+        previous frame's where the level is the same and the ranges overlap.
+        """
+        trace = self.traces.get(channel)
+        if trace is None or trace.level != level or not trace.start <= start < trace.stop or stop < trace.stop:
+            trace = self.build_trace(channel, level, start, stop)
+        elif not self.extend_trace(trace, channel, stop):
+            trace = self.build_trace(channel, level, start, stop)
+        elif start > trace.start:
+            self.trim_trace(trace, start)
+        self.traces[channel] = trace
+        return trace
+
+    def build_trace(self, channel, level, start, stop):
+        total_samples = self.ring_buffer.total_samples
+        if level < 0:
+            positions, levels = self.raw_vertices(channel, start, stop)
+            return Trace(level, start, stop, total_samples, positions, levels)
+        block_size = self.block_sizes[level]
+        first_block = start // block_size
+        positions, levels = self.block_vertices(channel, level, first_block, (stop - 1) // block_size, start)
+        return Trace(level, start, stop, total_samples, positions, levels, first_block)
+
+    def raw_vertices(self, channel, start, stop):
+        transitions = self.ring_buffer.transitions()
+        if transitions is None:
+            bits = (self.ring_buffer.read(start, stop) >> channel) & 1
+            return build_square_wave(bits, 1.0, 0, start)
+        positions, levels = transitions.channel_edges(channel, start, stop)
+        return build_square_wave_from_edges(positions, levels, stop - 1, 1.0)
+
+    def block_vertices(self, channel, level, first_block, last_block, start):
+        # Two vertices per block at its start: the minimum, then the maximum, and one at the end
+        block_size = self.block_sizes[level]
+        blocks = np.arange(first_block, last_block + 1)
+        positions = blocks % len(self.and_levels[level])
+        low = (self.and_levels[level][positions] >> channel) & 1
+        high = (self.or_levels[level][positions] >> channel) & 1
+
+        block_starts = np.maximum(blocks * block_size, start)
+        times = np.empty(2 * len(blocks) + 1)
+        levels = np.empty(2 * len(blocks) + 1)
+        times[0:-1:2] = block_starts
+        times[1:-1:2] = block_starts
+        times[-1] = min((last_block + 1) * block_size, self.ring_buffer.total_samples) - 1
+        levels[0:-1:2] = low
+        levels[1:-1:2] = high
+        levels[-1] = high[-1]
+        return times, levels
+
+    def extend_trace(self, trace, channel, stop):
+        """
+        Adds the vertices of the samples up to stop - 1, and rebuilds the pyramid block that
+        was still filling up. Returns False when the trace has to be built from scratch.
+        """
+        total_samples = self.ring_buffer.total_samples
+        if trace.level < 0:
+            if stop > trace.stop:
+                positions, levels = self.raw_vertices(channel, trace.stop - 1, stop)
+                # The old end vertex and the new start vertex both sit on sample stop - 1, neither stays
+                trace.end -= 1
+                trace.append(positions[1:], levels[1:])
+        elif stop > trace.stop or total_samples != trace.total_samples:
+            block_size = self.block_sizes[trace.level]
+            last_block = (trace.stop - 1) // block_size
+            if last_block == trace.first_block:
+                return False
+            trace.end = trace.begin + 2 * (last_block - trace.first_block)
+            trace.append(*self.block_vertices(channel, trace.level, last_block, (stop - 1) // block_size, 0))
+        trace.stop = stop
+        trace.total_samples = total_samples
+        return True
+
+    def trim_trace(self, trace, start):
+        # Vertices before the new start go, the first one left moves up to it
+        if trace.level < 0:
+            positions, _ = trace.vertices()
+            trace.begin += int(np.searchsorted(positions, start, side='right')) - 1
+            trace.positions[trace.begin] = start
+        else:
+            first_block = start // self.block_sizes[trace.level]
+            trace.begin += 2 * (first_block - trace.first_block)
+            trace.first_block = first_block
+            trace.positions[trace.begin:trace.begin + 2] = np.maximum(trace.positions[trace.begin:trace.begin + 2],
+                                                                      start)
+        trace.start = start
+
+
+def visible_window(plot):
+    """
+    Returns the X range and the width in pixels of a PlotItem's view box.
+    """
+    view_box = plot.getViewBox()
+    x_range = view_box.viewRange()[0]
+    return x_range, max(int(view_box.width()), 1)
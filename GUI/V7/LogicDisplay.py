@@ -9,15 +9,20 @@ from PyQt6.QtWidgets import (
     QHBoxLayout,
     QButtonGroup,
     QPushButton,
+    QLabel,
+    QFileDialog,
 )
 from PyQt6.QtGui import QAction
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 
 from aesthetic import get_icon
+from Acquisition import AcquisitionService
 from Signal import SignalDisplay
-from I2C import I2CDisplay
-from SPI import SPIDisplay
-from UART import UARTDisplay
+from Decoders import decoder_modes, discover_decoders, load_display
+from CaptureFile import load_capture
+from Instrumentation import instrumentation
+
+OVERLAY_INTERVAL = 500  # ms between refreshes of the performance overlay
 
 class LogicDisplay(QMainWindow):
     def __init__(self, port, baudrate, bufferSize=4096, channels=8):
@@ -32,7 +37,14 @@ class LogicDisplay(QMainWindow):
         self.setWindowIcon(get_icon())
 
         self.current_module = None
+        # Protocol modes come from the decoder registry, their views are imported when opened
+        discover_decoders()
+        self.decoder_plugins = {info.mode: info for info in decoder_modes()}  # Read, not imported
+        # One acquisition service for the whole window, modes only subscribe to it
+        self.acquisition = AcquisitionService(self.port, self.baudrate)
+        self.acquisition.start()
         self.init_ui()
+        self.init_menu()
 
         # Load the default module (Signal)
         self.load_module('Signal')
@@ -50,40 +62,20 @@ class LogicDisplay(QMainWindow):
         button_layout.setContentsMargins(0, 0, 0, 0)
         button_layout.setSpacing(0)
 
-        # Create buttons for each mode
-        self.signal_button = QPushButton('Signal')
-        self.i2c_button = QPushButton('I2C')
-        self.spi_button = QPushButton('SPI')
-        self.uart_button = QPushButton('UART')
-
-        # Make buttons checkable
-        self.signal_button.setCheckable(True)
-        self.i2c_button.setCheckable(True)
-        self.spi_button.setCheckable(True)
-        self.uart_button.setCheckable(True)
-
-        # Create a button group for exclusive checking
+        # Create a checkable button for each mode, only one checked at a time
         self.mode_button_group = QButtonGroup()
         self.mode_button_group.setExclusive(True)
-        self.mode_button_group.addButton(self.signal_button)
-        self.mode_button_group.addButton(self.i2c_button)
-        self.mode_button_group.addButton(self.spi_button)
-        self.mode_button_group.addButton(self.uart_button)
+        self.mode_buttons = {}
+        for mode in ['Signal'] + list(self.decoder_plugins):
+            button = QPushButton(mode if mode == 'Signal' else self.decoder_plugins[mode].label)
+            button.setCheckable(True)
+            button.clicked.connect(lambda _, mode=mode: self.load_module(mode))
+            self.mode_button_group.addButton(button)
+            button_layout.addWidget(button)
+            self.mode_buttons[mode] = button
 
         # Set the default checked button
-        self.signal_button.setChecked(True)
-
-        # Add buttons to the layout
-        button_layout.addWidget(self.signal_button)
-        button_layout.addWidget(self.i2c_button)
-        button_layout.addWidget(self.spi_button)
-        button_layout.addWidget(self.uart_button)
-
-        # Connect buttons to the handler
-        self.signal_button.clicked.connect(lambda: self.load_module('Signal'))
-        self.i2c_button.clicked.connect(lambda: self.load_module('I2C'))
-        self.spi_button.clicked.connect(lambda: self.load_module('SPI'))
-        self.uart_button.clicked.connect(lambda: self.load_module('UART'))
+        self.mode_buttons['Signal'].setChecked(True)
 
         # Create a widget to hold the current module
         self.module_widget = QWidget()
@@ -98,6 +90,66 @@ class LogicDisplay(QMainWindow):
         # Set the central widget
         self.setCentralWidget(central_widget)
 
+    def init_menu(self):
+        view_menu = self.menuBar().addMenu("View")
+        self.overlay_action = QAction("Performance Overlay", self)
+        self.overlay_action.setCheckable(True)
+        self.overlay_action.setShortcut("Ctrl+Shift+P")
+        self.overlay_action.toggled.connect(self.toggle_overlay)
+        view_menu.addAction(self.overlay_action)
+        # Protocol decoders run in worker processes instead of the acquisition thread
+        self.decode_pool_action = QAction("Decode in Worker Processes", self)
+        self.decode_pool_action.setCheckable(True)
+        self.decode_pool_action.toggled.connect(self.apply_decode_pool)
+        view_menu.addAction(self.decode_pool_action)
+        save_stats_action = QAction("Save Performance Stats...", self)
+        save_stats_action.triggered.connect(self.save_stats)
+        view_menu.addAction(save_stats_action)
+
+        # Stage latencies drawn over the top right corner of the plots, clicks go through
+        self.overlay = QLabel(self.centralWidget())
+        self.overlay.setStyleSheet("background-color: rgba(0, 0, 0, 170); color: #00FF77; "
+                                   "font-family: monospace; padding: 6px;")
+        self.overlay.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.overlay.hide()
+        self.overlay_timer = QTimer()
+        self.overlay_timer.timeout.connect(self.update_overlay)
+
+    def toggle_overlay(self, checked):
+        # Stages are only timed while the overlay is on
+        instrumentation.enabled = checked
+        if checked:
+            instrumentation.reset()
+            self.update_overlay()
+            self.overlay.show()
+            self.overlay_timer.start(OVERLAY_INTERVAL)
+        else:
+            self.overlay_timer.stop()
+            self.overlay.hide()
+
+    def apply_decode_pool(self):
+        # The Signal view has no decoder to move
+        worker = getattr(self.current_module, 'worker', None)
+        if hasattr(worker, 'use_decode_pool'):
+            worker.use_decode_pool(self.decode_pool_action.isChecked())
+
+    def update_overlay(self):
+        self.overlay.setText(instrumentation.overlay_text())
+        self.overlay.adjustSize()
+        self.overlay.move(self.centralWidget().width() - self.overlay.width() - 10, 40)
+        self.overlay.raise_()  # Above a module loaded since
+
+    def save_stats(self):
+        if not instrumentation.enabled:
+            print("Turn on View > Performance Overlay to collect stage latencies, saving counters only")
+        path, _ = QFileDialog.getSaveFileName(self, "Save Performance Stats", "stats.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            instrumentation.dump(path)
+        except OSError as e:
+            print(f"Failed to save performance stats: {e}")
+
     def load_module(self, module_name):
         # Remove the existing module widget if any
         if self.current_module:
@@ -115,23 +167,24 @@ class LogicDisplay(QMainWindow):
         # Reset baud rate to default when switching modes
         if module_name != 'UART':
             self.baudrate = self.default_baudrate
+        self.acquisition.set_baudrate(self.baudrate)
 
         # Load the selected module
         if module_name == 'Signal':
-            self.current_module = SignalDisplay(self.port, self.baudrate, self.bufferSize, self.channels)
-            self.signal_button.setChecked(True)
-        elif module_name == 'I2C':
-            self.current_module = I2CDisplay(self.port, self.baudrate, self.bufferSize)
-            self.i2c_button.setChecked(True)
-        elif module_name == 'SPI':
-            self.current_module = SPIDisplay(self.port, self.baudrate, self.bufferSize)
-            self.spi_button.setChecked(True)
-        elif module_name == 'UART':
-            # Update baud rate if changed in UART mode
-            self.current_module = UARTDisplay(self.port, self.baudrate, self.bufferSize)
-            self.uart_button.setChecked(True)
+            self.current_module = SignalDisplay(self.port, self.baudrate, self.bufferSize, self.channels, acquisition=self.acquisition)
+        elif module_name in self.decoder_plugins:
+            try:
+                display_class = load_display(self.decoder_plugins[module_name])
+            except (ImportError, AttributeError) as e:
+                print(f"Failed to load the {module_name} display: {e}")
+            else:
+                self.current_module = display_class(self.port, self.baudrate, self.bufferSize, acquisition=self.acquisition)
+        if module_name in self.mode_buttons:
+            self.mode_buttons[module_name].setChecked(True)
 
         if self.current_module:
+            if self.decode_pool_action.isChecked():
+                self.apply_decode_pool()
             self.module_layout.addWidget(self.current_module)
             self.current_module.show()
         else:
@@ -139,10 +192,23 @@ class LogicDisplay(QMainWindow):
             placeholder_widget = QWidget()
             self.module_layout.addWidget(placeholder_widget)
 
+    def open_capture(self, path):
+        # Shows a capture file in the display it was saved from
+        try:
+            capture = load_capture(path)
+        except (OSError, ValueError) as e:
+            print(f"Failed to open capture: {e}")
+            return
+        self.load_module(capture.mode)
+        if self.current_module:
+            self.current_module.show_capture(capture)
+
     def update_baudrate(self, baudrate):
         self.baudrate = baudrate
 
     def closeEvent(self, event):
+        self.overlay_timer.stop()
         if self.current_module:
             self.current_module.close()
+        self.acquisition.stop_worker()
         event.accept()
@@ -0,0 +1,116 @@
+# ModbusDecoder.py
+
+from Decoders import StackedDecoderPlugin
+from UARTDecoder import PARITY_BITS
+
+MAX_FRAME_BYTES = 256  # Longest RTU frame, longer runs of bytes are reported as INVALID
+MIN_GAP_SECONDS = 0.00175  # Fixed 3.5 character gap above 19200 baud
+# Function code -> name, for the public function codes
+FUNCTIONS = {
+    1: 'READ_COILS',
+    2: 'READ_DISCRETE_INPUTS',
+    3: 'READ_HOLDING_REGISTERS',
+    4: 'READ_INPUT_REGISTERS',
+    5: 'WRITE_SINGLE_COIL',
+    6: 'WRITE_SINGLE_REGISTER',
+    7: 'READ_EXCEPTION_STATUS',
+    8: 'DIAGNOSTICS',
+    15: 'WRITE_MULTIPLE_COILS',
+    16: 'WRITE_MULTIPLE_REGISTERS',
+    17: 'REPORT_SERVER_ID',
+    22: 'MASK_WRITE_REGISTER',
+    23: 'READ_WRITE_MULTIPLE_REGISTERS',
+}
+
+
+def modbus_crc(data):
+    # CRC-16/MODBUS: reflected polynomial 0xA001, initial value 0xFFFF
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+class ModbusPlugin(StackedDecoderPlugin):
+    """
+    Modbus RTU frames, stacked on the UART decoder.
+
+    Bytes belong to one frame until the line is idle for 3.5 character times (1.75 ms
+    above 19200 baud). A frame is reported once that gap has passed, either at the next
+    byte or at the end of a chunk the gap fits in, so the last frame of a burst is not
+    held back until more traffic comes; flush() reports the last frame of a capture. Events are named after the function code,
+    EXCEPTION for exception responses and INVALID for frames shorter than 4 bytes or
+    longer than MAX_FRAME_BYTES, with the 'device' address, the 'function' code, the 'data'
+    bytes between them and the CRC, and 'crc_error' when the CRC or a UART frame was bad.
+    They are reported at the start bit of the first byte.
+    """
+
+    name = 'modbus'
+    label = 'Modbus RTU'
+    lower = 'uart'
+    defaults = {'parity': 'Even'}
+    group_key = 'channel'
+
+    def reset(self):
+        super().reset()
+        self.frames = {}  # Channel -> frame in progress
+
+    def gap_samples(self, config):
+        # Idle samples that end a frame
+        sample_rate = config.get('sample_rate')
+        baud_rate = config.get('baud_rate', 9600)
+        if baud_rate > 19200:
+            return MIN_GAP_SECONDS * sample_rate
+        bits = 1 + config.get('data_bits', 8) + PARITY_BITS[config.get('parity', 'None')] + config.get('stop_bits', 1)
+        return 3.5 * bits * sample_rate / baud_rate
+
+    def decode_annotations(self, annotations, end_idx):
+        events = []
+        for annotation in annotations:
+            channel = annotation['channel']
+            frame = self.frames.get(channel)
+            gap = self.gap_samples(self.configs[channel])
+            if frame is not None and annotation['start_sample_idx'] - frame['end_idx'] >= gap:
+                events.append(self.frame_event(frame))
+                frame = None
+            if frame is None:
+                frame = self.frames[channel] = {
+                    'channel': channel, 'data': [], 'error': False, 'sample_idx': annotation['start_sample_idx'],
+                }
+            frame['data'].append(annotation['data'])
+            frame['error'] |= annotation['parity_error'] or annotation['framing_error']
+            frame['end_idx'] = annotation['sample_idx']
+            if len(frame['data']) > MAX_FRAME_BYTES:
+                events.append(self.frame_event(frame))
+                del self.frames[channel]
+        # Frames whose gap has passed by the end of the chunk
+        for channel, frame in list(self.frames.items()):
+            if end_idx - frame['end_idx'] >= self.gap_samples(self.configs[channel]):
+                events.append(self.frame_event(frame))
+                del self.frames[channel]
+        return events
+
+    def flush_events(self):
+        # The capture ended, so did the frames still waiting for their gap
+        events = sorted((self.frame_event(frame) for frame in self.frames.values()), key=lambda event: event['sample_idx'])
+        self.frames = {}
+        return events
+
+    def frame_event(self, frame):
+        data = frame['data']
+        event = {'channel': frame['channel'], 'sample_idx': frame['sample_idx'], 'device': None, 'function': None,
+                 'data': data, 'crc_error': frame['error']}
+        if not 4 <= len(data) <= MAX_FRAME_BYTES:
+            event['event'] = 'INVALID'
+            return event
+        function = data[1]
+        event.update(
+            event='EXCEPTION' if function & 0x80 else FUNCTIONS.get(function, f'FUNCTION_{function}'),
+            device=data[0],
+            function=function,
+            data=data[2:-2],
+            crc_error=frame['error'] or modbus_crc(data[:-2]) != data[-2] | (data[-1] << 8),
+        )
+        return event
@@ -0,0 +1,117 @@
+# Recorder.py
+
+import os
+import queue
+import numpy as np
+from PyQt6.QtCore import QThread
+from CaptureFile import CAPTURE_EXTENSION, write_header
+from Instrumentation import instrumentation
+
+SEGMENT_SAMPLES = 1 << 28  # 256 MB per segment file
+QUEUE_CHUNKS = 256  # ~2.5 s of ~10 ms acquisition chunks
+WRITE_BUFFER = 1 << 20
+
+
+def segment_path(path, segment):
+    # rec.lacap -> rec_0000.lacap, rec_0001.lacap, ...
+    base = path[:-len(CAPTURE_EXTENSION)] if path.endswith(CAPTURE_EXTENSION) else path
+    return f"{base}_{segment:04d}{CAPTURE_EXTENSION}"
+
+
+def recording_segments(path):
+    """
+    Returns the paths of the segment files of a recording, in order.
+    """
+    segments = []
+    while os.path.exists(segment_path(path, len(segments))):
+        segments.append(segment_path(path, len(segments)))
+    return segments
+
+
+class CaptureRecorder(QThread):
+    """
+    Streams acquisition chunks to disk for recordings longer than any display buffer.
+
+    record(samples, start_idx) is an AcquisitionService subscriber: it runs in the
+    acquisition thread and only puts the chunk on a bounded queue. When the writer has
+    fallen behind and the queue is full, record() drops the chunk at once and counts its
+    samples in dropped_samples and the recording_dropped_samples counter, so reading the
+    port never waits for the disk and the GUI thread is never involved.
+
+    The writer thread appends to a capture file and starts a new segment file every
+    segment_samples samples and after every gap (dropped chunk), so each segment is a
+    normal capture file of contiguous samples. Its header carries 'segment' and
+    'first_sample', the number of its first sample counted from the start of the recording.
+    """
+
+    def __init__(self, path, header, segment_samples=SEGMENT_SAMPLES, queue_chunks=QUEUE_CHUNKS):
+        super().__init__()
+        self.path = path
+        self.header = header
+        self.segment_samples = segment_samples
+        self.queue = queue.Queue(maxsize=queue_chunks)
+        self.dropped_samples = 0  # Updated by the acquisition thread only
+        self.written_samples = 0  # Updated by the writer thread only
+        self.segment_paths = []
+        self.error = None
+        self.file = None
+        self.segment_fill = 0  # Samples in the open segment
+        self.origin = None  # start_idx of the first recorded chunk
+        self.next_idx = None  # start_idx the next chunk has if nothing was dropped
+
+    def record(self, samples, start_idx):
+        try:
+            self.queue.put_nowait((samples, start_idx))
+        except queue.Full:
+            self.dropped_samples += len(samples)
+            instrumentation.set_counter('recording_dropped_samples', self.dropped_samples)
+
+    def stop(self):
+        # Call after unsubscribing record(), everything queued before is still written
+        self.queue.put(None)
+        self.wait()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue  # Keep draining so record() does not block
+            samples, start_idx = item
+            try:
+                self.write_chunk(samples, start_idx)
+            except OSError as e:
+                self.error = e
+                print(f"Recording stopped writing: {e}")
+        self.close_segment()
+
+    def write_chunk(self, samples, start_idx):
+        samples = np.asarray(samples).astype(np.uint8, copy=False)  # The transport delivers uint16
+        if self.origin is None:
+            self.origin = start_idx
+        if start_idx != self.next_idx:
+            self.close_segment()  # Samples were dropped, the next ones start a new segment
+        self.next_idx = start_idx + len(samples)
+        while len(samples):
+            if self.file is None or self.segment_fill >= self.segment_samples:
+                self.open_segment(start_idx - self.origin)
+            part = samples[:self.segment_samples - self.segment_fill]
+            part.tofile(self.file)
+            self.segment_fill += len(part)
+            self.written_samples += len(part)
+            samples = samples[len(part):]
+            start_idx += len(part)
+
+    def open_segment(self, first_sample):
+        self.close_segment()
+        path = segment_path(self.path, len(self.segment_paths))
+        self.file = open(path, 'wb', buffering=WRITE_BUFFER)
+        write_header(self.file, dict(self.header, segment=len(self.segment_paths), first_sample=first_sample))
+        self.segment_paths.append(path)
+        self.segment_fill = 0
+
+    def close_segment(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
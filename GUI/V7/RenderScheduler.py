@@ -0,0 +1,112 @@
+# RenderScheduler.py
+
+import math
+import time
+from collections import deque
+from PyQt6.QtCore import QEvent, QObject, QTimer
+from Instrumentation import instrumentation
+
+DEFAULT_REFRESH_RATE = 60.0  # Hz, for screens that do not report one
+LOAD_FACTOR = 2.0  # Frames start at least this many times the last frame's duration apart
+FPS_WINDOW = 1.0  # Seconds of frames the reported frame rate is measured over
+
+
+class RenderScheduler(QObject):
+    """
+    Redraws a display when its buffers changed, instead of on a fixed 1 ms timer.
+
+    mark_dirty() asks for a frame. Frames are at least one screen refresh apart, and at
+    least LOAD_FACTOR times the duration of the previous frame apart, so a slow plot
+    leaves the GUI thread time to take in samples instead of redrawing back to back.
+    Nothing is scheduled while the display is hidden or its window is minimized; a
+    pending frame runs once it is shown again.
+
+    The frame rate and the frames dropped, refresh intervals that went by while a frame
+    was pending, are reported as the render_fps and frames_dropped counters.
+    """
+
+    def __init__(self, widget, render):
+        super().__init__(widget)
+        self.widget = widget
+        self.render = render
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run_frame)
+        # Visibility is only updated once a show event has been handled, so the check waits a turn
+        self.resume_timer = QTimer(self)
+        self.resume_timer.setSingleShot(True)
+        self.resume_timer.timeout.connect(self.schedule)
+        self.running = False
+        self.dirty = False
+        self.dirty_time = 0.0  # When the pending frame was asked for
+        self.last_frame_start = 0.0
+        self.last_frame_duration = 0.0
+        self.frame_starts = deque()  # Within the last FPS_WINDOW seconds
+        self.dropped_frames = 0
+        self.watched_window = None
+        widget.installEventFilter(self)
+
+    def refresh_interval(self):
+        screen = self.widget.screen()
+        refresh_rate = screen.refreshRate() if screen is not None else 0
+        return 1.0 / (refresh_rate if refresh_rate > 0 else DEFAULT_REFRESH_RATE)
+
+    def is_visible(self):
+        return self.widget.isVisible() and not self.widget.window().isMinimized()
+
+    def start(self):
+        self.running = True
+        # The display may have been moved into another window since it was created
+        window = self.widget.window()
+        if window is not self.watched_window and window is not self.widget:
+            if self.watched_window is not None:
+                self.watched_window.removeEventFilter(self)
+            window.installEventFilter(self)
+            self.watched_window = window
+        self.schedule()
+
+    def stop(self):
+        # Samples that came in since the last frame are still drawn
+        self.running = False
+        self.timer.stop()
+        self.run_frame()
+
+    def mark_dirty(self):
+        if not self.dirty:
+            self.dirty = True
+            self.dirty_time = time.perf_counter()
+        self.schedule()
+
+    def schedule(self):
+        if not self.running or not self.dirty or self.timer.isActive() or not self.is_visible():
+            return
+        interval = max(self.refresh_interval(), LOAD_FACTOR * self.last_frame_duration)
+        delay = self.last_frame_start + interval - time.perf_counter()
+        self.timer.start(max(math.ceil(delay * 1000), 0))
+
+    def run_frame(self):
+        if not self.dirty or not self.is_visible():
+            return
+        start = time.perf_counter()
+        interval = self.refresh_interval()
+        due = max(self.dirty_time, self.last_frame_start + interval)
+        self.dropped_frames += max(int((start - due) / interval), 0)
+        self.dirty = False
+        self.render()
+        self.last_frame_start = start
+        self.last_frame_duration = time.perf_counter() - start
+
+        self.frame_starts.append(start)
+        while self.frame_starts[0] < start - FPS_WINDOW:
+            self.frame_starts.popleft()
+        span = start - self.frame_starts[0]
+        instrumentation.set_counter('render_fps', round((len(self.frame_starts) - 1) / span, 1) if span > 0 else 0.0)
+        instrumentation.set_counter('frames_dropped', self.dropped_frames)
+        self.schedule()
+
+    def eventFilter(self, watched, event):
+        if event.type() in (QEvent.Type.Show, QEvent.Type.WindowStateChange):
+            self.resume_timer.start(0)
+        elif event.type() == QEvent.Type.Hide:
+            self.timer.stop()
+        return False
@@ -21,194 +21,35 @@ from PyQt6.QtWidgets import (
     QSizePolicy,
 )
 from PyQt6.QtGui import QIcon, QIntValidator, QFont
-from PyQt6.QtCore import QTimer, QThread, pyqtSignal, Qt
+from PyQt6.QtCore import pyqtSignal, Qt
 from collections import deque
 from InterfaceCommands import (
     get_trigger_edge_command,
     get_trigger_pins_command,
 )
 from aesthetic import get_icon
+from SampleBuffer import SampleRingBuffer
+from Acquisition import AcquisitionService, DecodingSubscriber
+from Decoders import create_decoder
+from LevelOfDetail import MinMaxPyramid, visible_window
+from CaptureActions import CaptureActions
+from Instrumentation import instrumentation
+from RenderScheduler import RenderScheduler
 
-class SerialWorker(QThread):
-    data_ready = pyqtSignal(int, int)  # For raw data values and sample indices
-    decoded_message_ready = pyqtSignal(dict)  # For decoded messages
+class SerialWorker(DecodingSubscriber):
+    def __init__(self, acquisition, channels=8, group_configs=None):
+        decoder = create_decoder('spi', group_configs if group_configs else [{} for _ in range(2)])
+        super().__init__(acquisition, decoder, channels)
 
-    def __init__(self, port, baudrate, channels=8, group_configs=None):
-        super().__init__()
-        self.is_running = True
-        self.channels = channels
-        self.group_configs = group_configs if group_configs else [{} for _ in range(2)]
-        self.trigger_modes = ['No Trigger'] * self.channels
-        self.sample_idx = 0  # Initialize sample index
-
-        try:
-            self.serial = serial.Serial(port, baudrate)
-        except serial.SerialException as e:
-            print(f"Failed to open serial port: {str(e)}")
-            self.is_running = False
-
-        # Initialize SPI decoding variables for each group
-        self.states = ['IDLE'] * len(self.group_configs)
-        self.current_bits_mosi = [''] * len(self.group_configs)
-        self.current_bits_miso = [''] * len(self.group_configs)
-        self.last_clk_values = [0] * len(self.group_configs)
-        self.last_ss_values = [1] * len(self.group_configs)  # Assuming active low SS
-        self.sample_idx = 0  # Initialize sample index
-
-    def set_trigger_mode(self, channel_idx, mode):
-        self.trigger_modes[channel_idx] = mode
-
-    def run(self):
-        data_buffer = deque(maxlen=1000)
-
-        while self.is_running:
-            if self.serial.in_waiting:
-                raw_data = self.serial.read(self.serial.in_waiting).splitlines()
-                for line in raw_data:
-                    try:
-                        data_value = int(line.strip())
-                        data_buffer.append(data_value)
-                        self.data_ready.emit(data_value, self.sample_idx)  # Emit data_value and sample_idx
-                        self.decode_spi(data_value, self.sample_idx)
-                        self.sample_idx += 1  # Increment sample index
-                    except ValueError:
-                        continue
-
-    def decode_spi(self, data_value, sample_idx):
-        for group_idx, group_config in enumerate(self.group_configs):
-            ss_channel = group_config['ss_channel'] - 1
-            clk_channel = group_config['clock_channel'] - 1
-            mosi_channel = group_config['mosi_channel'] - 1
-            miso_channel = group_config['miso_channel'] - 1
-            bits = group_config.get('bits', 8)
-            first_bit = group_config.get('first_bit', 'MSB')
-            ss_active = group_config.get('ss_active', 'Low')
-            data_format = group_config.get('data_format', 'Hexadecimal')
-
-            # Extract SS, CLK, MOSI, MISO values
-            ss = (data_value >> ss_channel) & 1
-            clk = (data_value >> clk_channel) & 1
-            mosi = (data_value >> mosi_channel) & 1
-            miso = (data_value >> miso_channel) & 1
-
-            # Adjust for SS active level
-            ss_active_level = 0 if ss_active == 'Low' else 1
-            ss_inactive_level = 1 - ss_active_level
-
-            # State machine for SPI decoding
-            state = self.states[group_idx]
-            current_bits_mosi = self.current_bits_mosi[group_idx]
-            current_bits_miso = self.current_bits_miso[group_idx]
-            last_clk = self.last_clk_values[group_idx]
-            last_ss = self.last_ss_values[group_idx]
-
-            # Detect edges on CLK
-            clk_edge = clk != last_clk
-            clk_rising = clk_edge and clk == 1
-            clk_falling = clk_edge and clk == 0
-
-            # Detect SS activation/deactivation
-            ss_edge = ss != last_ss
-            ss_active_now = ss == ss_active_level
-            ss_inactive_now = ss == ss_inactive_level
-
-            if state == 'IDLE':
-                if ss_active_now:
-                    # SS went active, start capturing data
-                    state = 'RECEIVE'
-                    current_bits_mosi = ''
-                    current_bits_miso = ''
-            elif state == 'RECEIVE':
-                if ss_inactive_now:
-                    # SS went inactive, end of data
-                    if current_bits_mosi or current_bits_miso:
-                        # Emit the decoded data
-                        self.emit_decoded_data(group_idx, current_bits_mosi, current_bits_miso, sample_idx, data_format)
-                        current_bits_mosi = ''
-                        current_bits_miso = ''
-                    state = 'IDLE'
-                else:
-                    # Continue receiving data
-                    # Sample on clock edge (we can assume CPOL=0, CPHA=0 for now)
-                    if clk_rising:
-                        # Sample data
-                        if first_bit == 'MSB':
-                            current_bits_mosi += str(mosi)
-                            current_bits_miso += str(miso)
-                        else:
-                            current_bits_mosi = str(mosi) + current_bits_mosi
-                            current_bits_miso = str(miso) + current_bits_miso
-                        if len(current_bits_mosi) == bits:
-                            # Full data received
-                            self.emit_decoded_data(group_idx, current_bits_mosi, current_bits_miso, sample_idx, data_format)
-                            current_bits_mosi = ''
-                            current_bits_miso = ''
-
-            # Update stored states
-            self.states[group_idx] = state
-            self.current_bits_mosi[group_idx] = current_bits_mosi
-            self.current_bits_miso[group_idx] = current_bits_miso
-            self.last_clk_values[group_idx] = clk
-            self.last_ss_values[group_idx] = ss
-
-    def emit_decoded_data(self, group_idx, bits_str_mosi, bits_str_miso, sample_idx, data_format):
-        # Convert bits to integer
-        if bits_str_mosi:
-            data_value_mosi = int(bits_str_mosi, 2)
-        else:
-            data_value_mosi = None
-        if bits_str_miso:
-            data_value_miso = int(bits_str_miso, 2)
-        else:
-            data_value_miso = None
-
-        # Format data according to data_format
-        data_str_mosi = data_str_miso = ''
-        if data_value_mosi is not None:
-            if data_format == 'Binary':
-                data_str_mosi = bin(data_value_mosi)
-            elif data_format == 'Decimal':
-                data_str_mosi = str(data_value_mosi)
-            elif data_format == 'Hexadecimal':
-                data_str_mosi = hex(data_value_mosi)
-            elif data_format == 'ASCII':
-                data_str_mosi = chr(data_value_mosi)
-            else:
-                data_str_mosi = hex(data_value_mosi)
-        if data_value_miso is not None:
-            if data_format == 'Binary':
-                data_str_miso = bin(data_value_miso)
-            elif data_format == 'Decimal':
-                data_str_miso = str(data_value_miso)
-            elif data_format == 'Hexadecimal':
-                data_str_miso = hex(data_value_miso)
-            elif data_format == 'ASCII':
-                data_str_miso = chr(data_value_miso)
-            else:
-                data_str_miso = hex(data_value_miso)
-
-        # Emit the decoded message
-        self.decoded_message_ready.emit({
-            'group_idx': group_idx,
-            'event': 'DATA',
-            'data_mosi': data_str_mosi,
-            'data_miso': data_str_miso,
-            'sample_idx': sample_idx,
-        })
+    @property
+    def group_configs(self):
+        # The display edits and replaces the configs, the decoder reads them on every chunk
+        return self.decoder.configs
 
-    def reset_decoding_states(self):
-        # Reset SPI decoding variables for each group
-        self.states = ['IDLE'] * len(self.group_configs)
-        self.current_bits_mosi = [''] * len(self.group_configs)
-        self.current_bits_miso = [''] * len(self.group_configs)
-        self.last_clk_values = [0] * len(self.group_configs)
-        self.last_ss_values = [1] * len(self.group_configs)
-        self.sample_idx = 0  # Reset sample index
+    @group_configs.setter
+    def group_configs(self, configs):
+        self.decoder.configs = configs
 
-    def stop_worker(self):
-        self.is_running = False
-        if self.serial.is_open:
-            self.serial.close()
 
 class FixedYViewBox(pg.ViewBox):
     def __init__(self, *args, **kwargs):
@@ -384,6 +225,21 @@ class SPIConfigDialog(QDialog):
         else:
             self.first_lsb.setChecked(True)
 
+        # SPI Mode Selection, clock polarity and phase
+        mode_layout = QHBoxLayout()
+        mode_label = QLabel("SPI Mode:")
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems([
+            "Mode 0 (CPOL=0, CPHA=0)",
+            "Mode 1 (CPOL=0, CPHA=1)",
+            "Mode 2 (CPOL=1, CPHA=0)",
+            "Mode 3 (CPOL=1, CPHA=1)",
+        ])
+        self.mode_combo.setCurrentIndex(self.current_config.get('mode', 0))
+        mode_layout.addWidget(mode_label)
+        mode_layout.addWidget(self.mode_combo)
+        layout.addLayout(mode_layout)
+
         # Data Format Selection
         format_layout = QHBoxLayout()
         format_label = QLabel("Data Format:")
@@ -415,11 +271,14 @@ class SPIConfigDialog(QDialog):
             'miso_channel': self.miso_combo.currentIndex() + 1,
             'bits': int(self.bits_input.text()),
             'first_bit': 'MSB' if self.first_msb.isChecked() else 'LSB',
+            'mode': self.mode_combo.currentIndex(),
             'data_format': self.format_combo.currentText(),
         }
 
-class SPIDisplay(QWidget):
-    def __init__(self, port, baudrate, bufferSize, channels=8):
+class SPIDisplay(CaptureActions, QWidget):
+    capture_mode = 'SPI'
+
+    def __init__(self, port, baudrate, bufferSize, channels=8, acquisition=None):
         super().__init__()
         self.period = 65454
         self.num_samples = 0
@@ -428,11 +287,16 @@ class SPIDisplay(QWidget):
         self.channels = channels
         self.bufferSize = bufferSize
 
-        self.data_buffer = [deque(maxlen=self.bufferSize) for _ in range(self.channels)]  # 8 channels
+        self.data_buffer = SampleRingBuffer(self.bufferSize, transitions=True)  # 8 channels packed per sample
+        self.lod = MinMaxPyramid(self.data_buffer)  # Min/max summaries for zoomed out views
         self.sample_indices = deque(maxlen=self.bufferSize)
         self.total_samples = 0
+        self.awaiting_restart = False  # Cleared buffers wait for the worker's index to restart
 
         self.is_single_capture = False
+        self.capture = None  # CaptureFile shown instead of live data
+        self.trigger_line = None
+        self.recorder = None  # CaptureRecorder streaming every acquired sample to disk
 
         self.current_trigger_modes = ['No Trigger'] * self.channels
         self.trigger_mode_options = ['No Trigger', 'Rising Edge', 'Falling Edge']
@@ -441,33 +305,39 @@ class SPIDisplay(QWidget):
 
         # Initialize group configurations with default channels and settings
         self.group_configs = [
-            {'ss_channel': 1, 'clock_channel': 2, 'mosi_channel': 3, 'miso_channel': 4, 'bits':8, 'first_bit':'MSB', 'ss_active':'Low', 'data_format':'Hexadecimal'},
-            {'ss_channel': 5, 'clock_channel': 6, 'mosi_channel': 7, 'miso_channel': 8, 'bits':8, 'first_bit':'MSB', 'ss_active':'Low', 'data_format':'Hexadecimal'},
+            {'ss_channel': 1, 'clock_channel': 2, 'mosi_channel': 3, 'miso_channel': 4, 'bits':8, 'first_bit':'MSB', 'ss_active':'Low', 'mode':0, 'data_format':'Hexadecimal'},
+            {'ss_channel': 5, 'clock_channel': 6, 'mosi_channel': 7, 'miso_channel': 8, 'bits':8, 'first_bit':'MSB', 'ss_active':'Low', 'mode':0, 'data_format':'Hexadecimal'},
         ]
 
         # Default group configurations
         self.default_group_configs = [
-            {'ss_channel': 1, 'clock_channel': 2, 'mosi_channel': 3, 'miso_channel': 4, 'bits':8, 'first_bit':'MSB', 'ss_active':'Low', 'data_format':'Hexadecimal'},
-            {'ss_channel': 5, 'clock_channel': 6, 'mosi_channel': 7, 'miso_channel': 8, 'bits':8, 'first_bit':'MSB', 'ss_active':'Low', 'data_format':'Hexadecimal'},
+            {'ss_channel': 1, 'clock_channel': 2, 'mosi_channel': 3, 'miso_channel': 4, 'bits':8, 'first_bit':'MSB', 'ss_active':'Low', 'mode':0, 'data_format':'Hexadecimal'},
+            {'ss_channel': 5, 'clock_channel': 6, 'mosi_channel': 7, 'miso_channel': 8, 'bits':8, 'first_bit':'MSB', 'ss_active':'Low', 'mode':0, 'data_format':'Hexadecimal'},
         ]
 
         self.spi_group_enabled = [False] * 2  # Track which SPI groups are enabled
 
         # Initialize decoded messages per group
-        self.decoded_messages_per_group = {i: [] for i in range(2)}
+        self.decoded_messages_per_group = {i: deque(maxlen=self.bufferSize) for i in range(2)}
 
         self.group_cursors = [[] for _ in range(2)]  # To store cursors per group
 
         self.setup_ui()
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_plot)
+        self.render_scheduler = RenderScheduler(self, self.update_plot)  # Redraws when new samples arrive
+        # Redraw on zoom and pan, the level of detail depends on the visible range
+        self.plot.sigXRangeChanged.connect(lambda *args: self.update_plot())
 
         self.is_reading = False
 
-        self.worker = SerialWorker(self.port, self.baudrate, channels=self.channels, group_configs=self.group_configs)
-        self.worker.data_ready.connect(self.handle_data_value)
-        self.worker.decoded_message_ready.connect(self.display_decoded_message)
+        # Share the caller's acquisition service, or run a private one when used standalone
+        self.owns_acquisition = acquisition is None
+        self.acquisition = acquisition if acquisition else AcquisitionService(self.port, self.baudrate)
+        self.worker = SerialWorker(self.acquisition, channels=self.channels, group_configs=self.group_configs)
+        self.worker.data_ready.connect(self.handle_data_chunk)
+        self.worker.decoded_message_ready.connect(self.handle_decoded_message)
         self.worker.start()
+        if self.owns_acquisition:
+            self.acquisition.start()
 
         self.colors = ['#FF6EC7', '#39FF14', '#FF486D', '#BF00FF', '#FFFF33', '#FFA500', '#00F5FF', '#BFFF00']
         self.group_curves = []
@@ -604,6 +474,26 @@ class SPIDisplay(QWidget):
         self.single_button.clicked.connect(self.start_single_capture)
         control_buttons_layout.addWidget(self.single_button)
 
+        self.open_button = QPushButton("Open")
+        self.open_button.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Preferred)
+        self.open_button.setFixedWidth(80)
+        self.open_button.clicked.connect(self.open_capture_file)
+        control_buttons_layout.addWidget(self.open_button)
+
+        self.save_button = QPushButton("Save")
+        self.save_button.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Preferred)
+        self.save_button.setFixedWidth(80)
+        self.save_button.clicked.connect(self.save_capture_file)
+        control_buttons_layout.addWidget(self.save_button)
+
+        self.record_button = QPushButton("Record")
+        self.record_button.setCheckable(True)
+        self.record_button.clicked.connect(self.toggle_recording)
+        control_buttons_layout.addWidget(self.record_button)
+
+        self.record_label = QLabel("")  # Recorded and dropped samples
+        control_buttons_layout.addWidget(self.record_label)
+
         # Add control buttons layout to the button_layout
         button_layout.addLayout(control_buttons_layout, next_row + 2, 0, 1, 2)
 
@@ -863,13 +753,15 @@ class SPIDisplay(QWidget):
 
     def start_reading(self):
         if not self.is_reading:
+            if self.capture is not None:
+                self.close_capture()
             self.is_reading = True
-            self.timer.start(1)
+            self.render_scheduler.start()
 
     def stop_reading(self):
         if self.is_reading:
             self.is_reading = False
-            self.timer.stop()
+            self.render_scheduler.stop()
 
     def start_single_capture(self):
         if not self.is_reading:
@@ -891,7 +783,7 @@ class SPIDisplay(QWidget):
         self.single_button.setStyleSheet("")
 
     def clear_data_buffers(self):
-        self.data_buffer = [deque(maxlen=self.bufferSize) for _ in range(self.channels)]
+        self.data_buffer.clear()
         self.total_samples = 0  # Reset total samples
 
         # Remove all cursors
@@ -901,34 +793,69 @@ class SPIDisplay(QWidget):
                 self.plot.removeItem(cursor_info['label'])
             self.group_cursors[group_idx] = []
 
-        # Reset worker's decoding states
+        # Reset worker's decoding states; chunks and messages already on their way predate it
+        self.awaiting_restart = True
         self.worker.reset_decoding_states()
 
-    def handle_data_value(self, data_value):
+    def capture_decoder_configs(self):
+        # Group settings go with their enabled state, so the file reopens decoded the same way
+        return [dict(config, enabled=enabled) for config, enabled in zip(self.group_configs, self.spi_group_enabled)]
+
+    def apply_capture_configs(self, decoder_configs):
+        for group_idx, config in enumerate(decoder_configs[:len(self.group_configs)]):
+            config = dict(config)
+            is_enabled = config.pop('enabled', False)
+            self.group_configs[group_idx] = config
+            self.channel_buttons[group_idx].setChecked(is_enabled)
+
+    def capture_decoder(self):
+        return create_decoder('spi', self.group_configs)
+
+    @instrumentation.timed('handle')
+    def handle_data_chunk(self, samples, start_idx):
+        instrumentation.chunk_handled()
+        if self.awaiting_restart:
+            if start_idx != 0:
+                return  # Sent before the worker restarted its sample index for the cleared buffers
+            self.awaiting_restart = False
         if self.is_reading:
-            # Store raw data for plotting
-            for i in range(self.channels):
-                bit = (data_value >> i) & 1
-                self.data_buffer[i].append(bit)
-            self.total_samples += 1  # Increment total samples
-
-            # Check if buffers are full
-            if all(len(buf) >= self.bufferSize for buf in self.data_buffer):
-                if self.is_single_capture:
-                    # In single capture mode, stop acquisition
-                    self.stop_single_capture()
-                else:
-                    # In continuous mode, reset buffers and cursors
-                    self.clear_data_buffers()
-                    self.clear_decoded_text()
-    
+            self.render_scheduler.mark_dirty()
+        if self.is_reading and self.recorder is not None and not self.is_single_capture:
+            # The recording keeps everything, so the display slides instead of starting over
+            self.data_buffer.append(samples)
+            self.total_samples += len(samples)
+            return
+        if not self.is_reading:
+            return
+        # Store raw data for plotting, only up to capacity so a full buffer is handled at the same sample as before
+        space = self.data_buffer.capacity - len(self.data_buffer)
+        self.data_buffer.append(samples[:space])
+        self.total_samples += min(space, len(samples))  # Increment total samples
+
+        # Check if buffers are full
+        if self.data_buffer.is_full():
+            if self.is_single_capture:
+                # In single capture mode, stop acquisition
+                self.stop_single_capture()
+            else:
+                # In continuous mode, reset buffers and cursors. The rest of the chunk is dropped,
+                # the worker numbers its samples from 0 again with the next chunk
+                self.clear_data_buffers()
+                self.clear_decoded_text()
+
     def clear_decoded_text(self):
         # Clear all decoded messages per group
         for idx in range(len(self.group_configs)):
-            self.decoded_messages_per_group[idx] = []
+            self.decoded_messages_per_group[idx] = deque(maxlen=self.bufferSize)
         # Cursors are already cleared in clear_data_buffers
 
 
+    def handle_decoded_message(self, decoded_data):
+        # Messages from the worker; capture files are decoded here and shown directly
+        if not self.awaiting_restart:
+            self.display_decoded_message(decoded_data)
+
+    @instrumentation.timed('messages')
     def display_decoded_message(self, decoded_data):
         group_idx = decoded_data['group_idx']
         if not self.spi_group_enabled[group_idx]:
@@ -949,6 +876,8 @@ class SPIDisplay(QWidget):
 
 
     def create_cursor(self, group_idx, sample_idx, label_text, signal):
+        if sample_idx < self.total_samples - len(self.data_buffer):
+            return  # Already slid out of the display window while recording
         # Cursor color
         cursor_color = '#00F5FF'  # Use your preferred color
 
@@ -993,12 +922,17 @@ class SPIDisplay(QWidget):
         })
 
 
+    @instrumentation.timed('frame')
     def update_plot(self):
+        self.update_record_label()
         signals_per_group = 4
         total_groups = len(self.spi_group_enabled)
         total_signals = total_groups * signals_per_group
         signal_spacing = 1.5
 
+        # Only the visible X range, at the resolution the plot width can show
+        x_range, pixel_width = visible_window(self.plot)
+        num_samples = len(self.data_buffer)
         for group_idx, is_enabled in enumerate(self.spi_group_enabled):
             if is_enabled:
                 group_config = self.group_configs[group_idx]
@@ -1014,75 +948,22 @@ class SPIDisplay(QWidget):
                 mosi_curve = curves['mosi_curve']
                 miso_curve = curves['miso_curve']
 
-                # Prepare data for plotting
-                ss_data = list(self.data_buffer[ss_channel])
-                clk_data = list(self.data_buffer[clk_channel])
-                mosi_data = list(self.data_buffer[mosi_channel])
-                miso_data = list(self.data_buffer[miso_channel])
-
-                num_samples = len(ss_data)
                 if num_samples > 1:
-                    t = np.arange(num_samples) / self.sample_rate
-
-                    # --- Plot SS Signal ---
-                    signal_index = group_idx * signals_per_group + 0  # SS
-                    level_offset = (total_signals - signal_index - 1) * signal_spacing
-                    ss_square_wave_time = []
-                    ss_square_wave_data = []
-                    for j in range(1, num_samples):
-                        ss_square_wave_time.extend([t[j - 1], t[j]])
-                        level = ss_data[j - 1] + level_offset
-                        ss_square_wave_data.extend([level, level])
-                        if ss_data[j] != ss_data[j - 1]:
-                            ss_square_wave_time.append(t[j])
-                            level = ss_data[j] + level_offset
-                            ss_square_wave_data.append(level)
-                    ss_curve.setData(ss_square_wave_time, ss_square_wave_data)
-
-                    # --- Plot CLK Signal ---
-                    signal_index = group_idx * signals_per_group + 1  # CLK
-                    level_offset = (total_signals - signal_index - 1) * signal_spacing
-                    clk_square_wave_time = []
-                    clk_square_wave_data = []
-                    for j in range(1, num_samples):
-                        clk_square_wave_time.extend([t[j - 1], t[j]])
-                        level = clk_data[j - 1] + level_offset
-                        clk_square_wave_data.extend([level, level])
-                        if clk_data[j] != clk_data[j - 1]:
-                            clk_square_wave_time.append(t[j])
-                            level = clk_data[j] + level_offset
-                            clk_square_wave_data.append(level)
-                    clk_curve.setData(clk_square_wave_time, clk_square_wave_data)
-
-                    # --- Plot MOSI Signal ---
-                    signal_index = group_idx * signals_per_group + 2  # MOSI
-                    level_offset = (total_signals - signal_index - 1) * signal_spacing
-                    mosi_square_wave_time = []
-                    mosi_square_wave_data = []
-                    for j in range(1, num_samples):
-                        mosi_square_wave_time.extend([t[j - 1], t[j]])
-                        level = mosi_data[j - 1] + level_offset
-                        mosi_square_wave_data.extend([level, level])
-                        if mosi_data[j] != mosi_data[j - 1]:
-                            mosi_square_wave_time.append(t[j])
-                            level = mosi_data[j] + level_offset
-                            mosi_square_wave_data.append(level)
-                    mosi_curve.setData(mosi_square_wave_time, mosi_square_wave_data)
-
-                    # --- Plot MISO Signal ---
-                    signal_index = group_idx * signals_per_group + 3  # MISO
-                    level_offset = (total_signals - signal_index - 1) * signal_spacing
-                    miso_square_wave_time = []
-                    miso_square_wave_data = []
-                    for j in range(1, num_samples):
-                        miso_square_wave_time.extend([t[j - 1], t[j]])
-                        level = miso_data[j - 1] + level_offset
-                        miso_square_wave_data.extend([level, level])
-                        if miso_data[j] != miso_data[j - 1]:
-                            miso_square_wave_time.append(t[j])
-                            level = miso_data[j] + level_offset
-                            miso_square_wave_data.append(level)
-                    miso_curve.setData(miso_square_wave_time, miso_square_wave_data)
+                    sample_period = 1 / self.sample_rate  # Cursor positions only need the period, not a time axis
+
+                    # --- Plot SS, CLK, MOSI and MISO Signals ---
+                    for signal_offset, (curve, channel) in enumerate((
+                        (ss_curve, ss_channel),
+                        (clk_curve, clk_channel),
+                        (mosi_curve, mosi_channel),
+                        (miso_curve, miso_channel),
+                    )):
+                        signal_index = group_idx * signals_per_group + signal_offset
+                        level_offset = (total_signals - signal_index - 1) * signal_spacing
+                        square_wave_time, square_wave_data = self.lod.square_wave(
+                            channel, self.sample_rate, level_offset, x_range, pixel_width
+                        )
+                        curve.setData(square_wave_time, square_wave_data)
 
                     # --- Update Cursors ---
                     cursors_to_remove = []
@@ -1090,13 +971,13 @@ class SPIDisplay(QWidget):
                         sample_idx = cursor_info['sample_idx']
                         idx_in_buffer = sample_idx - (self.total_samples - num_samples)
                         if 0 <= idx_in_buffer < num_samples:
-                            cursor_time = t[int(idx_in_buffer)]
+                            cursor_time = int(idx_in_buffer) * sample_period
                             # Update the line position
                             x = cursor_time
                             y_position = cursor_info['y_position']
                             cursor_info['line'].setData([x, x], [y_position - 1, y_position + 1])
                             # Update the label position
-                            label_offset = (t[1] - t[0]) * 5  # Adjust label offset as needed
+                            label_offset = sample_period * 5  # Adjust label offset as needed
                             cursor_info['label'].setPos(x + label_offset, y_position + 0.7)
                             cursor_info['x_pos'] = x + label_offset  # Store x position for overlap checking
                         else:
@@ -1122,7 +1003,7 @@ class SPIDisplay(QWidget):
                     labels_with_positions.sort(key=lambda item: (item[0], item[1]))
 
                     # Hide labels that overlap in both x and y
-                    min_label_spacing_x = (t[1] - t[0]) * 10  # Adjust as needed
+                    min_label_spacing_x = sample_period * 10  # Adjust as needed
                     min_label_spacing_y = signal_spacing * 0.5  # Adjust as needed
                     last_label_x = last_label_y = None
                     for x_pos, y_pos, label in labels_with_positions:
@@ -1154,9 +1035,11 @@ class SPIDisplay(QWidget):
                 curves['miso_curve'].setVisible(False)
 
     def closeEvent(self, event):
+        self.stop_recording()
         self.worker.stop_worker()
-        self.worker.quit()
-        self.worker.wait()
+        self.worker.use_decode_pool(False)  # Ends its processes
+        if self.owns_acquisition:
+            self.acquisition.stop_worker()
         event.accept()
 
     def open_configuration_dialog(self, group_idx):
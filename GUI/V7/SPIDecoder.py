@@ -0,0 +1,254 @@
+# SPIDecoder.py
+
+import numpy as np
+from Decoders import DecoderPlugin
+
+# SPI mode -> (CPOL, CPHA). Data is sampled on the rising clock edge when CPOL == CPHA
+# (modes 0 and 3) and on the falling edge otherwise (modes 1 and 2).
+SPI_MODES = {
+    0: (0, 0),
+    1: (0, 1),
+    2: (1, 0),
+    3: (1, 1),
+}
+
+
+def sample_edge_level(mode):
+    """
+    Returns the clock level right after the sampling edge: 1 for rising, 0 for falling.
+    """
+    cpol, cpha = SPI_MODES[mode]
+    return 1 if cpol == cpha else 0
+
+
+def format_word(value, data_format):
+    if data_format == 'Binary':
+        return bin(value)
+    elif data_format == 'Decimal':
+        return str(value)
+    elif data_format == 'Hexadecimal':
+        return hex(value)
+    elif data_format == 'ASCII':
+        return chr(value)
+    return hex(value)
+
+
+def parse_word(text, data_format):
+    # Inverse of format_word
+    if data_format == 'ASCII':
+        return ord(text)
+    if data_format == 'Decimal':
+        return int(text)
+    return int(text, 0)
+
+
+class SPIDecoder:
+    """
+    Edge-indexed SPI decoder for groups of SS/CLK/MOSI/MISO channels.
+
+    For each chunk it finds the sampling clock edges for the group's SPI mode while SS is
+    active, gathers MOSI and MISO at those samples with fancy indexing and packs them into
+    words of 1 to 32 bits with shifts and np.add.reduceat. A word is reported when its last
+    bit arrives; a partial word is reported when SS goes inactive. Bits of an unfinished
+    word are carried into the next chunk.
+
+    The DATA dicts are the ones the SPI view used before, and in mode 0 the output matches
+    the old per-sample decoder, including that the sample where SS becomes active is not
+    sampled. With 'frame_events' set in a group config, an END event follows the last word
+    of every transfer, at the sample where SS went inactive.
+
+    decode_runs() takes the same chunk as runs of the packed word. Clock edges and SS
+    changes only happen where a run starts, so the masks are built over the runs and mapped
+    back to sample positions.
+    """
+
+    def __init__(self, num_groups=2):
+        self.num_groups = num_groups
+        self.reset()
+
+    def reset(self):
+        self.receiving = [False] * self.num_groups  # SS was active on the previous sample
+        self.last_clk_values = [0] * self.num_groups
+        self.pending_mosi = [np.empty(0, dtype=np.uint64) for _ in range(self.num_groups)]
+        self.pending_miso = [np.empty(0, dtype=np.uint64) for _ in range(self.num_groups)]
+
+    def decode(self, samples, start_idx, group_configs):
+        """
+        Decodes one chunk of packed samples whose first sample has index start_idx.
+
+        Returns DATA dicts ordered by the sample that completed them, then by group.
+        """
+        samples = np.asarray(samples)
+        if len(samples) == 0:
+            return []
+        return self._decode_groups(samples, start_idx, group_configs)
+
+    def decode_runs(self, indices, values, stop_idx, group_configs):
+        """
+        Decodes one chunk given as runs, (sample index, packed value) at every change as
+        TransitionStore keeps them, covering the samples up to stop_idx. Returns the events
+        decode() returns for the same samples.
+        """
+        if len(indices) == 0:
+            return []
+        start_idx = int(indices[0])
+        return self._decode_groups(np.asarray(values), start_idx, group_configs, np.asarray(indices) - start_idx)
+
+    def _decode_groups(self, samples, start_idx, group_configs, run_offsets=None):
+        keyed_events = []
+        for group_idx, group_config in enumerate(group_configs[:self.num_groups]):
+            keyed_events.extend(self._decode_group(samples, start_idx, group_idx, group_config, run_offsets))
+        keyed_events.sort(key=lambda item: (item[0], item[1]))
+        return [event for _, _, event in keyed_events]
+
+    def decode_words(self, samples, start_idx, group_idx, group_config, run_offsets=None):
+        """
+        Returns (sample_idxs, mosi_words, miso_words, bit_counts) as arrays for one group.
+
+        sample_idxs is the sample that completed each word: its last clock edge, or the
+        sample where SS went inactive for a partial word. With run_offsets, samples holds
+        the value of each run and run_offsets the sample it starts at, from start_idx.
+        """
+        ss_channel = group_config['ss_channel'] - 1
+        clk_channel = group_config['clock_channel'] - 1
+        mosi_channel = group_config['mosi_channel'] - 1
+        miso_channel = group_config['miso_channel'] - 1
+        bits = group_config.get('bits', 8)
+        first_bit = group_config.get('first_bit', 'MSB')
+        ss_active_level = 0 if group_config.get('ss_active', 'Low') == 'Low' else 1
+        edge_level = sample_edge_level(group_config.get('mode', 0))
+
+        ss = (samples >> ss_channel) & 1
+        clk = (samples >> clk_channel) & 1
+        active = ss == ss_active_level
+        # Receiving at sample i means SS was active at i - 1
+        receiving = np.empty_like(active)
+        receiving[0] = self.receiving[group_idx]
+        receiving[1:] = active[:-1]
+        clk_prev = np.empty_like(clk)
+        clk_prev[0] = self.last_clk_values[group_idx]
+        clk_prev[1:] = clk[:-1]
+        self.receiving[group_idx] = bool(active[-1])
+        self.last_clk_values[group_idx] = int(clk[-1])
+
+        bit_positions = np.flatnonzero((clk != clk_prev) & (clk == edge_level) & active & receiving)
+        frame_ends = np.flatnonzero(receiving & ~active)
+        bit_samples = samples[bit_positions]
+        if run_offsets is not None:
+            bit_positions = run_offsets[bit_positions]
+            frame_ends = run_offsets[frame_ends]
+
+        pending_mosi = self.pending_mosi[group_idx]
+        pending_miso = self.pending_miso[group_idx]
+        num_pending = len(pending_mosi)
+        mosi_bits = np.concatenate((pending_mosi, ((bit_samples >> mosi_channel) & 1).astype(np.uint64)))
+        miso_bits = np.concatenate((pending_miso, ((bit_samples >> miso_channel) & 1).astype(np.uint64)))
+        # Carried bits belong to the first frame of this chunk, place them before sample 0
+        bit_positions = np.concatenate((np.full(num_pending, -1, dtype=np.int64), bit_positions))
+        num_bits = len(bit_positions)
+
+        # Frame of every bit and position inside its frame
+        frames = np.searchsorted(frame_ends, bit_positions)
+        frame_starts = np.flatnonzero(np.diff(frames, prepend=-1)) if num_bits else np.empty(0, dtype=np.int64)
+        run_lengths = np.diff(np.append(frame_starts, num_bits))
+        position_in_frame = np.arange(num_bits) - np.repeat(frame_starts, run_lengths)
+
+        # Words start at every frame start and every `bits` bits inside a frame
+        word_starts = np.flatnonzero(position_in_frame % bits == 0)
+        word_lengths = np.diff(np.append(word_starts, num_bits))
+        word_of_bit = np.repeat(np.arange(len(word_starts)), word_lengths)
+        index_in_word = np.arange(num_bits) - word_starts[word_of_bit] if num_bits else np.empty(0, dtype=np.int64)
+        if first_bit == 'MSB':
+            shifts = (word_lengths[word_of_bit] - 1 - index_in_word).astype(np.uint64)
+        else:
+            shifts = index_in_word.astype(np.uint64)
+        if num_bits:
+            mosi_words = np.add.reduceat(mosi_bits << shifts, word_starts)
+            miso_words = np.add.reduceat(miso_bits << shifts, word_starts)
+        else:
+            mosi_words = miso_words = np.empty(0, dtype=np.uint64)
+
+        # Full words complete at their last bit, partial words when their frame ends
+        last_bits = word_starts + word_lengths - 1
+        word_frames = frames[word_starts] if num_bits else np.empty(0, dtype=np.int64)
+        complete = word_lengths == bits
+        frame_closed = word_frames < len(frame_ends)
+        emitted = complete | frame_closed
+        sample_positions = np.where(
+            complete, bit_positions[last_bits], frame_ends[np.minimum(word_frames, len(frame_ends) - 1)]
+            if len(frame_ends) else bit_positions[last_bits]
+        )
+
+        # A partial word in a frame that is still open waits for the next chunk
+        open_words = np.flatnonzero(~emitted)
+        if len(open_words):
+            first_open = word_starts[open_words[0]]
+            self.pending_mosi[group_idx] = mosi_bits[first_open:]
+            self.pending_miso[group_idx] = miso_bits[first_open:]
+        else:
+            self.pending_mosi[group_idx] = np.empty(0, dtype=np.uint64)
+            self.pending_miso[group_idx] = np.empty(0, dtype=np.uint64)
+
+        return (
+            sample_positions[emitted] + start_idx,
+            mosi_words[emitted],
+            miso_words[emitted],
+            word_lengths[emitted],
+        )
+
+    def _decode_group(self, samples, start_idx, group_idx, group_config, run_offsets=None):
+        data_format = group_config.get('data_format', 'Hexadecimal')
+        was_receiving = self.receiving[group_idx]
+        sample_idxs, mosi_words, miso_words, _ = self.decode_words(
+            samples, start_idx, group_idx, group_config, run_offsets
+        )
+        events = [
+            (sample_idx, group_idx, {
+                'group_idx': group_idx,
+                'event': 'DATA',
+                'data_mosi': format_word(mosi, data_format),
+                'data_miso': format_word(miso, data_format),
+                'sample_idx': sample_idx,
+            })
+            for sample_idx, mosi, miso in zip(sample_idxs.tolist(), mosi_words.tolist(), miso_words.tolist())
+        ]
+        if group_config.get('frame_events', False):
+            # After the partial word SS ended, the stable sort keeps them in this order
+            ss_active_level = 0 if group_config.get('ss_active', 'Low') == 'Low' else 1
+            active = ((samples >> (group_config['ss_channel'] - 1)) & 1) == ss_active_level
+            receiving = np.concatenate(([was_receiving], active[:-1]))
+            ends = np.flatnonzero(receiving & ~active)
+            if run_offsets is not None:
+                ends = run_offsets[ends]
+            events.extend(
+                (sample_idx, group_idx, {'group_idx': group_idx, 'event': 'END', 'sample_idx': sample_idx})
+                for sample_idx in (ends + start_idx).tolist()
+            )
+        return events
+
+
+class SPIPlugin(DecoderPlugin):
+    name = 'spi'
+    label = 'SPI'
+    mode = 'SPI'
+    display = 'SPI:SPIDisplay'
+    channels = ('ss_channel', 'clock_channel', 'mosi_channel', 'miso_channel')
+    settings = {
+        'ss': ('ss_channel', int), 'clock': ('clock_channel', int), 'mosi': ('mosi_channel', int),
+        'miso': ('miso_channel', int), 'bits': ('bits', int), 'first_bit': ('first_bit', str),
+        'ss_active': ('ss_active', str), 'mode': ('mode', int), 'format': ('data_format', str),
+    }
+    defaults = {
+        'ss_channel': 1, 'clock_channel': 2, 'mosi_channel': 3, 'miso_channel': 4, 'bits': 8,
+        'first_bit': 'MSB', 'ss_active': 'Low', 'mode': 0, 'data_format': 'Hexadecimal',
+    }
+
+    def reset(self):
+        self.decoder = SPIDecoder(len(self.configs))
+
+    def decode_events(self, samples, start_idx):
+        return self.decoder.decode(samples, start_idx, self.configs)
+
+    def decode_run_events(self, indices, values, stop_idx):
+        return self.decoder.decode_runs(indices, values, stop_idx, self.configs)
+
@@ -0,0 +1,100 @@
+# SPIFlashDecoder.py
+
+from Decoders import PAYLOAD_LIMIT, StackedDecoderPlugin
+from SPIDecoder import parse_word
+
+
+# Opcode -> (name, sends an address, dummy bytes, data line), for the common 25-series commands
+FLASH_COMMANDS = {
+    0x01: ('WRITE_STATUS', False, 0, 'mosi'),
+    0x02: ('PAGE_PROGRAM', True, 0, 'mosi'),
+    0x03: ('READ', True, 0, 'miso'),
+    0x04: ('WRITE_DISABLE', False, 0, None),
+    0x05: ('READ_STATUS', False, 0, 'miso'),
+    0x06: ('WRITE_ENABLE', False, 0, None),
+    0x0B: ('FAST_READ', True, 1, 'miso'),
+    0x20: ('SECTOR_ERASE', True, 0, None),
+    0x35: ('READ_STATUS_2', False, 0, 'miso'),
+    0x4B: ('READ_UNIQUE_ID', False, 4, 'miso'),
+    0x52: ('BLOCK_ERASE_32K', True, 0, None),
+    0x60: ('CHIP_ERASE', False, 0, None),
+    0x66: ('RESET_ENABLE', False, 0, None),
+    0x90: ('READ_ID', True, 0, 'miso'),
+    0x99: ('RESET', False, 0, None),
+    0x9F: ('JEDEC_ID', False, 0, 'miso'),
+    0xAB: ('RELEASE_POWER_DOWN', False, 3, 'miso'),
+    0xB9: ('POWER_DOWN', False, 0, None),
+    0xC7: ('CHIP_ERASE', False, 0, None),
+    0xD8: ('BLOCK_ERASE', True, 0, None),
+}
+
+
+class SPIFlashPlugin(StackedDecoderPlugin):
+    """
+    25-series SPI flash commands, stacked on the SPI decoder with 8-bit words.
+
+    Every SS-low transfer is one command: the opcode, the address (address_bytes bytes
+    MSB first) and dummy bytes where FLASH_COMMANDS has them, then the data on MOSI or
+    MISO. Events are named after the command, with the 'command' opcode, the 'address'
+    (None for commands without one) and the 'data' bytes, at the sample of the opcode.
+    Long reads and programs are reported every PAYLOAD_LIMIT bytes with the address of
+    the piece. Unknown opcodes are reported with the MOSI bytes that follow them.
+    """
+
+    name = 'spiflash'
+    label = 'SPI Flash'
+    lower = 'spi'
+    settings = {'address_bytes': ('address_bytes', int)}
+    defaults = {'bits': 8, 'data_format': 'Hexadecimal', 'frame_events': True, 'address_bytes': 3}
+
+    def reset(self):
+        super().reset()
+        self.commands = {}  # Group -> command in progress
+
+    def decode_annotations(self, annotations, end_idx):
+        events = []
+        for annotation in annotations:
+            group_idx = annotation['group_idx']
+            command = self.commands.get(group_idx)
+            if annotation['event'] == 'END':
+                if command is not None and (command['data'] or not command['continued']):
+                    events.append(self.command_event(command))
+                self.commands.pop(group_idx, None)
+                continue
+            config = self.configs[group_idx]
+            data_format = config.get('data_format', 'Hexadecimal')
+            mosi = parse_word(annotation['data_mosi'], data_format)
+            miso = parse_word(annotation['data_miso'], data_format)
+            if command is None:
+                name, has_address, dummy_bytes, line = FLASH_COMMANDS.get(mosi, (f'0x{mosi:02X}', False, 0, 'mosi'))
+                address_bytes = config.get('address_bytes', 3) if has_address else 0
+                self.commands[group_idx] = {
+                    'group_idx': group_idx, 'name': name, 'opcode': mosi, 'has_address': has_address,
+                    'address': 0, 'header': address_bytes + dummy_bytes, 'address_bytes': address_bytes,
+                    'line': line, 'position': 0, 'data': [], 'sample_idx': annotation['sample_idx'],
+                    'continued': False,
+                }
+                continue
+            command['position'] += 1
+            if command['position'] <= command['address_bytes']:
+                command['address'] = (command['address'] << 8) | mosi
+            elif command['position'] > command['header'] and command['line'] is not None:
+                if not command['data'] and command['continued']:
+                    command['sample_idx'] = annotation['sample_idx']
+                command['data'].append(miso if command['line'] == 'miso' else mosi)
+                if len(command['data']) >= PAYLOAD_LIMIT:
+                    events.append(self.command_event(command))
+                    command['address'] += len(command['data'])
+                    command['data'] = []
+                    command['continued'] = True
+        return events
+
+    def command_event(self, command):
+        return {
+            'group_idx': command['group_idx'],
+            'event': command['name'],
+            'command': command['opcode'],
+            'address': command['address'] if command['has_address'] else None,
+            'data': command['data'],
+            'sample_idx': command['sample_idx'],
+        }
@@ -0,0 +1,166 @@
+# SampleBuffer.py
+
+import numpy as np
+from Transitions import TransitionStore
+
+
+class SampleRingBuffer:
+    """
+    Fixed-size ring buffer of packed 8-channel samples (one uint8 per sample).
+
+    Bit i of each sample is channel i, so one buffer replaces the 8 per-channel deques.
+    `tail` is the index of the oldest sample and `head` is where the next sample goes.
+    Reads return views into the storage; bit planes are only unpacked when asked for.
+
+    Sample number n since the last clear always lives at buffer[n % capacity], and
+    `generation` changes whenever that numbering restarts, so derived data such as the
+    level-of-detail pyramid can be kept up to date incrementally.
+
+    Created with transitions set, the buffer also keeps its samples as a TransitionStore,
+    (sample index, value) runs numbered the same way, so the plot builder and the decoders
+    can read edges instead of scanning samples. The runs are brought up to date when
+    transitions() is called, a frame's worth of chunks in one pass, so append() costs the
+    same as without them.
+    """
+
+    def __init__(self, capacity, transitions=False):
+        self.capacity = int(capacity)
+        self.buffer = np.zeros(self.capacity, dtype=np.uint8)
+        self.head = 0
+        self.tail = 0
+        self.count = 0
+        self.total_samples = 0  # Samples appended since the last clear, including overwritten ones
+        self.generation = 0
+        self.run_store = TransitionStore() if transitions else None
+
+    @classmethod
+    def wrap(cls, samples, transitions=None):
+        """
+        A full buffer over existing uint8 storage, without copying it. Used to show a
+        memory-mapped capture file: reads stay views, so only the pages drawn are loaded.
+        transitions is a TransitionStore of the same samples, if one was built.
+        """
+        ring_buffer = cls.__new__(cls)
+        ring_buffer.capacity = len(samples)
+        ring_buffer.buffer = samples
+        ring_buffer.head = 0
+        ring_buffer.tail = 0
+        ring_buffer.count = len(samples)
+        ring_buffer.total_samples = len(samples)
+        ring_buffer.generation = 0
+        ring_buffer.run_store = transitions
+        return ring_buffer
+
+    def __len__(self):
+        return self.count
+
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def clear(self):
+        self.head = 0
+        self.tail = 0
+        self.count = 0
+        self.total_samples = 0
+        self.generation += 1
+        if self.run_store is not None:
+            self.run_store.clear()
+
+    def resize(self, capacity):
+        # Keeps the newest samples that still fit
+        samples = self.contiguous()[-int(capacity):].copy()
+        total_samples = self.total_samples
+        generation = self.generation
+        run_store = self.run_store
+        self.__init__(capacity)
+        self.run_store = run_store  # Same numbering, transitions() trims it
+        self.generation = generation + 1
+        self.total_samples = total_samples - len(samples)
+        self.head = self.tail = self.total_samples % self.capacity
+        self.append(samples)
+
+    @property
+    def first_sample(self):
+        # Number of the oldest stored sample, counted since the last clear
+        return self.total_samples - self.count
+
+    def append(self, samples):
+        samples = np.asarray(samples)
+        if samples.dtype != np.uint8:
+            samples = samples.astype(np.uint8)
+        num_new = len(samples)
+        if num_new == 0:
+            return
+        self.total_samples += num_new
+        if num_new >= self.capacity:
+            # Only the newest capacity samples survive, rotated so the numbering still holds
+            self.head = self.total_samples % self.capacity
+            self.buffer[:] = np.roll(samples[-self.capacity:], self.head)
+            self.tail = self.head
+            self.count = self.capacity
+            return
+
+        first = min(num_new, self.capacity - self.head)
+        self.buffer[self.head:self.head + first] = samples[:first]
+        if first < num_new:
+            self.buffer[:num_new - first] = samples[first:]
+        self.head = (self.head + num_new) % self.capacity
+        self.count = min(self.count + num_new, self.capacity)
+        self.tail = (self.head - self.count) % self.capacity
+
+    def transitions(self):
+        """
+        Returns the TransitionStore of the stored samples, or None if the buffer keeps none.
+        """
+        store = self.run_store
+        if store is None:
+            return None
+        if store.total_samples < self.first_sample:
+            store.clear(self.first_sample)  # Overwritten before they were folded in
+        if store.total_samples < self.total_samples:
+            store.append(self.read(store.total_samples, self.total_samples))
+        store.trim(self.first_sample)
+        return store
+
+    def segments(self):
+        """
+        Returns the stored samples, oldest first, as two zero-copy views.
+
+        The second view is empty unless the data wraps around the end of the storage.
+        """
+        if self.count == 0:
+            return self.buffer[:0], self.buffer[:0]
+        if self.tail < self.head:
+            return self.buffer[self.tail:self.head], self.buffer[:0]
+        return self.buffer[self.tail:], self.buffer[:self.head]
+
+    def read(self, start, stop):
+        """
+        Returns samples start..stop-1, numbered since the last clear. The range must be stored.
+        """
+        first = start % self.capacity
+        if first + (stop - start) <= self.capacity:
+            return self.buffer[first:first + stop - start]
+        return np.concatenate((self.buffer[first:], self.buffer[:stop - start - (self.capacity - first)]))
+
+    def contiguous(self):
+        """
+        Returns the stored samples oldest first. Zero-copy unless the data wraps.
+        """
+        first, second = self.segments()
+        if len(second) == 0:
+            return first
+        return np.concatenate((first, second))
+
+    def bit_planes(self):
+        """
+        Unpacks every stored sample into an (N, 8) array of 0/1 values, column i is channel i.
+        """
+        samples = self.contiguous()
+        return np.unpackbits(samples[:, np.newaxis], axis=1, bitorder='little')
+
+    def channel(self, channel):
+        """
+        Returns the 0/1 values of a single channel, oldest first.
+        """
+        return (self.contiguous() >> channel) & 1
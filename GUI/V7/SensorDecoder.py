@@ -0,0 +1,101 @@
+# SensorDecoder.py
+
+from Decoders import StackedDecoderPlugin
+from I2CDecoder import I2CTransfers
+
+# Sensor -> (bytes per register, register -> name). Byte registers auto-increment on
+# multi-byte accesses, 16-bit registers are read and written whole, MSB first.
+SENSORS = {
+    'bme280': (1, {
+        **{0x88 + i: f'calib{i:02d}' for i in range(26)},
+        **{0xE1 + i: f'calib{26 + i:02d}' for i in range(16)},
+        0xD0: 'id', 0xE0: 'reset', 0xF2: 'ctrl_hum', 0xF3: 'status', 0xF4: 'ctrl_meas', 0xF5: 'config',
+        0xF7: 'press_msb', 0xF8: 'press_lsb', 0xF9: 'press_xlsb', 0xFA: 'temp_msb', 0xFB: 'temp_lsb',
+        0xFC: 'temp_xlsb', 0xFD: 'hum_msb', 0xFE: 'hum_lsb',
+    }),
+    'mpu6050': (1, {
+        0x19: 'smplrt_div', 0x1A: 'config', 0x1B: 'gyro_config', 0x1C: 'accel_config', 0x38: 'int_enable',
+        0x3A: 'int_status', 0x3B: 'accel_xout_h', 0x3C: 'accel_xout_l', 0x3D: 'accel_yout_h', 0x3E: 'accel_yout_l',
+        0x3F: 'accel_zout_h', 0x40: 'accel_zout_l', 0x41: 'temp_out_h', 0x42: 'temp_out_l', 0x43: 'gyro_xout_h',
+        0x44: 'gyro_xout_l', 0x45: 'gyro_yout_h', 0x46: 'gyro_yout_l', 0x47: 'gyro_zout_h', 0x48: 'gyro_zout_l',
+        0x6B: 'pwr_mgmt_1', 0x6C: 'pwr_mgmt_2', 0x75: 'who_am_i',
+    }),
+    'tmp102': (2, {0x00: 'temperature', 0x01: 'configuration', 0x02: 't_low', 0x03: 't_high'}),
+    'ina219': (2, {
+        0x00: 'configuration', 0x01: 'shunt_voltage', 0x02: 'bus_voltage', 0x03: 'power', 0x04: 'current',
+        0x05: 'calibration',
+    }),
+}
+# I2C address -> sensor, for the address pin settings of each part
+SENSOR_ADDRESSES = {
+    0x76: 'bme280', 0x77: 'bme280', 0x68: 'mpu6050', 0x69: 'mpu6050',
+    0x48: 'tmp102', 0x49: 'tmp102', 0x4A: 'tmp102', 0x4B: 'tmp102',
+    0x40: 'ina219', 0x41: 'ina219', 0x44: 'ina219', 0x45: 'ina219',
+}
+
+
+class SensorPlugin(StackedDecoderPlugin):
+    """
+    Register accesses of common I2C sensors, stacked on the I2C decoder.
+
+    A write transfer starts with the register number and the values follow; a write of
+    the register alone selects it for the read after the repeated START. The sensor is
+    found from the device address in SENSOR_ADDRESSES, or set for every address with the
+    'sensor' setting; other devices are skipped.
+
+    Events are READ and WRITE with the 'device' address, the 'sensor', the first
+    'register' and its 'name', the 'data' bytes and 'values', (register name, value)
+    pairs, at the sample of the START.
+    """
+
+    name = 'sensor'
+    label = 'I2C Sensor Registers'
+    lower = 'i2c'
+    settings = {'sensor': ('sensor', str)}
+    defaults = {'address_width': 7, 'repeated_start': 1, 'stop_message': False, 'sensor': ''}
+
+    def reset(self):
+        super().reset()
+        self.transfers = I2CTransfers()
+        self.pointers = {}  # (group, device) -> selected register
+
+    def decode_annotations(self, annotations, end_idx):
+        events = []
+        for transfer in self.transfers.feed(annotations):
+            config = self.configs[transfer['group_idx']]
+            device = transfer['address']
+            sensor = config.get('sensor') or SENSOR_ADDRESSES.get(device)
+            if sensor not in SENSORS or transfer['nack']:
+                continue
+            register_bytes, names = SENSORS[sensor]
+            key = (transfer['group_idx'], device)
+            register = self.pointers.get(key, 0)
+            write = transfer['write']
+            if write and not transfer['continued']:
+                register, write = write[0], write[1:]
+            for event, data in (('WRITE', write), ('READ', transfer['read'])):
+                if not data:
+                    continue
+                if register_bytes == 1:
+                    values = [(names.get((register + i) & 0xFF, f'0x{(register + i) & 0xFF:02X}'), value)
+                              for i, value in enumerate(data)]
+                    next_register = (register + len(data)) & 0xFF
+                else:
+                    name = names.get(register, f'0x{register:02X}')
+                    values = [(name, int.from_bytes(bytes(data[i:i + register_bytes]), 'big'))
+                              for i in range(0, len(data) - register_bytes + 1, register_bytes)]
+                    next_register = register
+                events.append({
+                    'group_idx': transfer['group_idx'],
+                    'event': event,
+                    'device': device,
+                    'sensor': sensor,
+                    'register': register,
+                    'name': names.get(register, f'0x{register:02X}'),
+                    'data': data,
+                    'values': values,
+                    'sample_idx': transfer['sample_idx'],
+                })
+                register = next_register
+            self.pointers[key] = register
+        return events
@@ -18,67 +18,46 @@ from PyQt6.QtWidgets import (
     QLineEdit,
 )
 from PyQt6.QtGui import QIcon, QIntValidator
-from PyQt6.QtCore import QTimer, QThread, pyqtSignal, Qt
-from collections import deque
+from PyQt6.QtCore import Qt, pyqtSignal
 from InterfaceCommands import (
     get_trigger_edge_command,
     get_trigger_pins_command,
 )
 from aesthetic import get_icon
-
-class SerialWorker(QThread):
-    data_ready = pyqtSignal(list)
-
-    def __init__(self, port, baudrate, bufferSize, channels=8):
-        super().__init__()
-        self.is_running = True
+from SampleBuffer import SampleRingBuffer
+from Acquisition import AcquisitionService, AcquisitionSubscriber
+from LevelOfDetail import MinMaxPyramid, visible_window
+from CaptureActions import CaptureActions
+from Instrumentation import instrumentation
+from RenderScheduler import RenderScheduler
+from Trigger import CONDITION_HELP, TriggerEngine, parse_trigger_condition
+
+class SerialWorker(AcquisitionSubscriber):
+    trigger_found = pyqtSignal(int)  # Sample index of a trigger, numbered like data_ready's start_idx
+
+    def __init__(self, acquisition, bufferSize, channels=8):
+        super().__init__(acquisition)
         self.channels = channels
-        self.trigger_modes = ['No Trigger'] * self.channels
         self.bufferSize = bufferSize
-        try:
-            self.serial = serial.Serial(port, baudrate)
-        except serial.SerialException as e:
-            print(f"Failed to open serial port: {str(e)}")
-            self.is_running = False
+        self.trigger = TriggerEngine(channels)
+        self.sample_idx = 0  # Samples passed to the display so far
+
+    @property
+    def trigger_modes(self):
+        return self.trigger.trigger_modes
 
     def set_trigger_mode(self, channel_idx, mode):
-        self.trigger_modes[channel_idx] = mode
-
-    def run(self):
-        data_buffer = deque(maxlen=self.bufferSize - 24)
-        triggered = [False] * self.channels
-
-        while self.is_running:
-            if self.serial.in_waiting:
-                raw_data = self.serial.read(self.serial.in_waiting).splitlines()
-                for line in raw_data:
-                    try:
-                        data_value = int(line.strip())
-                        data_buffer.append(data_value)
-
-                        for i in range(self.channels):
-                            if not triggered[i] and self.trigger_modes[i] != 'No Trigger':
-                                last_value = data_buffer[-2] if len(data_buffer) >= 2 else None
-                                if last_value is not None:
-                                    current_bit = (data_value >> i) & 1
-                                    last_bit = (last_value >> i) & 1
-
-                                    if self.trigger_modes[i] == 'Rising Edge' and last_bit == 0 and current_bit == 1:
-                                        triggered[i] = True
-                                        print(f"Trigger condition met on channel {i+1}: Rising Edge")
-                                    elif self.trigger_modes[i] == 'Falling Edge' and last_bit == 1 and current_bit == 0:
-                                        triggered[i] = True
-                                        print(f"Trigger condition met on channel {i+1}: Falling Edge")
-                        if any(triggered) or all(mode == 'No Trigger' for mode in self.trigger_modes):
-                            self.data_ready.emit([data_value])
-
-                    except ValueError:
-                        continue
-
-    def stop_worker(self):
-        self.is_running = False
-        if self.serial.is_open:
-            self.serial.close()
+        self.trigger.set_trigger_mode(channel_idx, mode)
+
+    def process_samples(self, samples, start_idx):
+        # Rise/fall masks checked over the whole chunk at once, see Trigger.py
+        passed, trigger_offsets = self.trigger.process(samples)
+        if len(passed):
+            instrumentation.chunk_emitted()
+            self.data_ready.emit(passed, self.sample_idx)
+            for offset in trigger_offsets:
+                self.trigger_found.emit(self.sample_idx + offset)
+            self.sample_idx += len(passed)
 
 
 class FixedYViewBox(pg.ViewBox):
@@ -135,8 +114,10 @@ class EditableButton(QPushButton):
             self.setText(self.default_label)
 
 
-class SignalDisplay(QWidget):
-    def __init__(self, port, baudrate, bufferSize, channels=8):
+class SignalDisplay(CaptureActions, QWidget):
+    capture_mode = 'Signal'
+
+    def __init__(self, port, baudrate, bufferSize, channels=8, acquisition=None):
         super().__init__()
         self.period = 65454
         self.num_samples = 0
@@ -145,23 +126,38 @@ class SignalDisplay(QWidget):
         self.channels = channels
         self.bufferSize = bufferSize
 
-        self.data_buffer = [deque(maxlen=self.bufferSize) for _ in range(self.channels)]
+        self.data_buffer = SampleRingBuffer(self.bufferSize, transitions=True)
+        self.lod = MinMaxPyramid(self.data_buffer)  # Min/max summaries for zoomed out views
         self.channel_visibility = [False] * self.channels
 
         self.is_single_capture = False
+        self.capture = None  # CaptureFile shown instead of live data
+        self.trigger_line = None
+        self.trigger_sample = None  # Buffer sample number of the last trigger
+        self.stream_origin = 0  # Worker sample index of buffer sample 0
+        self.pre_trigger_percent = 0  # Share of a single capture taken before the trigger
+        self.post_trigger = None  # Samples a single capture takes from the trigger on
+        self.recorder = None  # CaptureRecorder streaming every acquired sample to disk
         self.current_trigger_modes = ['No Trigger'] * self.channels
         self.trigger_mode_indices = [0] * self.channels
         self.sample_rate = 1000  # Default sample rate in Hz
 
         self.setup_ui()
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_plot)
+        self.render_scheduler = RenderScheduler(self, self.update_plot)  # Redraws when new samples arrive
+        # Redraw on zoom and pan, the level of detail depends on the visible range
+        self.plot.sigXRangeChanged.connect(lambda *args: self.update_plot())
 
         self.is_reading = False
 
-        self.worker = SerialWorker(self.port, self.baudrate, self.bufferSize, channels=self.channels)
+        # Share the caller's acquisition service, or run a private one when used standalone
+        self.owns_acquisition = acquisition is None
+        self.acquisition = acquisition if acquisition else AcquisitionService(self.port, self.baudrate)
+        self.worker = SerialWorker(self.acquisition, self.bufferSize, channels=self.channels)
         self.worker.data_ready.connect(self.handle_data)
+        self.worker.trigger_found.connect(self.handle_trigger)
         self.worker.start()
+        if self.owns_acquisition:
+            self.acquisition.start()
 
     def setup_ui(self):
         main_layout = QHBoxLayout(self)
@@ -230,6 +226,26 @@ class SignalDisplay(QWidget):
         button_layout.addWidget(self.num_samples_input, self.channels + 1, 1)
         self.num_samples_input.returnPressed.connect(self.send_num_samples_command)
 
+        # Pre-trigger input
+        self.pre_trigger_label = QLabel("Pre-trigger (%):")
+        button_layout.addWidget(self.pre_trigger_label, self.channels + 2, 0)
+
+        self.pre_trigger_input = QLineEdit()
+        self.pre_trigger_input.setValidator(QIntValidator(0, 99))
+        self.pre_trigger_input.setText(str(self.pre_trigger_percent))
+        button_layout.addWidget(self.pre_trigger_input, self.channels + 2, 1)
+        self.pre_trigger_input.returnPressed.connect(self.handle_pre_trigger_input)
+
+        # Trigger condition input, replaces the per-channel edges when set
+        self.trigger_condition_label = QLabel("Trigger Condition:")
+        button_layout.addWidget(self.trigger_condition_label, self.channels + 3, 0)
+
+        self.trigger_condition_input = QLineEdit()
+        self.trigger_condition_input.setPlaceholderText("e.g. rising:1&pattern:X1X0 -> i2c:address=0x50")
+        self.trigger_condition_input.setToolTip(CONDITION_HELP)
+        button_layout.addWidget(self.trigger_condition_input, self.channels + 3, 1)
+        self.trigger_condition_input.returnPressed.connect(self.handle_trigger_condition_input)
+
         # Control buttons layout
         control_buttons_layout = QHBoxLayout()
         self.toggle_button = QPushButton("Start")
@@ -239,7 +255,23 @@ class SignalDisplay(QWidget):
         self.single_button = QPushButton("Single")
         self.single_button.clicked.connect(self.start_single_capture)
         control_buttons_layout.addWidget(self.single_button)
-        button_layout.addLayout(control_buttons_layout, self.channels + 2, 0, 1, 2)
+
+        self.open_button = QPushButton("Open")
+        self.open_button.clicked.connect(self.open_capture_file)
+        control_buttons_layout.addWidget(self.open_button)
+
+        self.save_button = QPushButton("Save")
+        self.save_button.clicked.connect(self.save_capture_file)
+        control_buttons_layout.addWidget(self.save_button)
+
+        self.record_button = QPushButton("Record")
+        self.record_button.setCheckable(True)
+        self.record_button.clicked.connect(self.toggle_recording)
+        control_buttons_layout.addWidget(self.record_button)
+
+        self.record_label = QLabel("")  # Recorded and dropped samples
+        control_buttons_layout.addWidget(self.record_label)
+        button_layout.addLayout(control_buttons_layout, self.channels + 4, 0, 1, 2)
 
         # Cursor for measurement
         self.cursor = pg.InfiniteLine(pos=0, angle=90, movable=True, pen=pg.mkPen(color='y', width=2))
@@ -272,6 +304,44 @@ class SignalDisplay(QWidget):
         except ValueError as e:
             print(f"Invalid number of samples: {e}")
 
+    def handle_pre_trigger_input(self):
+        try:
+            self.pre_trigger_percent = int(self.pre_trigger_input.text())
+            print(f"Pre-trigger set to {self.pre_trigger_percent}% of a single capture")
+            self.send_trigger_pins_command()
+        except ValueError as e:
+            print(f"Invalid pre-trigger input: {e}")
+
+    def handle_trigger_condition_input(self):
+        text = self.trigger_condition_input.text().strip()
+        try:
+            self.apply_trigger_condition(text)
+        except ValueError as e:
+            print(f"Invalid trigger condition: {e}")
+            return
+        print(f"Trigger condition set to {text}" if text else "Trigger condition cleared")
+        self.send_trigger_pins_command()
+
+    def apply_trigger_condition(self, text):
+        # Built again on every arm, UART timing depends on the sample rate
+        self.worker.trigger.set_condition(parse_trigger_condition(text, self.sample_rate) if text else None)
+
+    def is_host_trigger(self):
+        # The samples before the edge and complex conditions need the device to stream untriggered
+        return bool(self.pre_trigger_percent or self.worker.trigger.custom_condition is not None)
+
+    def arm_trigger(self, single_capture):
+        # A single capture splits the buffer around the trigger, a run passes everything after it
+        try:
+            self.apply_trigger_condition(self.trigger_condition_input.text().strip())
+        except ValueError as e:
+            print(f"Invalid trigger condition: {e}")
+        pre_trigger = self.data_buffer.capacity * self.pre_trigger_percent // 100
+        self.post_trigger = self.data_buffer.capacity - pre_trigger if single_capture else None
+        self.worker.trigger.configure(pre_trigger, self.post_trigger)
+        self.worker.trigger.rearm()
+        self.trigger_sample = None
+
     def send_trigger_edge_command(self):
         command_int = get_trigger_edge_command(self.current_trigger_modes)
         command_str = str(command_int)
@@ -286,7 +356,7 @@ class SignalDisplay(QWidget):
             print(f"Failed to send trigger edge command: {str(e)}")
 
     def send_trigger_pins_command(self):
-        command_int = get_trigger_pins_command(self.current_trigger_modes)
+        command_int = 0 if self.is_host_trigger() else get_trigger_pins_command(self.current_trigger_modes)
         command_str = str(command_int)
         try:
             self.worker.serial.write(b'3')
@@ -395,6 +465,7 @@ class SignalDisplay(QWidget):
             self.toggle_button.setStyleSheet("")
         else:
             self.is_single_capture = False
+            self.arm_trigger(False)
             self.send_start_message()
             self.start_reading()
             self.toggle_button.setText("Running")
@@ -431,18 +502,21 @@ class SignalDisplay(QWidget):
 
     def start_reading(self):
         if not self.is_reading:
+            if self.capture is not None:
+                self.close_capture()
             self.is_reading = True
-            self.timer.start(1)
+            self.render_scheduler.start()
 
     def stop_reading(self):
         if self.is_reading:
             self.is_reading = False
-            self.timer.stop()
+            self.render_scheduler.stop()
 
     def start_single_capture(self):
         if not self.is_reading:
             self.clear_data_buffers()
             self.is_single_capture = True
+            self.arm_trigger(True)
             self.send_start_message()
             self.start_reading()
             self.single_button.setEnabled(False)
@@ -459,35 +533,76 @@ class SignalDisplay(QWidget):
         self.single_button.setStyleSheet("")
 
     def clear_data_buffers(self):
-        self.data_buffer = [deque(maxlen=self.bufferSize) for _ in range(self.channels)]
-
-    def handle_data(self, data_list):
+        self.data_buffer.clear()
+        self.trigger_sample = None
+
+    def capture_trigger_position(self):
+        if self.capture is not None:
+            return self.capture.trigger_position
+        # Until the buffer wraps past it
+        if self.trigger_sample is not None and self.trigger_sample >= self.data_buffer.first_sample:
+            return self.trigger_sample - self.data_buffer.first_sample
+        return None
+
+    def apply_capture_configs(self, decoder_configs):
+        # Plain logic capture, nothing to decode: show the channels if none is on
+        if not any(self.channel_visibility):
+            for button in self.channel_buttons:
+                button.setChecked(True)
+
+    def prepare_import(self):
+        # Imported samples go through the trigger like a single capture
+        self.arm_trigger(True)
+
+    @instrumentation.timed('handle')
+    def handle_data(self, samples, start_idx):
+        instrumentation.chunk_handled()
         if self.is_reading:
-            for data_value in data_list:
-                for i in range(self.channels):
-                    bit_value = (data_value >> i) & 1
-                    self.data_buffer[i].append(bit_value)
-            if self.is_single_capture and all(len(buf) >= self.bufferSize for buf in self.data_buffer):
+            self.render_scheduler.mark_dirty()
+            self.stream_origin = start_idx - self.data_buffer.total_samples
+            if self.is_single_capture:
+                # A single capture keeps the first buffer's worth of samples
+                samples = samples[:self.data_buffer.capacity - len(self.data_buffer)]
+            self.data_buffer.append(samples)
+            if self.is_single_capture and (self.data_buffer.is_full() or self.is_capture_complete()):
+                self.stop_single_capture()
+
+    def handle_trigger(self, sample_idx):
+        # Emitted after the chunk holding the trigger, so stream_origin is up to date
+        trigger_sample = sample_idx - self.stream_origin
+        if self.is_reading and trigger_sample < self.data_buffer.total_samples:
+            self.trigger_sample = trigger_sample
+            print(f"Trigger condition met at {trigger_sample / self.sample_rate:.6f} s")
+            if self.is_single_capture and self.is_capture_complete():
                 self.stop_single_capture()
 
+    def is_capture_complete(self):
+        # The trigger engine passes nothing after the post-trigger samples, even when the buffer is not full
+        return (self.trigger_sample is not None and self.post_trigger is not None
+                and self.data_buffer.total_samples >= self.trigger_sample + self.post_trigger)
+
+    @instrumentation.timed('frame')
     def update_plot(self):
+        self.update_record_label()
+        if self.capture is None:
+            # The live trigger moves left as the ring buffer wraps
+            trigger_position = self.capture_trigger_position()
+            if trigger_position is not None and self.trigger_line is not None:
+                self.trigger_line.setValue(trigger_position / self.sample_rate)
+            elif (trigger_position is None) != (self.trigger_line is None):
+                self.show_trigger_marker(trigger_position)
+        num_samples = len(self.data_buffer)
+        if num_samples < 2 or not any(self.channel_visibility):
+            return
+        # Only the visible X range, at the resolution the plot width can show
+        x_range, pixel_width = visible_window(self.plot)
         for i in range(self.channels):
             if self.channel_visibility[i]:
                 inverted_index = self.channels - i - 1
-                num_samples = len(self.data_buffer[i])
-                if num_samples > 1:
-                    t = np.arange(num_samples) / self.sample_rate
-                    square_wave_time = []
-                    square_wave_data = []
-                    for j in range(1, num_samples):
-                        square_wave_time.extend([t[j-1], t[j]])
-                        level = self.data_buffer[i][j-1] + inverted_index * 2
-                        square_wave_data.extend([level, level])
-                        if self.data_buffer[i][j] != self.data_buffer[i][j-1]:
-                            square_wave_time.append(t[j])
-                            level = self.data_buffer[i][j] + inverted_index * 2
-                            square_wave_data.append(level)
-                    self.curves[i].setData(square_wave_time, square_wave_data)
+                square_wave_time, square_wave_data = self.lod.square_wave(
+                    i, self.sample_rate, inverted_index * 2, x_range, pixel_width
+                )
+                self.curves[i].setData(square_wave_time, square_wave_data)
 
     def update_cursor_position(self):
         cursor_pos = self.cursor.pos().x()
@@ -495,7 +610,8 @@ class SignalDisplay(QWidget):
         self.cursor_label.setPos(cursor_pos, self.channels * 2 - 1)
 
     def closeEvent(self, event):
+        self.stop_recording()
         self.worker.stop_worker()
-        self.worker.quit()
-        self.worker.wait()
+        if self.owns_acquisition:
+            self.acquisition.stop_worker()
         event.accept()
@@ -0,0 +1,290 @@
+# SimulatedDevice.py
+
+import threading
+import time
+import numpy as np
+import serial
+from Transport import encode_frame
+from Trigger import find_edge
+from InterfaceCommands import TIMER_CLOCK
+from Waveforms import make_i2c_capture, make_spi_capture, make_uart_capture
+
+SIMULATED_PORT_PREFIX = 'sim:'
+WAVEFORMS = ('square', 'i2c', 'spi', 'uart')
+SIMULATED_PORTS = [SIMULATED_PORT_PREFIX + waveform for waveform in WAVEFORMS]
+DEFAULT_PERIOD = 65536  # Sample timer period the firmware boots with
+FRAME_SAMPLES = 1024  # One binary frame per firmware sample buffer
+TX_BUFFER = 1 << 16  # Bytes the device holds for the host before it drops samples
+POLL_INTERVAL = 0.001  # Seconds a blocking read sleeps between checks
+SQUARE_HALF_PERIOD = 4  # Samples channel 1 of the square wave stays at one level
+UART_SAMPLES_PER_BIT = 16  # What the UART display sets the sample rate to
+
+
+def is_simulated_port(port):
+    return isinstance(port, str) and port.startswith(SIMULATED_PORT_PREFIX)
+
+
+def open_serial_port(port, baudrate, timeout):
+    """
+    Opens a real serial port, or a SimulatedSerial for the sim:<waveform> names.
+    """
+    if is_simulated_port(port):
+        return SimulatedSerial(port, baudrate, timeout=timeout)
+    return serial.Serial(port, baudrate, timeout=timeout)
+
+
+def make_pattern(waveform, seed=0):
+    """
+    One period of a simulated waveform, packed uint8 samples that the device repeats.
+
+    The channels match the default settings of the displays: I2C SDA/SCL on channels 1/2,
+    SPI SS/CLK/MOSI/MISO on channels 1-4 and UART on channel 1 at 16 samples per bit.
+    """
+    if waveform == 'square':
+        # GUI/TEST/SquareSignalGen.py: each channel at half the frequency of the one before
+        return np.repeat(np.arange(256, dtype=np.uint8), SQUARE_HALF_PERIOD)
+    if waveform == 'i2c':
+        return make_i2c_capture(64, seed=seed)
+    if waveform == 'spi':
+        return make_spi_capture(64, seed=seed)[0]
+    if waveform == 'uart':
+        return make_uart_capture(256, samples_per_bit=UART_SAMPLES_PER_BIT, seed=seed)[0]
+    raise ValueError(f"unknown waveform {waveform!r}, expected one of {', '.join(WAVEFORMS)}")
+
+
+class SimulatedSerial:
+    """
+    An in-process stand-in for serial.Serial that behaves like the logic analyzer.
+
+    Writes are parsed as the 3-part commands the displays send (command, then two values,
+    one write each): 0 start, 1 stop, 2/3 trigger edge and pin masks, 5/6 the halves of
+    the sample timer period, 4/7 the trigger timer period and prescaler, 8 the transport.
+
+    Once started, the device samples its waveform at TIMER_CLOCK / period in real time,
+    measured from the clock when read() or in_waiting is called, and queues the samples
+    as ASCII lines or binary frames. When the host falls behind and TX_BUFFER bytes are
+    queued, further samples are dropped and counted in dropped_samples; in binary mode
+    their frame numbers are skipped, so SampleDecoder.dropped_frames sees the gap too.
+
+    With trigger pins set, samples are only sent from the sample before a matching edge,
+    for the number of samples the trigger timer counts (all of them when it is not set),
+    after which the trigger re-arms.
+    """
+
+    def __init__(self, port=SIMULATED_PORTS[0], baudrate=115200, timeout=None, waveform=None,
+                 link_bytes_per_second=None, tx_buffer=TX_BUFFER, seed=0):
+        if waveform is None:
+            waveform = port[len(SIMULATED_PORT_PREFIX):] if is_simulated_port(port) else 'square'
+        if waveform not in WAVEFORMS:
+            raise serial.SerialException(f"could not open port {port}: no simulated waveform {waveform!r}")
+        self.port = port
+        self.baudrate = baudrate  # Ignored like on the USB CDC device
+        self.timeout = timeout
+        self.waveform = waveform
+        self.pattern = make_pattern(waveform, seed)
+        self.link_bytes_per_second = link_bytes_per_second  # None for a link faster than the host
+        self.tx_buffer = tx_buffer
+        self.is_open = True
+        self.lock = threading.Lock()  # Commands come from the GUI thread, reads from the acquisition thread
+        self.pending = bytearray()
+        self.command_parts = []
+
+        # Device settings
+        self.running = False
+        self.binary = False
+        self.period_high = DEFAULT_PERIOD & 0xFFFF0000  # Set by command 5
+        self.period_low = DEFAULT_PERIOD & 0xFFFF  # Set by command 6
+        self.period16 = 0
+        self.prescaler = 1
+        self.edge_mask = 0
+        self.pin_mask = 0
+
+        # Sampling state
+        self.start_time = 0.0
+        self.start_sample = 0  # generated_samples when the sample clock last started
+        self.link_time = 0.0
+        self.link_credit = 0.0
+        self.sequence = 0
+        self.last_value = None  # Last sample checked for a trigger
+        self.capture_left = 0  # Samples still to send after a trigger, -1 for no limit
+
+        # Counters for benchmarks
+        self.generated_samples = 0
+        self.sent_samples = 0
+        self.dropped_samples = 0
+        self.bytes_read = 0
+
+    @property
+    def period(self):
+        # Sample timer period in TIMER_CLOCK ticks
+        return max(self.period_high | self.period_low, 1)
+
+    @property
+    def sample_rate(self):
+        return TIMER_CLOCK / self.period
+
+    @property
+    def trigger_samples(self):
+        # Inverse of InterfaceCommands.get_trigger_timer
+        return int(round(self.period16 * self.prescaler / self.period))
+
+    @property
+    def in_waiting(self):
+        self.check_open()
+        with self.lock:
+            self.advance(time.perf_counter())
+            return self.readable()
+
+    def read(self, size=1):
+        self.check_open()
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        while True:
+            with self.lock:
+                now = time.perf_counter()
+                self.advance(now)
+                available = self.readable()
+                if available >= size or (deadline is not None and now >= deadline):
+                    data = bytes(self.pending[:min(size, available)])
+                    del self.pending[:len(data)]
+                    self.link_credit -= len(data)
+                    self.bytes_read += len(data)
+                    return data
+            time.sleep(POLL_INTERVAL)
+
+    def write(self, data):
+        self.check_open()
+        # Every write is one part of a command, as the firmware reads one USB packet per part
+        try:
+            value = int(bytes(data).decode('ascii'))
+        except ValueError:
+            value = 0  # atoi() on the device
+        with self.lock:
+            self.command_parts.append(value)
+            if len(self.command_parts) == 3:
+                self.execute(*self.command_parts)
+                self.command_parts = []
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        with self.lock:
+            self.pending.clear()
+
+    def close(self):
+        self.is_open = False
+
+    def check_open(self):
+        if not self.is_open:
+            raise serial.PortNotOpenError()
+
+    def execute(self, command, first, second):
+        now = time.perf_counter()
+        self.advance(now)  # Samples due so far were taken with the old settings
+        if command == 0:
+            self.running = True
+        elif command == 1:
+            self.running = False
+        elif command == 2:
+            self.edge_mask = second & 0xFF
+        elif command == 3:
+            self.pin_mask = second & 0xFF
+            self.capture_left = 0  # Re-armed
+        elif command == 4:
+            self.period16 = (first << 8) | second
+        elif command == 5:
+            self.period_high = (first << 24) | (second << 16)
+        elif command == 6:
+            self.period_low = (first << 8) | second
+        elif command == 7:
+            self.prescaler = max((first << 8) | second, 1)
+        elif command == 8:
+            self.binary = second == 1
+        else:
+            print(f"Simulated device: unknown command {command}")
+        self.restart_clock(now)
+
+    def restart_clock(self, now):
+        self.start_time = now
+        self.start_sample = self.generated_samples
+        self.link_time = now
+
+    def readable(self):
+        if self.link_bytes_per_second is None:
+            return len(self.pending)
+        return min(len(self.pending), max(int(self.link_credit), 0))
+
+    def advance(self, now):
+        """
+        Samples everything due by now and queues it for the host.
+        """
+        if self.link_bytes_per_second is not None:
+            self.link_credit = min(self.link_credit + (now - self.link_time) * self.link_bytes_per_second,
+                                   self.tx_buffer)
+            self.link_time = now
+        if not self.running:
+            return
+        due = self.start_sample + int((now - self.start_time) * self.sample_rate)
+        num_samples = due - self.generated_samples
+        if num_samples <= 0:
+            return
+        # Only what fits in the TX buffer is sampled, the rest is lost like on the device
+        bytes_per_sample = 1 if self.binary else 5
+        room = max(self.tx_buffer - len(self.pending), 0) // bytes_per_sample
+        kept = min(num_samples, room)
+        if kept:
+            positions = np.arange(self.generated_samples, self.generated_samples + kept) % len(self.pattern)
+            self.send(self.gate(self.pattern[positions]))
+        if kept < num_samples:
+            self.dropped_samples += num_samples - kept
+            lost_frames = -(-(num_samples - kept) // FRAME_SAMPLES)
+            self.sequence = (self.sequence + lost_frames) & 0xFFFF
+            self.last_value = None  # The edge before the gap was never seen
+        self.generated_samples = due
+
+    def gate(self, samples):
+        # Passes the samples the trigger lets through, all of them when no pin is armed
+        if not self.pin_mask:
+            return samples
+        passed = []
+        while len(samples):
+            if self.capture_left == 0:
+                previous = self.last_value
+                position = self.find_trigger(samples)
+                self.last_value = int(samples[-1])
+                if position is None:
+                    break
+                # The sample before the edge goes out too, so the host sees the edge
+                if position > 0:
+                    samples = samples[position - 1:]
+                else:
+                    passed.append(np.array([previous], dtype=np.uint8))
+                self.capture_left = self.trigger_samples or -1
+            if self.capture_left < 0:
+                passed.append(samples)
+                break
+            part = samples[:self.capture_left]
+            passed.append(part)
+            self.capture_left -= len(part)
+            self.last_value = int(part[-1])
+            samples = samples[len(part):]
+        return np.concatenate(passed) if passed else samples[:0]
+
+    def find_trigger(self, samples):
+        # Index of the first sample with a rising edge on a rising pin or a falling edge on a falling pin
+        rise_mask = self.pin_mask & self.edge_mask
+        fall_mask = self.pin_mask & ~self.edge_mask & 0xFF
+        return find_edge(samples, rise_mask, fall_mask, self.last_value)
+
+    def send(self, samples):
+        if len(samples) == 0:
+            return
+        if self.binary:
+            for i in range(0, len(samples), FRAME_SAMPLES):
+                self.pending += encode_frame(samples[i:i + FRAME_SAMPLES], self.sequence)
+                self.sequence = (self.sequence + 1) & 0xFFFF
+        else:
+            # "%hu\r\n" per sample, as the firmware prints them
+            self.pending += ('\r\n'.join(map(str, samples.tolist())) + '\r\n').encode('ascii')
+        self.sent_samples += len(samples)
@@ -0,0 +1,75 @@
+# SquareWave.py
+
+import numpy as np
+
+
+def build_square_wave(bits, sample_rate, level_offset=0, start_time=0.0):
+    """
+    Builds the (time, level) vertices of a step trace from an array of channel bits.
+
+    Only the first sample, the last sample and the samples where the level changes
+    produce vertices. Each transition adds two vertices at the same time (old level,
+    then new level), so the returned arrays trace the same square wave as joining
+    every sample, but with a length proportional to the number of edges.
+    """
+    bits = np.asarray(bits, dtype=np.uint8)
+    num_samples = len(bits)
+    if num_samples < 2:
+        return np.empty(0), np.empty(0)
+
+    edges = np.flatnonzero(bits[1:] != bits[:-1]) + 1
+    num_vertices = 2 * len(edges) + 2
+
+    sample_positions = np.empty(num_vertices, dtype=np.int64)
+    sample_positions[0] = 0
+    sample_positions[1:-1:2] = edges
+    sample_positions[2:-1:2] = edges
+    sample_positions[-1] = num_samples - 1
+
+    levels = np.empty(num_vertices, dtype=np.float64)
+    levels[0] = bits[0]
+    levels[1:-1:2] = bits[edges - 1]
+    levels[2:-1:2] = bits[edges]
+    levels[-1] = bits[-1]
+
+    square_wave_time = sample_positions / sample_rate + start_time
+    square_wave_data = levels + level_offset
+    return square_wave_time, square_wave_data
+
+
+def channel_bits(samples, channel):
+    """
+    Extracts the bit of one channel from an array of packed samples.
+
+    The LSB of each sample is channel 0 (DIO 1) and bit 7 is channel 7 (DIO 8).
+    """
+    return (np.asarray(samples) >> channel).astype(np.uint8) & 1
+
+
+def build_square_wave_from_edges(positions, levels, end_position, sample_rate, level_offset=0):
+    """
+    Builds the same vertices as build_square_wave from run-length data instead of samples.
+
+    positions[i] is the sample index where levels[i] starts, positions[0] is the first
+    sample of the range and end_position the last one. Consecutive runs must differ.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    levels = np.asarray(levels, dtype=np.float64)
+    num_runs = len(positions)
+    if num_runs == 0 or end_position <= positions[0]:
+        return np.empty(0), np.empty(0)
+
+    num_vertices = 2 * num_runs
+    sample_positions = np.empty(num_vertices, dtype=np.int64)
+    sample_positions[0] = positions[0]
+    sample_positions[1:-1:2] = positions[1:]
+    sample_positions[2:-1:2] = positions[1:]
+    sample_positions[-1] = end_position
+
+    vertex_levels = np.empty(num_vertices, dtype=np.float64)
+    vertex_levels[0] = levels[0]
+    vertex_levels[1:-1:2] = levels[:-1]
+    vertex_levels[2:-1:2] = levels[1:]
+    vertex_levels[-1] = levels[-1]
+
+    return sample_positions / sample_rate, vertex_levels + level_offset
@@ -0,0 +1,204 @@
+# Transitions.py
+
+import numpy as np
+from SquareWave import build_square_wave_from_edges
+
+RUN_CHUNK = 1 << 18  # Runs handed to a decoder per call by TransitionStore.chunks()
+
+
+class TransitionStore:
+    """
+    Run-length storage of a capture: one (sample_index, new_value) entry per change of the
+    packed 8-channel word instead of one byte per sample.
+
+    Digital captures are mostly constant, so memory follows the number of edges rather than
+    the capture length. Sample indices are numbered like the SampleRingBuffer the store goes
+    with; the first kept entry holds the value in effect at the first stored sample. Chunks
+    are appended as they arrive and trim() drops the runs that scrolled out, so a store can
+    follow a ring buffer. channel_edges() serves the plot builder and chunks() the protocol
+    decoders, which only need the edges.
+    """
+
+    def __init__(self, initial_capacity=4096):
+        self.indices = np.empty(initial_capacity, dtype=np.int64)
+        self.values = np.empty(initial_capacity, dtype=np.uint8)
+        self.begin = 0  # First kept entry, the ones before it were trimmed
+        self.count = 0  # End of the stored entries
+        self.total_samples = 0
+
+    @classmethod
+    def from_samples(cls, samples, max_bytes=None):
+        """
+        Builds a store from a whole capture, a chunk at a time, so a memory-mapped file
+        streams through without a second copy of it. Returns None once the runs take more
+        than max_bytes: a capture that changes that often is smaller as samples.
+        """
+        store = cls()
+        for indices, values in iter_transitions(samples):
+            store.append_transitions(indices, values, indices[-1] + 1)
+            if max_bytes is not None and store.nbytes() > max_bytes:
+                return None
+        store.total_samples = len(samples)
+        return store
+
+    def __len__(self):
+        return self.count - self.begin
+
+    def clear(self, start=0):
+        # The next appended sample is number start
+        self.begin = 0
+        self.count = 0
+        self.total_samples = start
+
+    def nbytes(self):
+        return len(self) * (self.indices.itemsize + self.values.itemsize)
+
+    def _reserve(self, extra):
+        needed = len(self) + extra
+        if self.count + extra <= len(self.indices):
+            return
+        # Trimmed entries make room first, the storage only grows when it is half full
+        capacity = len(self.indices) if 2 * needed <= len(self.indices) else max(needed, 2 * len(self.indices))
+        indices = np.empty(capacity, dtype=np.int64)
+        values = np.empty(capacity, dtype=np.uint8)
+        indices[:len(self)] = self.indices[self.begin:self.count]
+        values[:len(self)] = self.values[self.begin:self.count]
+        self.indices = indices
+        self.values = values
+        self.count = len(self)
+        self.begin = 0
+
+    def append(self, samples):
+        samples = np.asarray(samples)
+        if samples.dtype != np.uint8:
+            samples = samples.astype(np.uint8)
+        if len(samples) == 0:
+            return
+        # A change against the previous chunk's last value counts as an edge too
+        changes = np.flatnonzero(samples[1:] != samples[:-1]) + 1
+        if len(self) == 0 or samples[0] != self.values[self.count - 1]:
+            changes = np.concatenate(([0], changes))
+        self._reserve(len(changes))
+        self.indices[self.count:self.count + len(changes)] = changes + self.total_samples
+        self.values[self.count:self.count + len(changes)] = samples[changes]
+        self.count += len(changes)
+        self.total_samples += len(samples)
+
+    def append_transitions(self, indices, values, total_samples):
+        """
+        Appends ready-made run-length data, e.g. from an importer. indices are absolute and
+        must start at or after the current total_samples.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        values = np.asarray(values, dtype=np.uint8)
+        if len(indices):
+            keep = np.ones(len(values), dtype=bool)
+            keep[1:] = values[1:] != values[:-1]
+            if len(self):
+                keep[0] = values[0] != self.values[self.count - 1]
+            indices, values = indices[keep], values[keep]
+            self._reserve(len(indices))
+            self.indices[self.count:self.count + len(indices)] = indices
+            self.values[self.count:self.count + len(values)] = values
+            self.count += len(indices)
+        self.total_samples = max(self.total_samples, int(total_samples))
+
+    def trim(self, start):
+        """
+        Drops the runs that end before sample start; the run covering it stays.
+        """
+        first = int(np.searchsorted(self.indices[self.begin:self.count], start, side='right')) - 1
+        if first > 0:
+            self.begin += first
+
+    def transitions(self, start=0, stop=None):
+        """
+        Returns (indices, values) of the runs covering samples start..stop-1. The first run
+        is clipped to begin at start, so it carries the value in effect there.
+        """
+        stop = self.total_samples if stop is None else min(stop, self.total_samples)
+        if len(self) == 0 or stop <= start:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8)
+        indices = self.indices[self.begin:self.count]
+        first = max(np.searchsorted(indices, start, side='right') - 1, 0)
+        last = np.searchsorted(indices, stop, side='left')
+        run_indices = indices[first:last].copy()
+        run_indices[0] = max(run_indices[0], start)
+        return run_indices, self.values[self.begin + first:self.begin + last]
+
+    def chunks(self, start=0, stop=None, max_runs=RUN_CHUNK):
+        """
+        Yields (indices, values, stop_idx) for the runs of samples start..stop-1, at most
+        max_runs at a time, in the form the decoders' decode_runs() takes.
+        """
+        stop = self.total_samples if stop is None else min(stop, self.total_samples)
+        indices, values = self.transitions(start, stop)
+        for first in range(0, len(indices), max_runs):
+            last = first + max_runs
+            yield indices[first:last], values[first:last], int(indices[last]) if last < len(indices) else stop
+
+    def channel_edges(self, channel, start=0, stop=None):
+        """
+        Returns (indices, levels) of the runs of one channel: the first entry is the level at
+        start, every following entry is an edge of that channel.
+        """
+        indices, values = self.transitions(start, stop)
+        if len(indices) == 0:
+            return indices, values
+        bits = (values >> channel) & 1
+        keep = np.ones(len(bits), dtype=bool)
+        keep[1:] = bits[1:] != bits[:-1]
+        return indices[keep], bits[keep]
+
+    def samples(self, start=0, stop=None):
+        """
+        Expands samples start..stop-1 back to one packed value per sample.
+        """
+        stop = self.total_samples if stop is None else min(stop, self.total_samples)
+        indices, values = self.transitions(start, stop)
+        return expand_runs(indices, values, stop)
+
+    def square_wave(self, channel, sample_rate, level_offset=0, start=0, stop=None):
+        """
+        Step-trace vertices of one channel, time measured from sample `start`.
+        """
+        stop = self.total_samples if stop is None else min(stop, self.total_samples)
+        indices, levels = self.channel_edges(channel, start, stop)
+        return build_square_wave_from_edges(indices - start, levels, stop - 1 - start, sample_rate, level_offset)
+
+
+def expand_runs(indices, values, stop_idx):
+    """
+    One value per sample from runs starting at indices and ending at stop_idx.
+    """
+    if len(indices) == 0:
+        return np.empty(0, dtype=np.uint8)
+    return np.repeat(np.asarray(values), np.diff(np.append(indices, stop_idx)))
+
+
+def sample_runs(samples, start_idx=0):
+    """
+    Returns (indices, values) of the runs of one chunk of packed samples, the first run
+    starting at start_idx.
+    """
+    samples = np.asarray(samples)
+    changes = np.flatnonzero(samples[1:] != samples[:-1]) + 1
+    changes = np.concatenate(([0], changes)) if len(samples) else changes
+    return changes + start_idx, samples[changes]
+
+
+def iter_transitions(samples, chunk_size=1 << 20):
+    """
+    Yields (indices, values) of the changes of the packed word, one chunk of samples at a
+    time, starting with the value at sample 0. Only one chunk is in memory at once, so a
+    memory-mapped capture streams through in constant memory.
+    """
+    previous = None
+    for start in range(0, len(samples), chunk_size):
+        chunk = np.asarray(samples[start:start + chunk_size]).astype(np.uint8, copy=False)
+        changes = np.flatnonzero(chunk[1:] != chunk[:-1]) + 1
+        if previous is None or chunk[0] != previous:
+            changes = np.concatenate(([0], changes))
+        previous = chunk[-1]
+        if len(changes):
+            yield changes + start, chunk[changes]
@@ -0,0 +1,278 @@
+# Transport.py
+
+import time
+import warnings
+import numpy as np
+
+# Binary frame layout (little endian), sent by firmware after command 8 with value 1:
+#   [0xA5 0x5A][sequence u16][sample width u8][flags u8][sample count u16][payload][fletcher16 u16]
+# The Fletcher-16 checksum covers everything after the two sync bytes up to the end of the payload.
+FRAME_SYNC = b'\xA5\x5A'
+FRAME_HEADER_SIZE = 8
+FRAME_CHECKSUM_SIZE = 2
+MAX_FRAME_SAMPLES = 4096
+
+TRANSPORT_MODE_COMMAND = b'8'
+READ_TIMEOUT = 0.01  # Seconds a worker blocks in read() before checking is_running again
+MIN_READ_SIZE = 64  # Bytes a read waits for when the port is quiet, one ASCII line is ~5 bytes
+ASCII_MODE = 'ascii'
+BINARY_MODE = 'binary'
+AUTO_MODE = 'auto'
+
+
+def fletcher16(data):
+    """
+    Computes the Fletcher-16 checksum of a bytes-like object with NumPy.
+
+    sum1 is the byte sum mod 255 and sum2 is the sum of the running sums, which is the
+    byte sum weighted by (n - i). The result packs sum2 in the high byte.
+    """
+    values = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    weights = np.arange(len(values), 0, -1, dtype=np.int64)
+    sum1 = int(values.sum()) % 255
+    sum2 = int((values * weights).sum()) % 255
+    return (sum2 << 8) | sum1
+
+
+def encode_frame(samples, sequence, width=1):
+    """
+    Packs samples into one binary frame. Used by the simulated device and for testing decoders.
+    """
+    dtype = np.uint8 if width == 1 else np.dtype('<u2')
+    payload = np.asarray(samples).astype(dtype).tobytes()
+    count = len(payload) // width
+    header = bytes([
+        sequence & 0xFF, (sequence >> 8) & 0xFF,
+        width, 0,
+        count & 0xFF, (count >> 8) & 0xFF,
+    ])
+    checksum = fletcher16(header + payload)
+    return FRAME_SYNC + header + payload + bytes([checksum & 0xFF, checksum >> 8])
+
+
+class SampleDecoder:
+    """
+    Turns raw bytes read from the serial port into an array of samples.
+
+    Supports the original ASCII transport (one decimal sample per line) and the binary
+    framed transport. In 'auto' mode the decoder starts in ASCII and switches to binary as
+    soon as a frame sync pattern shows up, since ASCII data only ever contains digits and
+    line endings. Partial lines and partial frames are kept until the next call to feed().
+    """
+
+    def __init__(self, mode=AUTO_MODE):
+        self.requested_mode = mode
+        self.mode = BINARY_MODE if mode == BINARY_MODE else ASCII_MODE
+        self.pending = bytearray()
+        self.expected_sequence = None
+        self.frames = 0
+        self.checksum_errors = 0
+        self.dropped_frames = 0
+        self.bytes_received = 0
+
+    def reset(self):
+        self.pending = bytearray()
+        self.expected_sequence = None
+
+    def feed(self, raw_data):
+        self.bytes_received += len(raw_data)
+        self.pending += raw_data
+        if self.mode == ASCII_MODE and self.requested_mode == AUTO_MODE:
+            sync_idx = self.pending.find(FRAME_SYNC)
+            if sync_idx >= 0:
+                # Anything before the first frame is still ASCII from before the switch
+                ascii_part = bytes(self.pending[:sync_idx])
+                self.pending = self.pending[sync_idx:]
+                self.mode = BINARY_MODE
+                leading = self._decode_ascii(ascii_part + b'\n')
+                return np.concatenate((leading, self._decode_frames()))
+        if self.mode == BINARY_MODE:
+            return self._decode_frames()
+        return self._decode_ascii()
+
+    def _decode_ascii(self, data=None):
+        if data is None:
+            end = self.pending.rfind(b'\n')
+            if end < 0:
+                return np.empty(0, dtype=np.uint16)
+            data = bytes(self.pending[:end + 1])
+            del self.pending[:end + 1]
+        tokens = data.split()
+        if not tokens:
+            return np.empty(0, dtype=np.uint16)
+        try:
+            with warnings.catch_warnings():
+                # Older NumPy only warns when it stops at unparsable text, newer NumPy raises
+                warnings.simplefilter('error', DeprecationWarning)
+                values = np.fromstring(data.decode('ascii', errors='replace'), dtype=np.int64, sep=' ')
+            if len(values) == len(tokens):
+                return values.astype(np.uint16)
+        except (ValueError, DeprecationWarning):
+            pass
+        # A corrupted line stopped the fast parse, fall back to skipping bad lines only
+        values = []
+        for token in tokens:
+            try:
+                values.append(int(token))
+            except ValueError:
+                continue
+        return np.array(values, dtype=np.int64).astype(np.uint16)
+
+    def _decode_frames(self):
+        chunks = []
+        pending = self.pending
+        pos = 0
+        while True:
+            sync_idx = pending.find(FRAME_SYNC, pos)
+            if sync_idx < 0:
+                # Keep a trailing 0xA5 in case the sync pattern is split across reads
+                pos = len(pending) - 1 if pending.endswith(FRAME_SYNC[:1]) else len(pending)
+                break
+            if len(pending) - sync_idx < FRAME_HEADER_SIZE:
+                pos = sync_idx
+                break
+            header = pending[sync_idx + 2:sync_idx + FRAME_HEADER_SIZE]
+            sequence = header[0] | (header[1] << 8)
+            width = header[2]
+            count = header[4] | (header[5] << 8)
+            if width not in (1, 2) or count > MAX_FRAME_SAMPLES:
+                # Not a real header, the sync bytes were part of a payload
+                pos = sync_idx + 1
+                continue
+            frame_end = sync_idx + FRAME_HEADER_SIZE + count * width + FRAME_CHECKSUM_SIZE
+            if len(pending) < frame_end:
+                pos = sync_idx
+                break
+            body = pending[sync_idx + 2:frame_end - FRAME_CHECKSUM_SIZE]
+            checksum = pending[frame_end - 2] | (pending[frame_end - 1] << 8)
+            if fletcher16(body) != checksum:
+                self.checksum_errors += 1
+                pos = sync_idx + 1
+                continue
+
+            if self.expected_sequence is not None and sequence != self.expected_sequence:
+                self.dropped_frames += (sequence - self.expected_sequence) & 0xFFFF
+            self.expected_sequence = (sequence + 1) & 0xFFFF
+            self.frames += 1
+
+            dtype = np.uint8 if width == 1 else np.dtype('<u2')
+            payload = np.frombuffer(body, dtype=dtype, offset=FRAME_HEADER_SIZE - 2, count=count)
+            chunks.append(payload.astype(np.uint16))
+            pos = frame_end
+        del pending[:pos]
+        if not chunks:
+            return np.empty(0, dtype=np.uint16)
+        return np.concatenate(chunks)
+
+
+def request_transport_mode(serial_port, mode=BINARY_MODE):
+    """
+    Asks the device to switch transports using the 3-byte command format (command, value, value).
+
+    Firmware that does not know command 8 ignores it and keeps sending ASCII lines, which the
+    auto-detecting SampleDecoder still understands.
+    """
+    value = b'1' if mode == BINARY_MODE else b'0'
+    serial_port.write(TRANSPORT_MODE_COMMAND)
+    time.sleep(0.001)
+    serial_port.write(b'0')
+    time.sleep(0.001)
+    serial_port.write(value)
+
+
+def read_chunk(serial_port, min_size=MIN_READ_SIZE):
+    """
+    Blocking read for worker loops, the port must be opened with timeout=READ_TIMEOUT.
+
+    Returns everything already buffered, or waits until min_size bytes arrive or the
+    timeout expires, so an idle port wakes the worker at most 1 / READ_TIMEOUT times a second.
+    """
+    return serial_port.read(max(min_size, serial_port.in_waiting))
+
+
+class LoopStats:
+    """
+    Counts wake-ups of a worker loop and the CPU time its thread uses.
+
+    wakeup() must be called from the worker thread, since CPU time is measured with
+    time.thread_time(). snapshot() can be called from any thread.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.start_time = time.perf_counter()
+        self.start_cpu = time.thread_time()
+        self.last_time = self.start_time
+        self.cpu_time = 0.0
+        self.wakeups = 0
+        self.idle_wakeups = 0  # Wake-ups that read nothing
+        self.bytes_read = 0
+
+    def wakeup(self, num_bytes):
+        self.wakeups += 1
+        self.bytes_read += num_bytes
+        if num_bytes == 0:
+            self.idle_wakeups += 1
+        self.last_time = time.perf_counter()
+        self.cpu_time = time.thread_time() - self.start_cpu
+
+    def snapshot(self):
+        elapsed = max(self.last_time - self.start_time, 1e-9)
+        return {
+            'wakeups_per_second': self.wakeups / elapsed,
+            'idle_wakeups_per_second': self.idle_wakeups / elapsed,
+            'cpu_percent': 100.0 * self.cpu_time / elapsed,
+            'bytes_per_wakeup': self.bytes_read / self.wakeups if self.wakeups else 0.0,
+        }
+
+
+class SampleBatcher:
+    """
+    Coalesces decoded samples so a worker emits one chunk instead of one signal per sample.
+
+    A chunk is handed out once `interval` seconds have passed since its first sample or
+    once it holds `max_samples` samples, whichever comes first.
+    """
+
+    def __init__(self, interval=0.01, max_samples=65536):
+        self.interval = interval
+        self.max_samples = max_samples
+        self.chunks = []
+        self.num_samples = 0
+        self.first_time = None
+
+    def __len__(self):
+        return self.num_samples
+
+    def clear(self):
+        self.chunks = []
+        self.num_samples = 0
+        self.first_time = None
+
+    def add(self, samples):
+        if len(samples) == 0:
+            return
+        if self.num_samples == 0:
+            self.first_time = time.perf_counter()
+        self.chunks.append(samples)
+        self.num_samples += len(samples)
+
+    def is_due(self):
+        if self.num_samples == 0:
+            return False
+        if self.num_samples >= self.max_samples:
+            return True
+        return time.perf_counter() - self.first_time >= self.interval
+
+    def take(self):
+        """
+        Returns everything collected so far as one array and starts a new chunk.
+        """
+        if len(self.chunks) == 1:
+            samples = self.chunks[0]
+        else:
+            samples = np.concatenate(self.chunks) if self.chunks else np.empty(0, dtype=np.uint16)
+        self.clear()
+        return samples
@@ -0,0 +1,465 @@
+# Trigger.py
+
+import threading
+import numpy as np
+from I2CDecoder import I2CDecoder
+from UARTDecoder import UARTDecoder
+
+CONDITION_HELP = (
+    "stages joined by '->', each one of rising:CH, falling:CH, pattern:X1X0 (channel 1 rightmost), "
+    "rising:CH&pattern:..., pulse:channel=CH,level=high,min=N,max=N (widths in samples), "
+    "i2c:address=0x50,data=1,clock=2,address_width=7,rw=read|write, "
+    "uart:value=0x41,channel=1,baud=9600,data_bits=8,parity=None,stop_bits=1"
+)
+
+
+def compile_trigger_masks(trigger_modes):
+    """
+    Returns (rise_mask, fall_mask) for per-channel trigger modes, bit i for channel i+1,
+    the same bits get_trigger_edge_command and get_trigger_pins_command send to the device.
+    """
+    rise_mask = fall_mask = 0
+    for channel, mode in enumerate(trigger_modes):
+        if mode == 'Rising Edge':
+            rise_mask |= 1 << channel
+        elif mode == 'Falling Edge':
+            fall_mask |= 1 << channel
+    return rise_mask, fall_mask
+
+
+def previous_samples(samples, last_value):
+    # samples shifted by one, the first one compared with itself at the start of the stream
+    previous = np.empty_like(samples)
+    previous[1:] = samples[:-1]
+    previous[0] = samples[0] if last_value is None else last_value
+    return previous
+
+
+def find_edge(samples, rise_mask, fall_mask, last_value=None):
+    """
+    Returns the index of the first sample where a rise_mask channel goes high or a
+    fall_mask channel goes low, or None. last_value is the sample before samples[0],
+    None at the start of the stream, where the first sample cannot be an edge.
+    """
+    if len(samples) == 0 or not (rise_mask | fall_mask):
+        return None
+    previous = previous_samples(samples, last_value)
+    # A changed bit is a rising edge where it is now high and a falling edge where it was high
+    hits = np.flatnonzero((previous ^ samples) & ((samples & rise_mask) | (previous & fall_mask)))
+    return int(hits[0]) if len(hits) else None
+
+
+def parse_pattern(text):
+    """
+    "0bX1X0" -> (mask, value), written like a binary number: the last character is
+    channel 1. Channels left out or marked X are don't care.
+    """
+    digits = text[2:] if text.lower().startswith('0b') else text
+    if not digits or len(digits) > 8 or any(digit not in '01xX' for digit in digits):
+        raise ValueError(f"pattern {text!r} must be up to 8 of 0, 1 and X")
+    mask = value = 0
+    for channel, digit in enumerate(reversed(digits)):
+        if digit in '01':
+            mask |= 1 << channel
+            value |= int(digit) << channel
+    return mask, value
+
+
+# Trigger conditions: find(samples, last_value) returns the index of the sample the
+# condition fires on, or None once it has looked at the whole chunk. State is carried
+# from chunk to chunk, so every sample is looked at once however long the wait. After
+# firing, a condition is only fed again after reset().
+
+class EdgeTrigger:
+    """
+    Any rising edge on rise_mask or falling edge on fall_mask, optionally only while the
+    channels in pattern = (mask, value) match at the edge sample.
+    """
+
+    def __init__(self, rise_mask=0, fall_mask=0, pattern=None):
+        self.rise_mask = rise_mask
+        self.fall_mask = fall_mask
+        self.pattern = pattern
+
+    def reset(self):
+        pass
+
+    def find(self, samples, last_value):
+        if self.pattern is None:
+            return find_edge(samples, self.rise_mask, self.fall_mask, last_value)
+        previous = previous_samples(samples, last_value)
+        mask, value = self.pattern
+        hits = np.flatnonzero(
+            ((previous ^ samples) & ((samples & self.rise_mask) | (previous & self.fall_mask)) != 0)
+            & ((samples & mask) == value)
+        )
+        return int(hits[0]) if len(hits) else None
+
+
+class PatternTrigger:
+    """
+    The first sample where the channels start to match pattern = (mask, value). A match
+    already there at the start of the stream fires on the first sample.
+    """
+
+    def __init__(self, pattern):
+        self.mask, self.value = pattern
+
+    def reset(self):
+        pass
+
+    def find(self, samples, last_value):
+        matches = (samples & self.mask) == self.value
+        entered = matches.copy()
+        entered[1:] &= ~matches[:-1]
+        if last_value is not None:
+            entered[0] &= (last_value & self.mask) != self.value
+        hits = np.flatnonzero(entered)
+        return int(hits[0]) if len(hits) else None
+
+
+class PulseWidthTrigger:
+    """
+    The end of a pulse at `level` on `channel` (1-8) that lasted min_width to max_width
+    samples, max_width None for no upper limit. A pulse already going when the condition
+    is reset has an unknown width and never fires.
+    """
+
+    def __init__(self, channel, level=1, min_width=1, max_width=None):
+        self.bit = channel - 1
+        self.level = level
+        self.min_width = min_width
+        self.max_width = max_width
+        self.reset()
+
+    def reset(self):
+        self.sample_count = 0  # Samples looked at since the reset
+        self.pulse_start = -1  # Sample count where the current pulse began, -1 when unknown or none
+
+    def find(self, samples, last_value):
+        bits = (samples >> self.bit) & 1
+        previous = previous_samples(bits, None if last_value is None else (last_value >> self.bit) & 1)
+        edges = np.flatnonzero(bits != previous)
+        start = self.sample_count
+        self.sample_count += len(samples)
+        if len(edges) == 0:
+            return None
+        positions = edges + start
+        ends = bits[edges] != self.level
+        # Every end takes the latest start before it: carry the starts forward
+        starts = np.maximum.accumulate(np.concatenate(([self.pulse_start], np.where(ends, -1, positions))))
+        widths = positions - starts[:-1]
+        qualified = ends & (starts[:-1] >= 0) & (widths >= self.min_width)
+        if self.max_width is not None:
+            qualified &= widths <= self.max_width
+        self.pulse_start = -1 if ends[-1] else int(positions[-1])
+        hits = np.flatnonzero(qualified)
+        return int(edges[hits[0]]) if len(hits) else None
+
+
+class I2CAddressTrigger:
+    """
+    The acknowledge bit after an I2C address byte, when the address (and the R/W bit of a
+    7-bit address, if rw_bit is given) matches.
+    """
+
+    def __init__(self, address, data_channel=1, clock_channel=2, address_width=7, rw_bit=None):
+        self.address = address
+        self.rw_bit = rw_bit
+        # STOP messages are not needed, a trigger armed for hours would keep them growing
+        self.group_configs = [{'data_channel': data_channel, 'clock_channel': clock_channel,
+                               'address_width': address_width, 'stop_message': False}]
+        self.decoder = I2CDecoder(1)
+        self.reset()
+
+    def reset(self):
+        self.decoder.reset()
+        self.sample_count = 0
+        self.matched = False  # The last address matched, waiting for its ACK
+
+    def find(self, samples, last_value):
+        start = self.sample_count
+        self.sample_count += len(samples)
+        for event in self.decoder.decode(samples, start, self.group_configs):
+            if event['event'] == 'ADDRESS':
+                self.matched = event['data'] == self.address and self.rw_bit in (None, event['rw_bit'])
+            elif event['event'] == 'ACK' and self.matched:
+                return max(event['sample_idx'] - start, 0)
+            else:
+                self.matched = False
+        return None
+
+
+class UARTByteTrigger:
+    """
+    The last stop bit of a UART frame carrying `value`, without a framing error.
+    """
+
+    def __init__(self, value, sample_rate, data_channel=1, baud_rate=9600, data_bits=8, parity='None',
+                 stop_bits=1, polarity='Standard'):
+        self.value = value
+        self.uart_config = {
+            'enabled': True, 'sample_rate': sample_rate, 'data_channel': data_channel, 'baud_rate': baud_rate,
+            'data_bits': data_bits, 'parity': parity, 'stop_bits': stop_bits, 'polarity': polarity,
+        }
+        self.decoder = UARTDecoder(1)
+        self.reset()
+
+    def reset(self):
+        self.decoder.reset()
+        self.sample_count = 0
+
+    def find(self, samples, last_value):
+        start = self.sample_count
+        self.sample_count += len(samples)
+        _, end_idxs, values, _, framing_errors, _ = self.decoder.decode_frames(samples, start, 0, self.uart_config)
+        hits = np.flatnonzero((values == self.value) & ~framing_errors)
+        return max(int(end_idxs[hits[0]]) - start, 0) if len(hits) else None
+
+
+class SequenceTrigger:
+    """
+    Stages that have to fire one after the other; each stage starts looking at the
+    sample after the one the stage before it fired on.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.reset()
+
+    def reset(self):
+        self.stage = 0
+        self.stages[0].reset()
+
+    def find(self, samples, last_value):
+        offset = 0
+        while offset < len(samples):
+            position = self.stages[self.stage].find(samples[offset:], last_value)
+            if position is None:
+                return None
+            offset += position
+            if self.stage == len(self.stages) - 1:
+                return offset
+            last_value = int(samples[offset])
+            offset += 1
+            self.stage += 1
+            self.stages[self.stage].reset()
+        return None
+
+
+def parse_settings(text, keys):
+    # "channel=3,level=high" -> dict, with numbers in decimal or 0x hex
+    settings = {}
+    for item in filter(None, text.split(',')):
+        key, _, value = item.partition('=')
+        if key not in keys:
+            raise ValueError(f"unknown setting {key!r}, expected one of {', '.join(keys)}")
+        try:
+            settings[key] = int(value, 0)
+        except ValueError:
+            settings[key] = value
+    return settings
+
+
+def parse_stage(text, sample_rate):
+    rise_mask = fall_mask = 0
+    pattern = None
+    others = []
+    for part in text.split('&'):
+        kind, _, arguments = part.strip().partition(':')
+        kind = kind.lower()
+        if kind in ('rising', 'falling'):
+            if not arguments.isdigit() or not 1 <= int(arguments) <= 8:
+                raise ValueError(f"expected {kind}:CHANNEL with a channel 1-8, got {part!r}")
+            if kind == 'rising':
+                rise_mask |= 1 << (int(arguments) - 1)
+            else:
+                fall_mask |= 1 << (int(arguments) - 1)
+        elif kind == 'pattern':
+            pattern = parse_pattern(arguments)
+        elif kind == 'pulse':
+            settings = parse_settings(arguments, ('channel', 'level', 'min', 'max'))
+            level = str(settings.get('level', 'high')).lower()
+            if level not in ('high', 'low', '1', '0'):
+                raise ValueError(f"pulse level must be high or low, got {level!r}")
+            others.append(PulseWidthTrigger(int(settings.get('channel', 1)), int(level in ('high', '1')),
+                                            int(settings.get('min', 1)),
+                                            None if settings.get('max') is None else int(settings['max'])))
+        elif kind == 'i2c':
+            settings = parse_settings(arguments, ('address', 'data', 'clock', 'address_width', 'rw'))
+            if 'address' not in settings:
+                raise ValueError("an I2C trigger needs address=")
+            rw = settings.get('rw')
+            if rw not in (None, 'read', 'write'):
+                raise ValueError(f"rw must be read or write, got {rw!r}")
+            others.append(I2CAddressTrigger(
+                settings['address'], int(settings.get('data', 1)), int(settings.get('clock', 2)),
+                int(settings.get('address_width', 7)), None if rw is None else int(rw == 'read'),
+            ))
+        elif kind == 'uart':
+            settings = parse_settings(arguments, ('value', 'channel', 'baud', 'data_bits', 'parity', 'stop_bits',
+                                                  'polarity'))
+            if 'value' not in settings:
+                raise ValueError("a UART trigger needs value=")
+            others.append(UARTByteTrigger(
+                settings['value'], sample_rate, int(settings.get('channel', 1)), int(settings.get('baud', 9600)),
+                int(settings.get('data_bits', 8)), settings.get('parity', 'None'), int(settings.get('stop_bits', 1)),
+                settings.get('polarity', 'Standard'),
+            ))
+        else:
+            raise ValueError(f"unknown trigger {kind!r}")
+    if others:
+        if len(others) > 1 or rise_mask or fall_mask or pattern is not None:
+            raise ValueError(f"pulse, i2c and uart triggers cannot be combined with '&': {text!r}")
+        return others[0]
+    if rise_mask or fall_mask:
+        return EdgeTrigger(rise_mask, fall_mask, pattern)
+    if pattern is not None:
+        return PatternTrigger(pattern)
+    raise ValueError(f"empty trigger stage in {text!r}")
+
+
+def parse_trigger_condition(text, sample_rate):
+    """
+    Builds a trigger condition from text such as "rising:1&pattern:XX1X -> i2c:address=0x50",
+    see CONDITION_HELP. Raises ValueError for text it cannot read.
+    """
+    stages = [parse_stage(stage, sample_rate) for stage in text.split('->')]
+    return stages[0] if len(stages) == 1 else SequenceTrigger(stages)
+
+
+class TriggerEngine:
+    """
+    Gates a sample stream on a trigger condition, chunk by chunk.
+
+    The condition is the per-channel edges from set_trigger_mode(), or any condition
+    above given to set_condition(), which takes precedence. While armed, nothing passes;
+    the last pre_trigger samples are kept so they can go out ahead of the trigger sample.
+    After a trigger, post_trigger samples pass from the trigger sample on (all of them
+    when None), then the engine waits for rearm(), or arms again by itself with
+    auto_rearm for repeated captures. With no condition every sample passes, as if the
+    stream had triggered before it started.
+
+    Settings come from the GUI thread while process() runs in the acquisition thread, so
+    both hold the lock.
+    """
+
+    def __init__(self, channels=8, pre_trigger=0, post_trigger=None, auto_rearm=False):
+        self.lock = threading.Lock()
+        self.trigger_modes = ['No Trigger'] * channels
+        self.edge_condition = None  # From the per-channel trigger modes
+        self.custom_condition = None  # From set_condition()
+        self.pre_trigger = pre_trigger
+        self.post_trigger = post_trigger
+        self.auto_rearm = auto_rearm
+        self.last_value = None  # Last sample seen, for edges across chunks
+        self.history = np.empty(0, dtype=np.uint16)  # Up to pre_trigger samples before the trigger
+        self.armed = True
+        self.remaining = None  # Samples left to pass after the trigger, None for no limit
+        self.trigger_count = 0
+
+    @property
+    def condition(self):
+        return self.custom_condition if self.custom_condition is not None else self.edge_condition
+
+    @property
+    def enabled(self):
+        return self.condition is not None
+
+    def set_trigger_mode(self, channel_idx, mode):
+        with self.lock:
+            self.trigger_modes[channel_idx] = mode
+            self.compile_edges()
+
+    def set_trigger_modes(self, trigger_modes):
+        with self.lock:
+            self.trigger_modes = list(trigger_modes)
+            self.compile_edges()
+
+    def compile_edges(self):
+        rise_mask, fall_mask = compile_trigger_masks(self.trigger_modes)
+        self.edge_condition = EdgeTrigger(rise_mask, fall_mask) if rise_mask | fall_mask else None
+
+    def set_condition(self, condition):
+        # None goes back to the per-channel edges
+        with self.lock:
+            self.custom_condition = condition
+            if condition is not None:
+                condition.reset()
+
+    def configure(self, pre_trigger=0, post_trigger=None, auto_rearm=False):
+        # Takes effect from the next trigger, call rearm() to wait for one now
+        with self.lock:
+            self.pre_trigger = max(int(pre_trigger), 0)
+            self.post_trigger = None if post_trigger is None else max(int(post_trigger), 1)
+            self.auto_rearm = auto_rearm
+
+    def rearm(self):
+        with self.lock:
+            self.arm()
+            self.history = self.history[:0]
+
+    def arm(self):
+        self.armed = True
+        self.remaining = None
+        if self.condition is not None:
+            self.condition.reset()
+
+    def process(self, samples):
+        """
+        Returns (passed, trigger_offsets): the samples let through and the index in
+        passed of every trigger sample found in this chunk.
+        """
+        with self.lock:
+            condition = self.condition
+            if condition is None:
+                if len(samples):
+                    self.last_value = int(samples[-1])
+                return samples, []
+            passed = []
+            offsets = []
+            length = 0
+            while len(samples):
+                if self.armed:
+                    position = condition.find(samples, self.last_value)
+                    if position is None:
+                        self.keep_history(samples)
+                        break
+                    self.keep_history(samples[:position])
+                    if len(self.history):
+                        passed.append(self.history)
+                        length += len(self.history)
+                    offsets.append(length)
+                    self.history = self.history[:0]
+                    self.armed = False
+                    self.remaining = self.post_trigger
+                    self.trigger_count += 1
+                    samples = samples[position:]
+                if self.remaining is None:
+                    part = samples
+                elif self.remaining == 0:
+                    # Done, waiting for rearm()
+                    self.last_value = int(samples[-1])
+                    break
+                else:
+                    part = samples[:self.remaining]
+                    self.remaining -= len(part)
+                passed.append(part)
+                length += len(part)
+                self.last_value = int(part[-1])
+                samples = samples[len(part):]
+                if self.remaining == 0 and self.auto_rearm:
+                    self.arm()
+            if not passed:
+                return samples[:0], offsets
+            return (passed[0] if len(passed) == 1 else np.concatenate(passed)), offsets
+
+    def keep_history(self, samples):
+        if len(samples):
+            self.last_value = int(samples[-1])
+        if self.pre_trigger == 0:
+            return
+        if len(samples) >= self.pre_trigger:
+            self.history = samples[-self.pre_trigger:].copy()
+        else:
+            self.history = np.concatenate((self.history, samples))[-self.pre_trigger:]
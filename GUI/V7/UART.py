@@ -21,48 +21,37 @@ from PyQt6.QtWidgets import (
     QSizePolicy,
 )
 from PyQt6.QtGui import QFont, QIntValidator
-from PyQt6.QtCore import QTimer, QThread, pyqtSignal, Qt
+from PyQt6.QtCore import pyqtSignal, Qt
 from collections import deque
 from InterfaceCommands import (
     get_trigger_edge_command,
     get_trigger_pins_command,
 )
 from aesthetic import get_icon
-
-
-class UARTWorker(QThread):
-    data_ready = pyqtSignal(int, int)  # For raw data values and sample indices
-    decoded_message_ready = pyqtSignal(dict)  # For decoded messages
-
-    def __init__(self, port, baudrate, channels=8, uart_configs=None):
-        super().__init__()
-        self.is_running = True
-        self.channels = channels
-        self.uart_configs = uart_configs if uart_configs else [{} for _ in range(channels)]
-        self.trigger_modes = ['No Trigger'] * self.channels
-        # Initialize UART decoding variables for each channel
-        self.sample_idx = 0  # Initialize sample index
-        self.states = ['IDLE'] * self.channels
-        self.bit_counts = [0] * self.channels
-        self.current_bytes = [0] * self.channels
-        self.last_transition_times = [0] * self.channels
-        self.decoded_messages = [[] for _ in range(self.channels)]
+from SampleBuffer import SampleRingBuffer
+from Acquisition import AcquisitionService, DecodingSubscriber
+from Decoders import create_decoder
+from LevelOfDetail import MinMaxPyramid, visible_window
+from CaptureActions import CaptureActions
+from Instrumentation import instrumentation
+from RenderScheduler import RenderScheduler
+
+
+class UARTWorker(DecodingSubscriber):
+    def __init__(self, acquisition, channels=8, uart_configs=None):
+        decoder = create_decoder('uart', uart_configs if uart_configs else [{} for _ in range(channels)])
+        super().__init__(acquisition, decoder, channels)
         self.sample_rates = [0] * self.channels  # Sample rate per channel, derived from baud rate
         self.baud_rates = [9600] * self.channels  # Default baud rate
-        self.bit_timing_error = [0.0] * self.channels  # For fractional bit timing
-        self.start_bits_detected = [False] * self.channels  # For start bit detection
-        self.next_sample_times = [0.0] * self.channels  # Initialize next_sample_times per channel
-        self.last_bits = [1] * self.channels  # For edge detection
-        self.stop_bit_counters = [0] * self.channels  # Initialize stop_bit_counters per channel
 
-        try:
-            self.serial = serial.Serial(port, baudrate)
-        except serial.SerialException as e:
-            print(f"Failed to open serial port: {str(e)}")
-            self.is_running = False
+    @property
+    def uart_configs(self):
+        # The display edits and replaces the configs, the decoder reads them on every chunk
+        return self.decoder.configs
 
-    def set_trigger_mode(self, channel_idx, mode):
-        self.trigger_modes[channel_idx] = mode
+    @uart_configs.setter
+    def uart_configs(self, configs):
+        self.decoder.configs = configs
 
     def set_baud_rate(self, channel_idx, baud_rate):
         self.baud_rates[channel_idx] = baud_rate
@@ -70,125 +59,6 @@ class UARTWorker(QThread):
     def set_sample_rate(self, channel_idx, sample_rate):
         self.sample_rates[channel_idx] = sample_rate
 
-    def run(self):
-        data_buffer = deque(maxlen=1000)
-
-        while self.is_running:
-            if self.serial.in_waiting:
-                raw_data = self.serial.read(self.serial.in_waiting).splitlines()
-                for line in raw_data:
-                    try:
-                        data_value = int(line.strip())
-                        data_buffer.append(data_value)
-                        self.data_ready.emit(data_value, self.sample_idx)  # Emit data_value and sample_idx
-                        self.decode_uart(data_value, self.sample_idx)
-                        self.sample_idx += 1  # Increment sample index
-                    except ValueError:
-                        continue
-
-    def decode_uart(self, data_value, sample_idx):
-        for ch in range(self.channels):
-            # Only decode if the channel is enabled
-            uart_config = self.uart_configs[ch]
-            if not uart_config.get('enabled', False):
-                continue
-
-            # Get the bit for this channel
-            data_channel = uart_config.get('data_channel', ch + 1) - 1  # Adjust for zero-based index
-            bit = (data_value >> data_channel) & 1
-
-            # Apply polarity
-            polarity = uart_config.get('polarity', 'Standard')
-            if polarity == 'Inverted':
-                bit = 1 - bit
-
-            # Get sample rate and baud rate
-            sample_rate = uart_config.get('sample_rate', None)
-            baud_rate = uart_config.get('baud_rate', 9600)
-            if sample_rate is None or baud_rate == 0:
-                continue  # Cannot decode without sample rate and baud rate
-
-            # Calculate number of samples per bit
-            # samples_per_bit = sample_rate / baud_rate
-            samples_per_bit = 16
-
-            # State machine for UART decoding
-            state = self.states[ch]
-            bit_count = self.bit_counts[ch]
-            current_byte = self.current_bytes[ch]
-            next_sample_time = self.next_sample_times[ch]
-            stop_bits = uart_config.get('stop_bits', 1)
-            data_format = uart_config.get('data_format', 'ASCII')
-            stop_bit_counter = self.stop_bit_counters[ch]  # Retrieve stop_bit_counter
-            last_bit = self.last_bits[ch]
-
-            if state == 'IDLE':
-                if bit == 0 and last_bit == 1:
-                    # Start bit detected (falling edge)
-                    state = 'START_BIT'
-                    bit_count = 0
-                    current_byte = 0
-                    next_sample_time = sample_idx + samples_per_bit * 1.5  # Sample in the middle of first data bit
-            elif state == 'START_BIT':
-                # Wait for first data bit
-                if sample_idx >= next_sample_time - samples_per_bit:
-                    state = 'DATA_BITS'
-            elif state == 'DATA_BITS':
-                if sample_idx >= next_sample_time:
-                    # Sample data bit
-                    current_byte |= (bit << bit_count)
-                    bit_count += 1
-                    next_sample_time += samples_per_bit  # Schedule next bit sample time
-                    if bit_count >= 8:
-                        state = 'STOP_BITS'
-                        stop_bit_counter = 0  # Initialize stop_bit_counter
-            elif state == 'STOP_BITS':
-                if sample_idx >= next_sample_time:
-                    # Sample stop bit
-                    if bit == 1:
-                        # Valid stop bit
-                        stop_bit_counter += 1
-                        next_sample_time += samples_per_bit
-                        if stop_bit_counter >= stop_bits:
-                            # Byte is complete
-                            # Emit decoded byte
-                            self.decoded_message_ready.emit({
-                                'channel': ch,
-                                'data': current_byte,
-                                'sample_idx': sample_idx,
-                                'data_format': data_format,
-                            })
-                            state = 'IDLE'
-                    else:
-                        # Invalid stop bit
-                        state = 'IDLE'
-            else:
-                state = 'IDLE'
-
-            # Update states
-            self.states[ch] = state
-            self.bit_counts[ch] = bit_count
-            self.current_bytes[ch] = current_byte
-            self.next_sample_times[ch] = next_sample_time  # Update next_sample_time
-            self.stop_bit_counters[ch] = stop_bit_counter  # Update stop_bit_counter
-            self.last_bits[ch] = bit  # Update last_bit
-
-    def reset_decoding_states(self):
-        self.sample_idx = 0  # Reset sample index
-        self.states = ['IDLE'] * self.channels
-        self.bit_counts = [0] * self.channels
-        self.current_bytes = [0] * self.channels
-        self.next_sample_times = [0.0] * self.channels  # Reset next_sample_times
-        self.decoded_messages = [[] for _ in range(self.channels)]
-        self.stop_bit_counters = [0] * self.channels
-        self.last_bits = [1] * self.channels
-
-
-    def stop_worker(self):
-        self.is_running = False
-        if self.serial.is_open:
-            self.serial.close()
-
 
 class UARTChannelButton(QPushButton):
     configure_requested = pyqtSignal(int)  # Signal to notify when configure is requested
@@ -251,6 +121,26 @@ class UARTConfigDialog(QDialog):
         polarity_layout.addWidget(self.polarity_combo)
         layout.addLayout(polarity_layout)
 
+        # Data Bits Selection
+        data_bits_layout = QHBoxLayout()
+        data_bits_label = QLabel("Data Bits:")
+        self.data_bits_combo = QComboBox()
+        self.data_bits_combo.addItems(['5', '6', '7', '8', '9'])
+        self.data_bits_combo.setCurrentText(str(self.current_config.get('data_bits', 8)))
+        data_bits_layout.addWidget(data_bits_label)
+        data_bits_layout.addWidget(self.data_bits_combo)
+        layout.addLayout(data_bits_layout)
+
+        # Parity Selection
+        parity_layout = QHBoxLayout()
+        parity_label = QLabel("Parity:")
+        self.parity_combo = QComboBox()
+        self.parity_combo.addItems(['None', 'Even', 'Odd'])
+        self.parity_combo.setCurrentText(self.current_config.get('parity', 'None'))
+        parity_layout.addWidget(parity_label)
+        parity_layout.addWidget(self.parity_combo)
+        layout.addLayout(parity_layout)
+
         # Stop Bits Selection
         stop_bits_layout = QHBoxLayout()
         stop_bits_label = QLabel("Stop Bits:")
@@ -287,6 +177,8 @@ class UARTConfigDialog(QDialog):
         return {
             'data_channel': self.data_combo.currentIndex() + 1,
             'polarity': self.polarity_combo.currentText(),
+            'data_bits': int(self.data_bits_combo.currentText()),
+            'parity': self.parity_combo.currentText(),
             'stop_bits': int(self.stop_bits_combo.currentText()),
             'data_format': self.format_combo.currentText(),
         }
@@ -323,8 +215,10 @@ class FixedYViewBox(pg.ViewBox):
         super().translateBy(x=x, y=y)
 
 
-class UARTDisplay(QWidget):
-    def __init__(self, port, baudrate, bufferSize, channels=8):
+class UARTDisplay(CaptureActions, QWidget):
+    capture_mode = 'UART'
+
+    def __init__(self, port, baudrate, bufferSize, channels=8, acquisition=None):
         super().__init__()
         self.port = port
         self.baudrate = baudrate
@@ -332,11 +226,16 @@ class UARTDisplay(QWidget):
         self.bufferSize = bufferSize
         self.sample_rate = None  # Initialize sample_rate
 
-        self.data_buffer = [deque(maxlen=self.bufferSize) for _ in range(self.channels)]  # 8 channels
+        self.data_buffer = SampleRingBuffer(self.bufferSize, transitions=True)  # 8 channels packed per sample
+        self.lod = MinMaxPyramid(self.data_buffer)  # Min/max summaries for zoomed out views
         self.sample_indices = deque(maxlen=self.bufferSize)
         self.total_samples = 0
+        self.awaiting_restart = False  # Cleared buffers wait for the worker's index to restart
 
         self.is_single_capture = False
+        self.capture = None  # CaptureFile shown instead of live data
+        self.trigger_line = None
+        self.recorder = None  # CaptureRecorder streaming every acquired sample to disk
 
         self.current_trigger_modes = ['No Trigger'] * self.channels
         self.trigger_mode_options = ['No Trigger', 'Rising Edge', 'Falling Edge']
@@ -346,6 +245,8 @@ class UARTDisplay(QWidget):
             {
                 'data_channel': i + 1,
                 'polarity': 'Standard',
+                'data_bits': 8,
+                'parity': 'None',
                 'stop_bits': 1,
                 'data_format': 'ASCII',
                 'baud_rate': 9600,
@@ -361,15 +262,21 @@ class UARTDisplay(QWidget):
         self.uart_channel_enabled = [False] * self.channels  # Track which UART channels are enabled
 
         self.setup_ui()
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_plot)
+        self.render_scheduler = RenderScheduler(self, self.update_plot)  # Redraws when new samples arrive
+        # Redraw on zoom and pan, the level of detail depends on the visible range
+        self.plot.sigXRangeChanged.connect(lambda *args: self.update_plot())
 
         self.is_reading = False
 
-        self.worker = UARTWorker(self.port, self.baudrate, channels=self.channels, uart_configs=self.uart_configs)
-        self.worker.data_ready.connect(self.handle_data_value)
-        self.worker.decoded_message_ready.connect(self.display_decoded_message)
+        # Share the caller's acquisition service, or run a private one when used standalone
+        self.owns_acquisition = acquisition is None
+        self.acquisition = acquisition if acquisition else AcquisitionService(self.port, self.baudrate)
+        self.worker = UARTWorker(self.acquisition, channels=self.channels, uart_configs=self.uart_configs)
+        self.worker.data_ready.connect(self.handle_data_chunk)
+        self.worker.decoded_message_ready.connect(self.handle_decoded_message)
         self.worker.start()
+        if self.owns_acquisition:
+            self.acquisition.start()
 
         # Create curves for each channel
         self.channel_curves = []
@@ -380,7 +287,7 @@ class UARTDisplay(QWidget):
 
         # For displaying decoded messages
         self.decoded_texts = []
-        self.decoded_messages_per_channel = [[] for _ in range(self.channels)]
+        self.decoded_messages_per_channel = [deque(maxlen=self.bufferSize) for _ in range(self.channels)]
         
         self.update_sample_rates()
 
@@ -470,11 +377,35 @@ class UARTDisplay(QWidget):
         self.single_button.clicked.connect(self.start_single_capture)
         control_buttons_layout.addWidget(self.single_button)
 
+        self.open_button = QPushButton("Open")
+        self.open_button.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Preferred)
+        self.open_button.setFixedWidth(80)
+        self.open_button.clicked.connect(self.open_capture_file)
+        control_buttons_layout.addWidget(self.open_button)
+
+        self.save_button = QPushButton("Save")
+        self.save_button.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Preferred)
+        self.save_button.setFixedWidth(80)
+        self.save_button.clicked.connect(self.save_capture_file)
+        control_buttons_layout.addWidget(self.save_button)
+
+        self.record_button = QPushButton("Record")
+        self.record_button.setCheckable(True)
+        self.record_button.clicked.connect(self.toggle_recording)
+        control_buttons_layout.addWidget(self.record_button)
+
+        self.record_label = QLabel("")  # Recorded and dropped samples
+        control_buttons_layout.addWidget(self.record_label)
+
         main_layout.addLayout(control_buttons_layout)
 
     def toggle_channel(self, channel_idx, is_checked):
         self.uart_channel_enabled[channel_idx] = is_checked  # Update the enabled list
         self.uart_configs[channel_idx]['enabled'] = is_checked
+        if is_checked:
+            # Decode with the rates currently in use, not the ones from when the channel was last on
+            self.uart_configs[channel_idx]['sample_rate'] = self.sample_rate
+            self.uart_configs[channel_idx]['baud_rate'] = int(self.baud_rate_combo.currentText())
 
         # Update curve visibility
         curve = self.channel_curves[channel_idx]
@@ -501,6 +432,8 @@ class UARTDisplay(QWidget):
         default_config = {
             'data_channel': channel_idx + 1,
             'polarity': 'Standard',
+            'data_bits': 8,
+            'parity': 'None',
             'stop_bits': 1,
             'data_format': 'ASCII',
             'baud_rate': 9600,
@@ -594,24 +527,44 @@ class UARTDisplay(QWidget):
         except serial.SerialException as e:
             print(f"Failed to send trigger pins command: {str(e)}")
 
-    def handle_data_value(self, data_value, sample_idx):
+    @instrumentation.timed('handle')
+    def handle_data_chunk(self, samples, start_idx):
+        instrumentation.chunk_handled()
+        if self.awaiting_restart:
+            if start_idx != 0:
+                return  # Sent before the worker restarted its sample index for the cleared buffers
+            self.awaiting_restart = False
         if self.is_reading:
-            # Store raw data for plotting
-            for i in range(self.channels):
-                bit = (data_value >> i) & 1
-                self.data_buffer[i].append(bit)
-            self.total_samples += 1  # Increment total samples
-
-            # Check if buffers are full
-            if all(len(buf) >= self.bufferSize for buf in self.data_buffer):
-                if self.is_single_capture:
-                    # In single capture mode, stop acquisition
-                    self.stop_single_capture()
-                else:
-                    # In continuous mode, reset buffers
-                    self.clear_data_buffers()
-                    # Optionally clear decoded messages
+            self.render_scheduler.mark_dirty()
+        if self.is_reading and self.recorder is not None and not self.is_single_capture:
+            # The recording keeps everything, so the display slides instead of starting over
+            self.data_buffer.append(samples)
+            self.total_samples += len(samples)
+            return
+        if not self.is_reading:
+            return
+        # Store raw data for plotting, only up to capacity so a full buffer is handled at the same sample as before
+        space = self.data_buffer.capacity - len(self.data_buffer)
+        self.data_buffer.append(samples[:space])
+        self.total_samples += min(space, len(samples))  # Increment total samples
+
+        # Check if buffers are full
+        if self.data_buffer.is_full():
+            if self.is_single_capture:
+                # In single capture mode, stop acquisition
+                self.stop_single_capture()
+            else:
+                # In continuous mode, reset buffers. The rest of the chunk is dropped,
+                # the worker numbers its samples from 0 again with the next chunk
+                self.clear_data_buffers()
+                # Optionally clear decoded messages
+
+    def handle_decoded_message(self, decoded_data):
+        # Messages from the worker; capture files are decoded here and shown directly
+        if not self.awaiting_restart:
+            self.display_decoded_message(decoded_data)
 
+    @instrumentation.timed('messages')
     def display_decoded_message(self, decoded_data):
         channel = decoded_data['channel']
         if not self.uart_channel_enabled[channel]:
@@ -634,6 +587,12 @@ class UARTDisplay(QWidget):
                 data_str = '?'
         else:
             data_str = str(data_byte)
+        if decoded_data.get('break'):
+            data_str = 'BREAK'
+        elif decoded_data.get('framing_error'):
+            data_str += ' (framing error)'
+        elif decoded_data.get('parity_error'):
+            data_str += ' (parity error)'
 
         # Append to decoded messages
         self.decoded_messages_per_channel[channel].append(data_str)
@@ -642,12 +601,36 @@ class UARTDisplay(QWidget):
         print(f"Channel {channel + 1} Decoded Data: {data_str}")
 
     def clear_data_buffers(self):
-        self.data_buffer = [deque(maxlen=self.bufferSize) for _ in range(self.channels)]
+        self.data_buffer.clear()
         self.total_samples = 0  # Reset total samples
 
-        # Reset worker's decoding states
+        # Reset worker's decoding states; chunks and messages already on their way predate it
+        self.awaiting_restart = True
         self.worker.reset_decoding_states()
 
+    def capture_decoder_configs(self):
+        return [dict(config) for config in self.uart_configs]
+
+    def apply_capture_configs(self, decoder_configs):
+        configs = decoder_configs[:len(self.uart_configs)]
+        if configs:
+            # One baud rate for all channels, set without rebuilding the live buffer
+            self.baud_rate_combo.blockSignals(True)
+            self.baud_rate_combo.setCurrentText(str(configs[0].get('baud_rate', 9600)))
+            self.baud_rate_combo.blockSignals(False)
+        for ch, config in enumerate(configs):
+            self.uart_configs[ch].update(config)
+            self.channel_buttons[ch].setChecked(config.get('enabled', False))
+
+    def capture_decoder(self):
+        return create_decoder('uart', self.uart_configs)
+
+    def set_capture_sample_rate(self, sample_rate):
+        # No sample rate field, the decoders take it from their configs
+        self.sample_rate = sample_rate
+        for config in self.uart_configs:
+            config['sample_rate'] = self.sample_rate
+
     def toggle_reading(self):
         # Similar to I2CDisplay's toggle_reading
         if self.is_reading:
@@ -696,16 +679,18 @@ class UARTDisplay(QWidget):
 
     def start_reading(self):
         if not self.is_reading:
+            if self.capture is not None:
+                self.close_capture()
             # Update sample rates based on baud rate
             self.update_sample_rates()
             self.is_reading = True
-            self.timer.start(1)
+            self.render_scheduler.start()
 
 
     def stop_reading(self):
         if self.is_reading:
             self.is_reading = False
-            self.timer.stop()
+            self.render_scheduler.stop()
 
     def start_single_capture(self):
         if not self.is_reading:
@@ -729,28 +714,21 @@ class UARTDisplay(QWidget):
         self.toggle_button.setText("Start")
         self.single_button.setStyleSheet("")
 
+    @instrumentation.timed('frame')
     def update_plot(self):
+        self.update_record_label()
         # Update the plots for each channel
+        num_samples = len(self.data_buffer)
+        # Only the visible X range, at the resolution the plot width can show
+        x_range, pixel_width = visible_window(self.plot)
         for ch in range(self.channels):
             if self.uart_channel_enabled[ch]:
-                data = list(self.data_buffer[ch])
-                num_samples = len(data)
                 if num_samples > 1:
                     sample_rate = self.sample_rate  # Use the stored sample rate
-                    t = np.arange(num_samples) / sample_rate
                     base_level = ch * 2  # Adjust as needed
 
                     # Prepare square wave data
-                    square_wave_time = []
-                    square_wave_data = []
-                    for j in range(1, num_samples):
-                        square_wave_time.extend([t[j - 1], t[j]])
-                        level = data[j - 1] + base_level
-                        square_wave_data.extend([level, level])
-                        if data[j] != data[j - 1]:
-                            square_wave_time.append(t[j])
-                            level = data[j] + base_level
-                            square_wave_data.append(level)
+                    square_wave_time, square_wave_data = self.lod.square_wave(ch, sample_rate, base_level, x_range, pixel_width)
                     self.channel_curves[ch].setData(square_wave_time, square_wave_data)
                 else:
                     self.channel_curves[ch].setData([], [])
@@ -769,7 +747,8 @@ class UARTDisplay(QWidget):
 
         # Adjust bufferSize accordingly
         self.bufferSize = total_samples_needed
-        self.data_buffer = [deque(maxlen=self.bufferSize) for _ in range(self.channels)]
+        self.data_buffer = SampleRingBuffer(self.bufferSize, transitions=True)
+        self.lod = MinMaxPyramid(self.data_buffer)
 
         # Update the plot's X range based on new bufferSize and sample_rate
         # sample_rate = baud_rate * samples_per_bit
@@ -797,6 +776,8 @@ class UARTDisplay(QWidget):
         # self.sample_rate = sample_rate
 
     def send_sample_rate_to_mcu(self, sample_rate):
+        if not self.worker.serial.is_open:
+            return  # Offline, showing a capture file
         # Convert sample_rate to period for the MCU
         period = int((72e6) / sample_rate)
         if period < 1:
@@ -827,7 +808,9 @@ class UARTDisplay(QWidget):
 
 
     def closeEvent(self, event):
+        self.stop_recording()
         self.worker.stop_worker()
-        self.worker.quit()
-        self.worker.wait()
+        self.worker.use_decode_pool(False)  # Ends its processes
+        if self.owns_acquisition:
+            self.acquisition.stop_worker()
         event.accept()
@@ -0,0 +1,281 @@
+# UARTDecoder.py
+
+import numpy as np
+from itertools import repeat
+from Decoders import DecoderPlugin
+
+PARITY_BITS = {'None': 0, 'Even': 1, 'Odd': 1}
+
+
+def frame_offsets(samples_per_bit, data_bits=8, parity='None', stop_bits=1):
+    """
+    Sample offsets of the middle of every bit of a frame, counted from the first low
+    sample of the start bit: start bit, data bits LSB first, parity bit, stop bits.
+
+    The falling edge happened up to one sample before that first low sample, so the
+    middle of bit j is rounded from j + 0.5 bit times after half a sample earlier.
+    """
+    num_bits = 1 + data_bits + PARITY_BITS[parity] + stop_bits
+    return np.floor((np.arange(num_bits) + 0.5) * samples_per_bit).astype(np.int64)
+
+
+class UARTDecoder:
+    """
+    Frame-indexed UART decoder for up to 8 channels.
+
+    Per chunk it finds the falling edges of a channel with NumPy, keeps the ones that are
+    a valid start bit (still low in the middle of the bit) and not inside the previous
+    frame, then reads every bit of every frame with one gather at the mid-bit offsets from
+    the channel's real samples per bit, fractional values included. Data bits (5 to 9),
+    parity and stop bits are checked per frame; a frame that is all zeros is a break.
+    Samples of an unfinished frame are carried into the next chunk.
+
+    decode_runs() takes the same chunk as runs of the packed word: start bits are found
+    where a run starts and the mid-bit levels are looked up by run, so only the carried
+    samples of an unfinished frame are ever expanded.
+
+    Events are the dicts the UART view used before ('channel', 'data', 'sample_idx' of the
+    last stop bit, 'data_format'), plus 'start_sample_idx', 'parity_error',
+    'framing_error', 'break' and 'decoder', the name given to the decoder.
+    """
+
+    def __init__(self, num_channels=8, name=None):
+        self.num_channels = num_channels
+        self.name = name  # Tagged onto the events as 'decoder'
+        self.reset()
+
+    def reset(self):
+        self.last_bits = [1] * self.num_channels  # Line level before the carried samples
+        self.tails = [np.empty(0, dtype=bool) for _ in range(self.num_channels)]
+        self.tail_starts = [0] * self.num_channels  # Sample index of tails[ch][0]
+
+    def decode(self, samples, start_idx, uart_configs):
+        """
+        Decodes one chunk of packed samples whose first sample has index start_idx.
+
+        Returns the frames of all enabled channels ordered by their last sample, then by
+        channel.
+        """
+        samples = np.asarray(samples)
+        if len(samples) == 0:
+            return []
+        return self._decode_channels(samples, start_idx, uart_configs)
+
+    def decode_runs(self, indices, values, stop_idx, uart_configs):
+        """
+        Decodes one chunk given as runs, (sample index, packed value) at every change as
+        TransitionStore keeps them, covering the samples up to stop_idx. Returns the events
+        decode() returns for the same samples.
+        """
+        if len(indices) == 0:
+            return []
+        start_idx = int(indices[0])
+        return self._decode_channels(
+            np.asarray(values), start_idx, uart_configs, np.asarray(indices) - start_idx, stop_idx
+        )
+
+    def _decode_channels(self, samples, start_idx, uart_configs, run_offsets=None, stop_idx=None):
+        decoded = []
+        for ch, uart_config in enumerate(uart_configs[:self.num_channels]):
+            # Only decode if the channel is enabled
+            if not uart_config.get('enabled', False):
+                continue
+            sample_rate = uart_config.get('sample_rate', None)
+            baud_rate = uart_config.get('baud_rate', 9600)
+            if sample_rate is None or baud_rate == 0:
+                continue  # Cannot decode without sample rate and baud rate
+            frames = self.decode_frames(samples, start_idx, ch, uart_config, run_offsets, stop_idx)
+            decoded.append((ch, uart_config.get('data_format', 'ASCII'), frames))
+        if not decoded:
+            return []
+
+        # Every event starts as a copy of its channel's template, made in C, and only the fields
+        # that change from frame to frame are set; the error flags only on the frames that have one
+        templates = [
+            {
+                'channel': ch,
+                'data': 0,
+                'sample_idx': 0,
+                'start_sample_idx': 0,
+                'data_format': data_format,
+                'parity_error': False,
+                'framing_error': False,
+                'break': False,
+                'decoder': self.name,
+            }
+            for ch, data_format, _ in decoded
+        ]
+        if len(decoded) == 1:
+            # A single channel is in sample order already
+            columns = decoded[0][2]
+            events = list(map(dict.copy, repeat(templates[0], len(columns[0]))))
+        else:
+            # One stable sort of all channels by last sample; channels were visited in order
+            channel_idxs = np.concatenate([np.full(len(frames[0]), idx) for idx, (_, _, frames) in enumerate(decoded)])
+            order = np.argsort(np.concatenate([frames[1] for _, _, frames in decoded]), kind='stable')
+            columns = [np.concatenate([frames[i] for _, _, frames in decoded])[order] for i in range(6)]
+            events = list(map(dict.copy, np.array(templates, dtype=object)[channel_idxs[order]].tolist()))
+        starts, ends, values, parity_errors, framing_errors, breaks = columns
+        for event, start, end, value in zip(events, starts.tolist(), ends.tolist(), values.tolist()):
+            event['data'] = value
+            event['sample_idx'] = end
+            event['start_sample_idx'] = start
+        for idx in np.flatnonzero(parity_errors | framing_errors | breaks).tolist():
+            event = events[idx]
+            event['parity_error'] = bool(parity_errors[idx])
+            event['framing_error'] = bool(framing_errors[idx])
+            event['break'] = bool(breaks[idx])
+        return events
+
+    def decode_frames(self, samples, start_idx, ch, uart_config, run_offsets=None, stop_idx=None):
+        """
+        Returns (start_idxs, end_idxs, values, parity_errors, framing_errors, breaks) as
+        arrays for the frames of one channel that end inside this chunk. end_idxs is the
+        sample the last stop bit was read at.
+
+        With run_offsets, samples holds the value of each run, run_offsets the sample it
+        starts at, from start_idx, and the chunk ends at stop_idx.
+        """
+        data_channel = uart_config.get('data_channel', ch + 1) - 1
+        samples_per_bit = uart_config['sample_rate'] / uart_config.get('baud_rate', 9600)
+        data_bits = uart_config.get('data_bits', 8)
+        parity = uart_config.get('parity', 'None')
+        stop_bits = uart_config.get('stop_bits', 1)
+        offsets = frame_offsets(samples_per_bit, data_bits, parity, stop_bits)
+
+        if uart_config.get('polarity', 'Standard') == 'Inverted':
+            line = (samples & (1 << data_channel)) == 0
+        else:
+            line = (samples & (1 << data_channel)) != 0
+        # Carried samples only continue the line if nothing was skipped in between
+        tail = self.tails[ch]
+        if len(tail) and self.tail_starts[ch] + len(tail) == start_idx:
+            if run_offsets is not None:
+                # The carried samples go in front as runs of their own
+                tail_offsets = np.concatenate(([0], np.flatnonzero(tail[1:] != tail[:-1]) + 1))
+                run_offsets = np.concatenate((tail_offsets, run_offsets + len(tail)))
+                tail = tail[tail_offsets]
+            line = np.concatenate((tail, line))
+            line_start = self.tail_starts[ch]
+        else:
+            line_start = start_idx
+
+        if run_offsets is None:
+            num_samples = len(line)
+            level_at = line.__getitem__
+            candidates = np.flatnonzero(line[:-1] > line[1:]) + 1
+        else:
+            num_samples = stop_idx - line_start
+
+            def level_at(positions):
+                return line[np.searchsorted(run_offsets, positions, side='right') - 1]
+
+            candidates = run_offsets[np.flatnonzero(line[:-1] > line[1:]) + 1]
+        if self.last_bits[ch] and not line[0]:
+            candidates = np.concatenate(([0], candidates))
+
+        # A glitch shorter than half a bit is not a start bit, the search goes on after it.
+        # A real start bit owns the samples up to the middle of its last stop bit.
+        start_mids = candidates + offsets[0]
+        frame_ends = candidates + offsets[-1]
+        valid = np.zeros(len(candidates), dtype=bool)
+        in_range = start_mids < num_samples
+        valid[in_range] = ~level_at(start_mids[in_range])
+        next_candidates = np.where(
+            valid, np.searchsorted(candidates, frame_ends, side='right'), np.arange(1, len(candidates) + 1)
+        )
+        needed = np.where(valid, frame_ends, start_mids)
+
+        # Walk the chain of frames, one step per frame rather than per sample
+        accepted = []
+        pending = None
+        next_list = next_candidates.tolist()
+        needed_list = needed.tolist()
+        valid_list = valid.tolist()
+        k = 0
+        while k < len(candidates):
+            if needed_list[k] >= num_samples:
+                pending = k
+                break
+            if valid_list[k]:
+                accepted.append(k)
+            k = next_list[k]
+
+        if pending is None:
+            self.tails[ch] = np.empty(0, dtype=bool)
+            self.tail_starts[ch] = line_start + num_samples
+            self.last_bits[ch] = int(line[-1])
+        else:
+            first = int(candidates[pending])
+            if run_offsets is None:
+                self.tails[ch] = line[first:]
+            else:
+                run = int(np.searchsorted(run_offsets, first, side='right')) - 1
+                lengths = np.diff(np.append(run_offsets[run:], num_samples))
+                lengths[0] -= first - run_offsets[run]
+                self.tails[ch] = np.repeat(line[run:], lengths)
+            self.tail_starts[ch] = line_start + first
+            self.last_bits[ch] = 1  # The carried part starts with a falling edge
+
+        frames = candidates[accepted]
+        bits = level_at(frames[:, None] + offsets[None, :])
+        data = bits[:, 1:1 + data_bits]
+        # Data bits arrive LSB first, packbits does the shifting
+        packed = np.packbits(data, axis=1, bitorder='little').astype(np.int64)
+        values = packed[:, 0]
+        if data_bits > 8:
+            values = values | (packed[:, 1] << 8)
+        if parity == 'None':
+            parity_errors = np.zeros(len(frames), dtype=bool)
+        else:
+            ones = np.count_nonzero(data, axis=1) + bits[:, 1 + data_bits]
+            parity_errors = ones % 2 != (0 if parity == 'Even' else 1)
+        stop = bits[:, 1 + data_bits + PARITY_BITS[parity]:]
+        framing_errors = ~stop.all(axis=1)
+        breaks = ~bits.any(axis=1)
+        frames += line_start
+        return frames, frames + offsets[-1], values, parity_errors, framing_errors, breaks
+
+
+class UARTPlugin(DecoderPlugin):
+    """
+    Configs without a sample rate take the decoder's, the one the capture was taken at.
+    """
+
+    name = 'uart'
+    label = 'UART'
+    mode = 'UART'
+    display = 'UART:UARTDisplay'
+    channels = ('data_channel',)
+    settings = {
+        'channel': ('data_channel', int), 'baud': ('baud_rate', int), 'data_bits': ('data_bits', int),
+        'parity': ('parity', str), 'stop_bits': ('stop_bits', int), 'polarity': ('polarity', str),
+    }
+    defaults = {
+        'data_channel': 1, 'polarity': 'Standard', 'data_bits': 8, 'parity': 'None', 'stop_bits': 1,
+        'data_format': 'Hex', 'baud_rate': 9600, 'enabled': True,
+    }
+    group_key = 'channel'
+
+    def group_config(self, group_idx):
+        # Alone, the channel would default to the first data line instead of its own
+        return dict(self.configs[group_idx], data_channel=self.configs[group_idx].get('data_channel', group_idx + 1))
+
+    def reset(self):
+        if self.sample_rate is not None:
+            for config in self.configs:
+                if config.get('sample_rate') is None:
+                    config['sample_rate'] = self.sample_rate
+        self.decoder = UARTDecoder(len(self.configs), self.name)
+
+    def decode_events(self, samples, start_idx):
+        return self.decoder.decode(samples, start_idx, self.configs)
+
+    def decode_run_events(self, indices, values, stop_idx):
+        return self.decoder.decode_runs(indices, values, stop_idx, self.configs)
+
+    def decode(self, samples, start_idx):
+        return self.decode_events(samples, start_idx)  # Tagged by the decoder already
+
+    def decode_runs(self, indices, values, stop_idx):
+        return self.decode_run_events(indices, values, stop_idx)
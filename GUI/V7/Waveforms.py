@@ -0,0 +1,195 @@
+# Waveforms.py
+
+import numpy as np
+
+
+class WaveformBuilder:
+    """
+    Builds packed 8-channel sample arrays from a sequence of pin changes and delays,
+    the same way the bit-banging generators in GUI/TEST drive GPIO pins with sleeps.
+    """
+
+    def __init__(self, initial_value=0xFF):
+        self.value = initial_value
+        self.values = []
+        self.durations = []
+
+    def set(self, channel, level):
+        if level:
+            self.value |= 1 << channel
+        else:
+            self.value &= ~(1 << channel) & 0xFF
+
+    def hold(self, num_samples):
+        if num_samples > 0:
+            self.values.append(self.value)
+            self.durations.append(int(num_samples))
+
+    def samples(self):
+        return np.repeat(np.array(self.values, dtype=np.uint8), self.durations)
+
+
+def add_i2c_transaction(builder, data, scl_channel, sda_channel, bit_delay=4, acks=None, stop=True):
+    """
+    START, each byte MSB first followed by an ACK clock, then STOP. Follows
+    GUI/TEST/I2C_Signal_Gen.py with bit_delay samples in place of BIT_DELAY.
+
+    acks are the SDA levels of the ACK clocks, all 0 (acknowledged) by default. Without
+    stop the bus is left for the repeated START of the next transaction.
+    """
+    if not (builder.value >> scl_channel) & 1:
+        # Repeated START: SDA is released while SCL is still low
+        builder.set(sda_channel, 1)
+        builder.hold(bit_delay)
+    # Start: SDA falls while SCL is high, then SCL goes low
+    builder.set(sda_channel, 1)
+    builder.set(scl_channel, 1)
+    builder.hold(bit_delay)
+    builder.set(sda_channel, 0)
+    builder.hold(bit_delay)
+    builder.set(scl_channel, 0)
+    builder.hold(bit_delay)
+    for i, byte in enumerate(data):
+        for bit in range(8):
+            builder.set(sda_channel, (byte >> (7 - bit)) & 1)
+            builder.hold(bit_delay)
+            builder.set(scl_channel, 1)
+            builder.hold(bit_delay)
+            builder.set(scl_channel, 0)
+            builder.hold(bit_delay)
+        # ACK clock, the device pulls SDA low
+        builder.set(sda_channel, acks[i] if acks else 0)
+        builder.hold(bit_delay)
+        builder.set(scl_channel, 1)
+        builder.hold(bit_delay)
+        builder.set(scl_channel, 0)
+        builder.hold(bit_delay)
+    if not stop:
+        return
+    # Stop: SDA rises while SCL is high
+    builder.set(sda_channel, 0)
+    builder.set(scl_channel, 1)
+    builder.hold(bit_delay)
+    builder.set(sda_channel, 1)
+    builder.hold(bit_delay)
+
+
+def make_i2c_capture(num_transactions, scl_channel=1, sda_channel=0, bit_delay=4,
+                     idle_samples=200, max_bytes=8, seed=0):
+    """
+    Random write transactions (address byte plus 1..max_bytes data bytes) separated by idle time.
+    """
+    rng = np.random.default_rng(seed)
+    builder = WaveformBuilder()
+    builder.hold(idle_samples)
+    for _ in range(num_transactions):
+        num_bytes = int(rng.integers(1, max_bytes + 1))
+        data = rng.integers(0, 256, num_bytes + 1).tolist()
+        add_i2c_transaction(builder, data, scl_channel, sda_channel, bit_delay)
+        builder.hold(int(rng.integers(1, idle_samples + 1)))
+    return builder.samples()
+
+
+def add_spi_transfer(builder, mosi_words, miso_words, ss_channel, clk_channel, mosi_channel,
+                     miso_channel, bits=8, mode=0, first_bit='MSB', bit_delay=4):
+    """
+    One SS-low transfer of several words. Follows GUI/TEST/SPI_Signal_Gen.py, generalised
+    to the four SPI modes: data changes on the shifting edge and is stable on the sampling
+    edge. bit_delay samples stand in for BIT_DELAY.
+    """
+    cpol = 1 if mode in (2, 3) else 0
+    cpha = 1 if mode in (1, 3) else 0
+    builder.set(clk_channel, cpol)
+    builder.set(ss_channel, 0)
+    builder.hold(bit_delay)
+    for mosi_word, miso_word in zip(mosi_words, miso_words):
+        for bit in range(bits):
+            shift = bits - 1 - bit if first_bit == 'MSB' else bit
+            if cpha:
+                # Leading edge shifts, trailing edge samples
+                builder.set(clk_channel, 1 - cpol)
+            builder.set(mosi_channel, (mosi_word >> shift) & 1)
+            builder.set(miso_channel, (miso_word >> shift) & 1)
+            builder.hold(bit_delay)
+            builder.set(clk_channel, cpol if cpha else 1 - cpol)
+            builder.hold(bit_delay)
+            if not cpha:
+                # Trailing edge returns the clock to idle
+                builder.set(clk_channel, cpol)
+                builder.hold(bit_delay)
+    builder.set(clk_channel, cpol)
+    builder.hold(bit_delay)
+    builder.set(ss_channel, 1)
+    builder.hold(bit_delay)
+
+
+def make_spi_capture(num_transfers, ss_channel=0, clk_channel=1, mosi_channel=2, miso_channel=3,
+                     bits=8, mode=0, first_bit='MSB', bit_delay=4, idle_samples=200, max_words=8, seed=0):
+    """
+    Random transfers of 1..max_words words separated by idle time.
+
+    Returns (samples, mosi_words, miso_words) with the words in the order they were sent.
+    """
+    rng = np.random.default_rng(seed)
+    builder = WaveformBuilder()
+    builder.set(clk_channel, 1 if mode in (2, 3) else 0)
+    builder.hold(idle_samples)
+    all_mosi = []
+    all_miso = []
+    for _ in range(num_transfers):
+        num_words = int(rng.integers(1, max_words + 1))
+        mosi_words = rng.integers(0, 1 << bits, num_words, dtype=np.uint64).tolist()
+        miso_words = rng.integers(0, 1 << bits, num_words, dtype=np.uint64).tolist()
+        add_spi_transfer(builder, mosi_words, miso_words, ss_channel, clk_channel, mosi_channel,
+                         miso_channel, bits, mode, first_bit, bit_delay)
+        builder.hold(int(rng.integers(1, idle_samples + 1)))
+        all_mosi.extend(mosi_words)
+        all_miso.extend(miso_words)
+    return builder.samples(), all_mosi, all_miso
+
+
+def uart_frame_levels(value, data_bits=8, parity='None', stop_bits=1):
+    """
+    Line levels of one frame: start bit, data bits LSB first, optional parity, stop bits.
+    """
+    data = [(value >> i) & 1 for i in range(data_bits)]
+    levels = [0] + data
+    if parity == 'Even':
+        levels.append(sum(data) % 2)
+    elif parity == 'Odd':
+        levels.append(1 - sum(data) % 2)
+    return levels + [1] * stop_bits
+
+
+def add_uart_levels(builder, levels, channel, samples_per_bit, phase=0.0):
+    """
+    Drives one channel through bit levels of samples_per_bit samples each, which may be
+    fractional: bit boundaries are rounded from the exact times, starting phase samples in,
+    like GUI/TEST/UART_Signal.py holding each level for 1 / baud_rate seconds.
+    """
+    boundaries = np.round(phase + np.arange(len(levels) + 1) * samples_per_bit).astype(int)
+    for level, duration in zip(levels, np.diff(boundaries).tolist()):
+        builder.set(channel, level)
+        builder.hold(duration)
+
+
+def make_uart_capture(num_frames, channel=0, samples_per_bit=16, data_bits=8, parity='None',
+                      stop_bits=1, max_idle_bits=3, seed=0):
+    """
+    Random frames separated by 0..max_idle_bits bit times of idle line, each frame at a
+    random sub-sample phase.
+
+    Returns (samples, values). Captures of different channels can be combined with
+    np.bitwise_and, the other channels stay idle high.
+    """
+    rng = np.random.default_rng(seed)
+    builder = WaveformBuilder()
+    builder.hold(int(np.ceil(samples_per_bit)))
+    values = rng.integers(0, 1 << data_bits, num_frames).tolist()
+    for value in values:
+        levels = uart_frame_levels(value, data_bits, parity, stop_bits)
+        add_uart_levels(builder, levels, channel, samples_per_bit, rng.random())
+        builder.set(channel, 1)
+        builder.hold(int(rng.integers(0, max_idle_bits + 1) * samples_per_bit))
+    builder.hold(int(np.ceil(samples_per_bit)))
+    return builder.samples(), values
@@ -0,0 +1,933 @@
+# benchmark.py
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import numpy as np
+from SquareWave import build_square_wave
+from collections import deque
+from datetime import datetime, timezone
+from unittest import mock
+from PyQt6.QtCore import QEvent, QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+from InterfaceCommands import send_stop
+from Transport import SampleDecoder, LoopStats, encode_frame, ASCII_MODE, BINARY_MODE
+from SampleBuffer import SampleRingBuffer
+from LevelOfDetail import MAPPED_MIN_BLOCK_SIZE, MinMaxPyramid
+from CaptureFile import load_capture, make_header, save_capture
+from Recorder import CaptureRecorder, recording_segments
+from Interchange import SigrokImport, VCDImport, export_sigrok, export_vcd
+from Transitions import TransitionStore
+from I2CDecoder import I2CDecoder
+from SPIDecoder import SPIDecoder
+from UARTDecoder import UARTDecoder
+from Decoders import PAYLOAD_LIMIT, DecoderSet, create_decoder, load_decoder
+from DecodePool import DecodePool
+from Waveforms import make_i2c_capture, make_spi_capture, make_uart_capture
+from Acquisition import AcquisitionService
+from Signal import SerialWorker
+from RenderScheduler import RenderScheduler
+from Trigger import TriggerEngine, parse_trigger_condition
+from fixtures import (
+    SAMPLE_RATE, I2C_GROUP_CONFIGS, SPI_GROUP_CONFIGS, LegacyI2CDecoder, LegacySPIDecoder, LegacyUARTDecoder,
+    decode_in_chunks, decode_stacked, find_in_chunks, gate_in_chunks, get_application, legacy_trigger_gate,
+    make_channel_bits, make_mixed_capture, make_multichannel_uart, make_pool_decoders, make_register_capture,
+    make_uart_configs, run_event_loop,
+)
+
+SAMPLE_SIZES = [4096, 65536, 1048576]
+
+
+def legacy_square_wave(bits, sample_rate, level_offset):
+    # Per-sample loop used by update_plot before build_square_wave
+    num_samples = len(bits)
+    t = np.arange(num_samples) / sample_rate
+    square_wave_time = []
+    square_wave_data = []
+    for j in range(1, num_samples):
+        square_wave_time.extend([t[j - 1], t[j]])
+        level = bits[j - 1] + level_offset
+        square_wave_data.extend([level, level])
+        if bits[j] != bits[j - 1]:
+            square_wave_time.append(t[j])
+            level = bits[j] + level_offset
+            square_wave_data.append(level)
+    return square_wave_time, square_wave_data
+
+
+def time_call(func, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_square_wave(channels=8, include_legacy=True):
+    print(f"Square wave build, {channels} channels per frame")
+    print(f"{'samples':>10} {'vectorized (ms)':>16} {'legacy (ms)':>12} {'speedup':>8}")
+    for num_samples in SAMPLE_SIZES:
+        bits = make_channel_bits(num_samples)
+        vectorized = time_call(build_square_wave, bits, SAMPLE_RATE, 2) * channels
+        if include_legacy:
+            legacy_bits = list(bits)
+            legacy = time_call(legacy_square_wave, legacy_bits, SAMPLE_RATE, 2, repeat=1) * channels
+            print(f"{num_samples:>10} {vectorized * 1e3:>16.3f} {legacy * 1e3:>12.1f} {legacy / vectorized:>7.0f}x")
+        else:
+            print(f"{num_samples:>10} {vectorized * 1e3:>16.3f} {'-':>12} {'-':>8}")
+
+
+def legacy_ascii_parse(raw_data):
+    # Line parse used by SerialWorker.run before SampleDecoder
+    values = []
+    for line in raw_data.splitlines():
+        try:
+            values.append(int(line.strip()))
+        except ValueError:
+            continue
+    return values
+
+
+def bench_transport(num_samples=1048576, link_bytes_per_second=1e6):
+    # USB full-speed CDC typically sustains around 1 MB/s of payload
+    samples = np.random.default_rng(0).integers(0, 256, num_samples).astype(np.uint8)
+    ascii_stream = b''.join(b'%d\r\n' % value for value in samples.tolist())
+    binary_stream = b''.join(
+        encode_frame(samples[i:i + 240], sequence)
+        for sequence, i in enumerate(range(0, num_samples, 240))
+    )
+
+    print(f"Transport decode, {num_samples} samples")
+    print(f"{'transport':>16} {'bytes/sample':>13} {'decode (ms)':>12} {'link-limited samples/s':>23}")
+    rows = [
+        ('ascii (legacy)', ascii_stream, lambda: legacy_ascii_parse(ascii_stream)),
+        ('ascii', ascii_stream, lambda: SampleDecoder(ASCII_MODE).feed(ascii_stream)),
+        ('binary', binary_stream, lambda: SampleDecoder(BINARY_MODE).feed(binary_stream)),
+    ]
+    for name, stream, decode in rows:
+        elapsed = time_call(decode, repeat=3)
+        bytes_per_sample = len(stream) / num_samples
+        print(f"{name:>16} {bytes_per_sample:>13.2f} {elapsed * 1e3:>12.1f} "
+              f"{link_bytes_per_second / bytes_per_sample:>23.0f}")
+
+
+def legacy_deque_fill(samples, buffer_size, channels=8):
+    # Per-channel deques filled one value at a time, as handle_data did before SampleRingBuffer
+    buffers = [deque(maxlen=buffer_size) for _ in range(channels)]
+    for value in samples:
+        for i in range(channels):
+            buffers[i].append((value >> i) & 1)
+    return [np.array(buffer) for buffer in buffers]
+
+
+def ring_buffer_fill(samples, buffer_size, chunk_size=240):
+    buffer = SampleRingBuffer(buffer_size)
+    for i in range(0, len(samples), chunk_size):
+        buffer.append(samples[i:i + chunk_size])
+    return buffer.bit_planes()
+
+
+def bench_sample_buffer(buffer_size=65536, include_legacy=True):
+    print(f"Sample storage, buffer of {buffer_size} samples, 8 channels")
+    print(f"{'samples':>10} {'ring buffer (ms)':>17} {'deques (ms)':>12} {'speedup':>8}")
+    for num_samples in SAMPLE_SIZES:
+        samples = np.random.default_rng(0).integers(0, 256, num_samples).astype(np.uint8)
+        ring = time_call(ring_buffer_fill, samples, buffer_size, repeat=3)
+        if include_legacy:
+            legacy = time_call(legacy_deque_fill, samples.tolist(), buffer_size, repeat=1)
+            print(f"{num_samples:>10} {ring * 1e3:>17.2f} {legacy * 1e3:>12.1f} {legacy / ring:>7.0f}x")
+        else:
+            print(f"{num_samples:>10} {ring * 1e3:>17.2f} {'-':>12} {'-':>8}")
+
+
+def bench_level_of_detail(num_samples=10000000, pixel_width=1920, chunk_size=65536):
+    # Every channel gets its own random run lengths
+    samples = np.zeros(num_samples, dtype=np.uint8)
+    for channel in range(8):
+        samples |= make_channel_bits(num_samples, seed=channel) << channel
+
+    buffer = SampleRingBuffer(num_samples)
+    pyramid = MinMaxPyramid(buffer)
+    start = time.perf_counter()
+    for i in range(0, num_samples, chunk_size):
+        buffer.append(samples[i:i + chunk_size])
+        pyramid.update()
+    build = time.perf_counter() - start
+
+    print(f"Level of detail, {num_samples} samples, {pixel_width} px wide plot, 8 channels per frame")
+    print(f"  pyramid built incrementally in {build * 1e3:.0f} ms ({chunk_size} sample chunks)")
+    print(f"{'visible samples':>16} {'render (ms)':>12} {'vertices':>9} {'full trace (ms)':>16} {'vertices':>9}")
+    bits = samples & 1
+    full = time_call(build_square_wave, bits, SAMPLE_RATE, 0, repeat=1)
+    full_vertices = len(build_square_wave(bits, SAMPLE_RATE, 0)[0])
+    for visible in (num_samples, 100000, 1000):
+        x_range = (0.0, visible / SAMPLE_RATE)
+        elapsed = time_call(lambda: (pyramid.traces.clear(), pyramid.square_wave(0, SAMPLE_RATE, 0, x_range, pixel_width)),
+                            repeat=3)
+        vertices = len(pyramid.square_wave(0, SAMPLE_RATE, 0, x_range, pixel_width)[0])
+        print(f"{visible:>16} {elapsed * 8e3:>12.2f} {vertices:>9} {full * 8e3:>16.1f} {full_vertices:>9}")
+
+
+def bench_incremental_trace(capacity=1048576, new_samples=1000, frames=200, pixel_width=1920):
+    # A full buffer taking new_samples per frame, drawn whole and zoomed in on the newest samples
+    samples = make_busy_samples(capacity + new_samples * (frames + 1))
+    print(f"Trace per frame, {capacity} sample buffer, {new_samples} new samples per frame, 8 channels")
+    print(f"{'view':>16} {'rebuilt (ms)':>13} {'kept (ms)':>10}")
+    for name, visible in (('whole buffer', capacity), ('newest samples', 4 * pixel_width)):
+        results = []
+        for keep in (False, True):
+            buffer = SampleRingBuffer(capacity)
+            buffer.append(samples[:capacity])
+            pyramid = MinMaxPyramid(buffer)
+            x_range = ((capacity - visible) / SAMPLE_RATE, capacity / SAMPLE_RATE)
+            elapsed = 0.0
+            for frame in range(frames):
+                start = capacity + frame * new_samples
+                buffer.append(samples[start:start + new_samples])
+                pyramid.update()
+                if not keep:
+                    pyramid.traces.clear()
+                begin = time.perf_counter()
+                for channel in range(8):
+                    pyramid.square_wave(channel, SAMPLE_RATE, 0, x_range, pixel_width)
+                elapsed += time.perf_counter() - begin
+            results.append(elapsed / frames * 1e3)
+        print(f"{name:>16} {results[0]:>13.3f} {results[1]:>10.3f}")
+
+
+def make_bursty_samples(num_samples, burst_length=2000, idle_length=50000, seed=0):
+    # Bus traffic in short bursts separated by long idle stretches, where all lines sit high
+    samples = np.full(num_samples, 0xFF, dtype=np.uint8)
+    period = burst_length + idle_length
+    burst = np.zeros(burst_length, dtype=np.uint8)
+    for channel in range(8):
+        burst |= make_channel_bits(burst_length, seed=seed + channel) << channel
+    for start in range(0, num_samples, period):
+        chunk = burst[:num_samples - start]
+        samples[start:start + len(chunk)] = chunk
+    return samples
+
+
+def bench_capture_file(num_samples=100000000, pixel_width=1920):
+    samples = make_bursty_samples(num_samples)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.lacap')
+        start = time.perf_counter()
+        save_capture(path, samples, SAMPLE_RATE, [f"Ch{i}" for i in range(8)])
+        save = time.perf_counter() - start
+        del samples
+
+        start = time.perf_counter()
+        capture = load_capture(path)
+        buffer = SampleRingBuffer.wrap(capture.samples)
+        pyramid = MinMaxPyramid(buffer, min_block_size=MAPPED_MIN_BLOCK_SIZE)
+        opened = time.perf_counter() - start
+        start = time.perf_counter()
+        pyramid.square_wave(0, SAMPLE_RATE, 0, (0.0, num_samples / SAMPLE_RATE), pixel_width)
+        first_draw = time.perf_counter() - start
+        redraw = time_call(pyramid.square_wave, 0, SAMPLE_RATE, 0, (0.0, num_samples / SAMPLE_RATE), pixel_width, repeat=3)
+        middle = num_samples / 2 / SAMPLE_RATE
+        zoomed = time_call(pyramid.square_wave, 0, SAMPLE_RATE, 0, (middle, middle + 10.0), pixel_width, repeat=3)
+        pyramid_bytes = sum(level.nbytes for level in pyramid.and_levels + pyramid.or_levels)
+
+        print(f"Capture file, {num_samples / 1e6:.0f} MB of samples")
+        print(f"  save {save * 1e3:.0f} ms, open {opened * 1e3:.2f} ms, first full-range draw {first_draw * 1e3:.0f} ms")
+        print(f"  redraw per channel: full range {redraw * 1e3:.2f} ms, 10000 samples {zoomed * 1e3:.2f} ms")
+        print(f"  pyramid {pyramid_bytes / 1e6:.1f} MB ({pyramid_bytes / len(capture) * 100:.1f}% of the file)")
+        del pyramid, buffer, capture
+
+
+def bench_transitions(num_samples=20000000, pixel_width=1920, chunk_size=1 << 20):
+    samples = make_bursty_samples(num_samples)
+    build = time_call(TransitionStore.from_samples, samples, repeat=1)
+    store = TransitionStore.from_samples(samples)
+    print(f"Transition storage, {num_samples} samples of bursty bus traffic")
+    print(f"  raw {samples.nbytes / 1e6:.1f} MB, transitions {store.nbytes() / 1e6:.2f} MB "
+          f"({len(store)} entries, {samples.nbytes / store.nbytes():.0f}x smaller), built in {build * 1e3:.0f} ms")
+
+    # A raw-level frame, zoomed in on a burst, from the samples and from the runs
+    x_range = (0.0, pixel_width * 4 / SAMPLE_RATE)
+    for label, buffer in (('samples', SampleRingBuffer.wrap(samples)), ('runs', SampleRingBuffer.wrap(samples, store))):
+        pyramid = MinMaxPyramid(buffer, min_block_size=MAPPED_MIN_BLOCK_SIZE)
+        pyramid.update()
+        elapsed = time_call(lambda: (pyramid.traces.clear(), pyramid.square_wave(0, SAMPLE_RATE, 0, x_range, pixel_width)))
+        print(f"  raw trace of {pixel_width * 4} samples from {label}: {elapsed * 1e3:.3f} ms")
+
+    # Decoding an opened capture: 4 I2C groups over bursts of traffic with idle bus in between
+    capture = make_i2c_capture(4000, bit_delay=8, idle_samples=20000)
+    configs = [dict(I2C_GROUP_CONFIGS[0]) for _ in range(4)]
+    capture_store = TransitionStore.from_samples(capture)
+    decoder = create_decoder('i2c', configs)
+    from_samples = time_call(lambda: (decoder.reset(), decode_in_chunks(decoder.decode, capture, chunk_size)), repeat=3)
+    from_runs = time_call(
+        lambda: (decoder.reset(), [decoder.decode_runs(*runs) for runs in capture_store.chunks()]), repeat=3
+    )
+    print(f"  decode {len(capture) / 1e6:.1f} M samples of I2C, 4 groups: from samples {from_samples * 1e3:.0f} ms, "
+          f"from {len(capture_store)} runs {from_runs * 1e3:.0f} ms")
+
+
+def bench_recorder(num_samples=200000000, chunk_size=100000, segment_samples=1 << 26):
+    # Acquisition-side cost of record() and the rate the writer thread sustains
+    chunk = (np.arange(chunk_size) % 251).astype(np.uint16)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.lacap')
+        recorder = CaptureRecorder(path, make_header(SAMPLE_RATE, [f"Ch{i}" for i in range(8)]), segment_samples)
+        recorder.start()
+        longest = 0.0
+        start = time.perf_counter()
+        for start_idx in range(0, num_samples, chunk_size):
+            put_start = time.perf_counter()
+            recorder.record(chunk, start_idx)
+            longest = max(longest, time.perf_counter() - put_start)
+        recorder.stop()
+        elapsed = time.perf_counter() - start
+        segments = recording_segments(path)
+        assert sum(len(load_capture(segment)) for segment in segments) == recorder.written_samples
+        print(f"Recorder, {num_samples / 1e6:.0f} M samples offered in {chunk_size} sample chunks")
+        print(f"  {recorder.written_samples / elapsed / 1e6:.0f} M samples/s written to {len(segments)} segments, "
+              f"{recorder.dropped_samples} dropped, longest record() call {longest * 1e3:.1f} ms")
+
+
+def bench_interchange(num_samples=20000000):
+    samples = make_bursty_samples(num_samples)
+    names = [f"Ch{i}" for i in range(8)]
+    transitions = np.count_nonzero(samples[1:] != samples[:-1]) + 1
+    with tempfile.TemporaryDirectory() as directory:
+        capture_path = os.path.join(directory, 'bench.lacap')
+        save_capture(capture_path, samples, SAMPLE_RATE, names)
+        capture = load_capture(capture_path)
+        print(f"Interchange, {num_samples} samples of bursty bus traffic, {transitions} transitions, "
+              f"from a memory-mapped capture")
+        for label, export, importer, extension in (
+            ('VCD', export_vcd, VCDImport, '.vcd'),
+            ('sigrok', export_sigrok, SigrokImport, '.sr'),
+        ):
+            path = os.path.join(directory, 'bench' + extension)
+            elapsed = time_call(export, path, capture.samples, SAMPLE_RATE, names, repeat=1)
+            tracemalloc.start()  # Separate run, tracing slows Python code down
+            export(path, capture.samples, SAMPLE_RATE, names)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            start = time.perf_counter()
+            imported = sum(len(chunk) for _, chunk in importer(path).chunks())
+            import_time = time.perf_counter() - start
+            assert imported == num_samples
+            print(f"  {label:>6}: export {elapsed * 1e3:.0f} ms, peak {peak / 1e6:.1f} MB, "
+                  f"{os.path.getsize(path) / 1e6:.1f} MB file, import {import_time * 1e3:.0f} ms")
+        del capture
+
+
+def bench_i2c_decoder(num_samples=1048576, chunk_size=65536):
+    samples = make_i2c_capture(num_samples // 400, bit_delay=8)[:num_samples]
+    decoder = I2CDecoder()
+    legacy = time_call(decode_in_chunks, LegacyI2CDecoder(I2C_GROUP_CONFIGS).decode, samples, chunk_size, repeat=1)
+    vectorized = time_call(
+        decode_in_chunks, lambda chunk, idx: decoder.decode(chunk, idx, I2C_GROUP_CONFIGS), samples, chunk_size
+    )
+    print(f"I2C decode, {len(samples)} samples, 4 groups")
+    print(f"  per sample {legacy * 1e3:.0f} ms, edge driven {vectorized * 1e3:.1f} ms, {legacy / vectorized:.0f}x faster")
+
+
+def bench_spi_decoder(num_samples=1048576, chunk_size=65536):
+    samples = make_spi_capture(num_samples // 400, bit_delay=8)[0][:num_samples]
+    decoder = SPIDecoder()
+    legacy = time_call(decode_in_chunks, LegacySPIDecoder(SPI_GROUP_CONFIGS).decode, samples, chunk_size, repeat=1)
+    vectorized = time_call(
+        decode_in_chunks, lambda chunk, idx: decoder.decode(chunk, idx, SPI_GROUP_CONFIGS), samples, chunk_size
+    )
+    print(f"SPI decode, {len(samples)} samples, 2 groups")
+    print(f"  per sample {legacy * 1e3:.0f} ms, vectorized {vectorized * 1e3:.1f} ms, {legacy / vectorized:.0f}x faster")
+
+
+def bench_uart_decoder(num_samples=1048576, chunk_size=65536, samples_per_bit=16):
+    # 8 channels at 1 Mbaud captured at 16 MS/s
+    samples, _ = make_multichannel_uart(num_samples // (12 * samples_per_bit), samples_per_bit)
+    samples = samples[:num_samples]
+    uart_configs = make_uart_configs(samples_per_bit)
+    decoder = UARTDecoder()
+    legacy = time_call(decode_in_chunks, LegacyUARTDecoder(uart_configs).decode, samples, chunk_size, repeat=1)
+    events = time_call(
+        decode_in_chunks, lambda chunk, idx: decoder.decode(chunk, idx, uart_configs), samples, chunk_size
+    )
+
+    def decode_all_frames(chunk, idx):
+        return [decoder.decode_frames(chunk, idx, ch, uart_config) for ch, uart_config in enumerate(uart_configs)]
+
+    decoder.reset()
+    frames = time_call(decode_in_chunks, decode_all_frames, samples, chunk_size)
+    capture_time = len(samples) / (1e6 * samples_per_bit)
+    print(f"UART decode, {len(samples)} samples, 8 channels at 1 Mbaud, 16 MS/s ({capture_time * 1e3:.1f} ms of capture)")
+    print(f"  per sample {legacy * 1e3:.0f} ms, frame arrays {frames * 1e3:.1f} ms, "
+          f"event dicts {events * 1e3:.1f} ms, {legacy / events:.0f}x faster")
+
+
+def bench_decoder_plugins(chunk_size=65536, repeat=3):
+    # The plugin layer over the decoders, and three decoders in one pass over a mixed capture
+    samples, configs = make_mixed_capture(2500)
+    engines = {'i2c': I2CDecoder(1), 'spi': SPIDecoder(1), 'uart': UARTDecoder(1)}
+    print(f"Decoder plugins, {len(samples)} samples, I2C + SPI + UART")
+    print(f"{'decoder':>8} {'direct (ms)':>12} {'plugin (ms)':>12} {'events':>8}")
+    direct_total = 0.0
+    for name, engine in engines.items():
+        direct = time_call(decode_in_chunks, lambda chunk, idx: engine.decode(chunk, idx, configs[name]),
+                           samples, chunk_size, repeat=repeat)
+        plugin = create_decoder(name, configs[name])
+        through_plugin = time_call(decode_in_chunks, plugin.decode, samples, chunk_size, repeat=repeat)
+        events = len(decode_in_chunks(plugin.decode, samples, chunk_size))
+        print(f"{name:>8} {direct * 1e3:>12.1f} {through_plugin * 1e3:>12.1f} {events:>8}")
+        direct_total += direct
+    decoders = DecoderSet(create_decoder(name, configs[name]) for name in engines)
+    merged = time_call(decode_in_chunks, decoders.decode, samples, chunk_size, repeat=repeat)
+    print(f"  all three in one pass {merged * 1e3:.1f} ms, merged in sample order "
+          f"(separately {direct_total * 1e3:.1f} ms, unmerged)")
+
+
+def bench_stacked_decoders(chunk_size=65536):
+    # One long sequential EEPROM read: time should follow the length, memory should not
+    print(f"Stacked decode of one long EEPROM read, {chunk_size} sample chunks")
+    print(f"{'bytes read':>10} {'samples':>10} {'i2c (ms)':>9} {'+eeprom (ms)':>13} {'ns/sample':>10} {'peak (kB)':>10}")
+    config = load_decoder('eeprom').make_config()
+    for read_bytes in (4096, 16384, 65536):
+        samples = make_register_capture(read_bytes)
+        lower = time_call(decode_in_chunks, create_decoder('i2c', [dict(config)]).decode, samples, chunk_size, repeat=3)
+        decoder = create_decoder('eeprom', [dict(config)])
+        stacked = time_call(decode_stacked, decoder, samples, chunk_size, repeat=3)
+        # Memory held by the decoders while decoding, the events handed out are not kept
+        decoder.reset()
+        tracemalloc.start()
+        pieces = 0
+        for start in range(0, len(samples), chunk_size):
+            for event in decoder.decode(samples[start:start + chunk_size], start):
+                assert len(event['data']) <= PAYLOAD_LIMIT
+                pieces += 1
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert pieces == 2 + -(-read_bytes // PAYLOAD_LIMIT)
+        print(f"{read_bytes:>10} {len(samples):>10} {lower * 1e3:>9.1f} {stacked * 1e3:>13.1f} "
+              f"{stacked * 1e9 / len(samples):>10.1f} {peak / 1024:>10.0f}")
+
+
+def bench_decode_pool(chunk_size=16384):
+    # Time the acquisition thread spends per chunk, decoding inline against handing it to the pool
+    samples = make_mixed_capture(25000)[0]
+    num_chunks = -(-len(samples) // chunk_size)
+    decoders = DecoderSet(make_pool_decoders())
+    inline = time_call(decode_in_chunks, decoders.decode, samples, chunk_size, repeat=3)
+    print(f"Decode pool, {len(samples)} mixed samples in {chunk_size} sample chunks, 8 lanes, {os.cpu_count()} CPUs")
+    print(f"{'decoding':>12} {'per chunk (ms)':>15} {'total (ms)':>11} {'startup (ms)':>13}")
+    print(f"{'inline':>12} {inline * 1e3 / num_chunks:>15.3f} {inline * 1e3:>11.1f} {'':>13}")
+    for processes in (1, 2, 4):
+        start = time.perf_counter()
+        pool = DecodePool(make_pool_decoders(), lambda annotations: None, processes)
+        pool.submit(samples[:1], 0, wait=True)
+        while pool.in_flight:
+            time.sleep(0.001)
+        started = time.perf_counter()
+        submit_time = 0.0
+        for i in range(0, len(samples), chunk_size):
+            submit_start = time.perf_counter()
+            pool.submit(samples[i:i + chunk_size], i + 1, wait=True)
+            submit_time += time.perf_counter() - submit_start
+        while pool.in_flight:
+            time.sleep(0.001)
+        total = time.perf_counter() - started
+        pool.close()
+        print(f"{f'{processes} process' + ('es' if processes > 1 else ''):>12} {submit_time * 1e3 / num_chunks:>15.3f} "
+              f"{total * 1e3:>11.1f} {(started - start) * 1e3:>13.0f}")
+
+
+def bench_trigger(num_samples=1048576, chunk_size=65536, include_legacy=True):
+    # Worst case: a trigger far into a busy capture, so every chunk before it is searched
+    samples = make_busy_samples(num_samples) & 0x7F
+    samples[-1] |= 0x80
+    modes = ['No Trigger'] * 7 + ['Rising Edge']
+    chunks = [samples[i:i + chunk_size] for i in range(0, num_samples, chunk_size)]
+
+    def vectorized():
+        engine = TriggerEngine()
+        engine.set_trigger_modes(modes)
+        return gate_in_chunks(engine, samples, chunk_size)
+
+    engine_time = time_call(vectorized)
+    print(f"Trigger search, {num_samples} samples in {chunk_size}-sample chunks, edge on the last sample")
+    if include_legacy:
+        legacy_time = time_call(legacy_trigger_gate, chunks, modes, repeat=1)
+        print(f"  per sample {legacy_time * 1e3:.0f} ms, masks {engine_time * 1e3:.2f} ms, "
+              f"{legacy_time / engine_time:.0f}x faster")
+    else:
+        print(f"  masks {engine_time * 1e3:.2f} ms")
+
+
+def bench_trigger_conditions(num_samples=1048576, chunk_size=65536):
+    # Conditions that never fire, so every chunk is searched: the cost per chunk while waiting
+    samples = make_busy_samples(num_samples) & 0x7F
+    i2c_samples = np.resize(make_i2c_capture(num_samples // 400, bit_delay=8), num_samples)
+    uart_samples = np.resize(make_uart_capture(num_samples // 160, samples_per_bit=16)[0], num_samples)
+    print(f"Trigger conditions, {num_samples} samples in {chunk_size}-sample chunks, never firing")
+    print(f"{'condition':>34} {'ms':>8} {'MS/s':>8}")
+    for text, capture in (
+        ('rising:8', samples),
+        ('pattern:1XXXXXXX', samples),
+        ('rising:1&pattern:1XXXXXXX', samples),
+        ('pulse:channel=1,min=1000', samples),
+        ('rising:1 -> rising:2 -> rising:8', samples),
+        ('i2c:address=0x100,address_width=8', i2c_samples),
+        ('uart:value=0x100,baud=1000000', uart_samples),
+    ):
+        condition = parse_trigger_condition(text, 16e6)
+        elapsed = time_call(find_in_chunks, condition, capture, chunk_size)
+        print(f"{text:>34} {elapsed * 1e3:>8.2f} {num_samples / elapsed / 1e6:>8.1f}")
+
+
+class FakeSerial:
+    """
+    Stands in for serial.Serial and plays back a prepared byte stream in USB-sized reads.
+
+    Like a real port opened with a timeout, read() waits up to the timeout once the
+    stream has run dry, so an idle port can be simulated with an empty stream.
+    """
+    stream = b''
+    read_size = 4096
+
+    def __init__(self, port=None, baudrate=None, timeout=None):
+        self.timeout = timeout
+        self.position = 0
+        self.is_open = True
+
+    @property
+    def in_waiting(self):
+        return min(self.read_size, len(self.stream) - self.position)
+
+    def read(self, size=1):
+        if self.position >= len(self.stream) and self.timeout:
+            time.sleep(self.timeout)
+        data = self.stream[self.position:self.position + min(size, self.read_size)]
+        self.position += len(data)
+        return data
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        self.is_open = False
+
+
+class PerSampleWorker(QThread):
+    """
+    The acquisition loop before chunking and blocking reads: spins on in_waiting and
+    queues one signal per sample.
+    """
+    data_ready = pyqtSignal(list)
+
+    def __init__(self):
+        super().__init__()
+        self.is_running = True
+        self.decoder = SampleDecoder()
+        self.serial = FakeSerial()
+        self.loop_stats = LoopStats()
+
+    def run(self):
+        self.loop_stats.reset()
+        while self.is_running:
+            num_bytes = self.serial.in_waiting
+            self.loop_stats.wakeup(num_bytes)
+            if num_bytes:
+                for data_value in self.decoder.feed(self.serial.read(num_bytes)).tolist():
+                    self.data_ready.emit([data_value])
+
+    def stop_worker(self):
+        self.is_running = False
+        self.wait()
+
+
+class Receiver(QObject):
+    # Lives in the GUI thread, so every signal from a worker is queued like in the displays
+    def __init__(self):
+        super().__init__()
+        self.received = 0
+        self.signals = 0
+
+    @pyqtSlot(list)
+    def on_list(self, values):
+        self.received += len(values)
+        self.signals += 1
+
+    @pyqtSlot(object, int)
+    def on_chunk(self, samples, start_idx):
+        self.received += len(samples)
+        self.signals += 1
+
+
+def make_worker(kind, receiver, buffer_size=65536):
+    if kind == 'per sample':
+        worker = PerSampleWorker()
+        worker.data_ready.connect(receiver.on_list)
+    else:
+        # The shared acquisition service with the Signal view subscribed, as LogicDisplay sets it up
+        with mock.patch('serial.Serial', FakeSerial):
+            worker = AcquisitionService('fake', 115200)
+        view = SerialWorker(worker, buffer_size)
+        view.data_ready.connect(receiver.on_chunk)
+        view.start()
+    return worker
+
+
+def bench_worker_throughput(num_samples=200000):
+    samples = np.random.default_rng(0).integers(0, 256, num_samples).astype(np.uint8)
+    FakeSerial.stream = b''.join(
+        encode_frame(samples[i:i + 240], sequence)
+        for sequence, i in enumerate(range(0, num_samples, 240))
+    )
+    app = get_application()
+    print(f"Worker -> GUI throughput, {num_samples} samples from a fake serial port")
+    print(f"{'worker':>12} {'samples/s':>12} {'signals':>9}")
+    for kind in ('per sample', 'chunked'):
+        receiver = Receiver()
+        worker = make_worker(kind, receiver)
+        start = time.perf_counter()
+        worker.start()
+        run_event_loop(60.0, until=lambda: receiver.received >= num_samples)
+        elapsed = time.perf_counter() - start
+        worker.stop_worker()
+        print(f"{kind:>12} {receiver.received / elapsed:>12.0f} {receiver.signals:>9}")
+
+
+def bench_idle_worker(duration=1.0):
+    # Nothing arrives on the port, a well behaved worker should be nearly free
+    FakeSerial.stream = b''
+    app = get_application()
+    print(f"Idle worker, {duration:.0f} s with no data on the port")
+    print(f"{'worker':>12} {'CPU (%)':>8} {'wake-ups/s':>11}")
+    for kind in ('per sample', 'chunked'):
+        worker = make_worker(kind, Receiver())
+        worker.start()
+        run_event_loop(duration)
+        worker.stop_worker()
+        stats = worker.loop_stats.snapshot()
+        print(f"{kind:>12} {stats['cpu_percent']:>8.1f} {stats['wakeups_per_second']:>11.0f}")
+
+
+def bench_render_scheduler(duration=1.0):
+    # Data every millisecond: frames follow the refresh rate, slow frames back off, hidden windows stop
+    from PyQt6.QtWidgets import QWidget
+    app = get_application()
+    widget = QWidget()
+    widget.show()
+    frames = []
+    frame_time = [0.0]
+
+    def render():
+        frames.append(time.perf_counter())
+        time.sleep(frame_time[0])
+
+    scheduler = RenderScheduler(widget, render)
+    feeder = QTimer()
+    feeder.timeout.connect(scheduler.mark_dirty)
+    feeder.start(1)
+    scheduler.start()
+    print(f"Render scheduler, data every 1 ms for {duration:.0f} s per case, "
+          f"screen at {1 / scheduler.refresh_interval():.0f} Hz")
+    print(f"{'case':>16} {'frames/s':>9} {'late frames':>12}")
+    for case, sleep, visible in (('fast frames', 0.0, True), ('20 ms frames', 0.02, True), ('hidden', 0.0, False)):
+        frame_time[0] = sleep
+        widget.setVisible(visible)
+        del frames[:]
+        dropped = scheduler.dropped_frames
+        run_event_loop(duration)
+        print(f"{case:>16} {len(frames) / duration:>9.1f} {scheduler.dropped_frames - dropped:>12}")
+    feeder.stop()
+    scheduler.stop()
+    widget.close()
+
+
+def setup_signal_display(view, sample_rate):
+    view.sample_rate_input.setText(str(sample_rate))
+    view.handle_sample_rate_input()
+    for channel in range(view.channels):
+        view.toggle_channel(channel, True)
+
+
+def setup_protocol_display(view, sample_rate):
+    # I2C and SPI: the first group on the channels the simulated device drives
+    view.sample_rate_input.setText(str(sample_rate))
+    view.handle_sample_rate_input()
+    view.toggle_channel_group(0, True)
+
+
+def setup_uart_display(view, sample_rate):
+    # The UART display sets 16 samples per bit itself when it starts
+    view.baud_rate_combo.setCurrentText(str(sample_rate // 16))
+    view.toggle_channel(0, True)
+
+
+def bench_simulated_device(duration=2.0, sample_rate=153600, buffer_size=65536, timeout=120.0):
+    """
+    Runs each display against the simulated device on its matching waveform, end to end:
+    device -> transport -> acquisition thread -> worker -> display buffers -> plot.
+
+    The device streams for `duration` seconds and is then stopped from another thread, so
+    every display gets the same samples; the time runs until the display has handled them
+    all. 153600 samples/s is what the UART display asks for at its default 9600 baud.
+    """
+    from Signal import SignalDisplay
+    from I2C import I2CDisplay
+    from SPI import SPIDisplay
+    from UART import UARTDisplay
+    app = get_application()
+    modules = [
+        ('Signal', SignalDisplay, 'sim:square', setup_signal_display),
+        ('I2C', I2CDisplay, 'sim:i2c', setup_protocol_display),
+        ('SPI', SPIDisplay, 'sim:spi', setup_protocol_display),
+        ('UART', UARTDisplay, 'sim:uart', setup_uart_display),
+    ]
+    print(f"End to end with the simulated device, {duration:.0f} s at {sample_rate} samples/s per display")
+    print(f"{'display':>8} {'samples':>9} {'samples/s':>10} {'dropped':>9} {'lost frames':>12} "
+          f"{'frames/s':>9} {'frame (ms)':>11} {'p95 (ms)':>9} {'late frames':>12}")
+    for name, display_class, port, setup in modules:
+        acquisition = AcquisitionService(port, 115200)
+        device = acquisition.serial
+        view = display_class(port, 115200, buffer_size, acquisition=acquisition)
+        receiver = Receiver()
+        view.worker.data_ready.connect(receiver.on_chunk)
+        frame_times = []
+
+        def timed_update(view=view, frame_times=frame_times):
+            start = time.perf_counter()
+            view.update_plot()
+            frame_times.append(time.perf_counter() - start)
+
+        view.render_scheduler.render = timed_update
+        view.show()  # Hidden displays are not redrawn
+        setup(view, sample_rate)
+        acquisition.start()
+        view.toggle_reading()
+        start = time.perf_counter()
+        # The GUI thread may be too busy to stop the device on time, so another thread does
+        stopper = threading.Timer(duration, send_stop, (device,))
+        stopper.start()
+        run_event_loop(timeout, until=lambda: not stopper.is_alive() and not device.running
+                       and device.in_waiting == 0 and receiver.received >= device.sent_samples)
+        elapsed = time.perf_counter() - start
+        stopper.join()
+        view.toggle_reading()
+        view.close()
+        acquisition.stop_worker()
+        # Drops the signals still queued for a display that fell behind, so they do not run into the next one
+        view.deleteLater()
+        app.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+        frame_ms = np.array(frame_times) * 1e3 if frame_times else np.zeros(1)
+        print(f"{name:>8} {receiver.received:>9} {receiver.received / elapsed:>10.0f} {device.dropped_samples:>9} "
+              f"{acquisition.decoder.dropped_frames:>12} {len(frame_times) / elapsed:>9.1f} "
+              f"{frame_ms.mean():>11.2f} {np.percentile(frame_ms, 95):>9.2f} "
+              f"{view.render_scheduler.dropped_frames:>12}")
+
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmark_history.json')
+SUITE_SAMPLES = 1 << 20
+SUITE_REPEAT = 10  # Best of, so a busy machine does not show up as a regression
+REGRESSION_RATIO = 1.25  # Flagged when this much slower than the baseline
+BASELINE_RUNS = 5
+
+
+def make_busy_samples(num_samples):
+    # Every channel toggling in random runs, the worst case for drawing zoomed out
+    samples = np.zeros(num_samples, dtype=np.uint8)
+    for channel in range(8):
+        samples |= make_channel_bits(num_samples, seed=channel) << channel
+    return samples
+
+
+def make_suite_display(display_class, samples, sample_rate=1000000):
+    # A display showing a full buffer of samples, zoomed out, without a device
+    view = display_class(None, 115200, len(samples), acquisition=AcquisitionService(None, 115200))
+    view.resize(1920, 1080)
+    view.show()
+    view.sample_rate = sample_rate
+    view.data_buffer.append(samples)
+    if hasattr(view, 'total_samples'):
+        view.total_samples = len(samples)
+    duration = len(samples) / sample_rate
+    view.plot.setLimits(xMin=0, xMax=duration)
+    view.plot.setXRange(0, duration, padding=0)
+    return view
+
+
+def feed_display(view, samples, chunk_size=240):
+    # Chunks of the size the device sends, through the display's own handler
+    view.is_reading = True
+    for i in range(0, len(samples), chunk_size):
+        view.handle_data(samples[i:i + chunk_size], i)
+
+
+def suite_timings(num_samples=SUITE_SAMPLES, chunk_size=65536):
+    """
+    Times the hot paths from the serial port to the screen. Parse, buffer and decode
+    results are ms per million samples; render results are ms per update_plot frame of
+    a full num_samples buffer, zoomed out in a 1920x1080 window.
+    """
+    from Signal import SignalDisplay
+    from I2C import I2CDisplay
+    from SPI import SPIDisplay
+    from UART import UARTDisplay
+    app = get_application()
+    per_million = 1e9 / num_samples
+    samples = make_busy_samples(num_samples)
+    results = {}
+
+    ascii_stream = ('\r\n'.join(map(str, samples.tolist())) + '\r\n').encode('ascii')
+    binary_stream = b''.join(encode_frame(samples[i:i + 1024], i // 1024) for i in range(0, num_samples, 1024))
+    results['parse_ascii'] = time_call(lambda: SampleDecoder(ASCII_MODE).feed(ascii_stream), repeat=SUITE_REPEAT) * per_million
+    results['parse_binary'] = time_call(lambda: SampleDecoder(BINARY_MODE).feed(binary_stream), repeat=SUITE_REPEAT) * per_million
+
+    view = make_suite_display(SignalDisplay, np.zeros(65536, dtype=np.uint8))
+    results['handle_data'] = time_call(feed_display, view, samples, repeat=SUITE_REPEAT) * per_million
+    view.close()
+    results['bit_planes'] = time_call(SampleRingBuffer.wrap(samples).bit_planes, repeat=SUITE_REPEAT) * per_million
+    trigger = TriggerEngine(pre_trigger=1000, post_trigger=10000, auto_rearm=True)
+    trigger.set_trigger_modes(['Rising Edge'] + ['No Trigger'] * 7)
+    results['trigger'] = time_call(gate_in_chunks, trigger, samples, chunk_size, repeat=SUITE_REPEAT) * per_million
+    results['lod_build'] = time_call(lambda: MinMaxPyramid(SampleRingBuffer.wrap(samples)).update(), repeat=SUITE_REPEAT) * per_million
+
+    for name, display_class, enable in (
+        ('signal', SignalDisplay, lambda view: [view.toggle_channel(ch, True) for ch in range(8)]),
+        ('i2c', I2CDisplay, lambda view: view.toggle_channel_group(0, True)),
+        ('spi', SPIDisplay, lambda view: view.toggle_channel_group(0, True)),
+        ('uart', UARTDisplay, lambda view: view.toggle_channel(0, True)),
+    ):
+        view = make_suite_display(display_class, samples)
+        enable(view)
+        # A full frame, not the kept traces of the frame before
+        results[f'render_{name}'] = time_call(lambda: (view.lod.traces.clear(), view.update_plot()),
+                                              repeat=SUITE_REPEAT) * 1e3
+        view.close()
+    app.processEvents()
+
+    i2c_samples = make_i2c_capture(num_samples // 400, bit_delay=8)[:num_samples]
+    spi_samples = make_spi_capture(num_samples // 400, bit_delay=8)[0][:num_samples]
+    uart_samples = make_multichannel_uart(num_samples // (12 * 16), 16)[0][:num_samples]
+    uart_configs = make_uart_configs(16)
+    for name, decoder, configs, capture in (
+        ('decode_i2c', I2CDecoder(), I2C_GROUP_CONFIGS, i2c_samples),
+        ('decode_spi', SPIDecoder(), SPI_GROUP_CONFIGS, spi_samples),
+        ('decode_uart', UARTDecoder(), uart_configs, uart_samples),
+    ):
+        decode = lambda chunk, idx, decoder=decoder, configs=configs: decoder.decode(chunk, idx, configs)
+        results[name] = time_call(decode_in_chunks, decode, capture, chunk_size, repeat=SUITE_REPEAT) * 1e9 / len(capture)
+    # UART frames as arrays, and as the tagged event dicts the displays get: the gap is the cost of the dicts
+    decoder = UARTDecoder()
+    decode_frames = lambda chunk, idx: [decoder.decode_frames(chunk, idx, ch, config) for ch, config in enumerate(uart_configs)]
+    results['uart_frames'] = time_call(decode_in_chunks, decode_frames, uart_samples, chunk_size,
+                                       repeat=SUITE_REPEAT) * 1e9 / len(uart_samples)
+    results['uart_events'] = time_call(decode_in_chunks, create_decoder('uart', uart_configs).decode, uart_samples,
+                                       chunk_size, repeat=SUITE_REPEAT) * 1e9 / len(uart_samples)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load_history(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable benchmark history {path}: {e}")
+        return []
+
+
+def run_suite(history_path=HISTORY_PATH):
+    """
+    Runs suite_timings, compares with the earlier runs on this machine and appends the
+    results to the JSON history, a list of runs shared by all GUI versions.
+    """
+    results = suite_timings()
+    history = load_history(history_path)
+    run = {
+        'version': os.path.basename(os.path.dirname(os.path.abspath(__file__))),
+        'commit': git_commit(),
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'results': results,
+    }
+    # Baseline: the median of the last BASELINE_RUNS runs on this machine, one noisy run does not move it
+    previous = [old for old in history if old.get('host') == run['host']][-BASELINE_RUNS:]
+    print(f"Benchmark suite, {run['version']} at {run['commit']}: ms per million samples, render in ms per frame")
+    if previous:
+        print(f"  compared with the median of {len(previous)} runs, last {previous[-1].get('version')} "
+              f"at {previous[-1].get('commit')} from {previous[-1].get('time')}")
+    print(f"{'benchmark':>14} {'ms':>10} {'baseline':>10} {'change':>8}")
+    for name, value in results.items():
+        old_values = [old['results'][name] for old in previous if name in old.get('results', {})]
+        if old_values:
+            baseline = float(np.median(old_values))
+            flag = '  slower' if value > baseline * REGRESSION_RATIO else ''
+            print(f"{name:>14} {value:>10.2f} {baseline:>10.2f} {100 * (value / baseline - 1):>+7.0f}%{flag}")
+        else:
+            print(f"{name:>14} {value:>10.2f} {'':>10} {'':>8}")
+    history.append(run)
+    with open(history_path, 'w') as file:
+        json.dump(history, file, indent=1)
+    print(f"Saved to {os.path.normpath(history_path)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Logic analyzer GUI benchmarks, offscreen and without hardware.")
+    parser.add_argument('--no-legacy', action='store_true', help="skip the slow per-sample reference versions")
+    parser.add_argument('--suite', action='store_true',
+                        help="only time the hot paths and append the results to the history file")
+    parser.add_argument('--history', default=HISTORY_PATH, help="JSON history file for --suite")
+    args = parser.parse_args()
+    if args.suite:
+        run_suite(args.history)
+        sys.exit(0)
+    bench_square_wave(include_legacy=not args.no_legacy)
+    print()
+    bench_transport()
+    print()
+    bench_sample_buffer(include_legacy=not args.no_legacy)
+    print()
+    bench_level_of_detail()
+    bench_incremental_trace()
+    print()
+    bench_capture_file()
+    bench_transitions()
+    bench_recorder()
+    print()
+    bench_interchange()
+    print()
+    bench_i2c_decoder()
+    print()
+    bench_spi_decoder()
+    print()
+    bench_uart_decoder()
+    print()
+    bench_decoder_plugins()
+    bench_stacked_decoders()
+    bench_decode_pool()
+    print()
+    bench_trigger(include_legacy=not args.no_legacy)
+    bench_trigger_conditions()
+    print()
+    bench_worker_throughput()
+    print()
+    bench_idle_worker()
+    print()
+    bench_render_scheduler()
+    print()
+    bench_simulated_device()
@@ -2,9 +2,11 @@
 
 import sys
 import serial.tools.list_ports
-from PyQt6.QtWidgets import QMainWindow, QPushButton, QVBoxLayout, QWidget, QComboBox
+from PyQt6.QtWidgets import QMainWindow, QPushButton, QVBoxLayout, QWidget, QComboBox, QFileDialog
 from aesthetic import get_icon
 from LogicDisplay import LogicDisplay  # Make sure this is the correct file name
+from CaptureFile import CAPTURE_FILTER
+from SimulatedDevice import SIMULATED_PORTS
 
 class SerialApp(QMainWindow):
     def __init__(self):
@@ -41,11 +43,17 @@ class SerialApp(QMainWindow):
         self.button_disconnect.setEnabled(False)
         layout.addWidget(self.button_disconnect)
 
+        # Open a saved capture without a device
+        self.button_open_capture = QPushButton("Open Capture")
+        self.button_open_capture.clicked.connect(self.open_capture)
+        layout.addWidget(self.button_open_capture)
+
     def refresh_ports(self):
         self.combo_ports.clear()
         ports = serial.tools.list_ports.comports()
         for port in ports:
             self.combo_ports.addItem(port.device)
+        self.combo_ports.addItems(SIMULATED_PORTS)  # In-process devices for trying the GUI without hardware
 
     def connect_device(self):
         port_name = self.combo_ports.currentText()
@@ -65,6 +73,16 @@ class SerialApp(QMainWindow):
         except Exception as e:
             print(f"Failed to connect to {port_name}: {str(e)}")
 
+    def open_capture(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Capture", "", CAPTURE_FILTER)
+        if not path:
+            return
+        if self.logic_display_window:
+            self.logic_display_window.close()
+        self.logic_display_window = LogicDisplay(port=None, baudrate=115200, channels=8)
+        self.logic_display_window.open_capture(path)
+        self.logic_display_window.show()
+
     def disconnect_device(self):
         # Close the LogicDisplay window when disconnecting the device
         if self.logic_display_window:
@@ -0,0 +1,699 @@
+# fixtures.py
+# Captures, decoding helpers and the per-sample reference decoders shared by the tests and benchmark.py
+
+import os
+import sys
+import numpy as np
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QEventLoop, QTimer
+from Decoders import create_decoder, load_decoder
+from ModbusDecoder import modbus_crc
+from Waveforms import (
+    WaveformBuilder, make_i2c_capture, make_spi_capture, make_uart_capture, add_uart_levels, uart_frame_levels,
+    add_i2c_transaction, add_spi_transfer,
+)
+
+SAMPLE_RATE = 1000
+
+
+def make_channel_bits(num_samples, seed=0):
+    # Random run lengths between 1 and 64 samples, roughly what a busy bus looks like
+    rng = np.random.default_rng(seed)
+    run_lengths = rng.integers(1, 64, size=num_samples // 8 + 2)
+    levels = np.arange(len(run_lengths)) & 1
+    return np.repeat(levels, run_lengths)[:num_samples].astype(np.uint8)
+
+
+class LegacyI2CDecoder:
+    """
+    The per-sample I2C state machine from I2C.SerialWorker before I2CDecoder, kept as the
+    reference for the equivalence check.
+    """
+
+    def __init__(self, group_configs):
+        self.group_configs = group_configs
+        self.events = []
+        self.states = ['IDLE'] * len(self.group_configs)
+        self.current_bytes = [0] * len(self.group_configs)
+        self.bit_counts = [0] * len(self.group_configs)
+        self.scl_last_values = [1] * len(self.group_configs)
+        self.sda_last_values = [1] * len(self.group_configs)
+        self.messages = [[] for _ in range(len(self.group_configs))]
+        self.error_flags = [False] * len(self.group_configs)
+        self.addr_sample_idxs = [None] * len(self.group_configs)
+        self.ack_sample_idxs = [None] * len(self.group_configs)
+        self.data_sample_idxs = [None] * len(self.group_configs)
+        self.stop_sample_idxs = [None] * len(self.group_configs)
+
+    def decode(self, samples, start_idx):
+        for offset, data_value in enumerate(samples.tolist()):
+            self.decode_i2c(data_value, start_idx + offset)
+        events, self.events = self.events, []
+        return events
+
+    def decode_i2c(self, data_value, sample_idx):
+        for group_idx, group_config in enumerate(self.group_configs):
+            scl_channel = group_config['clock_channel'] - 1
+            sda_channel = group_config['data_channel'] - 1
+            address_width = group_config.get('address_width', 8)
+            data_format = group_config.get('data_format', 'Hexadecimal')
+
+            # Extract SCL and SDA values
+            scl = (data_value >> scl_channel) & 1
+            sda = (data_value >> sda_channel) & 1
+
+            # Detect edges on SCL and SDA
+            scl_last = self.scl_last_values[group_idx]
+            sda_last = self.sda_last_values[group_idx]
+            scl_edge = scl != scl_last
+            sda_edge = sda != sda_last
+
+            # State machine for I2C decoding
+            state = self.states[group_idx]
+            current_byte = self.current_bytes[group_idx]
+            bit_count = self.bit_counts[group_idx]
+            message = self.messages[group_idx]
+            error_flag = self.error_flags[group_idx]
+
+            # Retrieve stored sample indices
+            addr_sample_idx = self.addr_sample_idxs[group_idx]
+            ack_sample_idx = self.ack_sample_idxs[group_idx]
+            data_sample_idx = self.data_sample_idxs[group_idx]
+            stop_sample_idx = self.stop_sample_idxs[group_idx]
+
+            # Determine the expected number of bits for the address
+            if address_width == 7:
+                expected_bits = address_width + 1  # Include R/W bit
+            else:
+                expected_bits = address_width  # 8 bits, no extra bit
+
+            if state == 'IDLE':
+                if sda_edge and sda == 0 and scl == 1:
+                    # Start condition detected
+                    state = 'START'
+                    current_byte = 0
+                    bit_count = 0
+                    message = []
+                    error_flag = False
+                    # Record the sample index for START
+                    start_sample_idx = sample_idx
+                    # Emit start condition immediately
+                    self.events.append({
+                        'group_idx': group_idx,
+                        'event': 'START',
+                        'sample_idx': start_sample_idx,
+                    })
+            elif state == 'START':
+                if scl_edge and scl == 1:
+                    if bit_count == 0:
+                        # Record sample index at the start of address transmission
+                        addr_sample_idx = sample_idx
+                        self.addr_sample_idxs[group_idx] = addr_sample_idx
+                    # Rising edge of SCL, sample SDA
+                    current_byte = (current_byte << 1) | sda
+                    bit_count += 1
+                    if bit_count == expected_bits:
+                        # Address byte received
+                        if address_width == 7:
+                            address = current_byte >> 1
+                            rw_bit = current_byte & 1
+                            message.append({'type': 'Address', 'data': address, 'rw': rw_bit})
+                        else:
+                            address = current_byte
+                            rw_bit = None
+                            message.append({'type': 'Address', 'data': address})
+                        # Emit signal for address
+                        self.events.append({
+                            'group_idx': group_idx,
+                            'event': 'ADDRESS',
+                            'data': address,
+                            'rw_bit': rw_bit,
+                            'sample_idx': addr_sample_idx,  # Use recorded sample index
+                        })
+                        bit_count = 0
+                        current_byte = 0
+                        state = 'ACK'
+                        # Reset address sample index
+                        self.addr_sample_idxs[group_idx] = None
+            elif state == 'ACK':
+                if scl_edge and scl == 1:
+                    # Record sample index at the start of ACK bit
+                    ack_sample_idx = sample_idx
+                    self.ack_sample_idxs[group_idx] = ack_sample_idx
+                    # Sample ACK bit
+                    ack = sda
+                    message.append({'type': 'ACK', 'data': ack})
+                    # Emit signal for ACK
+                    self.events.append({
+                        'group_idx': group_idx,
+                        'event': 'ACK',
+                        'data': ack,
+                        'sample_idx': ack_sample_idx,
+                    })
+                    state = 'DATA'
+                    # Reset ACK sample index
+                    self.ack_sample_idxs[group_idx] = None
+            elif state == 'DATA':
+                if scl_edge and scl == 1:
+                    if bit_count == 0:
+                        # Record sample index at the start of data byte
+                        data_sample_idx = sample_idx
+                        self.data_sample_idxs[group_idx] = data_sample_idx
+                    # Rising edge of SCL, sample SDA
+                    current_byte = (current_byte << 1) | sda
+                    bit_count += 1
+                    if bit_count == 8:
+                        # Data byte received
+                        message.append({'type': 'Data', 'data': current_byte})
+                        # Emit signal for DATA
+                        self.events.append({
+                            'group_idx': group_idx,
+                            'event': 'DATA',
+                            'data': current_byte,
+                            'sample_idx': data_sample_idx,  # Use recorded sample index
+                        })
+                        bit_count = 0
+                        current_byte = 0
+                        state = 'ACK2'
+                        # Reset data sample index
+                        self.data_sample_idxs[group_idx] = None
+            elif state == 'ACK2':
+                if scl_edge and scl == 1:
+                    # Record sample index at the start of ACK bit
+                    ack_sample_idx = sample_idx
+                    self.ack_sample_idxs[group_idx] = ack_sample_idx
+                    # Sample ACK bit
+                    ack = sda
+                    message.append({'type': 'ACK', 'data': ack})
+                    # Emit signal for ACK
+                    self.events.append({
+                        'group_idx': group_idx,
+                        'event': 'ACK',
+                        'data': ack,
+                        'sample_idx': ack_sample_idx,
+                    })
+                    state = 'DATA'
+                    # Reset ACK sample index
+                    self.ack_sample_idxs[group_idx] = None
+            if sda_edge and sda == 1 and scl == 1:
+                # Stop condition detected
+                stop_sample_idx = sample_idx  # Record sample index for STOP
+                # Emit the decoded message
+                self.events.append({
+                    'group_idx': group_idx,
+                    'event': 'STOP',
+                    'message': message.copy(),
+                    'sample_idx': stop_sample_idx,
+                })
+                # Reset state
+                state = 'IDLE'
+                current_byte = 0
+                bit_count = 0
+                message = []
+                error_flag = False
+                # Reset sample indices
+                self.addr_sample_idxs[group_idx] = None
+                self.ack_sample_idxs[group_idx] = None
+                self.data_sample_idxs[group_idx] = None
+                self.stop_sample_idxs[group_idx] = None
+
+            # Update the stored states
+            self.states[group_idx] = state
+            self.current_bytes[group_idx] = current_byte
+            self.bit_counts[group_idx] = bit_count
+            self.messages[group_idx] = message
+            self.error_flags[group_idx] = error_flag
+
+            # Update last values
+            self.scl_last_values[group_idx] = scl
+            self.sda_last_values[group_idx] = sda
+
+
+I2C_GROUP_CONFIGS = [
+    {'data_channel': 1, 'clock_channel': 2, 'address_width': 8},
+    {'data_channel': 3, 'clock_channel': 4, 'address_width': 8},
+    {'data_channel': 5, 'clock_channel': 6, 'address_width': 8},
+    {'data_channel': 7, 'clock_channel': 8, 'address_width': 8},
+]
+
+
+def decode_in_chunks(decode, samples, chunk_size):
+    events = []
+    for i in range(0, len(samples), chunk_size):
+        events.extend(decode(samples[i:i + chunk_size], i))
+    return events
+
+
+class LegacySPIDecoder:
+    """
+    The per-sample SPI state machine from SPI.SerialWorker before SPIDecoder, kept as the
+    reference for the equivalence check. It samples on the rising edge only (mode 0).
+    """
+
+    def __init__(self, group_configs):
+        self.group_configs = group_configs
+        self.events = []
+        self.states = ['IDLE'] * len(self.group_configs)
+        self.current_bits_mosi = [''] * len(self.group_configs)
+        self.current_bits_miso = [''] * len(self.group_configs)
+        self.last_clk_values = [0] * len(self.group_configs)
+        self.last_ss_values = [1] * len(self.group_configs)
+
+    def decode(self, samples, start_idx):
+        for offset, data_value in enumerate(samples.tolist()):
+            self.decode_spi(data_value, start_idx + offset)
+        events, self.events = self.events, []
+        return events
+
+    def decode_spi(self, data_value, sample_idx):
+        for group_idx, group_config in enumerate(self.group_configs):
+            ss_channel = group_config['ss_channel'] - 1
+            clk_channel = group_config['clock_channel'] - 1
+            mosi_channel = group_config['mosi_channel'] - 1
+            miso_channel = group_config['miso_channel'] - 1
+            bits = group_config.get('bits', 8)
+            first_bit = group_config.get('first_bit', 'MSB')
+            ss_active = group_config.get('ss_active', 'Low')
+            data_format = group_config.get('data_format', 'Hexadecimal')
+
+            # Extract SS, CLK, MOSI, MISO values
+            ss = (data_value >> ss_channel) & 1
+            clk = (data_value >> clk_channel) & 1
+            mosi = (data_value >> mosi_channel) & 1
+            miso = (data_value >> miso_channel) & 1
+
+            # Adjust for SS active level
+            ss_active_level = 0 if ss_active == 'Low' else 1
+            ss_inactive_level = 1 - ss_active_level
+
+            # State machine for SPI decoding
+            state = self.states[group_idx]
+            current_bits_mosi = self.current_bits_mosi[group_idx]
+            current_bits_miso = self.current_bits_miso[group_idx]
+            last_clk = self.last_clk_values[group_idx]
+            last_ss = self.last_ss_values[group_idx]
+
+            # Detect edges on CLK
+            clk_edge = clk != last_clk
+            clk_rising = clk_edge and clk == 1
+            clk_falling = clk_edge and clk == 0
+
+            # Detect SS activation/deactivation
+            ss_edge = ss != last_ss
+            ss_active_now = ss == ss_active_level
+            ss_inactive_now = ss == ss_inactive_level
+
+            if state == 'IDLE':
+                if ss_active_now:
+                    # SS went active, start capturing data
+                    state = 'RECEIVE'
+                    current_bits_mosi = ''
+                    current_bits_miso = ''
+            elif state == 'RECEIVE':
+                if ss_inactive_now:
+                    # SS went inactive, end of data
+                    if current_bits_mosi or current_bits_miso:
+                        # Emit the decoded data
+                        self.emit_decoded_data(group_idx, current_bits_mosi, current_bits_miso, sample_idx, data_format)
+                        current_bits_mosi = ''
+                        current_bits_miso = ''
+                    state = 'IDLE'
+                else:
+                    # Continue receiving data
+                    # Sample on clock edge (we can assume CPOL=0, CPHA=0 for now)
+                    if clk_rising:
+                        # Sample data
+                        if first_bit == 'MSB':
+                            current_bits_mosi += str(mosi)
+                            current_bits_miso += str(miso)
+                        else:
+                            current_bits_mosi = str(mosi) + current_bits_mosi
+                            current_bits_miso = str(miso) + current_bits_miso
+                        if len(current_bits_mosi) == bits:
+                            # Full data received
+                            self.emit_decoded_data(group_idx, current_bits_mosi, current_bits_miso, sample_idx, data_format)
+                            current_bits_mosi = ''
+                            current_bits_miso = ''
+
+            # Update stored states
+            self.states[group_idx] = state
+            self.current_bits_mosi[group_idx] = current_bits_mosi
+            self.current_bits_miso[group_idx] = current_bits_miso
+            self.last_clk_values[group_idx] = clk
+            self.last_ss_values[group_idx] = ss
+
+    def emit_decoded_data(self, group_idx, bits_str_mosi, bits_str_miso, sample_idx, data_format):
+        # Convert bits to integer
+        if bits_str_mosi:
+            data_value_mosi = int(bits_str_mosi, 2)
+        else:
+            data_value_mosi = None
+        if bits_str_miso:
+            data_value_miso = int(bits_str_miso, 2)
+        else:
+            data_value_miso = None
+
+        # Format data according to data_format
+        data_str_mosi = data_str_miso = ''
+        if data_value_mosi is not None:
+            if data_format == 'Binary':
+                data_str_mosi = bin(data_value_mosi)
+            elif data_format == 'Decimal':
+                data_str_mosi = str(data_value_mosi)
+            elif data_format == 'Hexadecimal':
+                data_str_mosi = hex(data_value_mosi)
+            elif data_format == 'ASCII':
+                data_str_mosi = chr(data_value_mosi)
+            else:
+                data_str_mosi = hex(data_value_mosi)
+        if data_value_miso is not None:
+            if data_format == 'Binary':
+                data_str_miso = bin(data_value_miso)
+            elif data_format == 'Decimal':
+                data_str_miso = str(data_value_miso)
+            elif data_format == 'Hexadecimal':
+                data_str_miso = hex(data_value_miso)
+            elif data_format == 'ASCII':
+                data_str_miso = chr(data_value_miso)
+            else:
+                data_str_miso = hex(data_value_miso)
+
+        # Emit the decoded message
+        self.events.append({
+            'group_idx': group_idx,
+            'event': 'DATA',
+            'data_mosi': data_str_mosi,
+            'data_miso': data_str_miso,
+            'sample_idx': sample_idx,
+        })
+
+
+SPI_GROUP_CONFIGS = [
+    {'ss_channel': 1, 'clock_channel': 2, 'mosi_channel': 3, 'miso_channel': 4, 'bits': 8,
+     'first_bit': 'MSB', 'ss_active': 'Low', 'mode': 0, 'data_format': 'Hexadecimal'},
+    {'ss_channel': 5, 'clock_channel': 6, 'mosi_channel': 7, 'miso_channel': 8, 'bits': 8,
+     'first_bit': 'MSB', 'ss_active': 'Low', 'mode': 0, 'data_format': 'Hexadecimal'},
+]
+
+
+class LegacyUARTDecoder:
+    """
+    The per-sample UART state machine from UART.UARTWorker before UARTDecoder, kept as the
+    reference for the equivalence check. It always assumes 16 samples per bit.
+    """
+
+    def __init__(self, uart_configs, channels=8):
+        self.channels = channels
+        self.uart_configs = uart_configs
+        self.events = []
+        self.states = ['IDLE'] * self.channels
+        self.bit_counts = [0] * self.channels
+        self.current_bytes = [0] * self.channels
+        self.next_sample_times = [0.0] * self.channels
+        self.last_bits = [1] * self.channels
+        self.stop_bit_counters = [0] * self.channels
+
+    def decode(self, samples, start_idx):
+        for offset, data_value in enumerate(samples.tolist()):
+            self.decode_uart(data_value, start_idx + offset)
+        events, self.events = self.events, []
+        return events
+
+    def decode_uart(self, data_value, sample_idx):
+        for ch in range(self.channels):
+            # Only decode if the channel is enabled
+            uart_config = self.uart_configs[ch]
+            if not uart_config.get('enabled', False):
+                continue
+
+            # Get the bit for this channel
+            data_channel = uart_config.get('data_channel', ch + 1) - 1  # Adjust for zero-based index
+            bit = (data_value >> data_channel) & 1
+
+            # Apply polarity
+            polarity = uart_config.get('polarity', 'Standard')
+            if polarity == 'Inverted':
+                bit = 1 - bit
+
+            # Get sample rate and baud rate
+            sample_rate = uart_config.get('sample_rate', None)
+            baud_rate = uart_config.get('baud_rate', 9600)
+            if sample_rate is None or baud_rate == 0:
+                continue  # Cannot decode without sample rate and baud rate
+
+            # Calculate number of samples per bit
+            # samples_per_bit = sample_rate / baud_rate
+            samples_per_bit = 16
+
+            # State machine for UART decoding
+            state = self.states[ch]
+            bit_count = self.bit_counts[ch]
+            current_byte = self.current_bytes[ch]
+            next_sample_time = self.next_sample_times[ch]
+            stop_bits = uart_config.get('stop_bits', 1)
+            data_format = uart_config.get('data_format', 'ASCII')
+            stop_bit_counter = self.stop_bit_counters[ch]  # Retrieve stop_bit_counter
+            last_bit = self.last_bits[ch]
+
+            if state == 'IDLE':
+                if bit == 0 and last_bit == 1:
+                    # Start bit detected (falling edge)
+                    state = 'START_BIT'
+                    bit_count = 0
+                    current_byte = 0
+                    next_sample_time = sample_idx + samples_per_bit * 1.5  # Sample in the middle of first data bit
+            elif state == 'START_BIT':
+                # Wait for first data bit
+                if sample_idx >= next_sample_time - samples_per_bit:
+                    state = 'DATA_BITS'
+            elif state == 'DATA_BITS':
+                if sample_idx >= next_sample_time:
+                    # Sample data bit
+                    current_byte |= (bit << bit_count)
+                    bit_count += 1
+                    next_sample_time += samples_per_bit  # Schedule next bit sample time
+                    if bit_count >= 8:
+                        state = 'STOP_BITS'
+                        stop_bit_counter = 0  # Initialize stop_bit_counter
+            elif state == 'STOP_BITS':
+                if sample_idx >= next_sample_time:
+                    # Sample stop bit
+                    if bit == 1:
+                        # Valid stop bit
+                        stop_bit_counter += 1
+                        next_sample_time += samples_per_bit
+                        if stop_bit_counter >= stop_bits:
+                            # Byte is complete
+                            # Emit decoded byte
+                            self.events.append({
+                                'channel': ch,
+                                'data': current_byte,
+                                'sample_idx': sample_idx,
+                                'data_format': data_format,
+                            })
+                            state = 'IDLE'
+                    else:
+                        # Invalid stop bit
+                        state = 'IDLE'
+            else:
+                state = 'IDLE'
+
+            # Update states
+            self.states[ch] = state
+            self.bit_counts[ch] = bit_count
+            self.current_bytes[ch] = current_byte
+            self.next_sample_times[ch] = next_sample_time  # Update next_sample_time
+            self.stop_bit_counters[ch] = stop_bit_counter  # Update stop_bit_counter
+            self.last_bits[ch] = bit  # Update last_bit
+
+
+def make_uart_configs(samples_per_bit, channels=8, **settings):
+    baud_rate = 1000000
+    return [
+        dict({'data_channel': ch + 1, 'polarity': 'Standard', 'stop_bits': 1, 'data_format': 'ASCII',
+              'baud_rate': baud_rate, 'sample_rate': baud_rate * samples_per_bit, 'enabled': True}, **settings)
+        for ch in range(channels)
+    ]
+
+
+def make_multichannel_uart(num_frames, samples_per_bit, channels=8, **settings):
+    captures = [make_uart_capture(num_frames, ch, samples_per_bit, seed=ch, **settings) for ch in range(channels)]
+    # Pad the shorter captures with idle line so no channel loses frames
+    length = max(len(samples) for samples, _ in captures)
+    padded = np.full((channels, length), 0xFF, dtype=np.uint8)
+    for ch, (samples, _) in enumerate(captures):
+        padded[ch, :len(samples)] = samples
+    samples = np.bitwise_and.reduce(padded, axis=0)
+    return samples, [values for _, values in captures]
+
+
+def make_mixed_capture(num_events=200):
+    # I2C on channels 1/2, SPI on 3-6 and UART on 7, in one packed capture
+    i2c = make_i2c_capture(num_events)
+    spi = make_spi_capture(num_events)[0]
+    uart = make_uart_capture(num_events * 4, 0, 16)[0]
+    length = min(len(i2c), len(spi), len(uart))
+    samples = (i2c[:length] & 0x03) | ((spi[:length] & 0x0F) << 2) | ((uart[:length] & 0x01) << 6)
+    configs = {
+        'i2c': [dict(I2C_GROUP_CONFIGS[0])],
+        'spi': [dict(SPI_GROUP_CONFIGS[0], ss_channel=3, clock_channel=4, mosi_channel=5, miso_channel=6)],
+        'uart': [dict(make_uart_configs(16, channels=1)[0], data_channel=7)],
+    }
+    return samples.astype(np.uint8), configs
+
+
+def make_register_capture(read_bytes=3):
+    # 24C32 EEPROM at 0x50 and MPU-6050 / TMP102 sensors sharing one bus, SDA on channel 1
+    builder = WaveformBuilder()
+    builder.hold(50)
+    transactions = [
+        ([0xA0, 0x01, 0x20, 1, 2, 3], None, True),  # EEPROM write at 0x0120
+        ([0xA0, 0x01, 0x20], None, False),  # Random read: address, repeated START, read
+        ([0xA1] + list(range(read_bytes)), [0] * read_bytes + [1], True),
+        ([0xA1, 5, 6], [0, 0, 1], True),  # Current address read
+        ([0xA0], [1], True),  # Busy, not acknowledged
+        ([0xD0, 0x6B, 0x00], None, True),  # MPU-6050 register write
+        ([0xD0, 0x3B], None, False),
+        ([0xD1, 1, 2, 3, 4, 5, 6], [0] * 6 + [1], True),
+        ([0x90, 0x00], None, False),  # TMP102 temperature
+        ([0x91, 0x19, 0x60], [0, 0, 1], True),
+    ]
+    for data, acks, stop in transactions:
+        add_i2c_transaction(builder, data, 1, 0, 4, acks, stop)
+        builder.hold(30)
+    return builder.samples()
+
+
+def make_flash_capture(program_bytes=514):
+    # JEDEC ID, write enable, a program longer than PAYLOAD_LIMIT, fast read and erase
+    builder = WaveformBuilder()
+    builder.set(1, 0)
+    builder.hold(50)
+    program = [i & 0xFF for i in range(program_bytes)]
+    transfers = [
+        ([0x9F, 0, 0, 0], [0, 0xEF, 0x40, 0x18]),
+        ([0x06], [0]),
+        ([0x02, 0x01, 0x00, 0x00] + program, [0] * (4 + len(program))),
+        ([0x0B, 0, 0x10, 0, 0xFF, 0, 0], [0] * 5 + [0xAA, 0xBB]),
+        ([0x20, 0, 0x20, 0], [0] * 4),
+    ]
+    for mosi, miso in transfers:
+        add_spi_transfer(builder, mosi, miso, 0, 1, 2, 3)
+        builder.hold(20)
+    return builder.samples()
+
+
+def with_crc(frame):
+    crc = modbus_crc(frame)
+    return frame + [crc & 0xFF, crc >> 8]
+
+
+def make_modbus_capture(frames, samples_per_bit=16, gap_bits=40):
+    # Even parity RTU frames on channel 1, the last one right at the end of the capture
+    builder = WaveformBuilder()
+    builder.hold(100)
+    for i, frame in enumerate(frames):
+        for byte in frame:
+            add_uart_levels(builder, uart_frame_levels(byte, parity='Even'), 0, samples_per_bit)
+            builder.set(0, 1)
+            builder.hold(samples_per_bit // 2)
+        builder.hold(gap_bits * samples_per_bit if i < len(frames) - 1 else samples_per_bit)
+    return builder.samples()
+
+
+def decode_stacked(decoder, samples, chunk_size):
+    decoder.reset()
+    return decode_in_chunks(decoder.decode, samples, chunk_size) + decoder.flush()
+
+
+def make_pool_decoders(samples_per_bit=16):
+    # Four I2C groups, SPI, two UART channels and Modbus over the mixed capture, eight lanes
+    configs = make_mixed_capture(2500)[1]
+    uart = configs['uart'][0]
+    return [
+        create_decoder('i2c', [dict(configs['i2c'][0]) for _ in range(4)]),
+        create_decoder('spi', configs['spi']),
+        create_decoder('uart', [dict(uart), dict(uart, data_format='ASCII')]),
+        create_decoder('modbus', [load_decoder('modbus').make_config('channel=7,baud=9600')], samples_per_bit * 9600),
+    ]
+
+
+def decode_in_pool(pool, samples, chunk_size, wait=True, start_idx=0):
+    # Returns which chunks were taken
+    accepted = [pool.submit(samples[i:i + chunk_size], start_idx + i, wait) for i in range(0, len(samples), chunk_size)]
+    pool.flush()
+    pool.close()
+    return accepted
+
+
+def legacy_trigger_gate(chunks, trigger_modes, channels=8):
+    # Signal.SerialWorker before Trigger.py: every sample and channel checked in Python
+    triggered = [False] * channels
+    last_value = None
+    passed = []
+    for samples in chunks:
+        for data_value in samples.tolist():
+            for i in range(channels):
+                if not triggered[i] and trigger_modes[i] != 'No Trigger':
+                    if last_value is not None:
+                        current_bit = (data_value >> i) & 1
+                        last_bit = (last_value >> i) & 1
+                        if trigger_modes[i] == 'Rising Edge' and last_bit == 0 and current_bit == 1:
+                            triggered[i] = True
+                        elif trigger_modes[i] == 'Falling Edge' and last_bit == 1 and current_bit == 0:
+                            triggered[i] = True
+            last_value = data_value
+            if any(triggered):
+                passed.append(data_value)
+    return np.array(passed, dtype=np.uint8)
+
+
+def gate_in_chunks(engine, samples, chunk_size):
+    passed, offsets = [], []
+    length = 0
+    for i in range(0, len(samples), chunk_size):
+        chunk, chunk_offsets = engine.process(samples[i:i + chunk_size])
+        offsets += [length + offset for offset in chunk_offsets]
+        passed.append(chunk)
+        length += len(chunk)
+    return np.concatenate(passed).astype(np.uint8), offsets
+
+
+def find_in_chunks(condition, samples, chunk_size):
+    # Sample index a condition fires on when the capture arrives in chunks, or None
+    condition.reset()
+    last_value = None
+    for i in range(0, len(samples), chunk_size):
+        chunk = samples[i:i + chunk_size]
+        position = condition.find(chunk, last_value)
+        if position is not None:
+            return i + position
+        last_value = int(chunk[-1])
+    return None
+
+
+def get_application():
+    # A QApplication rather than a QCoreApplication, so the display benchmarks can create widgets
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return QApplication.instance() or QApplication(sys.argv)
+
+
+def run_event_loop(duration, until=None):
+    loop = QEventLoop()
+    poll = QTimer()
+    poll.timeout.connect(lambda: loop.quit() if until is not None and until() else None)
+    poll.start(1)
+    QTimer.singleShot(int(duration * 1000), loop.quit)
+    loop.exec()
+    poll.stop()
+
+
+def make_offline_display(mode, buffer_size):
+    # A display on an acquisition service without a device; needs get_application() first
+    from Acquisition import AcquisitionService
+    from Signal import SignalDisplay
+    from I2C import I2CDisplay
+    from SPI import SPIDisplay
+    from UART import UARTDisplay
+    display_class = {'Signal': SignalDisplay, 'I2C': I2CDisplay, 'SPI': SPIDisplay, 'UART': UARTDisplay}[mode]
+    return display_class(None, 115200, buffer_size, acquisition=AcquisitionService(None, 115200))
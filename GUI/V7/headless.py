@@ -0,0 +1,267 @@
+# headless.py:
+#
+# Capture and decode without a display, for test stations:
+#   python headless.py --sample-rate 1000000 --samples 100000 --trigger 1:falling \
+#       --i2c data=1,clock=2,address_width=7 --format csv --output result.csv
+#   python headless.py --port sim:i2c --trigger-condition "i2c:address=0x50,data=1,clock=2" --i2c data=1,clock=2
+#   python headless.py --input capture.vcd --uart channel=1,baud=115200 --decoder i2c:data=3,clock=4
+#   python headless.py --input eeprom.lacap --decoder eeprom:data=1,clock=2,device=0x50 --decoder sensor:data=1,clock=2
+#   python headless.py --port sim:i2c --samples 1000000 --i2c data=1,clock=2 --decode-processes 2
+# Nothing here imports PyQt6, so startup stays at the cost of NumPy and pyserial.
+
+import argparse
+import csv
+import json
+import sys
+import time
+import numpy as np
+from Transport import READ_TIMEOUT, SampleDecoder, read_chunk, request_transport_mode
+from InterfaceCommands import send_num_samples, send_sample_rate, send_start, send_stop, send_triggers
+from Trigger import CONDITION_HELP, TriggerEngine, parse_trigger_condition
+from Decoders import DecoderSet, create_decoder, discover_decoders, load_decoder
+
+DEVICE_VID = 1155
+DEVICE_PID = 22336
+CSV_FIELDS = [
+    'decoder', 'group', 'event', 'sample_idx', 'time', 'data', 'rw_bit', 'data_mosi', 'data_miso',
+    'parity_error', 'framing_error', 'break', 'device', 'address', 'register', 'command', 'function', 'crc_error',
+]
+TRIGGER_MODES = {'rising': 'Rising Edge', 'falling': 'Falling Edge'}
+
+
+def decoder_option(name):
+    # argparse type for --i2c style options: "data=1,clock=2" -> (name, config)
+    def parse(text):
+        try:
+            return name, load_decoder(name).make_config(text)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    return parse
+
+
+def parse_decoder(text):
+    # "NAME:data=1,clock=2" -> (name, config), for any registered decoder
+    name, _, settings = text.partition(':')
+    return decoder_option(name)(settings)
+
+
+def parse_trigger(text):
+    # "3:rising" -> (channel index, mode)
+    channel, _, edge = text.partition(':')
+    if edge not in TRIGGER_MODES or not channel.isdigit() or not 1 <= int(channel) <= 8:
+        raise argparse.ArgumentTypeError(f"expected CHANNEL:rising or CHANNEL:falling, got {text!r}")
+    return int(channel) - 1, TRIGGER_MODES[edge]
+
+
+def find_device_port():
+    import serial.tools.list_ports
+    for port in serial.tools.list_ports.comports():
+        if port.vid == DEVICE_VID and port.pid == DEVICE_PID:
+            return port.device
+    return None
+
+
+def capture_from_device(port, baudrate, sample_rate, num_samples, trigger_modes, timeout, trigger_condition=None):
+    """
+    Configures the device, starts it and yields (start_idx, samples) chunks until
+    num_samples samples from the trigger have arrived or timeout seconds have passed.
+    A trigger_condition from Trigger.py is evaluated here, on an untriggered stream.
+    """
+    from SimulatedDevice import open_serial_port
+    device = open_serial_port(port, baudrate, READ_TIMEOUT)
+    try:
+        request_transport_mode(device)
+        period = send_sample_rate(device, sample_rate)
+        send_num_samples(device, period, num_samples)
+        armed = any(mode != 'No Trigger' for mode in trigger_modes)
+        if armed and trigger_condition is None:
+            send_triggers(device, trigger_modes)
+        send_start(device)
+
+        decoder = SampleDecoder()
+        trigger = TriggerEngine(len(trigger_modes), post_trigger=num_samples)
+        trigger.set_trigger_modes(trigger_modes)
+        trigger.set_condition(trigger_condition)
+        captured = 0
+        deadline = time.perf_counter() + timeout
+        while captured < num_samples and time.perf_counter() < deadline:
+            samples = decoder.feed(read_chunk(device))
+            if len(samples) == 0:
+                continue
+            samples, _ = trigger.process(samples)
+            samples = samples[:num_samples - captured].astype(np.uint8)
+            if len(samples) == 0:
+                continue
+            yield captured, samples
+            captured += len(samples)
+        if captured < num_samples:
+            print(f"Timed out after {captured} of {num_samples} samples", file=sys.stderr)
+    finally:
+        try:
+            send_stop(device)
+        finally:
+            device.close()
+
+
+def capture_from_file(path):
+    """
+    Returns (sample_rate, chunks) for a capture, VCD or sigrok file.
+    """
+    if path.endswith(('.vcd', '.sr')):
+        from Interchange import open_import
+        imported = open_import(path)
+        return imported.sample_rate, imported.chunks()
+    from CaptureFile import capture_chunks, load_capture
+    capture = load_capture(path)
+    return capture.sample_rate, capture_chunks(capture.samples)
+
+
+class EventWriter:
+    """
+    Writes decoded events as JSON lines or CSV rows, adding the decoder name and the time.
+    """
+
+    def __init__(self, file, output_format, sample_rate):
+        self.file = file
+        self.sample_rate = sample_rate
+        self.csv_writer = None
+        if output_format == 'csv':
+            self.csv_writer = csv.DictWriter(file, CSV_FIELDS, extrasaction='ignore')
+            self.csv_writer.writeheader()
+        self.count = 0
+
+    def write(self, annotation):
+        row = dict(annotation)
+        row.setdefault('event', 'DATA')  # UART frames carry no event name
+        row['group'] = row.pop('group_idx', row.pop('channel', None))
+        row['time'] = row['sample_idx'] / self.sample_rate
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + '\n')
+        self.count += 1
+
+    def write_all(self, annotations):
+        for annotation in annotations:
+            self.write(annotation)
+
+
+def build_decoders(args):
+    # One plugin per decoder asked for, with all its groups, imported only when used
+    configs = {}
+    for name, config in args.decoders:
+        configs.setdefault(name, []).append(config)
+    return DecoderSet(create_decoder(name, group_configs, args.sample_rate) for name, group_configs in configs.items())
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description="Headless logic analyzer capture and protocol decode.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--port', help="serial port, found by USB VID/PID when omitted, "
+                                       "sim:square, sim:i2c, sim:spi or sim:uart for a simulated device")
+    source.add_argument('--input', help="decode a .lacap, .vcd or .sr file instead of capturing")
+    parser.add_argument('--baudrate', type=int, default=115200)
+    parser.add_argument('--sample-rate', type=float, default=1000, help="Hz, taken from the file with --input")
+    parser.add_argument('--samples', type=int, default=4096, help="samples to capture after the trigger")
+    trigger = parser.add_mutually_exclusive_group()
+    trigger.add_argument('--trigger', type=parse_trigger, action='append', default=[],
+                         help="CHANNEL:rising or CHANNEL:falling, channels 1-8, repeatable")
+    trigger.add_argument('--trigger-condition', help="host-side trigger: " + CONDITION_HELP)
+    parser.add_argument('--timeout', type=float, default=10.0, help="seconds to wait for the capture")
+    parser.add_argument('--i2c', dest='decoders', action='append', default=[], type=decoder_option('i2c'),
+                        help="I2C group, e.g. data=1,clock=2,address_width=7, repeatable")
+    parser.add_argument('--spi', dest='decoders', action='append', type=decoder_option('spi'),
+                        help="SPI group, e.g. ss=1,clock=2,mosi=3,miso=4,mode=0,bits=8, repeatable")
+    parser.add_argument('--uart', dest='decoders', action='append', type=decoder_option('uart'),
+                        help="UART channel, e.g. channel=1,baud=115200,parity=Even, repeatable")
+    parser.add_argument('--decoder', dest='decoders', action='append', type=parse_decoder,
+                        help="NAME:SETTINGS for any decoder plugin (" + ", ".join(discover_decoders()) + "), repeatable")
+    parser.add_argument('--decode-processes', type=int, default=0, metavar='N',
+                        help="decode in N worker processes while capturing, 0 decodes in this one")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl')
+    parser.add_argument('--output', help="file for the decoded events, stdout when omitted")
+    parser.add_argument('--save', help="also write the raw samples to a .lacap capture file")
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    trigger_modes = ['No Trigger'] * 8
+    for channel, mode in args.trigger:
+        trigger_modes[channel] = mode
+
+    if args.input:
+        try:
+            args.sample_rate, chunks = capture_from_file(args.input)
+        except (OSError, ValueError) as e:
+            print(f"Failed to open {args.input}: {e}", file=sys.stderr)
+            return 2
+    else:
+        trigger_condition = None
+        if args.trigger_condition:
+            try:
+                trigger_condition = parse_trigger_condition(args.trigger_condition, args.sample_rate)
+            except ValueError as e:
+                print(f"Invalid trigger condition: {e}", file=sys.stderr)
+                return 2
+        port = args.port or find_device_port()
+        if port is None:
+            print("Device not found, pass --port", file=sys.stderr)
+            return 2
+        chunks = capture_from_device(port, args.baudrate, args.sample_rate, args.samples, trigger_modes, args.timeout,
+                                     trigger_condition)
+
+    decoders = build_decoders(args)
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    saved = []
+    pool = None
+    try:
+        writer = EventWriter(output, args.format, args.sample_rate)
+        if args.decode_processes > 0 and len(decoders):
+            from DecodePool import DecodePool
+            # Events are written by the pool's collector thread, in the same order as below
+            pool = DecodePool(decoders.decoders, writer.write_all, args.decode_processes)
+        for start_idx, samples in chunks:
+            if args.save:
+                saved.append(samples)
+            if pool is not None:
+                # Nothing is dropped, reading waits only when the whole ring is still being decoded
+                pool.submit(samples, start_idx, wait=True)
+                continue
+            # All decoders see the chunk in one pass, their events come back in sample order
+            for annotation in decoders.decode(samples, start_idx):
+                writer.write(annotation)
+        if pool is not None:
+            pool.flush()
+            pool.close()
+        else:
+            for annotation in decoders.flush():
+                writer.write(annotation)
+    except OSError as e:
+        print(f"Capture failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if pool is not None:
+            pool.close()
+        if output is not sys.stdout:
+            output.close()
+
+    if args.save:
+        from CaptureFile import save_capture
+        samples = np.concatenate(saved) if saved else np.empty(0, dtype=np.uint8)
+        # The file opens in the display of the first decoder, decoded the same way
+        display_mode, configs = 'Signal', None
+        shown = [decoder for decoder in decoders.decoders if decoder.mode is not None]
+        if shown:
+            display_mode = shown[0].mode
+            configs = [dict(config, enabled=True) for config in shown[0].configs]
+        triggered = args.trigger_condition or any(mode != 'No Trigger' for mode in trigger_modes)
+        trigger_position = 0 if triggered else None
+        save_capture(args.save, samples, args.sample_rate, [f"Channel {ch + 1}" for ch in range(8)],
+                     trigger_position, display_mode, configs)
+    print(f"{writer.count} events", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
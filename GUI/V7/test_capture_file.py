@@ -0,0 +1,85 @@
+# test_capture_file.py
+
+import os
+import numpy as np
+import pytest
+from SampleBuffer import SampleRingBuffer
+from LevelOfDetail import MAPPED_MIN_BLOCK_SIZE, MinMaxPyramid
+from CaptureFile import load_capture, save_capture
+from fixtures import get_application, make_channel_bits, make_offline_display
+
+NUM_SAMPLES = 1000003
+NAMES = [f"Ch{i}" for i in range(8)]
+CONFIGS = [{'enabled': True, 'clock_channel': 2, 'data_channel': 1}]
+
+
+def make_samples(num_samples=NUM_SAMPLES):
+    samples = np.zeros(num_samples, dtype=np.uint8)
+    for channel in range(8):
+        samples |= make_channel_bits(num_samples, seed=channel) << channel
+    return samples
+
+
+def test_round_trip(tmp_path):
+    samples = make_samples()
+    path = os.path.join(tmp_path, 'check.lacap')
+    save_capture(path, samples, 2000000, NAMES, 42, 'I2C', CONFIGS, chunk_size=65536)
+    capture = load_capture(path)
+    assert capture.payload_offset % 4096 == 0
+    assert np.array_equal(capture.samples, samples)
+    assert (capture.sample_rate, capture.channel_names, capture.trigger_position) == (2000000, NAMES, 42)
+    assert (capture.mode, capture.decoder_configs) == ('I2C', CONFIGS)
+
+
+def test_file_backed_pyramid(tmp_path):
+    # The pyramid over the file must match a brute-force reduction of every level
+    samples = make_samples()
+    path = os.path.join(tmp_path, 'check.lacap')
+    save_capture(path, samples, 2000000, NAMES, chunk_size=65536)
+    capture = load_capture(path)
+    pyramid = MinMaxPyramid(SampleRingBuffer.wrap(capture.samples), min_block_size=MAPPED_MIN_BLOCK_SIZE)
+    pyramid.update()
+    assert pyramid.block_sizes[0] == MAPPED_MIN_BLOCK_SIZE
+    for block_size, and_level, or_level in zip(pyramid.block_sizes, pyramid.and_levels, pyramid.or_levels):
+        num_blocks = -(-NUM_SAMPLES // block_size)
+        and_items = np.full(num_blocks * block_size, 0xFF, dtype=np.uint8)
+        or_items = np.zeros(num_blocks * block_size, dtype=np.uint8)
+        and_items[:NUM_SAMPLES] = samples
+        or_items[:NUM_SAMPLES] = samples
+        assert np.array_equal(and_level[:num_blocks], np.bitwise_and.reduce(and_items.reshape(-1, block_size), axis=1))
+        assert np.array_equal(or_level[:num_blocks], np.bitwise_or.reduce(or_items.reshape(-1, block_size), axis=1))
+    del pyramid, capture  # Release the memory map before the directory goes
+
+
+@pytest.mark.parametrize('mode', ['Signal', 'I2C', 'SPI', 'UART'])
+def test_display_round_trip(tmp_path, mode, buffer_size=20000):
+    # Saved from one display and opened in another, with channel names and decoder settings
+    app = get_application()
+    samples = make_samples(buffer_size)
+    path = os.path.join(tmp_path, 'check.lacap')
+    writer = make_offline_display(mode, buffer_size)
+    reader = make_offline_display(mode, buffer_size)
+    try:
+        if mode == 'UART':
+            writer.toggle_channel(0, True)
+        elif mode != 'Signal':
+            writer.toggle_channel_group(0, True)
+        writer.channel_buttons[1].setText('Renamed')
+        writer.data_buffer.append(samples)
+        saved = writer.data_buffer.contiguous()  # UART sizes its buffer from the baud rate
+        writer.write_capture_file(path)
+        assert load_capture(path).mode == mode
+
+        reader.read_capture_file(path)
+        assert reader.capture is not None
+        assert len(saved) and np.array_equal(reader.data_buffer.contiguous(), saved)
+        assert reader.channel_buttons[1].text() == 'Renamed'
+        assert reader.capture_decoder_configs() == writer.capture_decoder_configs()
+        assert reader.trigger_line is None
+
+        reader.close_capture()
+        assert reader.capture is None and len(reader.data_buffer) == 0
+    finally:
+        for view in (writer, reader):
+            view.worker.stop_worker()
+            view.close()
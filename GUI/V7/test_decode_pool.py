@@ -0,0 +1,98 @@
+# test_decode_pool.py
+
+import threading
+import numpy as np
+import pytest
+from Decoders import DecoderSet
+from DecodePool import DecodePool, RingSpace
+from fixtures import decode_in_chunks, decode_in_pool, make_mixed_capture, make_pool_decoders
+
+
+@pytest.fixture(scope='module')
+def samples():
+    return make_mixed_capture(2500)[0]
+
+
+def test_ring_regions_never_overlap(size=1000, steps=20000):
+    # Regions handed out never overlap, whatever order chunks come and go in
+    rng = np.random.default_rng(5)
+    ring = RingSpace(size)
+    for _ in range(steps):
+        if ring.regions and rng.random() < 0.45:
+            ring.release()
+        else:
+            ring.allocate(int(rng.integers(1, size // 3)))
+        regions = sorted(ring.regions)
+        assert all(offset + length <= next_offset for (offset, length), (next_offset, _) in zip(regions, regions[1:])), \
+            f"ring regions overlap: {regions}"
+        assert all(offset + length <= size for offset, length in regions)
+
+
+def test_ring_full_after_wrap():
+    # A chunk ending right at the oldest one after a wrap leaves the ring full, not empty
+    ring = RingSpace(30)
+    assert [ring.allocate(10) for _ in range(3)] == [0, 10, 20]
+    ring.release()
+    assert ring.allocate(10) == 0 and ring.allocate(10) is None, "ring handed out space still in use"
+
+
+@pytest.mark.parametrize('processes', [1, 3])
+def test_matches_inline_decoding(samples, processes, chunk_size=4999):
+    # The pool hands out what one DecoderSet decodes inline, for any number of processes
+    decoders = DecoderSet(make_pool_decoders())
+    expected = decode_in_chunks(decoders.decode, samples, chunk_size) + decoders.flush()
+    annotations = []
+    decode_in_pool(DecodePool(make_pool_decoders(), annotations.extend, processes), samples, chunk_size)
+    assert annotations == expected, f"decode pool of {processes} processes differs from inline decoding"
+
+
+def test_resets_after_dropped_chunks(samples, chunk_size=4999):
+    # The collector is held in the callback of the first chunk, so the backlog fills the
+    # ring of three chunks on purpose: three more are taken, the next two dropped
+    annotations = []
+    entered, release = threading.Event(), threading.Event()
+
+    def held_callback(chunk_annotations):
+        entered.set()
+        release.wait()
+        annotations.extend(chunk_annotations)
+
+    pool = DecodePool(make_pool_decoders(), held_callback, 2, ring_size=3 * chunk_size)
+    starts = list(range(0, len(samples), chunk_size))
+    accepted = [pool.submit(samples[:chunk_size], 0)]
+    assert entered.wait(60), "decode pool never delivered the first chunk"
+    accepted += [pool.submit(samples[start:start + chunk_size], start) for start in starts[1:6]]
+    assert accepted == [True] * 4 + [False] * 2 and pool.dropped == 2, f"unexpected drops {accepted}"
+    release.set()
+    accepted += decode_in_pool(pool, samples[starts[6]:], chunk_size, start_idx=starts[6])
+
+    decoders = DecoderSet(make_pool_decoders())
+    expected = []
+    needs_reset = False
+    for taken, start in zip(accepted, starts):
+        if not taken:
+            needs_reset = True
+            continue
+        if needs_reset:
+            decoders.reset()
+            needs_reset = False
+        expected.extend(decoders.decode(samples[start:start + chunk_size], start))
+    expected.extend(decoders.flush())
+    assert annotations == expected, "decode pool output after dropped chunks differs from inline decoding"
+
+
+def test_reset_drops_earlier_results(samples, chunk_size=4999):
+    # Results of chunks submitted before reset() are not handed out, the decoders start over after it
+    annotations = []
+    pool = DecodePool(make_pool_decoders(), annotations.extend, 1)
+    starts = list(range(0, len(samples), chunk_size))
+    with pool.space:  # The collector waits for it before handing out anything, submit() and reset() take it again
+        for start in starts[:4]:
+            assert pool.submit(samples[start:start + chunk_size], start)
+        pool.reset()
+    decode_in_pool(pool, samples[starts[4]:], chunk_size, start_idx=starts[4])
+
+    decoders = DecoderSet(make_pool_decoders())
+    expected = decode_in_chunks(lambda chunk, idx: decoders.decode(chunk, starts[4] + idx), samples[starts[4]:], chunk_size)
+    expected += decoders.flush()
+    assert annotations == expected, "decode pool handed out results from before reset()"
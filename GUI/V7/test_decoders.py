@@ -0,0 +1,129 @@
+# test_decoders.py
+
+import os
+import subprocess
+import sys
+import pytest
+from I2CDecoder import I2CDecoder
+from SPIDecoder import SPIDecoder
+from UARTDecoder import UARTDecoder
+from Decoders import DecoderPlugin, DecoderSet, create_decoder, load_decoder
+from fixtures import (
+    decode_in_chunks, decode_stacked, make_flash_capture, make_mixed_capture, make_modbus_capture,
+    make_register_capture, with_crc,
+)
+
+ENGINES = {'i2c': lambda: I2CDecoder(1), 'spi': lambda: SPIDecoder(1), 'uart': lambda: UARTDecoder(1)}
+
+
+@pytest.fixture(scope='module')
+def mixed_capture():
+    return make_mixed_capture()
+
+
+def decode_engine(name, samples, configs, chunk_size=4999):
+    engine = ENGINES[name]()
+    return decode_in_chunks(lambda chunk, idx: engine.decode(chunk, idx, configs[name]), samples, chunk_size)
+
+
+def test_discovery_imports_no_decoders():
+    # Plugins find the decoders by file name without importing them
+    # and the modes LogicDisplay offers are read from their source, still without importing them
+    code = ("import sys, Decoders; names = Decoders.discover_decoders(); "
+            "modes = [(info.mode, info.label, info.display) for info in Decoders.decoder_modes()]; "
+            "print(names, modes, [name for name in sys.modules if name.endswith('Decoder')])")
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    assert output == ("['eeprom', 'i2c', 'modbus', 'spi', 'spiflash', 'sensor', 'uart'] "
+                      "[('I2C', 'I2C', 'I2C:I2CDisplay'), ('SPI', 'SPI', 'SPI:SPIDisplay'), "
+                      "('UART', 'UART', 'UART:UARTDisplay')] []"), \
+        f"decoder discovery imported or missed modules: {output}"
+    modes = {plugin.mode: (plugin.label, plugin.display) for plugin in map(load_decoder, ('i2c', 'spi', 'uart'))}
+    assert modes == {'I2C': ('I2C', 'I2C:I2CDisplay'), 'SPI': ('SPI', 'SPI:SPIDisplay'),
+                     'UART': ('UART', 'UART:UARTDisplay')}, "read decoder modes differ from the plugin classes"
+
+
+def test_incomplete_plugin_fails_when_created():
+    # A plugin without decode_events fails when it is created, not at its first chunk
+    class IncompletePlugin(DecoderPlugin):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        IncompletePlugin()
+
+
+@pytest.mark.parametrize('name', ENGINES)
+def test_plugin_matches_decoder(mixed_capture, name, chunk_size=4999):
+    samples, configs = mixed_capture
+    expected = decode_engine(name, samples, configs, chunk_size)
+    annotations = decode_in_chunks(create_decoder(name, configs[name]).decode, samples, chunk_size)
+    assert len(annotations) > 50 and all(annotation['decoder'] == name for annotation in annotations)
+    assert [dict(annotation, decoder=None) for annotation in annotations] == \
+        [dict(event, decoder=None) for event in expected], f"{name} plugin differs from its decoder"
+
+
+def test_decoder_set_merges_in_sample_order(mixed_capture, chunk_size=4999):
+    # One pass of all three: each decoder's events unchanged, all of them in sample order
+    samples, configs = mixed_capture
+    decoders = DecoderSet(create_decoder(name, configs[name]) for name in ENGINES)
+    merged = []
+    for start in range(0, len(samples), chunk_size):
+        annotations = decoders.decode(samples[start:start + chunk_size], start)
+        sample_idxs = [annotation['sample_idx'] for annotation in annotations]
+        assert sample_idxs == sorted(sample_idxs), f"decoder set output of chunk {start} is not in sample order"
+        merged.extend(annotations)
+    for name in ENGINES:
+        assert [annotation for annotation in merged if annotation['decoder'] == name] == \
+            [dict(event, decoder=name) for event in decode_engine(name, samples, configs, chunk_size)], \
+            f"{name} events change in a decoder set"
+
+
+def test_settings_text():
+    # Settings text as headless.py passes it
+    assert load_decoder('uart').make_config('channel=3,baud=115200,parity=Even')['baud_rate'] == 115200
+    for name, text in (('i2c', 'speed=1'), ('spi', 'bits=eight')):
+        with pytest.raises(ValueError):
+            load_decoder(name).make_config(text)
+
+
+MODBUS_FRAMES = [
+    with_crc([0x11, 0x03, 0x00, 0x6B, 0x00, 0x03]),
+    with_crc([0x11, 0x03, 0x06, 0x02, 0x2B, 0x00, 0x00, 0x00, 0x64]),
+    [0x11, 0x83, 0x02, 0x00, 0x00],
+    with_crc([0x11, 0x06, 0x00, 0x01, 0x00, 0x03]),
+]
+STACKED_CASES = {
+    'eeprom': (make_register_capture, None, ['event', 'device', 'address', 'data'], [
+        ('WRITE', 0x50, 0x0120, [1, 2, 3]), ('READ', 0x50, 0x0120, [0, 1, 2]), ('READ', 0x50, 0x0123, [5, 6]),
+    ]),
+    'sensor': (make_register_capture, None, ['event', 'sensor', 'register', 'values'], [
+        ('WRITE', 'mpu6050', 0x6B, [('pwr_mgmt_1', 0)]),
+        ('READ', 'mpu6050', 0x3B, [('accel_xout_h', 1), ('accel_xout_l', 2), ('accel_yout_h', 3),
+                                   ('accel_yout_l', 4), ('accel_zout_h', 5), ('accel_zout_l', 6)]),
+        ('READ', 'tmp102', 0x00, [('temperature', 0x1960)]),
+    ]),
+    'spiflash': (make_flash_capture, None, ['event', 'address', 'data'], [
+        ('JEDEC_ID', None, [0xEF, 0x40, 0x18]), ('WRITE_ENABLE', None, []),
+        ('PAGE_PROGRAM', 0x010000, list(range(256))), ('PAGE_PROGRAM', 0x010100, list(range(256))),
+        ('PAGE_PROGRAM', 0x010200, [0, 1]), ('FAST_READ', 0x001000, [0xAA, 0xBB]), ('SECTOR_ERASE', 0x002000, []),
+    ]),
+    'modbus': (lambda: make_modbus_capture(MODBUS_FRAMES), 16 * 9600, ['event', 'device', 'data', 'crc_error'], [
+        ('READ_HOLDING_REGISTERS', 0x11, [0x00, 0x6B, 0x00, 0x03], False),
+        ('READ_HOLDING_REGISTERS', 0x11, [0x06, 0x02, 0x2B, 0x00, 0x00, 0x00, 0x64], False),
+        ('EXCEPTION', 0x11, [0x02], True),
+        ('WRITE_SINGLE_REGISTER', 0x11, [0x00, 0x01, 0x00, 0x03], False),
+    ]),
+}
+
+
+# Every layer against the traffic it was built from, whole and in odd-sized chunks
+@pytest.mark.parametrize('name', STACKED_CASES)
+def test_stacked_decoder(name):
+    make_capture, sample_rate, keys, expected = STACKED_CASES[name]
+    capture = make_capture()
+    decoder = create_decoder(name, [load_decoder(name).make_config('channel=1,baud=9600' if name == 'modbus' else '')],
+                             sample_rate)
+    for chunk_size in (len(capture), 4999, 97):
+        events = decode_stacked(decoder, capture, chunk_size)
+        found = [tuple(event[key] for key in keys) for event in events]
+        assert found == expected, f"{name} decodes {found} in chunks of {chunk_size}"
@@ -0,0 +1,24 @@
+# test_i2c_decoder.py
+
+import numpy as np
+import pytest
+from I2CDecoder import I2CDecoder
+from Waveforms import make_i2c_capture
+from fixtures import I2C_GROUP_CONFIGS, LegacyI2CDecoder, decode_in_chunks
+
+CAPTURES = {
+    'transactions': lambda: make_i2c_capture(200),
+    'noise': lambda: np.random.default_rng(0).integers(0, 256, 100000).astype(np.uint8),
+}
+
+
+# Both decoders on protocol traffic and on random noise, in odd-sized chunks so state crosses chunks
+@pytest.mark.parametrize('capture', CAPTURES)
+@pytest.mark.parametrize('address_width', [8, 7])
+def test_matches_per_sample_decoder(capture, address_width, chunk_size=4999):
+    samples = CAPTURES[capture]()
+    group_configs = [dict(config, address_width=address_width) for config in I2C_GROUP_CONFIGS]
+    decoder = I2CDecoder()
+    legacy = decode_in_chunks(LegacyI2CDecoder(group_configs).decode, samples, chunk_size)
+    vectorized = decode_in_chunks(lambda chunk, idx: decoder.decode(chunk, idx, group_configs), samples, chunk_size)
+    assert legacy == vectorized, f"I2C decoders differ on {capture} with {address_width}-bit addresses"
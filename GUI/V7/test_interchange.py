@@ -0,0 +1,62 @@
+# test_interchange.py
+
+import os
+import numpy as np
+import pytest
+from Interchange import SigrokImport, VCDImport, export_sigrok, export_vcd
+from fixtures import get_application, make_channel_bits, make_offline_display
+
+NUM_SAMPLES = 300001
+NAMES = [f"Ch{i}" for i in range(8)]
+
+
+@pytest.fixture(scope='module')
+def samples():
+    samples = np.zeros(NUM_SAMPLES, dtype=np.uint8)
+    for channel in range(8):
+        samples |= make_channel_bits(NUM_SAMPLES, seed=channel) << channel
+    return samples
+
+
+# Whole-unit, fractional and very slow rates, chunk sizes that split runs
+@pytest.mark.parametrize('sample_rate', [1000000, 153600, 3, 2.5e9])
+def test_vcd_round_trip(tmp_path, samples, sample_rate):
+    path = os.path.join(tmp_path, 'check.vcd')
+    export_vcd(path, samples, sample_rate, NAMES, chunk_size=7777)
+    imported = VCDImport(path)
+    assert imported.sample_rate == sample_rate
+    assert np.array_equal(np.concatenate([chunk for _, chunk in imported.chunks(5000)]), samples)
+
+
+@pytest.mark.parametrize('sample_rate', [1000000, 153600, 3, 2.5e9])
+def test_sigrok_round_trip(tmp_path, samples, sample_rate):
+    path = os.path.join(tmp_path, 'check.sr')
+    export_sigrok(path, samples, sample_rate, NAMES, chunk_size=7777)
+    imported = SigrokImport(path)
+    assert (imported.sample_rate, imported.channel_names) == (sample_rate, NAMES)
+    assert np.array_equal(np.concatenate([chunk for _, chunk in imported.chunks(5000)]), samples)
+
+
+@pytest.mark.parametrize('extension', ['.vcd', '.sr'])
+@pytest.mark.parametrize('mode', ['Signal', 'I2C', 'SPI', 'UART'])
+def test_display_export_import(tmp_path, samples, mode, extension, num_samples=5000):
+    # Exported from one display, imported by another through its worker like a single capture
+    app = get_application()
+    path = os.path.join(tmp_path, 'check' + extension)
+    writer = make_offline_display(mode, 8192)
+    reader = make_offline_display(mode, 8192)
+    try:
+        writer.sample_rate = 250000
+        writer.channel_buttons[1].setText('Renamed')
+        writer.data_buffer.append(samples[:num_samples])
+        writer.export_capture_file(path)
+
+        reader.import_capture_file(path)
+        assert reader.sample_rate == 250000
+        assert reader.channel_buttons[1].text() == 'Renamed'
+        assert np.array_equal(reader.data_buffer.contiguous(), samples[:num_samples])
+        assert not reader.is_reading and reader.worker.is_running
+    finally:
+        for view in (writer, reader):
+            view.worker.stop_worker()
+            view.close()
@@ -0,0 +1,62 @@
+# test_level_of_detail.py
+
+import numpy as np
+from SampleBuffer import SampleRingBuffer
+from LevelOfDetail import MinMaxPyramid
+from fixtures import SAMPLE_RATE
+
+
+def test_kept_traces_match_new_ones(frames=3000, capacity=50000, pixel_width=1000):
+    # Kept traces against traces built from scratch, while the buffer fills, wraps and clears
+    rng = np.random.default_rng(1)
+    samples = np.repeat(rng.integers(0, 256, 200000), rng.integers(1, 30, 200000)).astype(np.uint8)
+    buffer = SampleRingBuffer(capacity)
+    pyramid = MinMaxPyramid(buffer)
+    fresh = MinMaxPyramid(buffer)
+    position = 0
+    for frame in range(frames):
+        new = int(rng.integers(0, 400))
+        buffer.append(samples[position:position + new])
+        position = (position + new) % (len(samples) - 400)
+        if rng.random() < 0.01:
+            buffer.clear()
+        if len(buffer) < 2:
+            continue
+        span = len(buffer) / SAMPLE_RATE
+        # Whole buffer (min/max blocks), the newest samples and the oldest ones (raw samples)
+        x_range = [(0, span), (max(span - 0.5, 0), span), (0, 0.2)][frame % 3]
+        for channel in (0, 5):
+            times, levels = pyramid.square_wave(channel, SAMPLE_RATE, 2, x_range, pixel_width)
+            fresh.traces.clear()
+            expected_times, expected_levels = fresh.square_wave(channel, SAMPLE_RATE, 2, x_range, pixel_width)
+            assert len(times) == len(expected_times) and np.allclose(times, expected_times) \
+                and np.array_equal(levels, expected_levels), f"kept trace differs from a new one in frame {frame}"
+
+
+def test_raw_traces_from_transitions(frames=2000, capacity=20000, pixel_width=1000):
+    # Raw traces built from the buffer's runs against the ones built from its samples
+    rng = np.random.default_rng(2)
+    samples = np.repeat(rng.integers(0, 256, 100000), rng.integers(1, 30, 100000)).astype(np.uint8)
+    buffers = [SampleRingBuffer(capacity, transitions=True), SampleRingBuffer(capacity)]
+    pyramids = [MinMaxPyramid(buffer) for buffer in buffers]
+    position = 0
+    for frame in range(frames):
+        new = int(rng.integers(0, 400))
+        clear = rng.random() < 0.01
+        for buffer in buffers:
+            buffer.append(samples[position:position + new])
+            if clear:
+                buffer.clear()
+        position = (position + new) % (len(samples) - 400)
+        if len(buffers[0]) < 2:
+            continue
+        # Both ends of the buffer and a window in the middle, all narrow enough for raw samples
+        start = [0, max(len(buffers[0]) / SAMPLE_RATE - 0.5, 0), len(buffers[0]) / SAMPLE_RATE / 2][frame % 3]
+        x_range = (start, start + 0.5)
+        for channel in (0, 7):
+            (times, levels), (expected_times, expected_levels) = (
+                pyramid.square_wave(channel, SAMPLE_RATE, 2, x_range, pixel_width) for pyramid in pyramids
+            )
+            assert pyramids[0].traces[channel].level == -1
+            assert np.array_equal(times, expected_times) and np.array_equal(levels, expected_levels), \
+                f"trace from transitions differs in frame {frame}"
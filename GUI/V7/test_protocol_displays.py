@@ -0,0 +1,57 @@
+# test_protocol_displays.py
+
+import numpy as np
+import pytest
+from Waveforms import make_i2c_capture, make_spi_capture, make_uart_capture
+from benchmark import setup_protocol_display, setup_uart_display
+from fixtures import SAMPLE_RATE, get_application, make_offline_display
+
+
+def make_display(mode, capacity):
+    view = make_offline_display(mode, capacity)
+    if mode == 'UART':
+        setup_uart_display(view, SAMPLE_RATE)
+    else:
+        setup_protocol_display(view, SAMPLE_RATE)
+    view.start_reading()
+    return view
+
+
+@pytest.mark.parametrize('mode, samples', [
+    ('I2C', make_i2c_capture(40)),
+    ('SPI', make_spi_capture(50)[0]),
+    ('UART', make_uart_capture(150)[0]),
+])
+def test_events_match_buffer_after_mid_chunk_clear(mode, samples, capacity=8000, chunk_size=1500):
+    # The buffer fills in the middle of a chunk; events shown after the clear must point
+    # at the buffer position holding the sample they were decoded from
+    app = get_application()
+    view = make_display(mode, capacity)
+    clears = []
+    clear_data_buffers = view.clear_data_buffers
+    view.clear_data_buffers = lambda: (clears.append(1), clear_data_buffers())
+    chunk_start = [0]
+    checked = []
+
+    def check(event):
+        if view.awaiting_restart:
+            return  # Dropped by the display as well
+        worker_start = chunk_start[0] - view.worker.sample_idx  # Stream position of worker sample 0
+        idx = event['sample_idx']
+        assert idx < view.total_samples
+        # A window rather than one sample, so a shift on a constant line is caught as well
+        window = slice(max(0, idx - 64), idx + 1)
+        assert np.array_equal(view.data_buffer.buffer[window], samples[worker_start + window.start:worker_start + idx + 1])
+        checked.append(idx)
+
+    view.worker.decoded_message_ready.connect(check)
+    try:
+        for start in range(0, len(samples), chunk_size):
+            chunk_start[0] = start
+            view.worker.process_samples(samples[start:start + chunk_size], start)
+            assert view.awaiting_restart or view.total_samples == view.worker.sample_idx
+        assert len(clears) >= 2 and len(checked) > 50
+    finally:
+        view.stop_reading()
+        view.worker.stop_worker()
+        view.close()
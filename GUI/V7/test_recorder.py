@@ -0,0 +1,50 @@
+# test_recorder.py
+
+import os
+import time
+import numpy as np
+import pytest
+from CaptureFile import load_capture, make_header
+from Recorder import CaptureRecorder, recording_segments
+from fixtures import SAMPLE_RATE, get_application, make_channel_bits, make_offline_display
+
+
+def test_full_queue_drops_without_waiting(tmp_path, chunk_size=1000):
+    # With the writer not started the queue fills up: record() must drop at once, never wait
+    chunk = (np.arange(chunk_size) % 251).astype(np.uint16)
+    path = os.path.join(tmp_path, 'check.lacap')
+    recorder = CaptureRecorder(path, make_header(SAMPLE_RATE, [f"Ch{i}" for i in range(8)]), queue_chunks=2)
+    start = time.perf_counter()
+    for start_idx in range(0, 5 * chunk_size, chunk_size):
+        recorder.record(chunk, start_idx)
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.01, f"record() waited {elapsed * 1e3:.1f} ms on a full queue"
+    assert recorder.dropped_samples == 3 * chunk_size
+    recorder.start()
+    recorder.stop()
+    assert recorder.written_samples == 2 * chunk_size
+    assert [len(load_capture(segment)) for segment in recording_segments(path)] == [2 * chunk_size]
+
+
+@pytest.mark.parametrize('mode', ['Signal', 'I2C', 'SPI', 'UART'])
+def test_display_recording(tmp_path, mode, num_samples=50000, chunk_size=4096):
+    # Everything the acquisition fans out while recording ends up on disk, tagged with the display
+    app = get_application()
+    samples = make_channel_bits(num_samples).astype(np.uint8) * 0x55
+    path = os.path.join(tmp_path, 'check.lacap')
+    view = make_offline_display(mode, 8192)
+    try:
+        view.start_recording(path)
+        assert view.record_button.isChecked()
+        for start_idx in range(0, num_samples, chunk_size):
+            for callback in view.acquisition.subscribers:
+                callback(samples[start_idx:start_idx + chunk_size], start_idx)
+        view.stop_recording()
+        assert view.recorder is None and not view.record_button.isChecked()
+        assert view.acquisition.subscribers == (view.worker.process_samples,)
+        segments = [load_capture(segment) for segment in recording_segments(path)]
+        assert all(segment.mode == mode for segment in segments)
+        assert np.array_equal(np.concatenate([segment.samples for segment in segments]), samples)
+    finally:
+        view.worker.stop_worker()
+        view.close()
@@ -0,0 +1,48 @@
+# test_render_scheduler.py
+
+import time
+from PyQt6.QtCore import QTimer
+from RenderScheduler import LOAD_FACTOR, RenderScheduler
+from fixtures import get_application, run_event_loop
+
+
+def test_frame_rate_limits(duration=1.0):
+    # Data every millisecond: frames follow the refresh rate, slow frames back off, hidden windows stop
+    from PyQt6.QtWidgets import QWidget
+    app = get_application()
+    widget = QWidget()
+    widget.show()
+    frames = []
+    frame_time = [0.0]
+
+    def render():
+        frames.append(time.perf_counter())
+        time.sleep(frame_time[0])
+
+    scheduler = RenderScheduler(widget, render)
+    feeder = QTimer()
+    feeder.timeout.connect(scheduler.mark_dirty)
+    feeder.start(1)
+    scheduler.start()
+    max_fps = 1 / scheduler.refresh_interval()
+    try:
+        for sleep, visible in ((0.0, True), (0.02, True), (0.0, False)):
+            frame_time[0] = sleep
+            widget.setVisible(visible)
+            del frames[:]
+            run_event_loop(duration)
+            fps = len(frames) / duration
+            if not visible:
+                assert fps == 0, "a hidden display was redrawn"
+            else:
+                # At most one refresh per interval, or one frame per LOAD_FACTOR frame durations
+                assert fps <= min(max_fps, 1 / (LOAD_FACTOR * sleep) if sleep else max_fps) * 1.1 + 1, \
+                    f"{fps:.0f} frames/s is over the limit"
+                assert fps > 0, "a visible display with new data was not redrawn"
+        widget.show()
+        run_event_loop(0.1)
+        assert frames, "the display was not redrawn when shown again"
+    finally:
+        feeder.stop()
+        scheduler.stop()
+        widget.close()
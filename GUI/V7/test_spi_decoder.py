@@ -0,0 +1,42 @@
+# test_spi_decoder.py
+
+import numpy as np
+import pytest
+from SPIDecoder import SPIDecoder
+from Waveforms import make_spi_capture
+from fixtures import SPI_GROUP_CONFIGS, LegacySPIDecoder, decode_in_chunks
+
+CAPTURES = {
+    'transfers': lambda: make_spi_capture(200)[0],
+    'noise': lambda: np.random.default_rng(0).integers(0, 256, 100000).astype(np.uint8),
+}
+
+
+# Mode 0 against the per-sample decoder, on protocol traffic and on random noise
+@pytest.mark.parametrize('capture', CAPTURES)
+@pytest.mark.parametrize('bits, first_bit', [(8, 'MSB'), (5, 'LSB'), (16, 'MSB')])
+def test_matches_per_sample_decoder(capture, bits, first_bit, chunk_size=4999):
+    samples = CAPTURES[capture]()
+    group_configs = [dict(config, bits=bits, first_bit=first_bit) for config in SPI_GROUP_CONFIGS]
+    decoder = SPIDecoder()
+    legacy = decode_in_chunks(LegacySPIDecoder(group_configs).decode, samples, chunk_size)
+    vectorized = decode_in_chunks(lambda chunk, idx: decoder.decode(chunk, idx, group_configs), samples, chunk_size)
+    assert legacy == vectorized, f"SPI decoders differ on {capture} with {bits} {first_bit} first bits"
+
+
+# Every mode and word size against the words the generator sent
+@pytest.mark.parametrize('mode', range(4))
+@pytest.mark.parametrize('bits', [4, 7, 8, 12, 16, 24, 32])
+@pytest.mark.parametrize('first_bit', ['MSB', 'LSB'])
+def test_decodes_generated_words(mode, bits, first_bit, chunk_size=4999):
+    samples, mosi_words, miso_words = make_spi_capture(50, bits=bits, mode=mode, first_bit=first_bit, seed=bits)
+    config = dict(SPI_GROUP_CONFIGS[0], bits=bits, mode=mode, first_bit=first_bit)
+    decoder = SPIDecoder(1)
+    decoded_mosi = []
+    decoded_miso = []
+    for i in range(0, len(samples), chunk_size):
+        _, mosi, miso, _ = decoder.decode_words(samples[i:i + chunk_size], i, 0, config)
+        decoded_mosi.extend(mosi.tolist())
+        decoded_miso.extend(miso.tolist())
+    assert decoded_mosi == mosi_words and decoded_miso == miso_words, \
+        f"SPI mode {mode} with {bits} {first_bit} first bits decodes wrong words"
@@ -0,0 +1,181 @@
+# test_transitions.py
+
+import os
+import numpy as np
+import pytest
+from SampleBuffer import SampleRingBuffer
+from Transitions import RUN_CHUNK, TransitionStore, sample_runs
+from Decoders import DecoderPlugin, DecoderSet, create_decoder, load_decoder
+from CaptureFile import save_capture
+from Waveforms import make_i2c_capture, make_spi_capture, make_uart_capture
+from benchmark import setup_protocol_display, setup_uart_display
+from fixtures import (
+    decode_in_chunks, decode_stacked, get_application, make_channel_bits, make_flash_capture, make_mixed_capture,
+    make_modbus_capture, make_multichannel_uart, make_offline_display, make_register_capture, make_uart_configs,
+    with_crc,
+)
+
+
+def decode_store(decoder, store, max_runs):
+    events = []
+    for indices, values, stop_idx in store.chunks(max_runs=max_runs):
+        events.extend(decoder.decode_runs(indices, values, stop_idx))
+    return events
+
+
+def test_store_follows_ring_buffer(steps=3000, capacity=5000):
+    # The buffer's runs expand to its samples while it fills, wraps, clears and resizes
+    rng = np.random.default_rng(3)
+    samples = np.repeat(rng.integers(0, 256, 50000), rng.integers(1, 40, 50000)).astype(np.uint8)
+    buffer = SampleRingBuffer(capacity, transitions=True)
+    position = 0
+    for step in range(steps):
+        new = int(rng.integers(0, 2 * capacity if step % 100 == 0 else 300))
+        buffer.append(samples[position:position + new])
+        position = (position + new) % (len(samples) - 2 * capacity)
+        if rng.random() < 0.01:
+            buffer.clear()
+        elif rng.random() < 0.01:
+            buffer.resize(int(rng.integers(100, 2 * capacity)))
+        if step % 4:
+            continue  # Several chunks, some of them overwritten already, get folded in at once
+        store = buffer.transitions()
+        assert store.total_samples == buffer.total_samples and len(store) <= len(buffer) + 1
+        assert np.array_equal(store.samples(buffer.first_sample), buffer.contiguous()), \
+            f"transitions differ from the buffer after step {step}"
+
+
+def test_from_samples():
+    samples = make_mixed_capture()[0]
+    store = TransitionStore.from_samples(samples)
+    assert store.total_samples == len(samples) and np.array_equal(store.samples(), samples)
+    noise = np.random.default_rng(0).integers(0, 256, 100000).astype(np.uint8)
+    assert TransitionStore.from_samples(noise, max_bytes=len(noise)) is None
+
+
+@pytest.fixture(scope='module')
+def mixed_capture():
+    samples, configs = make_mixed_capture()
+    configs['spi'][0]['frame_events'] = True
+    return samples, configs
+
+
+# Runs against samples, in chunks of runs of every size and in the live chunks' runs
+@pytest.mark.parametrize('name', ['i2c', 'spi', 'uart'])
+def test_runs_decode_like_samples(mixed_capture, name, chunk_size=4999):
+    samples, configs = mixed_capture
+    expected = decode_in_chunks(create_decoder(name, configs[name]).decode, samples, chunk_size)
+    assert len(expected) > 500
+    store = TransitionStore.from_samples(samples)
+    for max_runs in (1, 97, RUN_CHUNK):
+        events = decode_store(create_decoder(name, configs[name]), store, max_runs)
+        assert events == expected, f"{name} decodes differently from runs of {max_runs}"
+    decoder = create_decoder(name, configs[name])
+    events = decode_in_chunks(
+        lambda chunk, idx: decoder.decode_runs(*sample_runs(chunk, idx), idx + len(chunk)), samples, chunk_size
+    )
+    assert events == expected, f"{name} decodes differently from the runs of each chunk"
+
+
+def test_uart_runs_with_fractional_bits():
+    # Eight channels with parity and 13.7 samples per bit, frames split across chunks of runs
+    samples = make_multichannel_uart(100, 13.7, parity='Even')[0]
+    configs = make_uart_configs(13.7, parity='Even')
+    expected = decode_in_chunks(create_decoder('uart', configs).decode, samples, 3001)
+    store = TransitionStore.from_samples(samples)
+    for max_runs in (1, 5, 333):
+        assert decode_store(create_decoder('uart', configs), store, max_runs) == expected
+
+
+def test_decoder_set_and_sample_plugins(mixed_capture, chunk_size=4999):
+    class ChunkPlugin(DecoderPlugin):
+        # Needs the samples, gets them expanded from the runs
+        name = 'chunk'
+
+        def decode_events(self, samples, start_idx):
+            return [{'sample_idx': start_idx, 'ones': int(np.count_nonzero(samples & 1))}]
+
+    samples, configs = mixed_capture
+
+    def make_set():
+        return DecoderSet([create_decoder(name, configs[name]) for name in ('i2c', 'spi', 'uart')] + [ChunkPlugin()])
+
+    expected = decode_in_chunks(make_set().decode, samples, chunk_size)
+    decoders = make_set()
+    events = decode_in_chunks(
+        lambda chunk, idx: decoders.decode_runs(*sample_runs(chunk, idx), idx + len(chunk)), samples, chunk_size
+    )
+    assert events == expected
+
+
+STACKED_CAPTURES = {
+    'eeprom': (make_register_capture, '', None),
+    'sensor': (make_register_capture, '', None),
+    'spiflash': (make_flash_capture, '', None),
+    'modbus': (lambda: make_modbus_capture([with_crc([0x11, 0x03, 0x00, 0x6B, 0x00, 0x03]), [0x11, 0x83, 0x02, 0, 0]]),
+               'channel=1,baud=9600', 16 * 9600),
+}
+
+
+@pytest.mark.parametrize('name', STACKED_CAPTURES)
+def test_stacked_runs(name):
+    make_capture, settings, sample_rate = STACKED_CAPTURES[name]
+    samples = make_capture()
+    decoder = create_decoder(name, [load_decoder(name).make_config(settings)], sample_rate)
+    expected = decode_stacked(decoder, samples, 97)
+    assert len(expected) >= 2
+    store = TransitionStore.from_samples(samples)
+    for max_runs in (3, RUN_CHUNK):
+        decoder.reset()
+        assert decode_store(decoder, store, max_runs) + decoder.flush() == expected
+
+
+# Oversampled like a real capture, so the runs are smaller than the samples
+CAPTURES = {
+    'I2C': lambda: make_i2c_capture(40, bit_delay=40),
+    'SPI': lambda: make_spi_capture(50, bit_delay=40)[0],
+    'UART': lambda: make_uart_capture(150)[0],
+}
+
+
+@pytest.mark.parametrize('mode', CAPTURES)
+def test_opened_capture_decodes_runs(tmp_path, mode, sample_rate=153600):
+    # An opened capture is shown from its runs, with the events decoding its samples gives
+    app = get_application()
+    samples = CAPTURES[mode]()
+    path = os.path.join(tmp_path, 'check.lacap')
+    view = make_offline_display(mode, 4096)
+    try:
+        if mode == 'UART':
+            setup_uart_display(view, sample_rate)
+        else:
+            setup_protocol_display(view, sample_rate)
+        save_capture(path, samples, sample_rate, [f"Ch{i}" for i in range(8)], None, mode,
+                     view.capture_decoder_configs())
+        shown = []
+        view.display_decoded_message = shown.append
+        view.read_capture_file(path)
+        assert view.data_buffer.transitions() is not None
+        expected = decode_in_chunks(view.capture_decoder().decode, samples, 65536)
+        assert len(shown) > 50 and shown == expected
+        view.close_capture()
+    finally:
+        view.worker.stop_worker()
+        view.close()
+
+
+def test_busy_capture_stays_samples(tmp_path):
+    # Noisier than the runs are worth, the capture is drawn and decoded from its samples
+    app = get_application()
+    samples = make_channel_bits(20000) * 0xFF
+    samples[::2] ^= 0x10
+    path = os.path.join(tmp_path, 'check.lacap')
+    view = make_offline_display('Signal', 4096)
+    try:
+        save_capture(path, samples, 1000, [f"Ch{i}" for i in range(8)])
+        view.read_capture_file(path)
+        assert view.data_buffer.transitions() is None and len(view.data_buffer) == len(samples)
+        view.close_capture()
+    finally:
+        view.worker.stop_worker()
+        view.close()
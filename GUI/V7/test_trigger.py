@@ -0,0 +1,124 @@
+# test_trigger.py
+
+import numpy as np
+import pytest
+from I2CDecoder import I2CDecoder
+from UARTDecoder import UARTDecoder
+from Waveforms import make_i2c_capture, make_uart_capture
+from Trigger import TriggerEngine, compile_trigger_masks, find_edge, parse_trigger_condition
+from fixtures import find_in_chunks, gate_in_chunks, legacy_trigger_gate, make_uart_configs
+
+NUM_SAMPLES = 200003
+CHUNK_SIZE = 4999
+
+
+@pytest.fixture(scope='module')
+def slow_samples():
+    # Slow random levels so edges are a few hundred samples apart
+    rng = np.random.default_rng(3)
+    return np.repeat(rng.integers(0, 256, NUM_SAMPLES // 300 + 1), 300)[:NUM_SAMPLES].astype(np.uint8)
+
+
+@pytest.fixture(scope='module')
+def modes():
+    modes = ['No Trigger'] * 8
+    modes[2], modes[5] = 'Rising Edge', 'Falling Edge'
+    return modes
+
+
+def test_matches_per_sample_gate(slow_samples, modes):
+    engine = TriggerEngine()
+    engine.set_trigger_modes(modes)
+    passed, offsets = gate_in_chunks(engine, slow_samples, CHUNK_SIZE)
+    chunks = [slow_samples[i:i + CHUNK_SIZE] for i in range(0, NUM_SAMPLES, CHUNK_SIZE)]
+    assert np.array_equal(passed, legacy_trigger_gate(chunks, modes)), \
+        "trigger engine passes different samples than the per-sample loop"
+    assert offsets == [0], f"one trigger expected at the start of the output, got {offsets}"
+
+
+def test_rearmed_pre_post_split(slow_samples, modes, pre=700, post=2000):
+    # Pre/post split with re-arming, against edges found over the whole capture
+    samples = slow_samples
+    rise_mask, fall_mask = compile_trigger_masks(modes)
+    previous = np.concatenate(([samples[0]], samples[:-1]))
+    edges = np.flatnonzero((previous ^ samples) & ((samples & rise_mask) | (previous & fall_mask)))
+    expected, history_start = [], 0
+    position = 0
+    while True:
+        following = edges[edges >= position]
+        if len(following) == 0:
+            break
+        edge = int(following[0])
+        expected.append(samples[max(edge - pre, history_start):edge + post])
+        position = history_start = edge + post
+    engine = TriggerEngine(pre_trigger=pre, post_trigger=post, auto_rearm=True)
+    engine.set_trigger_modes(modes)
+    passed, offsets = gate_in_chunks(engine, samples, CHUNK_SIZE)
+    assert np.array_equal(passed, np.concatenate(expected)), "re-armed captures do not match the edges"
+    assert len(offsets) == len(expected), f"{len(offsets)} triggers found, {len(expected)} expected"
+    assert find_edge(samples[:1], rise_mask, fall_mask) is None, "the first sample of a stream is not an edge"
+
+
+def reference_sequence(samples):
+    # "rising:1&pattern:1XXXXXXX -> pulse:channel=2,level=low,min=8,max=12 -> pattern:X01X", one sample at a time
+    stage = 0
+    previous = None
+    pulse_start = None
+    for idx, value in enumerate(samples.tolist()):
+        if stage == 0:
+            if previous is not None and not previous & 1 and value & 1 and value & 0x80:
+                stage = 1
+                pulse_start = None
+        elif stage == 1:
+            if previous & 2 and not value & 2:
+                pulse_start = idx
+            elif not previous & 2 and value & 2:
+                if pulse_start is not None and 8 <= idx - pulse_start <= 12:
+                    stage = 2
+                pulse_start = None
+        elif value & 0b0110 == 0b0010 and previous & 0b0110 != 0b0010:
+            return idx
+        previous = value
+    return None
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4999, 300007])
+def test_sequence_matches_reference(chunk_size, num_samples=300007):
+    rng = np.random.default_rng(5)
+    # Random levels held for 1 to 40 samples, so pulses of every width come up
+    samples = np.repeat(rng.integers(0, 256, num_samples // 8), rng.integers(1, 41, num_samples // 8))
+    samples = samples[:num_samples].astype(np.uint8)
+    if chunk_size == 1:
+        samples = samples[:20000]  # One sample at a time is slow
+    sequence = parse_trigger_condition(
+        "rising:1&pattern:1XXXXXXX -> pulse:channel=2,level=low,min=8,max=12 -> pattern:X01X", 1e6
+    )
+    expected = reference_sequence(samples)
+    assert expected is not None, "the test capture never fires the sequence"
+    found = find_in_chunks(sequence, samples, chunk_size)
+    assert found == expected, f"sequence trigger fired at {found} with {chunk_size}-sample chunks, expected {expected}"
+
+
+@pytest.mark.parametrize('chunk_size', [13, 4999])
+def test_i2c_address(chunk_size):
+    i2c_samples = make_i2c_capture(200, scl_channel=1, sda_channel=0, seed=2)
+    events = I2CDecoder(1).decode(i2c_samples, 0, [{'data_channel': 1, 'clock_channel': 2, 'address_width': 7}])
+    addresses = [(i, event) for i, event in enumerate(events) if event['event'] == 'ADDRESS']
+    index, address = addresses[len(addresses) // 2]
+    first = next(i for i, event in addresses if event['data'] == address['data'] and event['rw_bit'] == address['rw_bit'])
+    expected = events[first + 1]['sample_idx']  # Its ACK
+    rw = 'read' if address['rw_bit'] else 'write'
+    i2c = parse_trigger_condition(f"i2c:address={address['data']},data=1,clock=2,rw={rw}", 1e6)
+    found = find_in_chunks(i2c, i2c_samples, chunk_size)
+    assert found == expected, f"I2C address trigger fired at {found}, expected {expected}"
+
+
+@pytest.mark.parametrize('chunk_size', [13, 4999])
+def test_uart_byte(chunk_size):
+    uart_samples, values = make_uart_capture(500, samples_per_bit=16, seed=4)
+    value = values[300]
+    frames = UARTDecoder(1).decode(uart_samples, 0, [dict(make_uart_configs(16)[0], enabled=True)])
+    expected = next(frame['sample_idx'] for frame in frames if frame['data'] == value)
+    uart = parse_trigger_condition(f"uart:value={value:#x},channel=1,baud=1000000", 16e6)
+    found = find_in_chunks(uart, uart_samples, chunk_size)
+    assert found == expected, f"UART byte trigger fired at {found}, expected {expected}"
@@ -0,0 +1,53 @@
+# test_uart_decoder.py
+
+import pytest
+from UARTDecoder import UARTDecoder
+from Waveforms import WaveformBuilder, add_uart_levels, uart_frame_levels
+from fixtures import LegacyUARTDecoder, decode_in_chunks, make_multichannel_uart, make_uart_configs
+
+
+def test_matches_per_sample_decoder(chunk_size=4999):
+    # 16 samples per bit on clean traffic, where the old decoder's timing was right
+    samples, _ = make_multichannel_uart(300, 16)
+    uart_configs = make_uart_configs(16)
+    decoder = UARTDecoder()
+    legacy = decode_in_chunks(LegacyUARTDecoder(uart_configs).decode, samples, chunk_size)
+    vectorized = decode_in_chunks(lambda chunk, idx: decoder.decode(chunk, idx, uart_configs), samples, chunk_size)
+    keys = ('channel', 'data', 'sample_idx', 'data_format')
+    assert legacy == [{key: event[key] for key in keys} for event in vectorized], "UART decoders differ at 16 samples per bit"
+
+
+# Fractional samples per bit, data bits, parity and stop bits against the generator
+@pytest.mark.parametrize('samples_per_bit', [3.3, 7.5, 16, 16.7, 100 / 3])
+@pytest.mark.parametrize('data_bits, parity, stop_bits', [(8, 'None', 1), (5, 'Even', 2), (7, 'Odd', 1), (9, 'Even', 1)])
+def test_decodes_generated_frames(samples_per_bit, data_bits, parity, stop_bits, chunk_size=4999):
+    settings = {'data_bits': data_bits, 'parity': parity, 'stop_bits': stop_bits}
+    samples, sent = make_multichannel_uart(200, samples_per_bit, **settings)
+    uart_configs = make_uart_configs(samples_per_bit, **settings)
+    decoder = UARTDecoder()
+    events = decode_in_chunks(lambda chunk, idx: decoder.decode(chunk, idx, uart_configs), samples, chunk_size)
+    for ch in range(8):
+        received = [event['data'] for event in events if event['channel'] == ch]
+        assert received == sent[ch], f"UART channel {ch} decodes wrong data at {samples_per_bit:.2f} samples per bit"
+    assert not any(event['parity_error'] or event['framing_error'] or event['break'] for event in events)
+
+
+def test_error_flags():
+    # Parity error, framing error and break on one channel
+    builder = WaveformBuilder()
+    builder.hold(50)
+    add_uart_levels(builder, uart_frame_levels(0x41, parity='Even'), 0, 10.5)
+    builder.hold(50)
+    add_uart_levels(builder, uart_frame_levels(0x41, parity='Odd'), 0, 10.5)
+    builder.hold(50)
+    add_uart_levels(builder, uart_frame_levels(0x41, parity='Even')[:-1] + [0], 0, 10.5)
+    builder.set(0, 1)
+    builder.hold(50)
+    add_uart_levels(builder, [0] * 20, 0, 10.5)
+    builder.set(0, 1)
+    builder.hold(50)
+    uart_config = make_uart_configs(10.5, channels=1, parity='Even')
+    events = UARTDecoder().decode(builder.samples(), 0, uart_config)
+    flags = [(event['data'], event['parity_error'], event['framing_error'], event['break']) for event in events]
+    assert flags == [(0x41, False, False, False), (0x41, True, False, False), (0x41, False, True, False),
+                     (0, False, True, True)], f"UART error reporting is wrong: {flags}"
@@ -53,6 +53,14 @@ uint16_t triggerPeriod = 0x0000;
 int trigPointer = 0;
 #define MAX_VALUES 2  // Number of values associated with each command
 #define MAX_CMD_LENGTH 64  // Maximum command string length
+// Binary transport: [0xA5 0x5A][seq u16][width u8][flags u8][count u16][payload][fletcher16 u16]
+#define FRAME_SYNC_0 0xA5
+#define FRAME_SYNC_1 0x5A
+#define FRAME_HEADER_SIZE 8
+#define FRAME_SAMPLES 240  // 8 + 240 + 2 bytes per frame
+uint8_t binaryMode = 0; // 0 = ASCII lines, 1 = binary frames (command 8)
+uint16_t frameSequence = 0;
+uint8_t frames[2][FRAME_HEADER_SIZE + FRAME_SAMPLES + 2]; // filled alternately while the other is in flight
 /* Private define ------------------------------------------------------------*/
 /* USER CODE BEGIN PD */
 
@@ -81,6 +89,7 @@ void change_prescalar16(uint16_t prescalar);
 void Process_USB_Command(char *cmd);
 void change_period2(uint32_t period);
 void change_period16(uint16_t period);
+void Send_Sample_Frame(void);
 /* USER CODE BEGIN PFP */
 
 /* USER CODE END PFP */
@@ -165,6 +174,11 @@ int main(void)
   	  	  		  break;
   	  	  	  case postTrigger:
 
+  	  	  		 if(binaryMode){
+  	  	  			 Send_Sample_Frame();
+  	  	  			 break;
+  	  	  		 }
+
   	  	  		 if(val == BUFFER_SIZE){
   	  	  			 val = 0;
   	  	  	  	 }
@@ -500,6 +514,10 @@ void Process_USB_Command(char *cmd) {
 				prescalar16 |= atoi(cmd);
 				change_prescalar16(prescalar16);
 				break;
+			case 8: // transport mode, 0 = ASCII, 1 = binary frames
+				binaryMode = atoi(cmd);
+				frameSequence = 0;
+				break;
 			}
 	}
 	 memset(cmd, 0, strlen(cmd));  // Clear the command string//clear command
@@ -524,6 +542,52 @@ void change_prescalar16(uint16_t prescalar){
 
 	MX_TIM16_Init(period16, prescalar);
 }
+
+// Sends up to FRAME_SAMPLES samples (low byte of each) as one binary frame
+void Send_Sample_Frame(void){
+	uint8_t *frame = frames[frameSequence & 1];
+	if(val == BUFFER_SIZE){
+		val = 0;
+	}
+	uint16_t count = 0;
+	while(count < FRAME_SAMPLES){
+		frame[FRAME_HEADER_SIZE + count] = (uint8_t)(buffer[val] & 0xFF);
+		count++;
+		val++;
+		if(val == bufferPointer || val == BUFFER_SIZE){
+			break;
+		}
+	}
+
+	frame[0] = FRAME_SYNC_0;
+	frame[1] = FRAME_SYNC_1;
+	frame[2] = frameSequence & 0xFF;
+	frame[3] = frameSequence >> 8;
+	frame[4] = 1; // sample width in bytes
+	frame[5] = 0;
+	frame[6] = count & 0xFF;
+	frame[7] = count >> 8;
+
+	// Fletcher-16 over everything after the sync bytes
+	uint16_t sum1 = 0;
+	uint16_t sum2 = 0;
+	for(int k = 2; k < FRAME_HEADER_SIZE + count; k++){
+		sum1 = (sum1 + frame[k]) % 255;
+		sum2 = (sum2 + sum1) % 255;
+	}
+	frame[FRAME_HEADER_SIZE + count] = sum1;
+	frame[FRAME_HEADER_SIZE + count + 1] = sum2;
+
+	while(CDC_Transmit_FS(frame, FRAME_HEADER_SIZE + count + 2) == USBD_BUSY);
+	frameSequence++;
+
+	if(val == bufferPointer){
+		counter = 0;
+		memset(buffer, 0, sizeof(buffer));
+		HAL_TIM_PWM_Start_IT(&htim2, TIM_CHANNEL_1);
+		state = preTrigger;
+	}
+}
 /* USER CODE BEGIN 4 */
 
 /* USER CODE END 4 */